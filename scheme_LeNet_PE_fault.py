@@ -18,8 +18,9 @@ from simulator.metrics.FT_metrics import acc_loss,relative_acc,pred_miss,top2_pr
 from tensorflow.keras.losses import categorical_crossentropy
 from simulator.comp_unit.tile import tile_PE, tile_FC_PE
 from simulator.comp_unit.PEarray import PEarray
-from simulator.comp_unit.mac import mac_unit, preprocess_model_mac_fault
-from simulator.comp_unit.mapping_flow import PE_mapping_forward,PE_mapping_backward
+from simulator.comp_unit.mac import mac_unit, preprocess_layer_mac_fault
+from simulator.comp_unit.mac_fault_cache import mac_fault_cache
+from simulator.comp_unit.mapping_flow import mapping_plan
 from simulator.models.model_mods import make_ref_model
 
 
@@ -46,6 +47,8 @@ config_dir=os.path.join(config_dir, network_dir, dataflow_dir, PEarraysize)
 mac_config=os.path.join(config_dir,'mac_unit_config.json')
 model_wl=model_word_length
 mapping_verbose=5
+# preprocess data cache, reused by later rounds and runs with the same mapping and fault
+cache_dir=os.path.join('..','mac_fault_cache',network_dir,dataflow_dir,PEarraysize)
 
 test_rounds=200
 
@@ -164,62 +167,48 @@ MXU_config_conv2  =os.path.join(config_dir,'MXU_config_conv2.json')
 
 #%% fault generation
 
+# the mapped layers (layer index, ifmap tile, wght tile, ofmap tile, mapping configs)
+layer_mappings=[(1,ifmap_tile_conv1,wght_tile_conv1,ofmap_tile_conv1,[ifmap_config_conv1,wght_config_conv1,ofmap_config_conv1,MXU_config_conv1]),
+                (3,ifmap_tile_conv2,wght_tile_conv2,ofmap_tile_conv2,[ifmap_config_conv2,wght_config_conv2,ofmap_config_conv2,MXU_config_conv2])]
+
+mac_cache=mac_fault_cache(cache_dir, verbose=mapping_verbose)
+layer_mapping_keys=[mac_cache.mapping_key(ref_model.layers[layer_num], PE, MXU, [ifmap_tile,wght_tile,ofmap_tile], configs,
+                                          fmap_dist_stat=lenet_ifmap_distribution_info[layer_num],
+                                          wght_dist_stat=lenet_wght_distribution_info[layer_num]) 
+                    for layer_num,ifmap_tile,wght_tile,ofmap_tile,configs in layer_mappings]
+
+# compiled mapping plans, made on first cache miss of each layer
+layer_plans=dict()
+
+def gen_layer_PE_fault_dict(layer_num,ifmap_tile,wght_tile,ofmap_tile,configs,faultloc,faultinfo,verbose):
+    if layer_num not in layer_plans:
+        ofmap_tile.clear()
+        ifmap_tile.clear()
+        wght_tile.clear()
+        MXU.clear_all()
+        layer_plans[layer_num]=mapping_plan(ref_model.layers[layer_num],ifmap_tile,wght_tile,ofmap_tile,MXU,*configs,verbose=verbose)
+        MXU.clear_all()
+    
+    plan=layer_plans[layer_num]
+    plan.gen_PEarray_permanent_fault_dict(faultloc, faultinfo, mac_config=True)
+    layer_mac_fault_dict, psidx_tmp = plan.map_backward(verbose=verbose, return_detail=True)
+    
+    # make preprocess data
+    preprocess_data=preprocess_layer_mac_fault(ref_model.layers[layer_num], PE, layer_mac_fault_dict,
+                                               layer_fmap_dist_stat=lenet_ifmap_distribution_info[layer_num],
+                                               layer_wght_dist_stat=lenet_wght_distribution_info[layer_num])
+    return preprocess_data, psidx_tmp
+
 def gen_model_PE_fault_dict(ref_model,faultloc,faultinfo,verbose):
     t=time.time()
     model_mac_fault_dict_list=[None for i in range(8)] 
     psidx_cnt=0
     
-    # clear fault dictionary every iteration
-    ofmap_tile_conv1.clear()
-    ifmap_tile_conv1.clear()
-    wght_tile_conv1.clear()
-    ofmap_tile_conv2.clear()
-    ifmap_tile_conv2.clear()
-    wght_tile_conv2.clear()
-    # ofmap_tile_fc1.clear()
-    # ifmap_tile_fc1.clear()
-    # wght_tile_fc1.clear()
-    # ofmap_tile_fc2.clear()
-    # ifmap_tile_fc2.clear()
-    # wght_tile_fc2.clear()
-    MXU.clear_all()
-    
-    PE_mapping_forward(ifmap_tile_conv1,wght_tile_conv1,ofmap_tile_conv1,MXU,
-                       ifmap_config_conv1,wght_config_conv1,ofmap_config_conv1,MXU_config_conv1,
-                       pre_plan=True,verbose=verbose)
-    MXU.gen_PEarray_permanent_fault_dict(faultloc, faultinfo, mac_config=True)
-    model_mac_fault_dict_list[1], psidx_tmp = PE_mapping_backward(ref_model.layers[1], MXU, verbose=verbose, return_detail=True)
-    psidx_cnt+=psidx_tmp['num_layer_psum_idx']
-    MXU.clear_all()
+    for (layer_num,ifmap_tile,wght_tile,ofmap_tile,configs),mapping_key in zip(layer_mappings,layer_mapping_keys):
+        key=mac_cache.PE_fault_key(mapping_key, faultloc, faultinfo)
+        model_mac_fault_dict_list[layer_num], psidx_tmp = mac_cache.cached(key, lambda: gen_layer_PE_fault_dict(layer_num,ifmap_tile,wght_tile,ofmap_tile,configs,faultloc,faultinfo,verbose))
+        psidx_cnt+=psidx_tmp['num_layer_psum_idx']
     
-    PE_mapping_forward(ifmap_tile_conv2,wght_tile_conv2,ofmap_tile_conv2,MXU,
-                        ifmap_config_conv2,wght_config_conv2,ofmap_config_conv2,MXU_config_conv2,
-                        pre_plan=True,verbose=verbose)
-    MXU.gen_PEarray_permanent_fault_dict(faultloc, faultinfo, mac_config=True)
-    model_mac_fault_dict_list[3], psidx_tmp = PE_mapping_backward(ref_model.layers[3], MXU, verbose=verbose, return_detail=True)
-    psidx_cnt+=psidx_tmp['num_layer_psum_idx']
-    MXU.clear_all()
-    
-    # PE_mapping_forward(ifmap_tile_fc1,wght_tile_fc1,ofmap_tile_fc1,MXU,
-    #                   ifmap_config_fc1,wght_config_fc1,ofmap_config_fc1,MXU_config_fc1,
-    #                   pre_plan=True,verbose=verbose)
-    # MXU.gen_PEarray_permanent_fault_dict(faultloc, faultinfo, mac_config=True)
-    # model_mac_math_fault_dict_list[6], psidx_tmp = PE_mapping_backward(model.layers[7], MXU, verbose=verbose, return_detail=True)
-    # psidx_cnt+=psidx_tmp['num_layer_psum_idx']
-    # MXU.clear_all()
-    
-    # PE_mapping_forward(ifmap_tile_fc2,wght_tile_fc2,ofmap_tile_fc2,MXU,
-    #                   ifmap_config_fc2,wght_config_fc2,ofmap_config_fc2,MXU_config_fc2,
-    #                   pre_plan=True,verbose=verbose)
-    # MXU.gen_PEarray_permanent_fault_dict(faultloc, faultinfo, mac_config=True)
-    # model_mac_math_fault_dict_list[7], psidx_tmp = PE_mapping_backward(model.layers[7], MXU, verbose=verbose, return_detail=True)
-    # psidx_cnt+=psidx_tmp['num_layer_psum_idx']
-    # MXU.clear_all()
-    
-    # make preprocess data
-    model_mac_fault_dict_list=preprocess_model_mac_fault(ref_model, PE, model_mac_fault_dict_list,
-                                                         model_fmap_dist_stat_list=lenet_ifmap_distribution_info,
-                                                         model_wght_dist_stat_list=lenet_wght_distribution_info)
     t=time.time()-t
     if verbose>0:
         print('mapping time : %f s'%t)
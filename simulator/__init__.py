@@ -1,5 +1,2 @@
-import numpy as np
-from tensorflow import keras
-
 import os
 os.environ['TF_FORCE_GPU_ALLOW_GROWTH'] = 'true'
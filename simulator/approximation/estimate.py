@@ -8,6 +8,7 @@ Estimation for approximate computing
 """
 
 import numpy as np
+from ..models.layer_shape import get_layer_weight_shape
 
 def comp_num_estimate(model,add_topo=None):
     '''
@@ -119,7 +120,7 @@ def get_model_param_size(model,batch_size):
         else:
             layer_input_shape=layer.input_shape
             layer_output_shape=layer.output_shape
-            layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
+            layer_weight_shape=get_layer_weight_shape(layer)
             
             if isinstance(layer_input_shape,list):
                 param_size_report['input_params'].append(np.array([int(np.prod(shapes[1:]) * batch_size) for shapes in layer_input_shape]))
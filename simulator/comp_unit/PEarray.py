@@ -3051,7 +3051,7 @@ class PEarray:
                 if np.min(idl_cnt)==np.max(idl_cnt):
                     fault_value['id']=np.array(id_list)
                 else:
-                    fault_value['id']=np.array(id_list,dtype=np.object)
+                    fault_value['id']=np.array(id_list,dtype=object)
             else:
                 id_list_rep=[list() for _ in range(len(uni_idx))]
                 type_list_rep=[list() for _ in range(len(uni_idx))]
@@ -102,24 +102,18 @@ class mac_unit:
     ...                  'signbit': Bool or Ndarray, #fault_bit on sign bit indication
     ...                  }
 
-    | mac math fault injection scatter fault
+    | mac math fault injection scatter fault, one row per (coordinate, fault) in integer columns
     >>> preprocess_data={'fd_coor': 2D Ndarray, #the coordinate of fault in layer
-    ...                  'param_ofmap': 1D Ndarray, #the faulty ofmap param index
-    ...                  'param_ifmap': 1D Ndarray, #the faulty ifmap param index
-    ...                  'param_wght': 1D Ndarray, #the faulty wght param index
-    ...                  'idx_ofmap': 2D Ndarray, #faulty ofmap coordinate
-    ...                  'modulator_ofmap': List, #polarty data list for ofmap fault
-    ...                  'idx_ifmap_ifmap': 2D Ndarray, #faulty ifmap coordinate
-    ...                  'idx_ifmap_wght': 2D Ndarray, #faulty ifmap correspond wght coordinate
-    ...                  'modulator_ifmap': List, #polarty data list for ifmap fault
-    ...                  'idx_wght_wght': 2D Ndarray, #faulty wght coordinate
-    ...                  'idx_wght_ifmap': 2D Ndarray, #faulty wght correspond ifmap coordinate
-    ...                  'modulator_wght': List, #polarty data list for wght fault
-    ...                  'faultbit_ofmap': 1D Ndarray, #the ofmap fault bit order
-    ...                  'faultbit_ifmap': 1D Ndarray, #the ifmap fault bit order
-    ...                  'faultbit_wght': 1D Ndarray, #the wght fault bit order
-    ...                  'cnt_psidx': 1D Ndarray, #the counter for uneven psidx number on single ofmap pixel
-    ...                  'psum_idx_list_len': Integer, #number of psum_idx
+    ...                  'coor_id': 1D Ndarray, #the index of fd_coor of each fault row
+    ...                  'param_code': 1D Ndarray, #the faulty param 0:ifmap, 1:wght, 2:psum
+    ...                  'type_code': 1D Ndarray, #the fault type 0:SA0, 1:SA1, 2:flip
+    ...                  'modulator': 1D Ndarray, #fault_bit order coefficient
+    ...                  'signbit': 1D Ndarray, #-1 for fault_bit on sign bit, else 1
+    ...                  'idx_ofmap': 2D Ndarray, #(psidx, ofmap coordinate)
+    ...                  'idx_ifmap': 2D Ndarray, #(psidx, ifmap coordinate)
+    ...                  'idx_wght': 2D Ndarray, #(psidx, wght coordinate)
+    ...                  'psidx_offsets': 1D Ndarray, #(row + 1,) the psidx of row i are idx[psidx_offsets[i]:psidx_offsets[i+1]]
+    ...                  'multi_fault': Bool, #some coordinates have more than one fault row
     ...                  }
     
     | mac noise fault injection unique fault
@@ -297,93 +291,40 @@ class mac_unit:
         """ Preproccess ifmap data and index for padding situation """
         dilated_ksize_row_edge = (ksizes[0] + (ksizes[0]-1) * (dilation_rates[0] - 1))//2
         dilated_ksize_col_edge = (ksizes[1] + (ksizes[1]-1) * (dilation_rates[1] - 1))//2
-        index[:,:,1]=np.add(index[:,:,1],dilated_ksize_row_edge)
-        index[:,:,2]=np.add(index[:,:,2],dilated_ksize_col_edge)
+        index[...,1]=np.add(index[...,1],dilated_ksize_row_edge)
+        index[...,2]=np.add(index[...,2],dilated_ksize_col_edge)
                         
         return index
     
     def _fault_value_extract_loop(self, fault_value, repetitive=False):
         """ Extract data from fault dictionary values 
-            The fault value is in np.array(list(fault_dict.values())) format
+            The fault value is in info-based fault dictionary format
             This is only for slow loop generation
         """
         psum_idx_list=fault_value['psum_idx']
-        fault_bit=fault_value['SA_bit']
-        param_ifmap=list()
-        param_wght=list()
-        param_ofmap=list()
-        type0=list()
-        type1=list()
-        typef=list()
         
         if not repetitive:
-            for i in range(len(fault_bit['param'])):
-                
-                param=fault_value['param'][i]
-                if param=='ifmap_in' or param=='ifmap_out':
-                    param_ifmap.append(i)
-                elif param=='wght_in' or param=='wght_out':
-                    param_wght.append(i)
-                elif param=='psum_in' or param=='psum_out':
-                    param_ofmap.append(i)
-                    
-                typee=fault_value['SA_type'][i]
-                if typee=='0':
-                    type0.append(i)
-                elif typee=='1':
-                    type1.append(i)
-                elif typee=='flip':
-                    typef.append(i)
-                
             # (coor idx, num of psidx, psum idx)
             psum_idx_list=psum_idx_list.astype(np.int32)
-            param_ifmap=np.array(param_ifmap)
-            param_wght=np.array(param_wght)
-            param_ofmap=np.array(param_ofmap)
-            type0=np.array(type0)
-            type1=np.array(type1)
-            typef=np.array(typef)
+            fault_param=np.asarray(fault_value['param'])
+            fault_type=np.asarray(fault_value['SA_type'])
+            fault_bit=np.asarray(fault_value['SA_bit'])
             cnt_psidx=None
         
         else:
-            cnt_psidx=list()
-            fault_param=list()
-            fault_type=list()
-            for i,info in enumerate(fault_value['psum_idx']):
-                cnt_psidx.append(len(info))
-                fault_bit.append(fault_value['SA_bit'][i])
-                fault_param.append(fault_value['param'][i])
-                fault_type.append(fault_value['SA_type'][i])
-            
-            cnt_psidx=np.cumsum(cnt_psidx)[:-1]
-            # (coor idx, num of fault, num of psidx, psum idx)
-            psum_idx_list=np.array(psum_idx_list,dtype=np.object)
+            cnt_psidx=np.cumsum([len(info) for info in psum_idx_list])[:-1]
             # (coor idx * num of fault, num of psidx, psum idx)
             psum_idx_list=np.concatenate(psum_idx_list)
-
-            fault_param=np.array(fault_param,dtype=np.object)
-            fault_type=np.array(fault_type,dtype=np.object)
-            fault_bit=np.array(fault_bit,dtype=np.object)
-            fault_param=np.concatenate(fault_param)
-            fault_type=np.concatenate(fault_type)
-            fault_bit=np.concatenate(fault_bit)
-            
-            for i in range(len(fault_param)):
-                param=fault_param[i]
-                if param=='ifmap_in' or param=='ifmap_out':
-                    param_ifmap.append(i)
-                elif param=='wght_in' or param=='wght_out':
-                    param_wght.append(i)
-                elif param=='psum_in' or param=='psum_out':
-                    param_ofmap.append(i)
-                    
-                typee=fault_type[i]
-                if typee=='0':
-                    type0.append(i)
-                elif typee=='1':
-                    type1.append(i)
-                elif typee=='flip':
-                    typef.append(i)
+            fault_param=np.concatenate(fault_value['param'])
+            fault_type=np.concatenate(fault_value['SA_type'])
+            fault_bit=np.concatenate(fault_value['SA_bit'])
+            
+        param_ifmap=np.flatnonzero(np.isin(fault_param,['ifmap_in','ifmap_out']))
+        param_wght=np.flatnonzero(np.isin(fault_param,['wght_in','wght_out']))
+        param_ofmap=np.flatnonzero(np.isin(fault_param,['psum_in','psum_out']))
+        type0=np.flatnonzero(fault_type=='0')
+        type1=np.flatnonzero(fault_type=='1')
+        typef=np.flatnonzero(fault_type=='flip')
 
         return psum_idx_list,cnt_psidx,fault_bit,param_ifmap,param_wght,param_ofmap,type0,type1,typef
     
@@ -458,7 +399,65 @@ class mac_unit:
             raise ValueError('layer type must be one of \'Conv2D\', \'Dense\', \'DepthwiseConv2D\'')
         
         return order_get_psidx_o,order_get_psidx_w,order_get_psidx_i
-
+    
+    def _fault_table_extract(self, fault_dict):
+        """ Flatten the fault dictionary values into rows of (coordinate, fault) for the vectorized mac fault kernel.
+            The psum indexes of all rows are flatten to (num of psidx, psum idx) with the offsets of rows (CSR),
+            the psum_idx[psidx_offsets[i]:psidx_offsets[i+1]] are the psum indexes of row i.
+            
+            | Support psum_idx in (coor idx, num of psidx, psum idx) Ndarray, flatten psum_idx with 'psum_idx_offsets',
+            | object Ndarray of uneven psidx and List of psidx lists (fastgen) or List of fault lists (repetitive, param is list of list).
+            
+        Returns
+        -------
+        coor_id, psum_idx (num of psidx, psum idx), psidx_offsets (row + 1,), fault_param, fault_type, fault_bit
+        """
+        n_coor=len(fault_dict['coor'])
+        psum_idx_list=fault_dict['psum_idx']
+        
+        def row_values(values):
+            if isinstance(values,(str,int,np.integer)):
+                return np.full(n_coor,values)
+            return values
+        fault_param=row_values(fault_dict['param'])
+        fault_type=row_values(fault_dict['SA_type'])
+        fault_bit=row_values(fault_dict['SA_bit'])
+        
+        # the flatten psum indexes and its offsets of coordinates
+        if 'psum_idx_offsets' in fault_dict:
+            psum_idx=np.asarray(psum_idx_list,dtype=np.int32)
+            psidx_offsets=np.asarray(fault_dict['psum_idx_offsets'],dtype=np.int64)
+        elif isinstance(psum_idx_list,np.ndarray) and psum_idx_list.dtype!=object:
+            if psum_idx_list.ndim==2:
+                psum_idx_list=np.expand_dims(psum_idx_list,1)
+            psum_idx=np.reshape(psum_idx_list,[-1,psum_idx_list.shape[-1]]).astype(np.int32)
+            psidx_offsets=np.multiply(np.arange(n_coor+1,dtype=np.int64),psum_idx_list.shape[1])
+        else:
+            # uneven psidx in object Ndarray or List
+            psidx_cnt=np.zeros(len(psum_idx_list),dtype=np.int64)
+            psidx_rows=list()
+            for i,psidx in enumerate(psum_idx_list):
+                psidx=np.asarray(psidx,dtype=np.int32)
+                if psidx.size>0:
+                    psidx=np.reshape(psidx,[-1,psidx.shape[-1]])
+                    psidx_cnt[i]=len(psidx)
+                    psidx_rows.append(psidx)
+            psum_idx=np.concatenate(psidx_rows)
+            psidx_offsets=np.append(0,np.cumsum(psidx_cnt))
+            
+        if n_coor>0 and isinstance(fault_param[0],list):
+            # repetitive, a list of faults with one psidx each
+            n_fault=np.array([len(param) for param in fault_param],dtype=np.int64)
+            coor_id=np.repeat(np.arange(n_coor,dtype=np.int32),n_fault)
+            psidx_offsets=np.arange(len(coor_id)+1,dtype=np.int64)
+            fault_param=np.concatenate(fault_param)
+            fault_type=np.concatenate(fault_type)
+            fault_bit=np.concatenate(fault_bit)
+        else:
+            coor_id=np.arange(n_coor,dtype=np.int32)
+        
+        return coor_id, psum_idx, psidx_offsets, np.asarray(fault_param), np.asarray(fault_type), np.asarray(fault_bit,dtype=np.int32)
+    
     def preprocess_mac_math_fault_tensor(self, fault_dict, 
                                          quantizer=None, quant_mode=None, layer_type='Conv2D',
                                          ksizes=(3,3), padding='valid', dilation_rates=(1,1), 
@@ -935,129 +934,63 @@ class mac_unit:
         if psumfault_handle is None:
             psumfault_handle=self.psumfault_handle
             
-        preprocess_data=dict()
-            
         order_get_psidx_o,order_get_psidx_w,order_get_psidx_i=self._layer_coor_order(layer_type)
         
-        fd_coor=fault_dict['coor']
-        preprocess_data['fd_coor']=fd_coor
-        
-        # loop data extraction
-        if isinstance(fault_dict['psum_idx'],np.ndarray):
-            psum_idx_list,cnt_psidx,fault_bit,param_ifmap,param_wght,param_ofmap,type0,type1,typef=self._fault_value_extract_loop(fault_dict, repetitive=False)
-        
-        elif isinstance(fault_dict['psum_idx'],list):
-            psum_idx_list,cnt_psidx,fault_bit,param_ifmap,param_wght,param_ofmap,type0,type1,typef=self._fault_value_extract_loop(fault_dict, repetitive=True)
+        fd_coor=np.asarray(fault_dict['coor'],dtype=np.int32)
+        coor_id,psum_idx_list,psidx_offsets,fault_param,fault_type,fault_bit=self._fault_table_extract(fault_dict)
+        
+        # integer columns of param and type
+        param_code=np.full(len(coor_id),-1,dtype=np.int32)
+        param_code[np.isin(fault_param,['ifmap_in','ifmap_out'])]=0
+        param_code[np.isin(fault_param,['wght_in','wght_out'])]=1
+        param_code[np.isin(fault_param,['psum_in','psum_out'])]=2
+        type_code=np.full(len(coor_id),-1,dtype=np.int32)
+        type_code[fault_type=='0']=0
+        type_code[fault_type=='1']=1
+        type_code[fault_type=='flip']=2
+        if np.any(param_code<0) or np.any(type_code<0):
+            raise ValueError('Unknown fault param or SA type in mac fault dictionary.')
+            
+        if psumfault_handle=='single':
+            # the psum fault only alter its own ofmap pixel once, keep the first psum index of psum fault rows
+            psidx_cnt=np.diff(psidx_offsets)
+            psum_row=np.bitwise_and(param_code==2,psidx_cnt>0)
+            psidx_row=np.repeat(np.arange(len(coor_id)),psidx_cnt)
+            psidx_keep=np.bitwise_or(np.logical_not(psum_row[psidx_row]),np.arange(len(psidx_row))==psidx_offsets[psidx_row])
+            psum_idx_list=psum_idx_list[psidx_keep]
+            psidx_offsets=np.append(0,np.cumsum(np.where(psum_row,1,psidx_cnt)))
+            
+        idx_ofmap=psum_idx_list[:,order_get_psidx_o]
+        idx_ifmap=psum_idx_list[:,order_get_psidx_i]
+        idx_wght=psum_idx_list[:,order_get_psidx_w]
+        if padding=='same' and layer_type!='Dense':
+            idx_ifmap=self._padding_idx(idx_ifmap, ksizes, dilation_rates)
+            
+        if psumfault_handle=='single':
+            idx_ofmap[psidx_offsets[:-1][psum_row]]=fd_coor[coor_id[psum_row]]
         
-        FI_ofmap=len(param_ofmap)>0
-        FI_ifmap=len(param_ifmap)>0
-        FI_wght=len(param_wght)>0
-        
-        # ofmap fault
-        if FI_ofmap:
-            # data gathering
-            psum_idx_ofmap=psum_idx_list[param_ofmap]
-            idx_ofmap=psum_idx_ofmap[:,:,order_get_psidx_o]
-            faultbit_ofmap=fault_bit[param_ofmap]
-            
-            if psumfault_handle=='single':
-                preprocess_data['idx_ofmap']=fd_coor
-            else:
-                preprocess_data['idx_ofmap']=idx_ofmap
-                            
-            # check polarity
-            if self.quant_mode=='intrinsic':
-                wlpolar = quantizer_output.nb
-            elif self.quant_mode=='hybrid':
-                wlpolar = quantizer_input.nb+quantizer_weight.nb   
-                
-            modulator_ofmap=self._polarity_check_type_grouping(idx_ofmap.shape,
-                                                               faultbit_ofmap,
-                                                               param_ofmap,
-                                                               type0,type1,typef,
-                                                               wlpolar)
-            preprocess_data['modulator_ofmap']=modulator_ofmap
-            
-        # ifmap fault
-        if FI_ifmap>0:
-            # data gathering
-            psum_idx_ifmap=psum_idx_list[param_ifmap]
-            idx_ifmap_ifmap=psum_idx_ifmap[:,:,order_get_psidx_i]
-            idx_ifmap_wght=psum_idx_ifmap[:,:,order_get_psidx_w]
-            faultbit_ifmap=fault_bit[param_ifmap]
-        
-            if padding=='same' and layer_type!='Dense':
-                idx_ifmap_ifmap=self._padding_idx(idx_ifmap_ifmap, ksizes, dilation_rates)
-            
-            preprocess_data['idx_ifmap_ifmap']=idx_ifmap_ifmap
-            preprocess_data['idx_ifmap_wght']=idx_ifmap_wght
-                            
-            # check polarity
-            wlpolar = quantizer_input.nb
-            
-            modulator_ifmap=self._polarity_check_type_grouping(idx_ifmap_ifmap.shape,
-                                                               faultbit_ifmap,
-                                                               param_ifmap,
-                                                               type0,type1,typef,
-                                                               wlpolar)
-            preprocess_data['modulator_ifmap']=modulator_ifmap
-        
-        # wght fault
-        if FI_wght>0:
-            # data gathering
-            psum_idx_wght=psum_idx_list[param_wght]
-            idx_wght_wght=psum_idx_wght[:,:,order_get_psidx_w]
-            idx_wght_ifmap=psum_idx_wght[:,:,order_get_psidx_i]
-            faultbit_wght=fault_bit[param_wght]
-            
-            if padding=='same' and layer_type!='Dense':
-                idx_wght_ifmap=self._padding_idx(idx_wght_ifmap, ksizes, dilation_rates)
-                    
-            preprocess_data['idx_wght_wght']=idx_wght_wght
-            preprocess_data['idx_wght_ifmap']=idx_wght_ifmap
-                    
-            # check polarity
-            wlpolar = quantizer_weight.nb
-            
-            modulator_wght=self._polarity_check_type_grouping(idx_wght_wght.shape,
-                                                              faultbit_wght,
-                                                              param_wght,
-                                                              type0,type1,typef,
-                                                              wlpolar)
-            preprocess_data['modulator_wght']=modulator_wght
-            
-        # fault injection
+        # check polarity
+        if self.quant_mode=='intrinsic':
+            wlpolar_psum = quantizer_output.nb
+        elif self.quant_mode=='hybrid':
+            wlpolar_psum = quantizer_input.nb+quantizer_weight.nb
+        wlpolar=np.array([quantizer_input.nb,quantizer_weight.nb,wlpolar_psum],dtype=np.int32)[param_code]
+        modulator, signbit=self._polarity_check(fault_bit, wlpolar)
         
-        # ofmap fault injection
-        if FI_ofmap:
-            faultbit_ofmap=self._fault_bit_ext4mult(faultbit_ofmap, idx_ofmap.shape[1])
-            preprocess_data['faultbit_ofmap']=faultbit_ofmap
-            
-        # ifmap fault injection
-        if FI_ifmap>0:
-            faultbit_ifmap=self._fault_bit_ext4mult(faultbit_ifmap, idx_ifmap_ifmap.shape[1])
-            preprocess_data['faultbit_ifmap']=faultbit_ifmap
-            
-        # wght fault injection
-        if FI_wght:
-            faultbit_wght=self._fault_bit_ext4mult(faultbit_wght, idx_wght_wght.shape[1])
-            preprocess_data['faultbit_wght']=faultbit_wght
-
-        if FI_ofmap:
-            param_ofmap=np.expand_dims(param_ofmap,-1)
-            preprocess_data['param_ofmap']=param_ofmap
-        if FI_ifmap:
-            param_ifmap=np.expand_dims(param_ifmap,-1)
-            preprocess_data['param_ifmap']=param_ifmap
-        if FI_wght:
-            param_wght=np.expand_dims(param_wght,-1)
-            preprocess_data['param_wght']=param_wght
-            
-        preprocess_data['cnt_psidx']=cnt_psidx
-        preprocess_data['psum_idx_list_len']=len(psum_idx_list)
+        preprocess_data={'fd_coor':fd_coor,
+                         'coor_id':coor_id,
+                         'param_code':param_code,
+                         'type_code':type_code,
+                         'modulator':modulator,
+                         'signbit':signbit,
+                         'idx_ofmap':idx_ofmap,
+                         'idx_ifmap':idx_ifmap,
+                         'idx_wght':idx_wght,
+                         'psidx_offsets':psidx_offsets,
+                         'multi_fault':len(coor_id)>len(np.unique(coor_id))}
             
         return preprocess_data
-
+    
     def _fault_noise_extract_loop(self, fault_value, repetitive=False):
         """ Extract data from fault dictionary values 
             The fault value is in np.array(list(fault_dict.values())) format
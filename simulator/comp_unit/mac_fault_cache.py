@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:20:37 2026
+
+@author: Yung-Yu Tsai
+
+Content-addressed on-disk cache of the layer mac fault preprocess data.
+The PE array mapping and preprocess of a (mapping config, layer shape, mac unit, fault descriptor) set is done once,
+and reused by the later rounds, PE sweeps and repeated runs.
+"""
+
+import os, json, hashlib
+import numpy as np
+from ..utils_tool.atomic_file import atomic_write
+
+# the layout version of preprocess data, part of every key. Bump it when the preprocess data layout changes,
+# the entries of older layout are then missed instead of reused.
+# 2: ragged psum indexes as flat idx_* tables with psidx_offsets
+CACHE_FORMAT_VERSION=2
+
+def _digest_update(hasher, obj):
+    """ Feed an object into the hasher in canonical form. Dictionary keys are sorted, Ndarray hashed by dtype, shape and bytes. """
+    if obj is None:
+        hasher.update(b'N;')
+    elif isinstance(obj,(bool,np.bool_)):
+        hasher.update(b'B%d;'%int(obj))
+    elif isinstance(obj,(int,np.integer)):
+        hasher.update(b'I%d;'%int(obj))
+    elif isinstance(obj,(float,np.floating)):
+        hasher.update(b'F'+repr(float(obj)).encode()+b';')
+    elif isinstance(obj,str):
+        encoded=obj.encode()
+        hasher.update(b'S%d:'%len(encoded)+encoded)
+    elif isinstance(obj,np.ndarray):
+        if obj.dtype==object:
+            hasher.update(b'O'+repr(obj.shape).encode()+b':')
+            for item in obj.flat:
+                _digest_update(hasher, item)
+        else:
+            hasher.update(b'A'+obj.dtype.str.encode()+repr(obj.shape).encode()+b':')
+            hasher.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj,dict):
+        hasher.update(b'D%d:'%len(obj))
+        for key in sorted(obj.keys(),key=str):
+            _digest_update(hasher, str(key))
+            _digest_update(hasher, obj[key])
+    elif isinstance(obj,(list,tuple)):
+        hasher.update(b'L%d:'%len(obj))
+        for item in obj:
+            _digest_update(hasher, item)
+    else:
+        raise TypeError('Cannot make cache key from type %s.'%type(obj).__name__)
+
+def content_key(*parts):
+    """ The sha256 hex digest of the key parts. """
+    hasher=hashlib.sha256()
+    for part in parts:
+        _digest_update(hasher, part)
+    return hasher.hexdigest()
+
+def config_descriptor(config):
+    """ The content of a mapping config. Config file is read in, so that the key follows the file content instead of its path. """
+    if isinstance(config,str) and os.path.isfile(config):
+        with open(config, 'r') as config_file:
+            return json.load(config_file)
+    return config
+
+def tile_descriptor(tile):
+    """ The shape setting of a tile_PE or tile_FC_PE. """
+    return {'class':type(tile).__name__,
+            'tile_shape':tuple(tile.tile_shape),
+            'is_fmap':tile.is_fmap,
+            'wl':tile.wl,
+            'row_prior':tile.row_prior,
+            'col_prior':tile.col_prior}
+
+def PEarray_descriptor(PEarray):
+    """ The size of a PEarray. """
+    return {'n_x':PEarray.n_x, 'n_y':PEarray.n_y, 'n_clk':PEarray.n_clk}
+
+def _quantizer_descriptor(quantizer):
+    return {'nb':quantizer.nb,
+            'fb':quantizer.fb,
+            'rounding_method':quantizer.rounding_method,
+            'overflow_mode':quantizer.overflow_mode}
+
+def mac_unit_descriptor(mac_unit_):
+    """ The setting of a mac_unit which affects the preprocess data. """
+    if isinstance(mac_unit_.quantizer,list):
+        quantizers=[_quantizer_descriptor(qtz) for qtz in mac_unit_.quantizer]
+    else:
+        quantizers=_quantizer_descriptor(mac_unit_.quantizer)
+    return {'quantizers':quantizers,
+            'quant_mode':mac_unit_.quant_mode,
+            'ifmap_io':mac_unit_.ifmap_io,
+            'wght_io':mac_unit_.wght_io,
+            'psum_io':mac_unit_.psum_io,
+            'noise_inject':mac_unit_.noise_inject,
+            'sim_truncarry':mac_unit_.sim_truncarry,
+            'psumfault_handle':mac_unit_.psumfault_handle,
+            'fast_gen':mac_unit_.fast_gen,
+            'amp_factor_fmap':mac_unit_.amp_factor_fmap,
+            'amp_factor_wght':mac_unit_.amp_factor_wght}
+
+def layer_descriptor(layer):
+    """ The shape setting of a Keras layer. """
+    descriptor={'class':type(layer).__name__,'name':layer.name}
+    for attr in ['input_shape','output_shape','kernel_size','strides','padding','dilation_rate','depth_multiplier']:
+        value=getattr(layer,attr,None)
+        if isinstance(value,list):
+            value=tuple(value)
+        descriptor[attr]=value
+    return descriptor
+
+class mac_fault_cache:
+    """ The content-addressed on-disk cache of layer mac fault preprocess data.
+
+        Each entry is an uncompressed npz file named by the sha256 key of its descriptors.
+        The preprocess data Dictionary is saved item by item, the mapping detail Dictionary (if any) is saved alongside.
+        Entries are written to a temporary file then renamed, so that parallel workers sharing cache_dir never read a partial entry.
+        The keys include CACHE_FORMAT_VERSION, entries of an older preprocess data layout are never reused.
+        Data with items that cannot be saved without pickle are returned uncached.
+
+    Arguments
+    ---------
+    cache_dir: String.
+        The directory of cache files.
+    verbose: Integer. Default is 0.
+        Print cache hit and miss or not.
+
+    Example
+    -------
+    >>> cache=mac_fault_cache('../mac_fault_cache')
+    >>> conv1_key=cache.mapping_key(ref_model.layers[1], PE, MXU,
+    ...                            [ifmap_tile_conv1, wght_tile_conv1, ofmap_tile_conv1],
+    ...                            [ifmap_config_conv1, wght_config_conv1, ofmap_config_conv1, MXU_config_conv1])
+    >>> key=cache.PE_fault_key(conv1_key, fault_loc, fault_info)
+    >>> preprocess_data, detail = cache.cached(key, mapping_func)
+
+    """
+    def __init__(self, cache_dir, verbose=0):
+        self.cache_dir=cache_dir
+        self.verbose=verbose
+        self.hit=0
+        self.miss=0
+
+    def mapping_key(self, layer, mac_unit_, PEarray, tiles, mapping_configs, **kwargs):
+        """ The key of the fault independent part of layer PE array mapping. Made once per layer and reused by every fault.
+
+        Arguments
+        ---------
+        layer: Keras.Layer.
+            The layer being mapped.
+        mac_unit_: Class mac_unit.
+            The mac unit used for preprocess.
+        PEarray: Class (PEarray).
+            The PE dataflow model.
+        tiles: List of Class (tile_PE).
+            The ifmap, wght and ofmap tiles.
+        mapping_configs: List of Dictionary or String.
+            The expansion configs of tiles and the PEarray setup config. Config file content is used for key.
+        **kwargs:
+            The other arguments which affect the preprocess data, i.e. distribution statistics.
+
+        Returns
+        -------
+        String. The mapping key.
+        """
+        return content_key(CACHE_FORMAT_VERSION,
+                           layer_descriptor(layer),
+                           mac_unit_descriptor(mac_unit_),
+                           PEarray_descriptor(PEarray),
+                           [tile_descriptor(tile) for tile in tiles],
+                           [config_descriptor(config) for config in mapping_configs],
+                           kwargs)
+
+    def PE_fault_key(self, mapping_key, fault_loc, fault_info):
+        """ The key of cache entry for a PE array fault on a layer mapping.
+
+        Arguments
+        ---------
+        mapping_key: String.
+            The key made by mapping_key.
+        fault_loc: Tuple.
+            The fault location on PE array (PE y, PE x).
+        fault_info: Dictionary.
+            The fault descriptor, include SA_type, SA_bit, param.
+
+        Returns
+        -------
+        String. The key of cache entry.
+        """
+        return content_key(CACHE_FORMAT_VERSION, mapping_key, tuple(fault_loc), fault_info)
+
+    def _entry_name(self, name, value):
+        """ Mark the python scalar items, so that they are not restored as numpy scalar. """
+        if isinstance(value,(bool,int,float,str)):
+            return '__py__'+name
+        return name
+
+    def entry_file(self, key):
+        return os.path.join(self.cache_dir, key+'.npz')
+
+    def load(self, key):
+        """ Load a cache entry.
+
+        Returns
+        -------
+        (preprocess_data, detail) or None if the entry does not exist.
+        """
+        entry_file=self.entry_file(key)
+        if not os.path.exists(entry_file):
+            return None
+
+        preprocess_data=dict()
+        detail=dict()
+        with np.load(entry_file, allow_pickle=False) as entry:
+            if '__none__' in entry.files:
+                preprocess_data=None
+            for name in entry.files:
+                if name=='__none__':
+                    continue
+                value=entry[name]
+                # python scalar items are restored as python scalar, numpy scalar items keep their dtype
+                if name.startswith('__py__'):
+                    value=value.item()
+                    name=name[len('__py__'):]
+                elif value.ndim==0:
+                    value=value[()]
+                if name.startswith('__detail__'):
+                    detail[name[len('__detail__'):]]=value
+                else:
+                    preprocess_data[name]=value
+
+        if len(detail)==0:
+            detail=None
+        return preprocess_data, detail
+
+    def _entry_array(self, name, value):
+        """ The Ndarray of an entry item. Object arrays are refused, they could only be saved by pickle which load does not allow. """
+        try:
+            array=np.asarray(value)
+        except ValueError:
+            array=None
+        if array is None or array.dtype==object:
+            raise TypeError('Cache item %s of type %s cannot be saved without pickle. Items must be Ndarray, String or numeric scalar.'%(name,type(value).__name__))
+        return array
+
+    def save(self, key, preprocess_data, detail=None):
+        """ Save a cache entry. The preprocess data items must be Ndarray, String or numeric scalar.
+            Raise TypeError before writing if any item (ragged list, dictionary...) would become an object array.
+        """
+        arrays=dict()
+        if preprocess_data is None:
+            arrays['__none__']=np.array(True)
+        else:
+            for name,value in preprocess_data.items():
+                arrays[self._entry_name(name,value)]=self._entry_array(name,value)
+        if detail is not None:
+            for name,value in detail.items():
+                arrays[self._entry_name('__detail__'+name,value)]=self._entry_array('detail '+name,value)
+
+        with atomic_write(self.entry_file(key), 'wb') as f:
+            np.savez(f, **arrays)
+
+    def cached(self, key, compute_func):
+        """ Load the cache entry, or compute and save it on miss.
+
+        Arguments
+        ---------
+        key: String.
+            The key of cache entry.
+        compute_func: Callable.
+            The function without argument returns (preprocess_data, detail). detail could be None.
+
+        Returns
+        -------
+        (preprocess_data, detail)
+        """
+        entry=self.load(key)
+        if entry is not None:
+            self.hit+=1
+            if self.verbose>0:
+                print('mac fault cache hit %s'%key[:12])
+            return entry
+
+        self.miss+=1
+        if self.verbose>0:
+            print('mac fault cache miss %s'%key[:12])
+        preprocess_data,detail=compute_func()
+        try:
+            self.save(key, preprocess_data, detail)
+        except TypeError as error:
+            # the data which cannot be saved is used uncached
+            if self.verbose>0:
+                print('mac fault cache skip %s, %s'%(key[:12],str(error)))
+        return preprocess_data, detail
+
+    def clear(self):
+        """ Remove all the cache entries. """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for file in os.listdir(self.cache_dir):
+            if file.endswith('.npz'):
+                os.remove(os.path.join(self.cache_dir,file))
+
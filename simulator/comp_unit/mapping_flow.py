@@ -7,9 +7,10 @@ Created on Wed Aug 12 17:39:08 2020
 Organized flow for compuation unit fault mapping
 """
 import numpy as np
-import json
+import json, copy
 
 from .tile import tile_PE, tile_FC_PE, io_data_solver
+from ..models.layer_shape import get_layer_weight_shape
 
 def PE_mapping_forward(ifmap_tile,
                        wght_tile,
@@ -229,7 +230,7 @@ def PE_mapping_backward(layer, PEarray, fault_dict=None, save2tile=False, verbos
         PEarray.ofmap_tile.print_detail=False
         PEarray.wght_tile.print_detail=False
     
-    layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
+    layer_weight_shape=get_layer_weight_shape(layer)
     if len(layer_weight_shape)==0:
         if verbose>2:
             print('    no weight layer Skipped!')
@@ -311,6 +312,12 @@ def PE_mapping_backward(layer, PEarray, fault_dict=None, save2tile=False, verbos
     else:
         raise ValueError('expand_method must be either \'reshape\' or \'extract_patches\'.')
          
+    return _solve_layer_fault_dict(layer, PEarray, save2tile=save2tile, verbose=verbose, return_detail=return_detail)
+
+def _solve_layer_fault_dict(layer, PEarray, save2tile=False, verbose=4, return_detail=False):
+    """ Solve the correspond I/O of tile fault dictionaries and transform to layer. 
+        The task 5, 6 of PE_mapping_backward, shared with mapping_plan.
+    """
     if verbose>2:
         print('\r    Task (5/6): Solve Fault I/O ...                                     ',end=' ') 
     # organize fault dict and give partial sum index
@@ -584,3 +591,393 @@ def mapping_valid_checker(ifmap_tile,
 
     return check_pass
 
+
+class mapping_plan:
+    """ The compiled PE array mapping plan of a layer. Plan once, map many.
+    
+        The dataflow pre-plan (PE_mapping_forward) is run once on a private copy of the PEarray and tiles. 
+        Then every PE dataflow model coordinate (PE y, PE x, clock cycle) is mapped backward through the PEarray and tile 
+        shrinking pipeline once, the result is kept as integer lookup tables from PE coordinate to tile coordinate 
+        for ofmap, psum, wght, bias and ifmap.
+        
+        Mapping a PE fault dictionary to tile is then a table lookup and np.unique per data type. 
+        The correspond I/O solving and tile to layer transform are the same as PE_mapping_backward.
+        The result is equivalent to PE_mapping_backward up to the order of psum indexes within a fault coordinate, which are sorted.
+        
+    Arguments
+    ---------
+    layer: Keras.Layer. 
+        The layer being mapped.
+    ifmap_tile: Class (tile_PE). 
+        The tile class for PE array dataflow mapping of input feature maps.
+    wght_tile: Class (tile_PE). 
+        The tile class for PE array dataflow mapping of kernel and bias.
+    ofmap_tile: Class (tile_PE). 
+        The tile class for PE array dataflow mapping of output feature maps.
+    PEarray: Class (PEarray). 
+        The PE dataflow model class for PE array dataflow mapping.
+    ifmap_expand_config: Dictionary or String. 
+        Configuration for input feature maps tile expansion.
+    wght_expand_config: Dictionary or String. 
+        Configuration for weight (both kernal and bias) tile expansion.
+    ofmap_expand_config: Dictionary or String. 
+        Configuration for output feature maps tile expansion.
+    PEarray_setup_config: Dictionary or String. 
+        Configuration for PE array dataflow setup.
+    verbose: Integer. Default 0.
+        The verbosity of forward mapping when compiling plan.
+        
+    Example
+    -------
+    >>> plan_conv1=mapping_plan(ref_model.layers[1],ifmap_tile_conv1,wght_tile_conv1,ofmap_tile_conv1,MXU,
+    ...                         ifmap_config_conv1,wght_config_conv1,ofmap_config_conv1,MXU_config_conv1)
+    >>> for fault_loc, fault_info in zip(fault_locs, fault_infos):
+    >>>     plan_conv1.gen_PEarray_permanent_fault_dict(fault_loc, fault_info, mac_config=True)
+    >>>     layer_mac_fault_dict = plan_conv1.map_backward(verbose=0)
+    
+    """
+    def __init__(self, 
+                 layer,
+                 ifmap_tile,
+                 wght_tile,
+                 ofmap_tile,
+                 PEarray,
+                 ifmap_expand_config,
+                 wght_expand_config,
+                 ofmap_expand_config,
+                 PEarray_setup_config,
+                 verbose=0):
+        self.layer=layer
+        # configs are copied, forward mapping pops items from config dictionary
+        PE_mapping_forward(ifmap_tile,wght_tile,ofmap_tile,PEarray,
+                           copy.deepcopy(ifmap_expand_config),
+                           copy.deepcopy(wght_expand_config),
+                           copy.deepcopy(ofmap_expand_config),
+                           copy.deepcopy(PEarray_setup_config),
+                           pre_plan=True,verbose=verbose)
+        # private copy, the plan stays valid after the caller clear and reuse the PEarray for other layers
+        self.PEarray=copy.deepcopy(PEarray)
+        self.PE_shape=(self.PEarray.n_y,self.PEarray.n_x,self.PEarray.n_clk)
+        
+        self.tables=dict()
+        if len(get_layer_weight_shape(layer))>0:
+            self._compile()
+        
+    def _tile_fault_dicts(self):
+        """ The tile fault dictionaries filled by backward mapping. (data type, tile, attribute name) """
+        tile_fds=[('ofmap',self.PEarray.ofmap_tile,'fault_dict'),
+                  ('psum',self.PEarray.ofmap_tile,'psum_fault_dict'),
+                  ('wght',self.PEarray.wght_tile,'fault_dict'),
+                  ('ifmap',self.PEarray.ifmap_tile,'fault_dict')]
+        if self.PEarray.wght_tile.use_bias:
+            tile_fds.append(('bias',self.PEarray.wght_tile,'bias_fault_dict'))
+        return tile_fds
+    
+    def _compile(self):
+        """ Map all the PE dataflow model coordinates backward once. 
+            Each coordinate has its ravel index as fault id, the ids are collapsed to their tile coordinate along the pipeline.
+        """
+        n_PE=int(np.prod(self.PE_shape))
+        probe_coors=np.stack(np.unravel_index(np.arange(n_PE),self.PE_shape),axis=1)
+        probe_fd={'coor':probe_coors,'SA_type':'flip','SA_bit':0,'param':'psum_out','id':np.arange(n_PE)}
+        
+        self.PEarray.fast_gen=True
+        self.PEarray.fault_num=n_PE
+        PE_mapping2tile(self.PEarray, probe_fd, print_detail=False)
+        
+        for data_type,tile,attr in self._tile_fault_dicts():
+            fault_dict=getattr(tile,attr)
+            # one extra sentinel entry at the end, the outlier coordinates are given index -1 and look up to -1
+            lookup=np.full(n_PE+1,-1,dtype=np.int32)
+            if len(fault_dict)==0 or len(fault_dict['coor'])==0:
+                self.tables[data_type]=(lookup,None)
+                continue
+            
+            coors=fault_dict['coor']
+            id_list=fault_dict['id']
+            # tile coordinate in sorted order, thus np.unique on lookup value gives sorted tile coordinates
+            if coors.ndim>1:
+                order=np.lexsort(coors.T[::-1])
+            else:
+                order=np.argsort(coors,kind='stable')
+            coors=coors[order]
+            if id_list.dtype==object:
+                id_list=id_list[order]
+                cnt=np.array([len(ids) for ids in id_list])
+                id_list=np.concatenate(id_list)
+            else:
+                id_list=np.reshape(id_list[order],[len(order),-1])
+                cnt=np.full(len(order),id_list.shape[1])
+                id_list=id_list.flatten()
+            lookup[id_list]=np.repeat(np.arange(len(coors),dtype=np.int32),cnt)
+            self.tables[data_type]=(lookup,coors)
+            
+        for _,tile,attr in self._tile_fault_dicts():
+            setattr(tile,attr,dict())
+        self.PEarray.clear_fd()
+        self.PEarray.mapping_shape_load()
+        
+    def gen_PEarray_permanent_fault_dict(self, fault_loc, fault_info, mac_config=False):
+        """ Generate the permanent fault dictionary on the private PEarray of plan. Same as PEarray.gen_PEarray_permanent_fault_dict. """
+        return self.PEarray.gen_PEarray_permanent_fault_dict(fault_loc, fault_info, mac_config=mac_config)
+    
+    def gen_PEarray_SA_fault_dict(self, n_bit, fault_type='flip', param_list=None, mac_config=False):
+        """ Generate the stuck-at fault dictionary on the private PEarray of plan. Same as PEarray.gen_PEarray_SA_fault_dict. """
+        return self.PEarray.gen_PEarray_SA_fault_dict(n_bit, fault_type=fault_type, param_list=param_list, mac_config=mac_config)
+        
+    def _map_data_type(self, data_type, fault_dict, fault_rav):
+        """ Map the PE fault dictionary to a tile fault dictionary by table lookup. 
+            Repetitive coordinates are collapsed the same way as PEarray.collapse_repetitive_coors.
+            If the fault dictionary has 'group', only the coordinates of the same group are collapsed,
+            the result is sorted by group then tile coordinate.
+        """
+        lookup,table_coors=self.tables[data_type]
+        tile_idx=lookup[fault_rav]
+        cond=tile_idx>=0
+        tile_idx=tile_idx[cond]
+        n_fault=len(fault_rav)
+        
+        new_fd=dict()
+        for info,value in fault_dict.items():
+            if info!='coor' and isinstance(value,(list,np.ndarray)) and len(value)==n_fault:
+                new_fd[info]=np.asarray(value)[cond]
+            elif info!='coor':
+                new_fd[info]=value
+        
+        if table_coors is None:
+            return dict()
+        if len(tile_idx)==0:
+            new_fd['coor']=table_coors[:0]
+            return new_fd
+        
+        if 'group' in new_fd:
+            # group major key, the same tile coordinate of different groups stays apart
+            tile_key=np.add(np.multiply(new_fd['group'],len(table_coors),dtype=np.int64),tile_idx)
+        else:
+            tile_key=tile_idx
+        uni_tile_key,uni_idx,rep_idx,cnt_idx=np.unique(tile_key,return_index=True,return_inverse=True,return_counts=True)
+        new_fd['coor']=table_coors[np.remainder(uni_tile_key,len(table_coors))]
+        
+        if len(uni_idx)==len(rep_idx):
+            for info,value in new_fd.items():
+                if info!='coor' and isinstance(value,np.ndarray) and len(value)==len(tile_idx):
+                    new_fd[info]=value[uni_idx]
+            return new_fd
+        
+        group_order=np.argsort(rep_idx,kind='stable')
+        split_idx=np.cumsum(cnt_idx)[:-1]
+        if self.PEarray.fast_gen:
+            id_list=new_fd['id'][group_order]
+            for info,value in new_fd.items():
+                if info not in ['coor','id'] and isinstance(value,np.ndarray) and len(value)==len(tile_idx):
+                    new_fd[info]=value[uni_idx]
+            if np.min(cnt_idx)==np.max(cnt_idx):
+                new_fd['id']=np.reshape(id_list,[len(uni_idx),-1])
+            else:
+                id_list=np.split(id_list,split_idx)
+                new_fd['id']=np.empty(len(id_list),dtype=object)
+                new_fd['id'][:]=id_list
+        else:
+            # transient faults, repetitive coordinate keeps all its fault info in list
+            for info in ['id','SA_type','SA_bit','param']:
+                value=new_fd[info]
+                if not isinstance(value,np.ndarray) or len(value)!=len(tile_idx):
+                    value=np.full(len(tile_idx),value)
+                new_fd[info]=[group.tolist() for group in np.split(value[group_order],split_idx)]
+        
+        return new_fd
+    
+    def _ravel_PE_coor(self, coors):
+        """ The ravel index of PE dataflow model coordinates for table lookup, -1 for outlier coordinates. """
+        cond=self.PEarray.get_outlier_cond_args(coors,self.PE_shape)
+        fault_rav=np.full(len(coors),-1,dtype=np.int64)
+        fault_rav[cond]=np.ravel_multi_index(coors[cond].T,self.PE_shape)
+        return fault_rav
+    
+    def map2tile(self, fault_dict=None):
+        """ Map the PE fault dictionary to ifmap, weight and ofmap tile by lookup tables. 
+            Equivalent to PE_mapping2tile up to psum index order, without running the PEarray and tile pipeline.
+            The fault coordinates and the psum index counts are the same, but the psum indexes of a coordinate are sorted 
+            instead of in the order of PE_mapping2tile.
+        
+        Arguments
+        ---------
+        fault_dict: Dictionary. 
+            The info-based fault dictionary on PE dataflow model. 
+            If None, use the fault dictionary of the private PEarray, i.e. made by gen_PEarray_permanent_fault_dict of plan.
+        """
+        if fault_dict is None:
+            fault_dict=self.PEarray.fault_dict
+        else:
+            if 'id' not in fault_dict:
+                fault_dict=self.PEarray.assign_id(fault_dict)
+            self.PEarray.fault_dict=fault_dict
+            self.PEarray.fault_num=int(np.max(fault_dict['id']))+1 if len(fault_dict['id'])>0 else 0
+            
+        fault_rav=self._ravel_PE_coor(fault_dict['coor'])
+        for data_type,tile,attr in self._tile_fault_dicts():
+            setattr(tile,attr,self._map_data_type(data_type, fault_dict, fault_rav))
+        
+    def map_backward(self, fault_dict=None, save2tile=False, verbose=0, return_detail=False):
+        """ Map the PE fault dictionary to layer. Same arguments and result as PE_mapping_backward.
+        
+        Arguments
+        ---------
+        fault_dict: Dictionary. 
+            The fault dictionary on PE dataflow model. 
+            If None, use the fault dictionary of the private PEarray, i.e. made by gen_PEarray_permanent_fault_dict of plan.
+        save2tile: Bool.
+            Save solved fault dictionary to respective data tile or not.
+        verbose: Integer. Default 0.
+            The verbosity of printing backward mapping progress.
+        return_detail: Bool.
+            Return layer mapping detail for sum up whole model mapping information.
+        
+        Returns
+        -------
+        The fault information Dictionary of Layer.
+        """
+        if len(self.tables)==0 or len(self.PEarray.fault_dict if fault_dict is None else fault_dict)==0:
+            empty_info={'num_base_coor':0,
+                        'num_fault_coor':0,
+                        'num_psum_idx':0,
+                        'num_layer_fault_coor':0,
+                        'num_layer_psum_idx':0}
+            if return_detail:
+                return None, empty_info
+            return None
+        
+        self.map2tile(fault_dict)
+        return _solve_layer_fault_dict(self.layer, self.PEarray, save2tile=save2tile, verbose=verbose, return_detail=return_detail)
+
+    def gen_PEarray_permanent_fault_batch(self, fault_locs, fault_infos, mac_config=False):
+        """ Generate the concatenated fault dictionary of a batch of permanent faults on the private PEarray of plan.
+            Each fault is generated by gen_PEarray_permanent_fault_dict, its fault ids are offset to be unique in batch.
+        
+        Arguments
+        ---------
+        fault_locs: List of Tuple. 
+            The location coordinates of faults.
+        fault_infos: List of Dictionary. 
+            The fault information dictionaries that include 'SA_type', 'SA_bit', 'param'.
+        mac_config: Class or Bool. 
+            The class of MAC unit configurations. Same as gen_PEarray_permanent_fault_dict.
+        
+        Returns
+        -------
+        Fault dictionary. 
+            The 'coor', 'id', 'SA_type', 'SA_bit', 'param' are given for every coordinate.
+            The 'group' is the index of fault in batch that the coordinate belongs to.
+            The number of faults generated by each fault before edge removal is kept in batch_fault_num.
+        """
+        if len(fault_locs)!=len(fault_infos):
+            raise ValueError('fault_locs and fault_infos must have the same length. Got %d and %d.'%(len(fault_locs),len(fault_infos)))
+        
+        batch_fd={'coor':list(),'id':list(),'SA_type':list(),'SA_bit':list(),'param':list(),'group':list()}
+        self.batch_fault_num=np.zeros(len(fault_locs),dtype=int)
+        id_offset=0
+        for group,(fault_loc,fault_info) in enumerate(zip(fault_locs,fault_infos)):
+            fault_dict=self.PEarray.gen_PEarray_permanent_fault_dict(fault_loc, fault_info, mac_config=mac_config)
+            n_coor=len(fault_dict['coor'])
+            batch_fd['coor'].append(np.reshape(fault_dict['coor'],[n_coor,3]))
+            batch_fd['id'].append(np.add(fault_dict['id'],id_offset))
+            for info in ['SA_type','SA_bit','param']:
+                batch_fd[info].append(np.full(n_coor,fault_info[info]))
+            batch_fd['group'].append(np.full(n_coor,group))
+            self.batch_fault_num[group]=self.PEarray.fault_num
+            id_offset+=self.PEarray.fault_num
+        
+        for info,value in batch_fd.items():
+            batch_fd[info]=np.concatenate(value) if len(value)>0 else np.zeros(0,dtype=int)
+        
+        self.PEarray.fault_dict=batch_fd
+        self.PEarray.fault_num=id_offset
+        self.PEarray.fast_gen=True
+        return batch_fd
+    
+    def map_backward_batch(self, fault_locs, fault_infos, mac_config=True, verbose=0, return_detail=False):
+        """ Map a list of permanent PE faults to layer in one backward pass.
+            The faults are concatenated by gen_PEarray_permanent_fault_batch, mapped to tile, 
+            solved and transformed to layer once for the whole batch. The coordinates are kept apart by the 'group' of fault 
+            along the way, then the layer fault dictionary is split by fault.
+            The fault coordinates and partial sum indexes of each fault are the same as map_backward of the fault alone.
+            The partial sum indexes are (coor idx, num of psidx, psum idx) Ndarray if the fault has the same number of psidx 
+            on every coordinate, otherwise flatten with 'psum_idx_offsets'.
+        
+        Arguments
+        ---------
+        fault_locs: List of Tuple. 
+            The location coordinates of faults.
+        fault_infos: List of Dictionary. 
+            The fault information dictionaries that include 'SA_type', 'SA_bit', 'param'.
+        mac_config: Class or Bool. Default True.
+            The class of MAC unit configurations. Same as gen_PEarray_permanent_fault_dict.
+        verbose: Integer. Default 0.
+            The verbosity of printing backward mapping progress.
+        return_detail: Bool.
+            Return layer mapping detail of the whole batch.
+        
+        Returns
+        -------
+        List of fault information Dictionary of Layer, one for each fault. 
+        None for no fault, i.e. the layer has no weight or the fault is mapped to no layer coordinate. 
+        The same as preprocess_layer_mac_fault takes for the layer without fault.
+        If return_detail, also the layer mapping detail Dictionary of the whole batch.
+        """
+        n_batch=len(fault_locs)
+        if len(self.tables)==0 or n_batch==0:
+            empty_info={'num_base_coor':0,
+                        'num_fault_coor':0,
+                        'num_psum_idx':0,
+                        'num_layer_fault_coor':0,
+                        'num_layer_psum_idx':0}
+            if return_detail:
+                return [None for _ in range(n_batch)], empty_info
+            return [None for _ in range(n_batch)]
+        
+        batch_fd=self.gen_PEarray_permanent_fault_batch(fault_locs, fault_infos, mac_config=mac_config)
+        # the fault info of a group is given back after split, only coordinates, ids and groups go through the mapping
+        batch_fd={'coor':batch_fd['coor'],'id':batch_fd['id'],'group':batch_fd['group']}
+        batch_rav=self._ravel_PE_coor(batch_fd['coor'])
+        for data_type,tile,attr in self._tile_fault_dicts():
+            setattr(tile,attr,self._map_data_type(data_type, batch_fd, batch_rav))
+        batch_layer_fd,detail=_solve_layer_fault_dict(self.layer, self.PEarray, verbose=verbose, return_detail=True)
+        
+        layer_fds=self._split_layer_fault_dict(batch_layer_fd, fault_infos)
+        if return_detail:
+            return layer_fds, detail
+        return layer_fds
+    
+    def _split_layer_fault_dict(self, batch_layer_fd, fault_infos):
+        """ Split the layer fault dictionary of a batch by 'group'. The coordinates of a group are contiguous. None for the group without coordinate. """
+        n_batch=len(fault_infos)
+        if len(batch_layer_fd)==0:
+            return [None for _ in range(n_batch)]
+        
+        bounds=np.searchsorted(batch_layer_fd['group'],np.arange(n_batch+1))
+        psum_idx=batch_layer_fd['psum_idx']
+        psidx_offsets=batch_layer_fd.get('psum_idx_offsets')
+        
+        layer_fds=list()
+        for group in range(n_batch):
+            start,end=bounds[group],bounds[group+1]
+            if start==end:
+                layer_fds.append(None)
+                continue
+            
+            layer_fd=dict(fault_infos[group])
+            layer_fd['coor']=batch_layer_fd['coor'][start:end]
+            if psidx_offsets is None:
+                layer_fd['psum_idx']=psum_idx[start:end]
+            else:
+                offsets=psidx_offsets[start:end+1]
+                psidx_cnt=np.diff(offsets)
+                group_psum_idx=psum_idx[offsets[0]:offsets[-1]]
+                if np.min(psidx_cnt)==np.max(psidx_cnt):
+                    layer_fd['psum_idx']=np.reshape(group_psum_idx,[end-start,-1,group_psum_idx.shape[-1]])
+                else:
+                    layer_fd['psum_idx']=group_psum_idx
+                    layer_fd['psum_idx_offsets']=np.subtract(offsets,offsets[0])
+            layer_fds.append(layer_fd)
+        
+        return layer_fds
@@ -12,6 +12,7 @@ import numpy as np
 import tqdm as tqdm
 
 from simulator.memory.tile import tile,tile_FC
+from ..models.layer_shape import get_layer_weight_shape
 
 class tile_PE(tile):
     """ Tile for PE dataflow model mapping.
@@ -1151,7 +1152,7 @@ class tile_PE(tile):
                 else:
                     for i in range(len(uni_idx)):
                         id_list[i]=id_list[i].flatten()
-                    fault_info['id']=np.array(id_list,dtype=np.object)
+                    fault_info['id']=np.array(id_list,dtype=object)
             else:
                 id_list_rep=[list() for _ in range(len(uni_idx))]
                 type_list_rep=[list() for _ in range(len(uni_idx))]
@@ -1429,7 +1430,7 @@ class io_data_solver:
                     state='fastgen'
                     maxx=np.max(np.concatenate(idlist))
                 else:
-                    if idlist.dtype==np.object:
+                    if idlist.dtype==object:
                         state='fastgen'
                         idl_cnt=np.array([len(i) for i in idlist])
                         idl_cnt=np.cumsum(idl_cnt)-1
@@ -1571,220 +1572,129 @@ class io_data_solver:
         
         return data_idf,shape_cnt
     
-    def _unique_searchsort(self, data_idf, search_id):
+    def _search_sorted_id(self, data_id, sorted_search_id):
         """
-        True data fault id search by another fault id.
-        Find search_id correspond value index in data_idf. Also, pop out outlier and repetitive values.
-        Leave only true correspond value for search result, and mark invalid search_id value to negative.
+        True data fault id search by the sorted fault ids of base data.
+        Find sorted_search_id correspond value index in data_id. Also, pop out outlier and repetitive values.
+        Leave only true correspond value for search result, and give the mask of valid search_id.
+        The search result is the data coordinate index of each search id.
         """
+        data_idf,shape_cnt=self._get_base_data_id(data_id)
+        if len(data_idf)==0:
+            return np.zeros(len(sorted_search_id),dtype=np.int64),np.zeros(len(sorted_search_id),dtype=bool)
+        
         data_sorter=np.argsort(data_idf)
-        search_sorter=np.argsort(search_id)
-        search_unsorter=np.argsort(search_sorter)
-        search_id=search_id[search_sorter]
-        search_result=np.searchsorted(data_idf,search_id,sorter=data_sorter)
+        search_result=np.searchsorted(data_idf,sorted_search_id,sorter=data_sorter)
         # uniquify, find true match case
-        search_uni=np.append(np.subtract(search_result[1:],search_result[:-1]),1)
-        search_uni=search_uni>0
+        search_valid=np.append(np.subtract(search_result[1:],search_result[:-1]),1)>0
         # tag outlie
-        search_bound=search_result<len(data_idf)
-        search_uni=np.bitwise_and(search_uni,search_bound)
-        not_uni=not np.all(search_uni)
-        # set invalid instance to -1
-        if not_uni:
-            search_result=np.where(search_uni,search_result,-1)
-        # restore result
-        data_sorter=np.append(data_sorter,-1)
-        search_result=search_result[search_unsorter]
-        search_result=data_sorter[search_result]
-        # restore search_id
-        if not_uni:
-            search_id=np.where(search_uni,search_id,-1)
-        search_id=search_id[search_unsorter]
-        
-        return search_result, search_id
-        
-    def _get_data_coor_by_id(self, data_id, search_id, data_coors):
-        """
-        Get data coordinate by giving fault id list
-        """
-        if isinstance(data_id,np.ndarray):
-            datashape=data_id.shape
-            if len(datashape)>1:
-                data_idf=data_id.flatten()
-#                sorter=np.argsort(data_idf)
-#                search=np.searchsorted(data_idf,search_id,sorter=sorter)
-#                search=sorter[search]
-                search,search_id=self._unique_searchsort(data_idf,search_id)
-                search=np.floor_divide(search,datashape[1])
-                found_index=data_coors[search]
-            else:
-                search,search_id=self._unique_searchsort(data_id,search_id)
-                found_index=data_coors[search]
-        elif isinstance(data_id,tuple):
-            data_idl_cnt=data_id[1]
-            data_idf=data_id[0]
-            search,search_id=self._unique_searchsort(data_idf,search_id)
-            search=np.searchsorted(data_idl_cnt,search)
-            found_index=data_coors[search]
-            
-        return found_index, search_id
+        search_valid=np.bitwise_and(search_valid,search_result<len(data_idf))
+        search_result=data_sorter[np.where(search_valid,search_result,0)]
+        # data fault id index to data coordinate index
+        if isinstance(data_id,tuple):
+            search_result=np.searchsorted(shape_cnt,search_result)
+        elif len(shape_cnt)>1:
+            search_result=np.floor_divide(search_result,shape_cnt[1])
+        
+        return search_result, search_valid
 
     def fast_gen_new_fd(self, save2tile=False, print_detail=False):
         """
         Extract the data coordinate index and fault parameter by fault id
         Add new fault information to new fault dict
         Numpy generation (fast version)
+        
+        The fault ids of base data are sorted once, then searched in the other two data.
+        The partial sum indexes are (coor idx, num of psidx, psum idx) Ndarray when every coordinate has the same number of psidx.
+        Otherwise, the partial sum indexes are flattened to (num of psidx, psum idx) Ndarray with 'psum_idx_offsets', 
+        the psum_idx[psum_idx_offsets[i]:psum_idx_offsets[i+1]] are the partial sum indexes of coordinate i.
         """
         if self.pstate not in ['fastgen','normal'] or self.wstate not in ['fastgen','normal'] or self.istate not in ['fastgen','normal']:
             raise ValueError('All psum_state, wght_state, ifmap_state are must be \'fast_gen\' to run fast generation method.')        
-                        
-        if not save2tile:
-            if print_detail:
-                print('\r    GenFD (1/5): Solve Partial Sum Coordinates...',end=' ')     
-            # solve psum, use as basis for fault id search
-            search_id, shape_cnt=self._get_base_data_id(self.psum_id)
-            
-            if print_detail:
-                print('\r    GenFD (2/5): Solve Input Feature Map Coordinates...',end=' ') 
-            # solve ifmap
-            ifmap_index,search_id=self._get_data_coor_by_id(self.ifmap_id, search_id, self.ifmap_coors)
-            
-            if print_detail:
-                print('\r    GenFD (3/5): Solve Weight Coordinates...             ',end=' ') 
-            # solve weight
-            wght_index,search_id=self._get_data_coor_by_id(self.wght_id, search_id, self.wght_coors)
-            
-        else:
-            if print_detail:
-                print('\r    GenFD (1/5): Solve Base Data Coordinates...           ',end=' ') 
-            
-            param=self.psum_vl[0]['param']
-            if param=='ifmap_in' or param=='ifmap_out':
-                search_id, shape_cnt=self._get_base_data_id(self.ifmap_id)
-            elif param=='wght_in' or param=='wght_out':
-                search_id, shape_cnt=self._get_base_data_id(self.wght_id)
-            elif param=='psum_in' or param=='psum_out':
-                search_id, shape_cnt=self._get_base_data_id(self.psum_id)
-                
-            if param=='ifmap_in' or param=='ifmap_out':
-                if print_detail:
-                    print('\r    GenFD (2/5): Solve Output Feature Map Coordinates...',end=' ') 
-                # solve ifmap
-                outpsum_index,search_id=self._get_data_coor_by_id(self.psum_id, search_id, self.psum_coors)
-                if print_detail:
-                    print('\r    GenFD (3/5): Solve Weight Coordinates...              ',end=' ') 
-                # solve weight
-                wght_index,search_id=self._get_data_coor_by_id(self.wght_id, search_id, self.wght_coors)
-                
-            elif param=='wght_in' or param=='wght_out':
-                if print_detail:
-                    print('\r    GenFD (2/5): Solve Input Feature Map Coordinates...  ',end=' ') 
-                # solve ifmap
-                ifmap_index,search_id=self._get_data_coor_by_id(self.ifmap_id, search_id, self.ifmap_coors)
-                if print_detail:
-                    print('\r    GenFD (3/5): Solve Output Feature Map Coordinates... ',end=' ') 
-                # solve weight
-                outpsum_index,search_id=self._get_data_coor_by_id(self.psum_id, search_id, self.psum_coors)
-                
-            elif param=='psum_in' or param=='psum_out':
-                if print_detail:
-                    print('\r    GenFD (2/5): Solve Input Feature Map Coordinates...  ',end=' ') 
-                # solve ifmap
-                ifmap_index,search_id=self._get_data_coor_by_id(self.ifmap_id, search_id, self.ifmap_coors)
-                if print_detail:
-                    print('\r    GenFD (3/5): Solve Weight Coordinates...             ',end=' ') 
-                # solve weight
-                wght_index,search_id=self._get_data_coor_by_id(self.wght_id, search_id, self.wght_coors)
         
-        if print_detail:
-            print('\r    GenFD (4/5): Build Partial Sum Indexes...                     ',end=' ')         
+        data_id={'ifmap':self.ifmap_id, 'wght':self.wght_id, 'psum':self.psum_id}
+        data_coors={'ifmap':self.ifmap_coors, 'wght':self.wght_coors, 'psum':self.psum_coors}
+        data_vl={'ifmap':self.ifmap_vl, 'wght':self.wght_vl, 'psum':self.psum_vl}
+        data_name={'ifmap':'Input Feature Map', 'wght':'Weight', 'psum':'Output Feature Map'}
         
-        # build psum_idx
         if not save2tile:
-            based_coors=self.psum_coors
-            based_vl=self.psum_vl
+            based='psum'
         else:
+            param=self.psum_vl[0]['param']
             if param=='ifmap_in' or param=='ifmap_out':
-                based_coors=self.ifmap_coors
-                based_vl=self.ifmap_vl
+                based='ifmap'
             elif param=='wght_in' or param=='wght_out':
-                based_coors=self.wght_coors
-                based_vl=self.wght_vl
+                based='wght'
             elif param=='psum_in' or param=='psum_out':
-                based_coors=self.psum_coors
-                based_vl=self.psum_vl
+                based='psum'
                 
-        new_solved_fd=copy.deepcopy(based_vl)
-            
+        if print_detail:
+            print('\r    GenFD (1/5): Solve Base Data Coordinates...           ',end=' ') 
+        # solve base data, use as basis for fault id search
+        search_id, shape_cnt=self._get_base_data_id(data_id[based])
+        based_coors=data_coors[based]
         if isinstance(shape_cnt,tuple):
             if len(shape_cnt)>1:
-                outpsum_index=np.repeat(based_coors,shape_cnt[1],axis=0)
+                based_index=np.repeat(np.arange(shape_cnt[0]),shape_cnt[1])
             else:
-                outpsum_index=based_coors
+                based_index=np.arange(shape_cnt[0])
         elif isinstance(shape_cnt,np.ndarray):
-            cnt0=shape_cnt[0]+1
-            idlrep=shape_cnt[1:]-shape_cnt[:-1]
-            idlrep=np.concatenate([[cnt0],idlrep])
-            idlconstruct=np.repeat(np.arange(len(idlrep)),idlrep)
-            outpsum_index=based_coors[idlconstruct]
-            
-        psum_index=np.concatenate([outpsum_index[:,self.order_assign_psidx_o],
-                                   wght_index[:,self.order_assign_psidx_w],
-                                   ifmap_index[:,self.order_assign_psidx_i]],axis=1)
-        
-        search_cond=search_id>=0
-        if np.all(search_cond): # all search_id found
-            if isinstance(shape_cnt,tuple):
-                if len(shape_cnt)>1:
-                    psum_index=np.split(psum_index,shape_cnt[0])
-                    psum_index=np.stack(psum_index)
-            elif isinstance(shape_cnt,np.ndarray):
-                psum_index=np.split(psum_index,np.add(shape_cnt,1)[:-1])
-                psum_index=np.array(psum_index,dtype=np.object)
-
-            if print_detail:
-                print('\r    GenFD (5/5): Make Solved Fault Dictionary...                ',end=' ')         
-    
-            new_solved_fd['coor']=based_coors
-            new_solved_fd['psum_idx']=psum_index
+            based_index=np.repeat(np.arange(len(shape_cnt)),np.diff(shape_cnt,prepend=-1))
         
-        else: # search_id incomplete
-            psum_index=psum_index[search_cond]
-            search_cond=np.bitwise_not(search_cond)
-            if isinstance(shape_cnt,tuple):
-                if len(shape_cnt)>1:
-                    search_cond=np.reshape(search_cond,[shape_cnt[0],-1])
-                    search_cond=np.sum(search_cond,axis=1)
-                    shape_cnt=np.full_like(search_cond,shape_cnt[1])
-                    shape_cnt=np.subtract(shape_cnt,search_cond)
-                    shape_cnt=np.cumsum(shape_cnt)[:-1]
-                    psum_index=np.split(psum_index,shape_cnt)
-                    psum_index=np.stack(psum_index)
-            elif isinstance(shape_cnt,np.ndarray):
-                search_cond=np.argwhere(search_cond)
-                search_cond=np.searchsorted(shape_cnt,search_cond)
-                search_cond=np.unique(search_cond,return_counts=True)
-                
-                idlrep[search_cond[0]]=np.subtract(idlrep[search_cond[0]],search_cond[1])
-                idlrep=np.cumsum(idlrep)[:-1]
-                psum_index=np.split(psum_index,idlrep)
-                psum_index=np.array(psum_index,dtype=np.object)
-
+        # sort search id once for all the data searching
+        search_sorter=np.argsort(search_id)
+        sorted_search_id=search_id[search_sorter]
+        search_valid=np.ones(len(search_id),dtype=bool)
+        data_index={based:based_index}
+        
+        for step,data in enumerate([data for data in ['psum','ifmap','wght'] if data!=based]):
             if print_detail:
-                print('\r    GenFD (5/5): Make Solved Fault Dictionary...                ',end=' ')         
-    
-            new_solved_fd['coor']=based_coors
+                print('\r    GenFD (%d/5): Solve %s Coordinates...                 '%(step+2,data_name[data]),end=' ') 
+            search_result,data_valid=self._search_sorted_id(data_id[data], sorted_search_id)
+            search_valid=np.bitwise_and(search_valid,data_valid)
+            # restore search_id order
+            data_index[data]=np.empty_like(search_result)
+            data_index[data][search_sorter]=search_result
+            
+        valid=np.empty_like(search_valid)
+        valid[search_sorter]=search_valid
+        
+        if print_detail:
+            print('\r    GenFD (4/5): Build Partial Sum Indexes...                     ',end=' ')         
+        
+        # build psum_idx, the invalid search_id are removed
+        if not np.all(valid):
+            for data in data_index.keys():
+                data_index[data]=data_index[data][valid]
+            
+        psum_index=np.concatenate([data_coors['psum'][data_index['psum']][:,self.order_assign_psidx_o],
+                                   data_coors['wght'][data_index['wght']][:,self.order_assign_psidx_w],
+                                   data_coors['ifmap'][data_index['ifmap']][:,self.order_assign_psidx_i]],axis=1)
+        
+        if print_detail:
+            print('\r    GenFD (5/5): Make Solved Fault Dictionary...                ',end=' ')         
+        
+        new_solved_fd=dict(data_vl[based])
+        new_solved_fd['coor']=based_coors
+        
+        if isinstance(shape_cnt,tuple) and len(shape_cnt)==1:
             new_solved_fd['psum_idx']=psum_index
-
+        else:
+            psidx_cnt=np.bincount(data_index[based],minlength=len(based_coors))
+            if len(psidx_cnt)>0 and np.min(psidx_cnt)==np.max(psidx_cnt):
+                new_solved_fd['psum_idx']=np.reshape(psum_index,[len(based_coors),-1,self.len_psidx])
+            else:
+                new_solved_fd['psum_idx']=psum_index
+                new_solved_fd['psum_idx_offsets']=np.append(0,np.cumsum(psidx_cnt))
             
         if not save2tile:
             return new_solved_fd
         else:
-            if param=='ifmap_in' or param=='ifmap_out':
+            if based=='ifmap':
                 fd_assigner=(new_solved_fd,dict(),dict(),dict())
-            elif param=='wght_in' or param=='wght_out':
+            elif based=='wght':
                 fd_assigner=(dict(),new_solved_fd,dict(),dict())
-            elif param=='psum_in' or param=='psum_out':
+            elif based=='psum':
                 fd_assigner=(dict(),dict(),dict(),new_solved_fd)
 
             self.ifmap_tile.fault_dict, self.wght_tile.fault_dict, self.wght_tile.bias_fault_dict, self.ofmap_tile.fault_dict = fd_assigner
@@ -2102,6 +2012,9 @@ class io_data_solver:
         ---------
         fault_dict: Dictionary. 
             The fault dictionary be duplicate expnand to layer. Contains fault information with partial sum indexes.
+            The uneven partial sum indexes could be flatten with 'psum_idx_offsets', the output of fast_gen_new_fd.
+            The optional 'group' gives the fault each coordinate belongs to, for a batch of faults solved at once.
+            Repetitive layer coordinates are only collapsed within a group, the result is sorted by group then coordinate.
         based_tile: String. 
             The tile which the coordinates of fault dictionary indicate to. Must be one of 'ofmap','wght','ifmap'.
         layer: Class. 
@@ -2118,6 +2031,9 @@ class io_data_solver:
         Returns
         -------
         The fault information Dictionary of a layer parameter (feature maps or weights).
+        The partial sum indexes are int32 (coor idx, num of psidx, psum idx) Ndarray if every coordinate has the same number of psidx.
+        Otherwise, they are flatten to (num of psidx, psum idx) Ndarray with 'psum_idx_offsets', 
+        the psum_idx[psum_idx_offsets[i]:psum_idx_offsets[i+1]] are the partial sum indexes of coordinate i.
         """
         # the combined inter tile tile2layer
         if based_tile not in ['ofmap','wght','ifmap']:
@@ -2137,30 +2053,33 @@ class io_data_solver:
         if layer is not None:
             layer_input_shape=layer.input_shape
             layer_output_shape=layer.output_shape
-            layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
+            layer_weight_shape=get_layer_weight_shape(layer)
         
         if print_detail:
             print('\r    Tile2Layer (1/9): Unpack Partial Sum Indexes...',end=' ')
         # unpack partial sum index
-        fd_coor=fault_dict['coor']
-        psum_idx=fault_dict['psum_idx']
-        fault_dict.pop('coor')
-        fault_dict.pop('psum_idx')
+        fd_coor=fault_dict.pop('coor')
+        psum_idx=fault_dict.pop('psum_idx')
+        psidx_offsets=fault_dict.pop('psum_idx_offsets',None)
         fault_dict.pop('id')
         
-        if isinstance(psum_idx,np.ndarray):
+        if psidx_offsets is not None:
+            state='fastgen'
+            psidx_cnt=np.diff(psidx_offsets)
+        elif isinstance(psum_idx,np.ndarray):
             if len(psum_idx.shape)>2:
                 state='fastgen'
-                psidx_cnt=psum_idx.shape
-                psum_idx=np.concatenate(psum_idx)
+                psidx_cnt=np.full(psum_idx.shape[0],psum_idx.shape[1])
+                psum_idx=np.reshape(psum_idx,[-1,psum_idx.shape[-1]])
             elif len(psum_idx.shape)==2:
                 state='normal'
             else:
-                if psum_idx.dtype==np.object:
+                if psum_idx.dtype==object:
+                    state='fastgen'
                     psidx_cnt=np.array([len(i) for i in psum_idx])
                     psum_idx=np.concatenate(psum_idx)
                 else:                    
-                    raise TypeError('psum_idx with shape length 1 should be np.object type, or it might be wrong.')
+                    raise TypeError('psum_idx with shape length 1 should be object type, or it might be wrong.')
         elif isinstance(psum_idx,list):
             state='repetitive'
             psidx_cnt=np.array([len(i) for i in psum_idx])
@@ -2273,56 +2192,15 @@ class io_data_solver:
         layer_psum_idx,psidx_cond=self._pop_outlier_idx(layer_psum_idx, psum_idx_shape, get_cond_idx=True)
         self.num_layer_psum_idx=len(layer_psum_idx)
         
-        # split serial layer partial sum index for each for coordinate
-        if np.all(psidx_cond):
-            if state=='fastgen':
-                if isinstance(psidx_cnt,tuple):
-                    layer_psum_idx=np.split(layer_psum_idx,psidx_cnt[0]*self.num_base_coor)
-                    layer_psum_idx=np.stack(layer_psum_idx)
-                else:
-                    psidx_cnt=np.tile(psidx_cnt,self.num_base_coor)
-                    psidx_cnt=np.cumsum(psidx_cnt)[:-1]
-                    layer_psum_idx=np.split(layer_psum_idx,psidx_cnt)
-                    layer_psum_idx=np.array(layer_psum_idx,dtype=np.object)
-            elif state=='normal':
-                pass
-            elif state=='repetitive':
-                psidx_cnt=np.tile(psidx_cnt,self.num_base_coor)
-                psidx_cnt=np.cumsum(psidx_cnt)[:-1]
-                layer_psum_idx=np.split(layer_psum_idx,psidx_cnt)
-                layer_psum_idx=np.array(layer_psum_idx,dtype=np.object)
-        else:
+        if state!='normal':
+            # the serial layer fault coordinate index of each layer partial sum index
+            psidx_owner=np.repeat(np.arange(self.num_fault_coor),psidx_cnt)
+            psidx_owner=np.add.outer(np.multiply(np.arange(self.num_base_coor),self.num_fault_coor),psidx_owner)
+            psidx_owner=np.reshape(psidx_owner,[-1])
+            if not np.all(psidx_cond):
+                psidx_owner=psidx_owner[psidx_cond]
+        elif not np.all(psidx_cond):
             psidx_cond=np.bitwise_not(psidx_cond)
-            if state=='fastgen':
-                if isinstance(psidx_cnt,tuple):
-                    psidx_cond=np.reshape(psidx_cond,[psidx_cnt[0]*self.num_base_coor,-1])
-                    psidx_cond=np.sum(psidx_cond,axis=1)
-                    psidx_cnt=np.full_like(psidx_cond,psidx_cnt[1])
-                    psidx_cnt=np.subtract(psidx_cnt,psidx_cond)
-                    psidx_cnt=np.cumsum(psidx_cnt)[:-1]
-                    layer_psum_idx=np.split(layer_psum_idx,psidx_cnt)
-                else:
-                    psidx_cnt=np.tile(psidx_cnt,self.num_base_coor)
-                    psidx_cnt_search=np.cumsum(psidx_cnt)-1
-                    psidx_cond=np.argwhere(psidx_cond)
-                    psidx_cond=np.searchsorted(psidx_cnt_search,psidx_cond)
-                    psidx_cond=np.unique(psidx_cond,return_counts=True)
-                    psidx_cnt[psidx_cond[0]]=np.subtract(psidx_cnt[psidx_cond[0]],psidx_cond[1])
-                    psidx_cnt=np.cumsum(psidx_cnt)[:-1]
-                    layer_psum_idx=np.split(layer_psum_idx,psidx_cnt)
-                layer_psum_idx=np.array(layer_psum_idx,dtype=np.object)
-            elif state=='normal':
-                pass
-            elif state=='repetitive':
-                psidx_cnt=np.tile(psidx_cnt,self.num_base_coor)
-                psidx_cnt_search=np.cumsum(psidx_cnt)-1
-                psidx_cond=np.argwhere(psidx_cond)
-                psidx_cond=np.searchsorted(psidx_cnt_search,psidx_cond)
-                psidx_cond=np.unique(psidx_cond,return_counts=True)
-                psidx_cnt[psidx_cond[0]]=np.subtract(psidx_cnt[psidx_cond[0]],psidx_cond[1])
-                psidx_cnt=np.cumsum(psidx_cnt)[:-1]
-                layer_psum_idx=np.split(layer_psum_idx,psidx_cnt)
-                layer_psum_idx=np.array(layer_psum_idx,dtype=np.object)
         
         if print_detail:
             print('\r    Tile2Layer (7/9): Remove Outlier Fault Coordinates...          ',end=' ')
@@ -2330,11 +2208,9 @@ class io_data_solver:
         layer_fault_coor,fc_cond=self._pop_outlier_idx(layer_fault_coor, layer_output_shape, get_cond_idx=True)
         if not np.all(fc_cond):
             if state=='fastgen' or state=='repetitive':
-                layer_psum_idx=layer_psum_idx[fc_cond]
-                if layer_psum_idx.dtype==np.object:
-                    psidx_cnt=np.array([len(psidx) for psidx in layer_psum_idx])
-                    if np.max(psidx_cnt)==np.min(psidx_cnt):
-                        layer_psum_idx=np.stack(layer_psum_idx)
+                psidx_keep=fc_cond[psidx_owner]
+                layer_psum_idx=layer_psum_idx[psidx_keep]
+                psidx_owner=np.subtract(np.cumsum(fc_cond),1)[psidx_owner[psidx_keep]]
             elif state=='normal':
                 if len(layer_psum_idx)==len(layer_fault_coor):
                     empty_fc_cond=None
@@ -2347,7 +2223,20 @@ class io_data_solver:
         if print_detail:
             print('\r    Tile2Layer (8/9): Collapse Repetitive Fault Coordinates... ',end=' ')
         # deal with repetitive layer fault coors
+        group=fault_dict.get('group')
+        if group is not None:
+            # the group of each layer fault coor, coors of different groups are not collapsed
+            layer_group=np.tile(group,self.num_base_coor)
+            if not np.all(fc_cond):
+                layer_group=layer_group[fc_cond]
+                if state=='normal' and empty_fc_cond is not None:
+                    layer_group=layer_group[empty_fc_cond]
+            coor_dtype=layer_fault_coor.dtype
+            layer_fault_coor=np.concatenate([np.expand_dims(layer_group,1),layer_fault_coor],axis=1)
         layer_fault_coor,uni_idx,rep_idx,cnt_idx=np.unique(layer_fault_coor,return_index=True,return_inverse=True,return_counts=True,axis=0)
+        rep_idx=np.reshape(rep_idx,[-1])
+        if group is not None:
+            layer_fault_coor=layer_fault_coor[:,1:].astype(coor_dtype)
         self.num_layer_fault_coor=len(layer_fault_coor)
         
         if not np.all(fc_cond):
@@ -2359,13 +2248,11 @@ class io_data_solver:
             uni_idx=np.searchsorted(fc_cond,uni_idx)
 
         # collapse duplicate coors
-        if len(uni_idx)==len(rep_idx):
-            self._reduce_fault_dict(fault_dict, np.remainder(uni_idx,self.num_fault_coor))
-            fault_dict['psum_idx']=layer_psum_idx
-            if state=='normal':
+        if state=='normal':
+            if len(uni_idx)==len(rep_idx):
+                self._reduce_fault_dict(fault_dict, np.remainder(uni_idx,self.num_fault_coor))
                 fault_dict['psum_idx']=np.expand_dims(layer_psum_idx,1)
-        else:
-            if self.pstate=='fastgen' and self.wstate=='fastgen' and self.istate=='fastgen':
+            else:
                 sorter=np.argsort(rep_idx)
                 even=np.min(cnt_idx)==np.max(cnt_idx)
                 cnt_idx=np.cumsum(cnt_idx)[:-1]
@@ -2373,62 +2260,64 @@ class io_data_solver:
                 layer_psum_idx=layer_psum_idx[sorter]
                 layer_psum_idx=np.split(layer_psum_idx,cnt_idx)
                 if even:
-                    layer_psum_idx=np.array(layer_psum_idx)
-                    layer_psum_idx=np.reshape(layer_psum_idx,[len(layer_psum_idx),-1,9])
+                    layer_psum_idx=np.stack(layer_psum_idx)
                 else:
-                    for psidx in layer_psum_idx:
-                        psidx=np.concatenate(psidx)
-                    layer_psum_idx=np.array(layer_psum_idx,dtype=np.object)
-                    
+                    layer_psum_idx=np.array(layer_psum_idx,dtype=object)
+                                  
                 self._reduce_fault_dict(fault_dict, np.remainder(uni_idx,self.num_fault_coor))
                 fault_dict['psum_idx']=layer_psum_idx
                 
+        elif len(uni_idx)==len(rep_idx) or (self.pstate=='fastgen' and self.wstate=='fastgen' and self.istate=='fastgen') or group is not None:
+            # gather the partial sum indexes by the sorted order of unique layer fault coors, 
+            # the partial sum indexes of repetitive coordinate are merged
+            # the coordinates of a group share one fault information, merged without keeping per fault lists
+            psidx_owner=rep_idx[psidx_owner]
+            sorter=np.argsort(psidx_owner,kind='stable')
+            layer_psum_idx=layer_psum_idx[sorter].astype(np.int32)
+            psidx_cnt=np.bincount(psidx_owner,minlength=self.num_layer_fault_coor)
+            
+            self._reduce_fault_dict(fault_dict, np.remainder(uni_idx,self.num_fault_coor))
+            if len(psidx_cnt)>0 and np.min(psidx_cnt)==np.max(psidx_cnt):
+                fault_dict['psum_idx']=np.reshape(layer_psum_idx,[self.num_layer_fault_coor,-1,self.len_psidx])
             else:
-                if state=='normal':
-                    sorter=np.argsort(rep_idx)
-                    even=np.min(cnt_idx)==np.max(cnt_idx)
-                    cnt_idx=np.cumsum(cnt_idx)[:-1]
+                fault_dict['psum_idx']=layer_psum_idx
+                fault_dict['psum_idx_offsets']=np.append(0,np.cumsum(psidx_cnt))
+                
+        else:
+            # the partial sum indexes of each layer fault coordinate before collapse
+            sorter=np.argsort(psidx_owner,kind='stable')
+            psidx_cnt=np.bincount(psidx_owner,minlength=len(rep_idx))
+            layer_psum_idx=np.split(layer_psum_idx[sorter],np.cumsum(psidx_cnt)[:-1])
+            
+            psum_idx_rep=[list() for _ in range(len(uni_idx))]
+            type_list_rep=[list() for _ in range(len(uni_idx))]
+            bit_list_rep=[list() for _ in range(len(uni_idx))]
+            param_list_rep=[list() for _ in range(len(uni_idx))]
+            
+            for i,repid in enumerate(rep_idx):
+                orig_i=np.remainder(i,self.num_fault_coor)
+                
+                psum_idx_rep[repid].append(layer_psum_idx[i])
                     
-                    layer_psum_idx=layer_psum_idx[sorter]
-                    layer_psum_idx=np.split(layer_psum_idx,cnt_idx)
-                    if even:
-                        layer_psum_idx=np.stack(layer_psum_idx)
-                    else:
-                        layer_psum_idx=np.array(layer_psum_idx,dtype=np.object)
-                                      
-                    self._reduce_fault_dict(fault_dict, np.remainder(uni_idx,self.num_fault_coor))
-                    fault_dict['psum_idx']=layer_psum_idx
-
+                if isinstance(fault_dict['SA_type'][orig_i],str):
+                    type_list_rep[repid].append(fault_dict['SA_type'][orig_i])
                 else:
-                    psum_idx_rep=[list() for _ in range(len(uni_idx))]
-                    type_list_rep=[list() for _ in range(len(uni_idx))]
-                    bit_list_rep=[list() for _ in range(len(uni_idx))]
-                    param_list_rep=[list() for _ in range(len(uni_idx))]
-                    
-                    for i,repid in enumerate(rep_idx):
-                        orig_i=np.remainder(i,self.num_fault_coor)
-                        
-                        psum_idx_rep[repid].append(layer_psum_idx[i])
-                            
-                        if isinstance(fault_dict['SA_type'][orig_i],str):
-                            type_list_rep[repid].append(fault_dict['SA_type'][orig_i])
-                        else:
-                            type_list_rep[repid]+=fault_dict['SA_type'][orig_i]
-                        
-                        if isinstance(fault_dict['SA_bit'][orig_i],int):
-                            bit_list_rep[repid].append(fault_dict['SA_bit'][orig_i])
-                        else:
-                            bit_list_rep[repid]+=fault_dict['SA_bit'][orig_i]
-                            
-                        if isinstance(fault_dict['param'][orig_i],str):
-                            param_list_rep[repid].append(fault_dict['param'][orig_i])
-                        else:
-                            param_list_rep[repid]+=fault_dict['param'][orig_i]
+                    type_list_rep[repid]+=fault_dict['SA_type'][orig_i]
                 
-                    fault_dict['psum_idx']=psum_idx_rep
-                    fault_dict['SA_type']=type_list_rep
-                    fault_dict['SA_bit']=bit_list_rep
-                    fault_dict['param']=param_list_rep
+                if isinstance(fault_dict['SA_bit'][orig_i],int):
+                    bit_list_rep[repid].append(fault_dict['SA_bit'][orig_i])
+                else:
+                    bit_list_rep[repid]+=fault_dict['SA_bit'][orig_i]
+                    
+                if isinstance(fault_dict['param'][orig_i],str):
+                    param_list_rep[repid].append(fault_dict['param'][orig_i])
+                else:
+                    param_list_rep[repid]+=fault_dict['param'][orig_i]
+        
+            fault_dict['psum_idx']=psum_idx_rep
+            fault_dict['SA_type']=type_list_rep
+            fault_dict['SA_bit']=bit_list_rep
+            fault_dict['param']=param_list_rep
 
         if print_detail:
             print('\r    Tile2Layer (9/9): Make Mapped Fault Dictionary...               ',end=' ')
@@ -9,6 +9,8 @@ weight fault injection
 
 import numpy as np
 import tensorflow as tf
+from ..models.layer_shape import get_layer_weight_shape
+from .fault_table import fault_table
 
 def generate_single_stuck_at_fault(original_value,fault_bit,stuck_at,quantizer,tensor_return=True):
     """Returns the a tensor or variable with single SA fault injected in each parameter.
@@ -252,7 +254,7 @@ def generate_stuck_at_fault_modulator_fast(shape,coor,fault_type,fault_bit):
     
     if fault_type == '0':
         tensor_modulator=-np.ones(shape,dtype=np.int32)
-        np.add.at(tensor_modulator,coor,modulator)
+        np.subtract.at(tensor_modulator,coor,modulator)
     elif fault_type == '1':
         tensor_modulator=np.zeros(shape,dtype=np.int32)
         np.add.at(tensor_modulator,coor,modulator)
@@ -262,6 +264,153 @@ def generate_stuck_at_fault_modulator_fast(shape,coor,fault_type,fault_bit):
         
     return tensor_modulator
 
+class sparse_modulator:
+    """ Sparse fault modulator of SA0, SA1 and invert bit.
+        Only keep the fault coordinates and the bit masks of each coordinate instead of full shape modulators.
+        The memory and injection cost scale with the number of faults, not the data size.
+        Each coordinate appears only once, the faults on the same parameter are merged into its bit masks.
+
+    Arguments
+    ---------
+    shape: Tuple of Integer.
+        The data shape of data fault inject to.
+    coor: Ndarray. Shape (number of faulty parameters, data dimension).
+        The coordinates of faulty parameters.
+    modulator0: Ndarray. Shape (number of faulty parameters,)
+        The SA0 bit mask of each faulty parameter, -1 is fault free.
+    modulator1: Ndarray. Shape (number of faulty parameters,)
+        The SA1 bit mask of each faulty parameter, 0 is fault free.
+    modulatorF: Ndarray. Shape (number of faulty parameters,)
+        The invert bit mask of each faulty parameter, 0 is fault free.
+    """
+    def __init__(self, shape, coor, modulator0, modulator1, modulatorF):
+        """ Sparse modulator initializer """
+        self.shape=tuple(shape)
+        self.coor=np.reshape(np.array(coor,dtype=np.int64),(-1,len(self.shape)))
+        self.modulator0=np.array(modulator0,dtype=np.int32)
+        self.modulator1=np.array(modulator1,dtype=np.int32)
+        self.modulatorF=np.array(modulatorF,dtype=np.int32)
+        
+    def __len__(self):
+        return len(self.coor)
+    
+    def to_dense(self):
+        """ Convert to the full shape modulator list [tensor_modulator0,tensor_modulator1,tensor_modulatorF]. """
+        coor=tuple(np.transpose(self.coor))
+        tensor_modulator=list()
+        for modulator,fault_free in [(self.modulator0,-1),(self.modulator1,0),(self.modulatorF,0)]:
+            if np.all(modulator==fault_free):
+                tensor_modulator.append(None)
+            else:
+                dense=np.full(self.shape,fault_free,dtype=np.int32)
+                dense[coor]=modulator
+                tensor_modulator.append(dense)
+        return tensor_modulator
+    
+def _merge_sparse_modulator(shape,coor,modulator0,modulator1,modulatorF):
+    """ Merge the bit masks of repeated coordinates and make sparse_modulator. """
+    coor=np.reshape(np.array(coor,dtype=np.int64),(-1,len(shape)))
+    if len(coor)==0:
+        return None
+    
+    coor,inverse=np.unique(coor,axis=0,return_inverse=True)
+    inverse=np.reshape(inverse,-1)
+    merged0=-np.ones(len(coor),dtype=np.int32)
+    merged1=np.zeros(len(coor),dtype=np.int32)
+    mergedF=np.zeros(len(coor),dtype=np.int32)
+    np.bitwise_and.at(merged0,inverse,np.array(modulator0,dtype=np.int32))
+    np.bitwise_or.at(merged1,inverse,np.array(modulator1,dtype=np.int32))
+    np.bitwise_xor.at(mergedF,inverse,np.array(modulatorF,dtype=np.int32))
+    
+    return sparse_modulator(shape,coor,merged0,merged1,mergedF)
+
+def generate_stuck_at_fault_modulator_sparse(shape,coor,fault_type,fault_bit):
+    """ Generates the sparse fault modulator of SA0, SA1 and invert bit.
+        The sparse version of generate_stuck_at_fault_modulator_fast.
+        The fault type of this generation must be unified and specified.
+
+    Parameters
+    ----------
+    shape : Tuple of Integer
+        The data shape of data fault inject to.
+    coor : List of Tuples of Integer or Ndarray
+        | The coordinate of the fault location in data. Format:
+        | List of Tuple : [(0,2,2,6),(3,5,4,2),...]
+        | Ndarray : [[0,2,2,6],
+        |            [3,5,4,2],
+        |            ...]
+    fault_type : String. One of '1' , '0' or 'flip'.
+        The SA type of the faulty bit, input argument must be one of '1' , '0' or 'flip'.
+    fault_bit : List or Ndarray. Each element 0 <= fault_bit < word length
+        The index of the SA fault bit on a fix-point parameter.
+
+    Returns
+    -------
+    sparse_modulator
+        The sparse modulator for parameter with given shape.
+
+    """
+    if len(coor) == 0:
+        return None
+    
+    modulator=np.left_shift(np.ones((len(coor),),dtype=np.int32),np.array(fault_bit,dtype=np.int32))
+    
+    modulator0=-np.ones((len(coor),),dtype=np.int32)
+    modulator1=np.zeros((len(coor),),dtype=np.int32)
+    modulatorF=np.zeros((len(coor),),dtype=np.int32)
+    if fault_type == '0':
+        modulator0=np.invert(modulator)
+    elif fault_type == '1':
+        modulator1=modulator
+    elif fault_type == 'flip':
+        modulatorF=modulator
+    else:
+        raise ValueError('You must stuck at \'0\' , \'1\' or \'flip\'.')
+        
+    return _merge_sparse_modulator(shape,coor,modulator0,modulator1,modulatorF)
+
+def generate_sparse_modulator(shape,nb,fb,fault_dict):
+    """ Generate sparse modulator for a Tensor from fault dictionary.
+        The Tensor could be input, weight or output of a layer.
+
+    Parameters
+    ----------
+    shape :Tuple of Integer
+        The data shape of data fault inject to.
+    nb : Integer. 
+        The fix-point representation of the parameter word length.
+    fb : Integer. 
+        Number of fractional bits in a fix-point parameter.
+    fault_dict : Dictionary or fault_table.
+        The keys is fault location, value is fault information dictionary. Or the columnar fault_table.
+
+    Returns
+    -------
+    sparse_modulator
+        The sparse modulator of fault dictionary. None if there is no fault.
+
+    """
+    if len(fault_dict)==0:
+        return None
+    
+    if isinstance(fault_dict,fault_table):
+        return _merge_sparse_modulator(shape,fault_dict.coor,*fault_dict.modulators())
+    
+    coor=list(fault_dict.keys())
+    modulator0=-np.ones((len(coor),),dtype=np.int32)
+    modulator1=np.zeros((len(coor),),dtype=np.int32)
+    modulatorF=np.zeros((len(coor),),dtype=np.int32)
+    for i,key in enumerate(coor):
+        mod0,mod1,modF=generate_stuck_at_fault_modulator(nb,fb,fault_dict[key]['SA_bit'],fault_dict[key]['SA_type'])
+        if mod0 is not None:
+            modulator0[i]=mod0
+        if mod1 is not None:
+            modulator1[i]=mod1
+        if modF is not None:
+            modulatorF[i]=modF
+            
+    return _merge_sparse_modulator(shape,coor,modulator0,modulator1,modulatorF)
+
 def generate_tensor_modulator(shape,nb,fb,fault_dict,fast_gen=False): 
     """ Generate modulator for a Tensor.
         The Tensor could be input, weight or output of a layer.
@@ -275,8 +424,9 @@ def generate_tensor_modulator(shape,nb,fb,fault_dict,fast_gen=False):
         The fix-point representation of the parameter word length.
     fb : Integer. 
         Number of fractional bits in a fix-point parameter.
-    fault_dict : Dictionary.
-        The keys is fault location, value is fault information dictionary.
+    fault_dict : Dictionary or fault_table.
+        The keys is fault location, value is fault information dictionary. 
+        Or the columnar fault_table, which is always generated numpy array based.
     fast_gen : Bool, optional
         Use numpy array based generation (fast gen) or not. The default is False.
 
@@ -289,6 +439,9 @@ def generate_tensor_modulator(shape,nb,fb,fault_dict,fast_gen=False):
     if len(fault_dict)==0:
         return [None,None,None]
     
+    if isinstance(fault_dict,fault_table):
+        return generate_sparse_modulator(shape,nb,fb,fault_dict).to_dense()
+    
     inject0=False
     inject1=False
     injectF=False
@@ -367,7 +520,7 @@ def generate_layer_modulator(layer,word_length,fractional_bit,ifmap_fault_dict,o
     """
     layer_input_shape=layer.input_shape
     layer_output_shape=layer.output_shape
-    layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
+    layer_weight_shape=get_layer_weight_shape(layer)
     
     if ifmap_fault_dict is None:
         ifmap_modulator=None
@@ -10,10 +10,14 @@ assign a fault rate to generate.
 support different type of fault distribution
 """
 
+import weakref
 import numpy as np
-from .fault_core import generate_stuck_at_fault_modulator_fast
+from .fault_rng import get_random_state
+from .fault_core import generate_stuck_at_fault_modulator_fast, generate_stuck_at_fault_modulator_sparse
+from .fault_table import fault_table
+from ..models.layer_shape import get_layer_weight_shape, get_model_param_bits
         
-def coordinate_gen_fmap(data_shape,batch_size,distribution='uniform',poisson_lam=None, mean=None, std=None, concentration=None):
+def coordinate_gen_fmap(data_shape,batch_size,distribution='uniform',poisson_lam=None, mean=None, std=None, concentration=None, rng=None):
     """Generate the coordinate of a feature map base on its shape and with specific distibution type.
 
     Arguments
@@ -32,27 +36,30 @@ def coordinate_gen_fmap(data_shape,batch_size,distribution='uniform',poisson_lam
         The standard deviation value for normal or center distribution in coordinate. Tuple for normal distribution. Float for concentration of center distribution.
     concentration: Float. 
         A float number between 1 and 0. 1 means set the lambda of 2D feature map to center of image, 0 means set to corner of the feature map. (can only be use in conv 2D layer)
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The coordinate Tuple.
     """
+    rng=get_random_state(rng)
     coordinate=list()
     
     if distribution=='uniform':
-        coordinate.append(np.random.randint(batch_size))
+        coordinate.append(rng.randint(batch_size))
         for j in range(1,len(data_shape)):
-            coordinate.append(np.random.randint(data_shape[j]))
+            coordinate.append(rng.randint(data_shape[j]))
     elif distribution=='poisson':
         if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=len(data_shape)-1:
             raise TypeError('Poisson distribution lambda setting must be a tuple same length as input data shape which indicates the lamda of poisson distribution.')
         
-        coordinate.append(np.random.randint(batch_size))
+        coordinate.append(rng.randint(batch_size))
         for j in range(1,len(data_shape)):
             if isinstance(poisson_lam[j-1],int) and poisson_lam[j-1]>=0 and poisson_lam[j-1]<data_shape[j]:
-                coor_tmp=np.random.poisson(poisson_lam[j-1])
+                coor_tmp=rng.poisson(poisson_lam[j-1])
                 while coor_tmp>=data_shape[j]:
-                    coor_tmp=np.random.poisson(poisson_lam[j-1])
+                    coor_tmp=rng.poisson(poisson_lam[j-1])
                 coordinate.append(coor_tmp)
             else:
                 raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str(data_shape),str(poisson_lam)))
@@ -62,12 +69,12 @@ def coordinate_gen_fmap(data_shape,batch_size,distribution='uniform',poisson_lam
         if not isinstance(std,tuple) or len(std)!=len(data_shape):
             raise TypeError('Normal distribution std setting must be a tuple same length as input data shape which indicates the lamda of poisson distribution.')
         
-        coordinate.append(np.random.randint(batch_size))
+        coordinate.append(rng.randint(batch_size))
         for j in range(1,len(data_shape)):
             if isinstance(mean[j-1],int) and mean[j-1]>=0 and mean[j-1]<data_shape[j]:
-                coor_tmp=np.random.normal(mean[j-1],std[j-1])
+                coor_tmp=rng.normal(mean[j-1],std[j-1])
                 while coor_tmp>=data_shape[j]:
-                    coor_tmp=np.random.normal(mean[j-1],std[j-1])
+                    coor_tmp=rng.normal(mean[j-1],std[j-1])
                 coordinate.append(coor_tmp)
             else:
                 raise ValueError('Normal distribution Mean must within feature map shape. Feature map shape %s but got lambda input %s'%(str(data_shape),str(poisson_lam)))
@@ -80,11 +87,11 @@ def coordinate_gen_fmap(data_shape,batch_size,distribution='uniform',poisson_lam
         if std is None:
             std=0.075
             
-        coordinate.append(np.random.randint(batch_size))
+        coordinate.append(rng.randint(batch_size))
 
         dist=np.linalg.norm(data_shape[1:3])
-        radius=np.random.normal(1-concentration,std)
-        theta=np.random.uniform(high=2*np.pi)
+        radius=rng.normal(1-concentration,std)
+        theta=rng.uniform(high=2*np.pi)
         width=radius*np.cos(theta)
         height=radius*np.sin(theta)
         width=int(np.clip(width*dist/2+data_shape[1]/2,0,data_shape[1]-1))
@@ -93,14 +100,14 @@ def coordinate_gen_fmap(data_shape,batch_size,distribution='uniform',poisson_lam
         coordinate.append(width)
         coordinate.append(height)
         
-        coordinate.append(np.random.randint(data_shape[3]))
+        coordinate.append(rng.randint(data_shape[3]))
     else:
         raise NameError('Invalid type of random generation distribution. Please choose between uniform, poisson, normal.')
     
     coordinate=tuple(coordinate)
     return coordinate
 
-def coordinate_gen_fmap_fast(data_shape,batch_size,fault_num,distribution='uniform',poisson_lam=None, mean=None, std=None, concentration=None):
+def coordinate_gen_fmap_fast(data_shape,batch_size,fault_num,distribution='uniform',poisson_lam=None, mean=None, std=None, concentration=None, rng=None):
     """Generate the coordinate of a feature map base on its shape and with specific distibution type.
        Faster generation version not multiple fault in a parameter.
 
@@ -122,25 +129,28 @@ def coordinate_gen_fmap_fast(data_shape,batch_size,fault_num,distribution='unifo
         The standard deviation value for normal or center distribution in coordinate. Tuple for normal distribution. Float for concentration of center distribution.
     concentration: Float. 
         A float number between 1 and 0. 1 means set the lambda of 2D feature map to center of image, 0 means set to corner of the feature map. (can only be use in conv 2D layer)
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The coordinate Tuple.
     """
+    rng=get_random_state(rng)
     coordinate=list()
     
     if distribution=='uniform':
-        coordinate.append(np.random.randint(batch_size,size=fault_num))
+        coordinate.append(rng.randint(batch_size,size=fault_num))
         for j in range(1,len(data_shape)):
-            coordinate.append(np.random.randint(data_shape[j],size=fault_num))
+            coordinate.append(rng.randint(data_shape[j],size=fault_num))
     elif distribution=='poisson':
         if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=len(data_shape)-1:
             raise TypeError('Poisson distribution lambda setting must be a tuple same length as input data shape which indicates the lamda of poisson distribution.')
         
-        coordinate.append(np.random.randint(batch_size,size=fault_num))
+        coordinate.append(rng.randint(batch_size,size=fault_num))
         for j in range(1,len(data_shape)):
             if isinstance(poisson_lam[j-1],int) and poisson_lam[j-1]>=0 and poisson_lam[j-1]<data_shape[j]:
-                coor_tmp=np.random.poisson(poisson_lam[j-1],size=fault_num)
+                coor_tmp=rng.poisson(poisson_lam[j-1],size=fault_num)
                 coor_tmp=np.clip(coor_tmp,0,data_shape[j]-1)
                 coordinate.append(coor_tmp)
             else:
@@ -151,10 +161,10 @@ def coordinate_gen_fmap_fast(data_shape,batch_size,fault_num,distribution='unifo
         if not isinstance(std,tuple) or len(std)!=len(data_shape):
             raise TypeError('Normal distribution std setting must be a tuple same length as input data shape which indicates the lamda of poisson distribution.')
         
-        coordinate.append(np.random.randint(batch_size,size=fault_num))
+        coordinate.append(rng.randint(batch_size,size=fault_num))
         for j in range(1,len(data_shape)):
             if isinstance(mean[j-1],int) and mean[j-1]>=0 and mean[j-1]<data_shape[j]:
-                coor_tmp=np.random.normal(mean[j-1],std[j-1],size=fault_num)
+                coor_tmp=rng.normal(mean[j-1],std[j-1],size=fault_num)
                 coor_tmp=np.clip(coor_tmp,0,data_shape[j]-1)
                 coordinate.append(coor_tmp)
             else:
@@ -168,11 +178,11 @@ def coordinate_gen_fmap_fast(data_shape,batch_size,fault_num,distribution='unifo
         if std is None:
             std=0.075
             
-        coordinate.append(np.random.randint(batch_size,size=fault_num))
+        coordinate.append(rng.randint(batch_size,size=fault_num))
 
         dist=np.linalg.norm(data_shape[1:3])
-        radius=np.random.normal(1-concentration,std,size=fault_num)
-        theta=np.random.uniform(high=2*np.pi,size=fault_num)
+        radius=rng.normal(1-concentration,std,size=fault_num)
+        theta=rng.uniform(high=2*np.pi,size=fault_num)
         width=np.multiply(radius,np.cos(theta))
         height=np.multiply(radius,np.sin(theta))
         width=(np.clip(width*(dist/2)+data_shape[1]/2,0,data_shape[1]-1)).astype(int)
@@ -181,14 +191,14 @@ def coordinate_gen_fmap_fast(data_shape,batch_size,fault_num,distribution='unifo
         coordinate.append(width)
         coordinate.append(height)
         
-        coordinate.append(np.random.randint(data_shape[3],size=fault_num))
+        coordinate.append(rng.randint(data_shape[3],size=fault_num))
     else:
         raise NameError('Invalid type of random generation distribution. Please choose between uniform, poisson, normal.')
     
     coordinate=list(zip(*coordinate))
     return coordinate
 
-def coordinate_gen_wght(data_shape,distribution='uniform',poisson_lam=None, mean=None, std=None, concentration=None):
+def coordinate_gen_wght(data_shape,distribution='uniform',poisson_lam=None, mean=None, std=None, concentration=None, rng=None):
     """Generate the coordinate of a weights base on its shape and with specific distibution type.
 
     Arguments
@@ -205,26 +215,29 @@ def coordinate_gen_wght(data_shape,distribution='uniform',poisson_lam=None, mean
         The standard deviation value for normal or center distribution in coordinate. Tuple for normal distribution. Float for concentration of center distribution.
     concentration: Float. 
         A float number between 1 and 0. 1 means set the lambda of 2D feature map to center of image, 0 means set to corner of the feature map. (can only be use in conv 2D layer)
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The coordinate Tuple.
     """
+    rng=get_random_state(rng)
 
     coordinate=list()
     
     if distribution=='uniform':
         for j in range(len(data_shape)):
-            coordinate.append(np.random.randint(data_shape[j]))
+            coordinate.append(rng.randint(data_shape[j]))
     elif distribution=='poisson':
         if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=len(data_shape):
             raise TypeError('Poisson distribution lambda setting must be a tuple same length as input data shape which indicates the lamda of poisson distribution.')
         
         for j in range(len(data_shape)):
             if isinstance(poisson_lam[j],int) and poisson_lam[j]>=0 and poisson_lam[j]<data_shape[j]:
-                coor_tmp=np.random.poisson(poisson_lam[j])
+                coor_tmp=rng.poisson(poisson_lam[j])
                 while coor_tmp>=data_shape[j]:
-                    coor_tmp=np.random.poisson(poisson_lam[j])
+                    coor_tmp=rng.poisson(poisson_lam[j])
                 coordinate.append(coor_tmp)
             else:
                 raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str(data_shape),str(poisson_lam)))
@@ -236,9 +249,9 @@ def coordinate_gen_wght(data_shape,distribution='uniform',poisson_lam=None, mean
         
         for j in range(len(data_shape)):
             if isinstance(mean[j],int) and mean[j]>=0 and mean[j]<data_shape[j]:
-                coor_tmp=np.random.normal(mean[j],std[j])
+                coor_tmp=rng.normal(mean[j],std[j])
                 while coor_tmp>=data_shape[j]:
-                    coor_tmp=np.random.normal(mean[j],std[j])
+                    coor_tmp=rng.normal(mean[j],std[j])
                 coordinate.append(coor_tmp)
             else:
                 raise ValueError('Normal distribution Mean must within feature map shape. Feature map shape %s but got lambda input %s'%(str(data_shape),str(poisson_lam)))
@@ -252,8 +265,8 @@ def coordinate_gen_wght(data_shape,distribution='uniform',poisson_lam=None, mean
             std=0.075
             
         dist=np.linalg.norm(data_shape[:2])
-        radius=np.random.normal(1-concentration,std)
-        theta=np.random.uniform(high=2*np.pi)
+        radius=rng.normal(1-concentration,std)
+        theta=rng.uniform(high=2*np.pi)
         width=radius*np.cos(theta)
         height=radius*np.sin(theta)
         width=int(np.clip(width*dist/2+data_shape[0]/2,0,data_shape[0]-1))
@@ -262,15 +275,15 @@ def coordinate_gen_wght(data_shape,distribution='uniform',poisson_lam=None, mean
         coordinate.append(width)
         coordinate.append(height)
         
-        coordinate.append(np.random.randint(data_shape[2]))
-        coordinate.append(np.random.randint(data_shape[3]))
+        coordinate.append(rng.randint(data_shape[2]))
+        coordinate.append(rng.randint(data_shape[3]))
     else:
         raise NameError('Invalid type of random generation distribution. Please choose between uniform, poisson, normal.')
     
     coordinate=tuple(coordinate)
     return coordinate
 
-def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisson_lam=None, mean=None, std=None, concentration=None):
+def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisson_lam=None, mean=None, std=None, concentration=None, rng=None):
     """ Generate the coordinate of a weights base on its shape and with specific distibution type.
         Faster generation version not multiple fault in a parameter.
        
@@ -290,24 +303,27 @@ def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisso
         The standard deviation value for normal or center distribution in coordinate. Tuple for normal distribution. Float for concentration of center distribution.
     concentration: Float. 
         A float number between 1 and 0. 1 means set the lambda of 2D feature map to center of image, 0 means set to corner of the feature map. (can only be use in conv 2D layer)
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The coordinate Tuple.
     """
+    rng=get_random_state(rng)
 
     coordinate=list()
     
     if distribution=='uniform':
         for j in range(len(data_shape)):
-            coordinate.append(np.random.randint(data_shape[j],size=fault_num))
+            coordinate.append(rng.randint(data_shape[j],size=fault_num))
     elif distribution=='poisson':
         if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=len(data_shape):
             raise TypeError('Poisson distribution lambda setting must be a tuple same length as input data shape which indicates the lamda of poisson distribution.')
         
         for j in range(len(data_shape)):
             if isinstance(poisson_lam[j],int) and poisson_lam[j]>=0 and poisson_lam[j]<data_shape[j]:
-                coor_tmp=np.random.poisson(poisson_lam[j],size=fault_num)
+                coor_tmp=rng.poisson(poisson_lam[j],size=fault_num)
                 coor_tmp=np.clip(coor_tmp,0,data_shape[j]-1)
                 coordinate.append(coor_tmp)
             else:
@@ -320,7 +336,7 @@ def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisso
         
         for j in range(len(data_shape)):
             if isinstance(mean[j],int) and mean[j]>=0 and mean[j]<data_shape[j]:
-                coor_tmp=np.random.normal(mean[j],std[j],size=fault_num)
+                coor_tmp=rng.normal(mean[j],std[j],size=fault_num)
                 coor_tmp=np.clip(coor_tmp,0,data_shape[j]-1)
                 coordinate.append(coor_tmp)
             else:
@@ -335,8 +351,8 @@ def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisso
             std=0.075
             
         dist=np.linalg.norm(data_shape[:2])
-        radius=np.random.normal(1-concentration,std,size=fault_num)
-        theta=np.random.uniform(high=2*np.pi,size=fault_num)
+        radius=rng.normal(1-concentration,std,size=fault_num)
+        theta=rng.uniform(high=2*np.pi,size=fault_num)
         width=radius*np.cos(theta)
         height=radius*np.sin(theta)
         width=(np.clip(width*dist/2+data_shape[0]/2,0,data_shape[0]-1)).astype(int)
@@ -345,8 +361,8 @@ def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisso
         coordinate.append(width)
         coordinate.append(height)
         
-        coordinate.append(np.random.randint(data_shape[2],size=fault_num))
-        coordinate.append(np.random.randint(data_shape[3],size=fault_num))
+        coordinate.append(rng.randint(data_shape[2],size=fault_num))
+        coordinate.append(rng.randint(data_shape[3],size=fault_num))
     else:
         raise NameError('Invalid type of random generation distribution. Please choose between uniform, poisson, normal.')
     
@@ -354,7 +370,7 @@ def coordinate_gen_wght_fast(data_shape,fault_num,distribution='uniform' ,poisso
     return coordinate
 
 
-def fault_bit_loc_gen(model_word_length,distribution='uniform',poisson_lam=None, mean=None, std=None):
+def fault_bit_loc_gen(model_word_length,distribution='uniform',poisson_lam=None, mean=None, std=None, rng=None):
     """ Generate the location of a fault bit in a parameter base on its word length and with specific distibution type.
 
     Arguments
@@ -369,33 +385,36 @@ def fault_bit_loc_gen(model_word_length,distribution='uniform',poisson_lam=None,
         The mean value for normal or center distribution in bit location. 
     std: Float. 
         The standard deviation value for normal or center distribution in bit location.
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The location index (Integer).
     """
+    rng=get_random_state(rng)
 
     if distribution=='uniform':
-        fault_bit=np.random.randint(model_word_length)
+        fault_bit=rng.randint(model_word_length)
     elif distribution=='poisson':
         if isinstance(poisson_lam,int) and poisson_lam>=0 and poisson_lam<model_word_length:
-            fault_bit=np.random.poisson(poisson_lam)
+            fault_bit=rng.poisson(poisson_lam)
             while fault_bit>=model_word_length:
-                fault_bit=np.random.poisson(poisson_lam)
+                fault_bit=rng.poisson(poisson_lam)
         else:
             raise ValueError('Poisson distribution Lambda must within model word length.')
     elif distribution=='normal':
         if isinstance(mean,int) and mean>=0 and mean<model_word_length:
-            fault_bit=np.random.normal(mean,std)
+            fault_bit=rng.normal(mean,std)
             while fault_bit>=model_word_length:
-                fault_bit=np.random.normal(mean,std)
+                fault_bit=rng.normal(mean,std)
         else:
             raise ValueError('Normal distribution Mean must within model word length.')
     else:
         raise NameError('Invalid type of random generation distribution. Please choose between uniform, poisson, normal.')
     return fault_bit
 
-def fault_bit_loc_gen_fast(model_word_length,fault_num,distribution='uniform',poisson_lam=None, mean=None, std=None):
+def fault_bit_loc_gen_fast(model_word_length,fault_num,distribution='uniform',poisson_lam=None, mean=None, std=None, rng=None):
     """ Generate the location of a fault bit in a parameter base on its word length and with specific distibution type.
         Faster generation version not multiple fault in a parameter.
 
@@ -413,23 +432,26 @@ def fault_bit_loc_gen_fast(model_word_length,fault_num,distribution='uniform',po
         The mean value for normal or center distribution in bit location. 
     std: Float. 
         The standard deviation value for normal or center distribution in bit location.
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The location index (Integer).
     """
+    rng=get_random_state(rng)
 
     if distribution=='uniform':
-        fault_bit=np.random.randint(model_word_length,size=fault_num)
+        fault_bit=rng.randint(model_word_length,size=fault_num)
     elif distribution=='poisson':
         if isinstance(poisson_lam,int) and poisson_lam>=0 and poisson_lam<model_word_length:
-            fault_bit=np.random.poisson(poisson_lam,size=fault_num)
+            fault_bit=rng.poisson(poisson_lam,size=fault_num)
             fault_bit=np.clip(fault_bit,0,model_word_length-1)
         else:
             raise ValueError('Poisson distribution Lambda must within model word length.')
     elif distribution=='normal':
         if isinstance(mean,int) and mean>=0 and mean<model_word_length:
-            fault_bit=np.random.normal(mean,std,size=fault_num)
+            fault_bit=rng.normal(mean,std,size=fault_num)
             fault_bit=np.clip(fault_bit,0,model_word_length-1)
         else:
             raise ValueError('Normal distribution Mean must within model word length.')
@@ -482,6 +504,25 @@ def fault_num_gen_wght(data_shape,fault_rate,model_word_length):
     fault_num=[int(np.prod(shapes) * model_word_length * fault_rate) for shapes in data_shape]
     return fault_num 
 
+_model_param_bits_cache=weakref.WeakKeyDictionary()
+
+def _get_model_param_bits(model,batch_size,model_word_length):
+    """ Get the number of bits of every layer input/output/weight in the DNN model by get_model_param_bits.
+        The result is cached per (model, batch_size, model_word_length), thus repeated fault generation rounds don't rescan the model.
+        The model_shape_index built with the same batch_size and model_word_length provides its precomputed bits.
+    """
+    if not isinstance(model_word_length,list):
+        model_word_length=[model_word_length,model_word_length,model_word_length]
+    key=(batch_size,tuple(model_word_length))
+    
+    if getattr(model,'param_bits',None) is not None and (model.batch_size,tuple(model.word_length))==key:
+        return model.param_bits,model.param_index
+    
+    model_cache=_model_param_bits_cache.setdefault(model,dict())
+    if key not in model_cache:
+        model_cache[key]=get_model_param_bits(model,batch_size,model_word_length)
+    return model_cache[key]
+
 def get_model_total_bits(model,batch_size,model_word_length):
     """ Get the total number of bits in the whole DNN model.
         For determin the minimum bit error rate that can generate faults.
@@ -505,44 +546,15 @@ def get_model_total_bits(model,batch_size,model_word_length):
         The total number of bits in model weights.
 
     """
-    model_depth=len(model.layers)
-    total_ifmap_bits=0
-    total_ofmap_bits=0
-    total_weight_bits=0
-    
-    for layer_num in range(1,model_depth):
-        layer=model.layers[layer_num]
-        layer_input_shape=layer.input_shape
-        layer_output_shape=layer.output_shape
-        layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
-        
-        if len(layer_weight_shape)==0:
-            continue
-        
-        if isinstance(layer_input_shape,list):
-            for i in range(len(layer_input_shape)):
-                bits_tmp=int(np.prod(layer_input_shape[i][1:]) * batch_size * model_word_length)
-                total_ifmap_bits+=bits_tmp
-        else:
-            bits_tmp=int(np.prod(layer_input_shape[1:]) * batch_size * model_word_length)
-            total_ifmap_bits+=bits_tmp
-            
-        if isinstance(layer_output_shape,list):
-            for i in range(len(layer_output_shape)):
-                bits_tmp=int(np.prod(layer_output_shape[i][1:]) * batch_size * model_word_length)
-                total_ofmap_bits+=bits_tmp
-        else:
-            bits_tmp=int(np.prod(layer_output_shape[1:]) * batch_size * model_word_length)
-            total_ofmap_bits+=bits_tmp
-            
-        for i in range(len(layer_weight_shape)):
-            bits_tmp=int(np.prod(layer_weight_shape[i][1:]) * batch_size * model_word_length)
-            total_weight_bits+=bits_tmp
+    param_bits,_=_get_model_param_bits(model,batch_size,model_word_length)
+    total_ifmap_bits,total_ofmap_bits,total_weight_bits=[int(np.sum(bits)) for bits in param_bits]
             
     return total_ifmap_bits,total_ofmap_bits,total_weight_bits
 
-def fault_num_gen_model(model,fault_rate,batch_size,model_word_length):
+def fault_num_gen_model(model,fault_rate,batch_size,model_word_length,rng=None):
     """ Get the fault number of each layer input/weight/output respectiely by the given bit error rate.
+        The faults are uniformly distributed over all the bits of model, 
+        the fault number of each parameter is drawn from a multinomial distribution at once.
 
     Parameters
     ----------
@@ -554,6 +566,8 @@ def fault_num_gen_model(model,fault_rate,batch_size,model_word_length):
         Batch size.
     model_word_length : Integer
         Word length of weights parameter.
+    rng : numpy.random.Generator, RandomState or Integer, optional
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
@@ -570,109 +584,50 @@ def fault_num_gen_model(model,fault_rate,batch_size,model_word_length):
     total_weight_bits : List of Integer
         The total number of bits in model weights.
     """
+    rng=get_random_state(rng)
     model_depth=len(model.layers)
-    ifmap_param_bits=[0 for _ in range(model_depth)]
-    wght_param_bits=[[0,0] for _ in range(model_depth)]
-    ofmap_param_bits=[0 for _ in range(model_depth)]
-    total_ifmap_bits=0
-    total_ofmap_bits=0
-    total_weight_bits=0
-    if not isinstance(model_word_length,list):
-        model_word_length=[model_word_length,model_word_length,model_word_length]
-        
-    for layer_num in range(1,model_depth):
-        layer=model.layers[layer_num]
-        layer_input_shape=layer.input_shape
-        layer_output_shape=layer.output_shape
-        layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
-        
-        if len(layer_weight_shape)==0:
-            continue
-        
-        if isinstance(layer_input_shape,list):
-            layer_ifmap_param_bits=list()
-            for i in range(len(layer_input_shape)):
-                bits_tmp=int(np.prod(layer_input_shape[i][1:]) * batch_size * model_word_length[0])
-                layer_ifmap_param_bits.append(bits_tmp)
-                total_ifmap_bits+=bits_tmp
-            ifmap_param_bits[layer_num]=layer_ifmap_param_bits
-        else:
-            bits_tmp=int(np.prod(layer_input_shape[1:]) * batch_size * model_word_length[0])
-            ifmap_param_bits[layer_num]=bits_tmp
-            total_ifmap_bits+=bits_tmp
-            
-        if isinstance(layer_output_shape,list):
-            layer_ofmap_param_bits=list()
-            for i in range(len(layer_output_shape)):
-                bits_tmp=int(np.prod(layer_output_shape[i][1:]) * batch_size * model_word_length[2])
-                layer_ofmap_param_bits.append(bits_tmp)
-                total_ofmap_bits+=bits_tmp
-            ofmap_param_bits[layer_num]=layer_ofmap_param_bits
-        else:
-            bits_tmp=int(np.prod(layer_output_shape[1:]) * batch_size * model_word_length[2])
-            ofmap_param_bits[layer_num]=bits_tmp
-            total_ofmap_bits+=bits_tmp
-            
-        layer_weight_param_bits=list()
-        for i in range(len(layer_weight_shape)):
-            bits_tmp=int(np.prod(layer_weight_shape[i][1:]) * batch_size * model_word_length[1])
-            layer_weight_param_bits.append(bits_tmp)
-            total_weight_bits+=bits_tmp
-        wght_param_bits[layer_num]=layer_weight_param_bits
-        
-    ifmap_fault_num=int(total_ifmap_bits*fault_rate)
-    ofmap_fault_num=int(total_ofmap_bits*fault_rate)
-    weight_fault_num=int(total_weight_bits*fault_rate)
-    
-    dtind=np.max(np.array([total_ifmap_bits,total_ofmap_bits,total_weight_bits]))
-    
-    ifmap_fault_list=np.random.randint(total_ifmap_bits,size=ifmap_fault_num,dtype=dtind.dtype)
-    ofmap_fault_list=np.random.randint(total_ofmap_bits,size=ofmap_fault_num,dtype=dtind.dtype)
-    weight_fault_list=np.random.randint(total_weight_bits,size=weight_fault_num,dtype=dtind.dtype)
+    param_bits,param_index=_get_model_param_bits(model,batch_size,model_word_length)
     
-    ifmap_fault_num_list=[0]
-    ofmap_fault_num_list=[0]
-    weight_fault_num_list=[0]
-    
-    filter_fault_num_ifmap_low=0
-    filter_fault_num_ofmap_low=0
-    filter_fault_num_weight_low=0
-    
-    for layer_num in range(1,model_depth):
-        if isinstance(ifmap_param_bits[layer_num],list):
-            layer_ifmap_fault_num=list()
-            for i in range(len(ifmap_param_bits[layer_num])):
-                filter_fault_num_ifmap_high=filter_fault_num_ifmap_low+ifmap_param_bits[layer_num][i]
-                layer_ifmap_fault_num.append(np.sum(np.prod(np.where([ifmap_fault_list>filter_fault_num_ifmap_low,ifmap_fault_list<filter_fault_num_ifmap_high],1,0),axis=0,keepdims=False)))
-                filter_fault_num_ifmap_low=filter_fault_num_ifmap_high
-            ifmap_fault_num_list.append(layer_ifmap_fault_num)
+    fault_num_list=list()
+    total_bits=list()
+    for i in range(3):
+        total=int(np.sum(param_bits[i]))
+        total_bits.append(total)
+        if total==0:
+            fault_num=np.zeros(len(param_bits[i]),dtype=np.int64)
         else:
-            filter_fault_num_ifmap_high=filter_fault_num_ifmap_low+ifmap_param_bits[layer_num]
-            ifmap_fault_num_list.append(np.sum(np.prod(np.where([ifmap_fault_list>filter_fault_num_ifmap_low,ifmap_fault_list<filter_fault_num_ifmap_high],1,0),axis=0,keepdims=False)))
-            filter_fault_num_ifmap_low=filter_fault_num_ifmap_high
-            
-        if isinstance(ofmap_param_bits[layer_num],list):
-            layer_ofmap_fault_num=list()
-            for i in range(len(ofmap_param_bits[layer_num])):
-                filter_fault_num_ofmap_high=filter_fault_num_ofmap_low+ofmap_param_bits[layer_num][i]
-                layer_ofmap_fault_num.append(np.sum(np.prod(np.where([ofmap_fault_list>filter_fault_num_ofmap_low,ofmap_fault_list<filter_fault_num_ofmap_high],1,0),axis=0,keepdims=False)))
-                filter_fault_num_ofmap_low=filter_fault_num_ofmap_high
-            ofmap_fault_num_list.append(layer_ofmap_fault_num)
+            fault_num=rng.multinomial(int(total*fault_rate),param_bits[i]/total)
+        
+        if i<2:
+            layer_fault_num=[0 for _ in range(model_depth)]
         else:
-            filter_fault_num_ofmap_high=filter_fault_num_ofmap_low+ofmap_param_bits[layer_num]
-            ofmap_fault_num_list.append(np.sum(np.prod(np.where([ofmap_fault_list>filter_fault_num_ofmap_low,ofmap_fault_list<filter_fault_num_ofmap_high],1,0),axis=0,keepdims=False)))
-            filter_fault_num_ofmap_low=filter_fault_num_ofmap_high
-            
-        layer_weight_fault_num=list()
-        for i in range(len(wght_param_bits[layer_num])):
-            filter_fault_num_weight_high=filter_fault_num_weight_low+wght_param_bits[layer_num][i]
-            layer_weight_fault_num.append(np.sum(np.prod(np.where([weight_fault_list>filter_fault_num_weight_low,weight_fault_list<filter_fault_num_weight_high],1,0),axis=0,keepdims=False)))
-            filter_fault_num_weight_low=filter_fault_num_weight_high
-        weight_fault_num_list.append(layer_weight_fault_num)
+            layer_fault_num=[list() for _ in range(model_depth)]
+            layer_fault_num[0]=0
+        for (layer_num,data_num),num in zip(param_index[i],fault_num):
+            if i==2:
+                layer_fault_num[layer_num].append(num)
+            elif data_num is None:
+                layer_fault_num[layer_num]=num
+            else:
+                if data_num==0:
+                    layer_fault_num[layer_num]=list()
+                layer_fault_num[layer_num].append(num)
+        fault_num_list.append(layer_fault_num)
+        
+    ifmap_fault_num_list,ofmap_fault_num_list,weight_fault_num_list=fault_num_list
+    total_ifmap_bits,total_ofmap_bits,total_weight_bits=total_bits
  
     return ifmap_fault_num_list,ofmap_fault_num_list,weight_fault_num_list,total_ifmap_bits,total_ofmap_bits,total_weight_bits
     
 
+def _dict2table(fault_dict,data_shape):
+    """ Convert the fault dictionaries left by slow generation or empty generation to fault_table. """
+    if isinstance(fault_dict,list):
+        return [_dict2table(fd,shape) for fd,shape in zip(fault_dict,data_shape)]
+    if isinstance(fault_dict,dict):
+        return fault_table.from_dict(fault_dict,ndim=len(data_shape))
+    return fault_dict
+
 def gen_fault_dict_list_fmap(data_shape,
                              fault_rate,
                              batch_size,
@@ -690,6 +645,7 @@ def gen_fault_dict_list_fmap(data_shape,
                              bit_loc_mean=None, 
                              bit_loc_std=None,
                              fault_type='flip',
+                             rng=None,
                              **kwargs):
     """Generate the fault dictionary list of a feature map base on its shape and with specific distibution type.
 
@@ -707,8 +663,10 @@ def gen_fault_dict_list_fmap(data_shape,
         The number of faults in fmap.
     fast_gen: Bool. 
         Use fast generation or not. Fast generation doesn't have multiple fault in single parameter, thus the fault_num maybe inaccurate.
-    return_modulator: Bool. 
-        Return fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+    return_modulator: Bool or String. 
+        | Return fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+        | If 'sparse', return sparse_modulator which only keeps fault coordinates and bit masks, the memory scales with fault count not data size.
+        | If 'table', return fault_table, the columnar fault list without per-fault dictionary. Also available when fast_gen is False.
     coor_distribution: String. 
         The distribution type of coordinate in feature map. Must be one of 'uniform', 'poisson', 'normal'.
     coor_pois_lam: Tuple. 
@@ -729,11 +687,14 @@ def gen_fault_dict_list_fmap(data_shape,
         The standard deviation value for normal or center distribution in bit location.
     fault_type: String. 
         The type of fault.
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The fault information Dictionary. The number of fault generated (Integer).
     """
+    rng=get_random_state(rng)
 
     fault_count=0
     if isinstance(data_shape,list):
@@ -755,6 +716,7 @@ def gen_fault_dict_list_fmap(data_shape,
                                                     mean=coor_mean,
                                                     std=coor_std,
                                                     concentration=concentration,
+                                                    rng=rng,
                                                     **kwargs)
                 fault_bit=fault_bit_loc_gen_fast(model_word_length,
                                                  fault_num[i],
@@ -762,9 +724,14 @@ def gen_fault_dict_list_fmap(data_shape,
                                                  poisson_lam=bit_loc_pois_lam,
                                                  mean=bit_loc_mean,
                                                  std=bit_loc_std,
+                                                 rng=rng,
                                                  **kwargs)
                 if coordinate is not None:
-                    if return_modulator:
+                    if return_modulator=='sparse':
+                        fault_dict[i]=generate_stuck_at_fault_modulator_sparse(data_shape[i],coordinate,fault_type,fault_bit)
+                    elif return_modulator=='table':
+                        fault_dict[i]=fault_table(coordinate,fault_bit,fault_type,ndim=len(data_shape[i])).unique_coor()
+                    elif return_modulator:
                         tensor_modulator0=None
                         tensor_modulator1=None
                         tensor_modulatorF=None
@@ -788,6 +755,7 @@ def gen_fault_dict_list_fmap(data_shape,
                                                 mean=coor_mean,
                                                 std=coor_std,
                                                 concentration=concentration,
+                                                rng=rng,
                                                 **kwargs)
             fault_bit=fault_bit_loc_gen_fast(model_word_length,
                                              fault_num,
@@ -795,9 +763,14 @@ def gen_fault_dict_list_fmap(data_shape,
                                              poisson_lam=bit_loc_pois_lam,
                                              mean=bit_loc_mean,
                                              std=bit_loc_std,
+                                             rng=rng,
                                              **kwargs)
             if coordinate is not None:
-                if return_modulator:
+                if return_modulator=='sparse':
+                    fault_dict=generate_stuck_at_fault_modulator_sparse(data_shape,coordinate,fault_type,fault_bit)
+                elif return_modulator=='table':
+                    fault_dict=fault_table(coordinate,fault_bit,fault_type,ndim=len(data_shape)).unique_coor()
+                elif return_modulator:
                     tensor_modulator0=None
                     tensor_modulator1=None
                     tensor_modulatorF=None
@@ -824,12 +797,14 @@ def gen_fault_dict_list_fmap(data_shape,
                                                    mean=coor_mean,
                                                    std=coor_std,
                                                    concentration=concentration,
+                                                   rng=rng,
                                                    **kwargs)
                     fault_bit=fault_bit_loc_gen(model_word_length,
                                                 distribution=bit_loc_distribution,
                                                 poisson_lam=bit_loc_pois_lam,
                                                 mean=bit_loc_mean,
                                                 std=bit_loc_std,
+                                                rng=rng,
                                                 **kwargs)
                     if coordinate is None:
                         break
@@ -864,12 +839,14 @@ def gen_fault_dict_list_fmap(data_shape,
                                                mean=coor_mean,
                                                std=coor_std,
                                                concentration=concentration,
+                                               rng=rng,
                                                **kwargs)
                 fault_bit=fault_bit_loc_gen(model_word_length,
                                             distribution=bit_loc_distribution,
                                             poisson_lam=bit_loc_pois_lam,
                                             mean=coor_mean,
                                             std=coor_std,
+                                            rng=rng,
                                             **kwargs)
                 
                 if coordinate is None:
@@ -895,6 +872,9 @@ def gen_fault_dict_list_fmap(data_shape,
                                               'SA_bit' : fault_bit}
                     fault_count += 1
         
+    if return_modulator=='table':
+        fault_dict=_dict2table(fault_dict,data_shape)
+        
     return fault_dict,fault_num
     
 def gen_fault_dict_list_wght(data_shape,
@@ -913,6 +893,7 @@ def gen_fault_dict_list_wght(data_shape,
                              bit_loc_mean=None, 
                              bit_loc_std=None,
                              fault_type='flip',
+                             rng=None,
                              **kwargs):
     """Generate the fault dictionary list of a feature map base on its shape and with specific distibution type.
 
@@ -930,8 +911,10 @@ def gen_fault_dict_list_wght(data_shape,
         The number of faults in [kernel,bias] respectively.
     fast_gen: Bool. 
         Use fast generation or not. Fast generation doesn't have multiple fault in single parameter, thus the fault_num maybe inaccurate.
-    return_modulator: Bool. 
-        Return fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+    return_modulator: Bool or String. 
+        | Return fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+        | If 'sparse', return sparse_modulator which only keeps fault coordinates and bit masks, the memory scales with fault count not data size.
+        | If 'table', return fault_table, the columnar fault list without per-fault dictionary. Also available when fast_gen is False.
     coor_distribution: String. 
         The distribution type of coordinate in weights. Must be one of 'uniform', 'poisson', 'normal'.
     coor_pois_lam: Tuple. 
@@ -952,11 +935,14 @@ def gen_fault_dict_list_wght(data_shape,
         The standard deviation value for normal or center distribution in bit location.
     fault_type: String. 
         The type of fault.
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The fault information Dictionary. The number of fault generated Integer.
     """
+    rng=get_random_state(rng)
 
     fault_count=0        
     fault_dict=[dict() for _ in range(len(data_shape))]
@@ -972,6 +958,7 @@ def gen_fault_dict_list_wght(data_shape,
                                                 mean=coor_mean,
                                                 std=coor_std,
                                                 concentration=concentration,
+                                                rng=rng,
                                                 **kwargs)
             fault_bit=fault_bit_loc_gen_fast(model_word_length,
                                              fault_num[i],
@@ -979,9 +966,14 @@ def gen_fault_dict_list_wght(data_shape,
                                              poisson_lam=bit_loc_pois_lam,
                                              mean=bit_loc_mean,
                                              std=bit_loc_std,
+                                             rng=rng,
                                              **kwargs)
             if coordinate is not None:
-                if return_modulator:
+                if return_modulator=='sparse':
+                    fault_dict[i]=generate_stuck_at_fault_modulator_sparse(data_shape[i],coordinate,fault_type,fault_bit)
+                elif return_modulator=='table':
+                    fault_dict[i]=fault_table(coordinate,fault_bit,fault_type,ndim=len(data_shape[i])).unique_coor()
+                elif return_modulator:
                     tensor_modulator0=None
                     tensor_modulator1=None
                     tensor_modulatorF=None
@@ -1006,12 +998,14 @@ def gen_fault_dict_list_wght(data_shape,
                                                concentration=concentration,
                                                mean=coor_mean,
                                                std=coor_std,
+                                               rng=rng,
                                                **kwargs)
                 fault_bit=fault_bit_loc_gen(model_word_length,
                                             distribution=bit_loc_distribution,
                                             poisson_lam=bit_loc_pois_lam,
                                             mean=bit_loc_mean,
                                             std=bit_loc_std,
+                                            rng=rng,
                                             **kwargs)
                 if coordinate is None:
                         break
@@ -1038,6 +1032,9 @@ def gen_fault_dict_list_wght(data_shape,
                                                   'SA_bit' : fault_bit}
                     fault_count += 1
         
+    if return_modulator=='table':
+        fault_dict=_dict2table(fault_dict,data_shape)
+        
     return fault_dict,fault_num
 
 def generate_layer_stuck_fault(layer,
@@ -1059,6 +1056,7 @@ def generate_layer_stuck_fault(layer,
                                bit_loc_std=None,
                                fault_type='flip',
                                print_detail=True,
+                               rng=None,
                                **kwargs):
     """Generate the fault dictionary list of a layer base on its shape and with specific distibution type.
 
@@ -1076,8 +1074,10 @@ def generate_layer_stuck_fault(layer,
         The number of faults in [input,weight,output] respectively.
     fast_gen: Bool. 
         Use fast generation or not. Fast generation doesn't have multiple fault in single parameter, thus the fault_num maybe inaccurate.
-    return_modulator: Bool. 
-        Return fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+    return_modulator: Bool or String. 
+        | Return fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+        | If 'sparse', return sparse_modulator which only keeps fault coordinates and bit masks, the memory scales with fault count not data size.
+        | If 'table', return fault_table, the columnar fault list without per-fault dictionary. Also available when fast_gen is False.
     coor_distribution: String. 
         The distribution type of coordinate in parameters. Must be one of 'uniform', 'poisson', 'normal'.
     coor_pois_lam: List of Tuple. 
@@ -1100,11 +1100,14 @@ def generate_layer_stuck_fault(layer,
         The type of fault.
     print_detail: Bool. 
         Print generation detail or not.
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The fault information Dictionary. The number of fault generated Integer.
     """
+    rng=get_random_state(rng)
 
     if coor_pois_lam is None:
         coor_pois_lam=[None,None,None]
@@ -1125,7 +1128,7 @@ def generate_layer_stuck_fault(layer,
 
     layer_input_shape=layer.input_shape
     layer_output_shape=layer.output_shape
-    layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
+    layer_weight_shape=get_layer_weight_shape(layer)
     
     if len(layer_weight_shape)==0:
         if print_detail:
@@ -1155,6 +1158,7 @@ def generate_layer_stuck_fault(layer,
                                                                         bit_loc_mean=bit_loc_mean,
                                                                         bit_loc_std=bit_loc_std,
                                                                         fault_type=fault_type,
+                                                                        rng=rng,
                                                                         **kwargs)
     else:
         ifmap_fault_dict=None
@@ -1183,6 +1187,7 @@ def generate_layer_stuck_fault(layer,
                                                                         bit_loc_mean=bit_loc_mean,
                                                                         bit_loc_std=bit_loc_std,
                                                                         fault_type=fault_type,
+                                                                        rng=rng,
                                                                         **kwargs)
     else:
         ofmap_fault_dict=None
@@ -1209,6 +1214,7 @@ def generate_layer_stuck_fault(layer,
                                                                           bit_loc_mean=bit_loc_mean,
                                                                           bit_loc_std=bit_loc_std,
                                                                           fault_type=fault_type,
+                                                                          rng=rng,
                                                                           **kwargs)
     else:
         weight_fault_dict=[None,None]
@@ -1240,6 +1246,7 @@ def generate_model_stuck_fault(model,
                                fault_type='flip',
                                print_detail=True,
                                layer_gen_list=None,
+                               rng=None,
                                **kwargs):
     """Generate the fault dictionary list of a model base on its shape and with specific distibution type.
 
@@ -1259,8 +1266,10 @@ def generate_model_stuck_fault(model,
         The indicator for generate fault on ifmap, weight, ofmap individually. [input,weight,output]
     fast_gen: Bool. 
         Use fast generation or not. Fast generation doesn't have multiple fault in single parameter, thus the fault_num maybe inaccurate.
-    return_modulator: Bool. Return 
+    return_modulator: Bool or String. Return 
         fault modulator or not. Return fault modulator in fault list generation phase. Further improve generation time. Only available when the fast_gen is True.
+        If 'sparse', return sparse_modulator which only keeps fault coordinates and bit masks.
+        If 'table', return fault_table, the columnar fault list without per-fault dictionary.
     coor_distribution: String. 
         The distribution type of coordinate in parameters. Must be one of 'uniform', 'poisson', 'normal'.
     coor_pois_lam: Double List of Tuple. 
@@ -1285,11 +1294,14 @@ def generate_model_stuck_fault(model,
         Print generation detail or not.
     layer_gen_list: List of Integer. 
         The list of indexes for specific layer wanted to generate fault
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation. If None, use the global numpy random state.
 
     Returns
     -------
     The fault information Dictionary List.
     """
+    rng=get_random_state(rng)
 
     model_depth=len(model.layers)
     model_ifmap_fault_dict_list=[None for _ in range(model_depth)]
@@ -1300,7 +1312,7 @@ def generate_model_stuck_fault(model,
         layer_wise=True
 
     if not layer_wise:
-        ifmap_fault_num_list,ofmap_fault_num_list,weight_fault_num_list,_,_,_=fault_num_gen_model(model,fault_rate,batch_size,model_word_length)  
+        ifmap_fault_num_list,ofmap_fault_num_list,weight_fault_num_list,_,_,_=fault_num_gen_model(model,fault_rate,batch_size,model_word_length,rng=rng)  
         
     if coor_pois_lam is None:
         coor_pois_lam=[[None,None,None]]
@@ -1360,7 +1372,7 @@ def generate_model_stuck_fault(model,
             std_index=layer_num
             
                     
-        layer_weight_shape=[weight_shape.shape for weight_shape in model.layers[layer_num].get_weights()]
+        layer_weight_shape=get_layer_weight_shape(model.layers[layer_num])
         
         if len(layer_weight_shape)==0:
             if print_detail:
@@ -1392,6 +1404,7 @@ def generate_model_stuck_fault(model,
                                     bit_loc_std=bit_loc_std,
                                     fault_type=fault_type,
                                     print_detail=print_detail,
+                                    rng=rng,
                                     **kwargs)
         
         if print_detail:
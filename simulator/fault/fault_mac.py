@@ -6,6 +6,8 @@ Created on Wed Sep  9 15:54:51 2020
 
 Fault Tensor operations for MAC faults. Including MAC math fault injection and MAC noise fault injection
 """
+import collections
+import numpy as np
 import tensorflow as tf
 
 class mac_fault_injector:
@@ -44,22 +46,16 @@ class mac_fault_injector:
 
     | mac math fault injection scatter fault
     >>> preprocess_data={'fd_coor': 2D Ndarray, #the coordinate of fault in layer
-    ...                  'param_ofmap': 1D Ndarray, #the faulty ofmap param index
-    ...                  'param_ifmap': 1D Ndarray, #the faulty ifmap param index
-    ...                  'param_wght': 1D Ndarray, #the faulty wght param index
-    ...                  'idx_ofmap': 2D Ndarray, #faulty ofmap coordinate
-    ...                  'modulator_ofmap': List, #polarty data list for ofmap fault
-    ...                  'idx_ifmap_ifmap': 2D Ndarray, #faulty ifmap coordinate
-    ...                  'idx_ifmap_wght': 2D Ndarray, #faulty ifmap correspond wght coordinate
-    ...                  'modulator_ifmap': List, #polarty data list for ifmap fault
-    ...                  'idx_wght_wght': 2D Ndarray, #faulty wght coordinate
-    ...                  'idx_wght_ifmap': 2D Ndarray, #faulty wght correspond ifmap coordinate
-    ...                  'modulator_wght': List, #polarty data list for wght fault
-    ...                  'faultbit_ofmap': 1D Ndarray, #the ofmap fault bit order
-    ...                  'faultbit_ifmap': 1D Ndarray, #the ifmap fault bit order
-    ...                  'faultbit_wght': 1D Ndarray, #the wght fault bit order
-    ...                  'cnt_psidx': 1D Ndarray, #the counter for uneven psidx number on single ofmap pixel
-    ...                  'psum_idx_list_len': Integer, #number of psum_idx
+    ...                  'coor_id': 1D Ndarray, #the index of fd_coor of each fault row
+    ...                  'param_code': 1D Ndarray, #the faulty param 0:ifmap, 1:wght, 2:psum
+    ...                  'type_code': 1D Ndarray, #the fault type 0:SA0, 1:SA1, 2:flip
+    ...                  'modulator': 1D Ndarray, #fault_bit order coefficient
+    ...                  'signbit': 1D Ndarray, #-1 for fault_bit on sign bit, else 1
+    ...                  'idx_ofmap': 2D Ndarray, #(psidx, ofmap coordinate)
+    ...                  'idx_ifmap': 2D Ndarray, #(psidx, ifmap coordinate)
+    ...                  'idx_wght': 2D Ndarray, #(psidx, wght coordinate)
+    ...                  'psidx_offsets': 1D Ndarray, #(row + 1,) the psidx of row i are idx[psidx_offsets[i]:psidx_offsets[i+1]]
+    ...                  'multi_fault': Bool, #some coordinates have more than one fault row
     ...                  }
     
     | mac noise fault injection unique fault
@@ -75,6 +71,11 @@ class mac_fault_injector:
     These fault injection method is not suitable for tf.function the decision flow is complex for 
     converting all of them to tensor graph. Recommand using Keras model to wrap these fault injection method.
     """
+    # the Tensors of preprocessed fault tables, converted once and captured by the layer graphs
+    _table_cache=collections.OrderedDict()
+    _table_cache_size=64
+    _table_keys=['fd_coor','coor_id','param_code','type_code','modulator','signbit','idx_ofmap','idx_ifmap','idx_wght','psidx_row']
+    
     def __init__(self, mac_unit, fault_dict=None):
         """ mac fault injector initializer """
         self.fault_dict=fault_dict
@@ -159,6 +160,52 @@ class mac_fault_injector:
             
         return polarity    
     
+    def _fault_table_tensors(self, fault_dict):
+        """ Get the Tensors of a preprocessed fault table. 
+            The Tensors are made once in eager context and cached, the layer calls capture them as graph inputs 
+            instead of building new constants on every call.
+        """
+        key=id(fault_dict)
+        if key in self._table_cache and self._table_cache[key][0] is fault_dict:
+            self._table_cache.move_to_end(key)
+            return self._table_cache[key][1]
+        
+        table=self._fault_table_flatten(fault_dict)
+        with tf.init_scope():
+            tensors={name:tf.constant(table[name]) for name in self._table_keys}
+        # keep the fault dict referenced so that its id is not reused
+        self._table_cache[key]=(fault_dict,tensors)
+        if len(self._table_cache)>self._table_cache_size:
+            self._table_cache.popitem(last=False)
+        return tensors
+    
+    def _fault_table_flatten(self, fault_dict):
+        """ The fault row index of each psum index, made from the psum index offsets of fault rows.
+            The zero padded (row, psidx) fault table with 'psidx_mask' of earlier preprocess, e.g. loaded from mac fault cache, 
+            is flatten to the same (psidx, coordinate) layout.
+        """
+        table=dict(fault_dict)
+        if 'psidx_offsets' in fault_dict:
+            psidx_cnt=np.diff(fault_dict['psidx_offsets'])
+        else:
+            psidx_mask=np.asarray(fault_dict['psidx_mask'],dtype=bool)
+            for name in ['idx_ofmap','idx_ifmap','idx_wght']:
+                table[name]=fault_dict[name][psidx_mask]
+            psidx_cnt=np.sum(psidx_mask,axis=1)
+        table['psidx_row']=np.repeat(np.arange(len(psidx_cnt),dtype=np.int32),psidx_cnt)
+        return table
+    
+    def _polarity_check_table(self, FI_param, modulator, signbit, type_code):
+        """ Get the polarity of all psum indexes at once. 
+            The polarity of a bit value b is -b for SA0, 1-b for SA1 and 1-2b for flip, inverted on sign bit.
+        """
+        bitval=tf.math.sign(tf.bitwise.bitwise_and(FI_param,modulator))
+        polarity_bias=tf.gather(tf.constant([0,1,1]),type_code)
+        polarity_gain=tf.gather(tf.constant([-1,-1,-2]),type_code)
+        polarity=tf.add(polarity_bias, tf.multiply(polarity_gain,bitval))
+        polarity=tf.multiply(polarity,signbit)
+        return polarity
+    
     def _rand_sum_polarity_mod(self, polarity):
         """ Polarity modify for rand_sum psum_handler. Half of the polarities are inverted. """
         randpolar=tf.random.uniform(polarity.shape, minval=0, maxval=2, dtype=tf.int32)
@@ -166,9 +213,10 @@ class mac_fault_injector:
         polarity=tf.multiply(polarity,randpolar)
         return polarity
     
-    def mac_math_alter_make(self, psum_alter, polarity, quantizer_output, sim_truncarry=False, ifmap_alloc=None, wght_alloc=None):
+    def mac_math_alter_make(self, psum_alter, polarity, quantizer_output, sim_truncarry=False, ifmap_alloc=None, wght_alloc=None, segment_ids=None, num_segments=None):
         """ The core funciton of create mac math fault injection alteration Tensor
             This alteration will be later add onto ofmap tensor
+            The psum_alter are summed along axis 1, or summed by segment_ids for flatten psum indexes.
             
             psum_alter: The product data by multiply coefficient data and fault bit order. That is:
                 >>> if fault_param=='ifmap_in' or fault_param=='ifmap_out':
@@ -195,14 +243,20 @@ class mac_fault_injector:
             psum_alter=tf.multiply(psum_alter, tf.cast(polarity,tf.float32))
             
             # sum all psum_alter
-            psum_alter=tf.reduce_sum(psum_alter, axis=1)
+            if segment_ids is None:
+                psum_alter=tf.reduce_sum(psum_alter, axis=1)
+            else:
+                psum_alter=tf.math.unsorted_segment_sum(psum_alter, segment_ids, num_segments)
             psum_alter=quantizer_output.right_shift_back(psum_alter)
             
         elif self.quant_mode=='hybrid':
             psum_alter=tf.multiply(polarity, psum_alter)
             
             # sum all psum_alter
-            psum_alter=tf.reduce_sum(psum_alter, axis=1)
+            if segment_ids is None:
+                psum_alter=tf.reduce_sum(psum_alter, axis=1)
+            else:
+                psum_alter=tf.math.unsorted_segment_sum(psum_alter, segment_ids, num_segments)
             psum_alter=quantizer_output.right_shift_back(psum_alter)
             psum_alter=quantizer_output.right_shift_back(psum_alter)
             
@@ -729,22 +783,16 @@ class mac_fault_injector:
             The dictionary contain fault list information.
             
             >>> preprocess_data={'fd_coor': 2D Ndarray, #the coordinate of fault in layer
-            ...                  'param_ofmap': 1D Ndarray, #the faulty ofmap param index
-            ...                  'param_ifmap': 1D Ndarray, #the faulty ifmap param index
-            ...                  'param_wght': 1D Ndarray, #the faulty wght param index
-            ...                  'idx_ofmap': 2D Ndarray, #faulty ofmap coordinate
-            ...                  'modulator_ofmap': List, #polarty data list for ofmap fault
-            ...                  'idx_ifmap_ifmap': 2D Ndarray, #faulty ifmap coordinate
-            ...                  'idx_ifmap_wght': 2D Ndarray, #faulty ifmap correspond wght coordinate
-            ...                  'modulator_ifmap': List, #polarty data list for ifmap fault
-            ...                  'idx_wght_wght': 2D Ndarray, #faulty wght coordinate
-            ...                  'idx_wght_ifmap': 2D Ndarray, #faulty wght correspond ifmap coordinate
-            ...                  'modulator_wght': List, #polarty data list for wght fault
-            ...                  'faultbit_ofmap': 1D Ndarray, #the ofmap fault bit order
-            ...                  'faultbit_ifmap': 1D Ndarray, #the ifmap fault bit order
-            ...                  'faultbit_wght': 1D Ndarray, #the wght fault bit order
-            ...                  'cnt_psidx': 1D Ndarray, #the counter for uneven psidx number on single ofmap pixel
-            ...                  'psum_idx_list_len': Integer, #number of psum_idx
+            ...                  'coor_id': 1D Ndarray, #the index of fd_coor of each fault row
+            ...                  'param_code': 1D Ndarray, #the faulty param 0:ifmap, 1:wght, 2:psum
+            ...                  'type_code': 1D Ndarray, #the fault type 0:SA0, 1:SA1, 2:flip
+            ...                  'modulator': 1D Ndarray, #fault_bit order coefficient
+            ...                  'signbit': 1D Ndarray, #-1 for fault_bit on sign bit, else 1
+            ...                  'idx_ofmap': 2D Ndarray, #(psidx, ofmap coordinate)
+            ...                  'idx_ifmap': 2D Ndarray, #(psidx, ifmap coordinate)
+            ...                  'idx_wght': 2D Ndarray, #(psidx, wght coordinate)
+            ...                  'psidx_offsets': 1D Ndarray, #(row + 1,) the psidx of row i are idx[psidx_offsets[i]:psidx_offsets[i+1]]
+            ...                  'multi_fault': Bool, #some coordinates have more than one fault row
             ...                  }
             
         quantizer: Class or List. 
@@ -809,124 +857,55 @@ class mac_fault_injector:
         if sim_truncarry is None:
             sim_truncarry=self.sim_truncarry
                     
-        fd_coor=tf.constant(fault_dict['fd_coor'])
+        table=self._fault_table_tensors(fault_dict)
+        fd_coor=table['fd_coor']
         fdoutput_alloc=tf.gather_nd(ofmap,fd_coor)
         
-        param_ofmap=fault_dict['param_ofmap']
-        param_ifmap=fault_dict['param_ifmap']
-        param_wght=fault_dict['param_wght']
-        FI_ofmap=len(param_ofmap)>0
-        FI_ifmap=len(param_ifmap)>0
-        FI_wght=len(param_wght)>0
+        if padding=='same' and layer_type!='Dense':
+            ifmap=self._padding_ifmap(ifmap, ksizes, dilation_rates)
         
-        # ofmap fault
-        if FI_ofmap:
-            # data gathering
-            idx_ofmap=tf.constant(fault_dict['idx_ofmap'])
-            
-            ofmap_alloc=tf.gather_nd(ofmap,idx_ofmap)
-            ofmap_alloc=quantizer_output.left_shift_2int(ofmap_alloc)
-            
-            # check polarity
-            modulator_ofmap=fault_dict['modulator_ofmap']
-            polarity_ofmap=self._polarity_check_type_grouping(ofmap_alloc, *modulator_ofmap)
-            
-        # ifmap fault
-        if FI_ifmap:
-            # data gathering            
-            if padding=='same' and layer_type!='Dense':
-                ifmap=self._padding_ifmap(ifmap, ksizes, dilation_rates)
-            
-            idx_ifmap_ifmap=tf.constant(fault_dict['idx_ifmap_ifmap'])
-            idx_ifmap_wght=tf.constant(fault_dict['idx_ifmap_wght'])
-            
-            ifmap_alloc_i=tf.gather_nd(ifmap,idx_ifmap_ifmap)
-            ifmap_alloc_i=quantizer_input.left_shift_2int(ifmap_alloc_i)
-            ifmap_alloc_w=tf.gather_nd(wght,idx_ifmap_wght)
-            ifmap_alloc_w=quantizer_input.left_shift_2int(ifmap_alloc_w)
-            
-            # check polarity
-            modulator_ifmap=fault_dict['modulator_ifmap']
-            polarity_ifmap=self._polarity_check_type_grouping(ifmap_alloc_i, *modulator_ifmap)
+        # data gathering for all psum indexes
+        ofmap_alloc=quantizer_output.left_shift_2int(tf.gather_nd(ofmap,table['idx_ofmap']))
+        ifmap_alloc=quantizer_input.left_shift_2int(tf.gather_nd(ifmap,table['idx_ifmap']))
+        wght_alloc=quantizer_weight.left_shift_2int(tf.gather_nd(wght,table['idx_wght']))
         
-        # wght fault
-        if FI_wght:
-            if padding=='same' and layer_type!='Dense':
-                if not FI_ifmap:
-                    ifmap=self._padding_ifmap(ifmap, ksizes, dilation_rates)
-                    
-            idx_wght_wght=tf.constant(fault_dict['idx_wght_wght'])
-            idx_wght_ifmap=tf.constant(fault_dict['idx_wght_ifmap'])
-                    
-            wght_alloc_w=tf.gather_nd(wght,idx_wght_wght) 
-            wght_alloc_w=quantizer_weight.left_shift_2int(wght_alloc_w)
-            wght_alloc_i=tf.gather_nd(ifmap,idx_wght_ifmap) 
-            wght_alloc_i=quantizer_weight.left_shift_2int(wght_alloc_i)
-
-            # check polarity
-            modulator_wght=fault_dict['modulator_wght']
-            polarity_wght=self._polarity_check_type_grouping(wght_alloc_w, *modulator_wght)
-            
-        # fault injection
+        # the fault row info of each psum index
+        psidx_row=table['psidx_row']
+        param_code=tf.gather(table['param_code'],psidx_row)
+        modulator=tf.gather(table['modulator'],psidx_row)
+        is_ifmap=tf.equal(param_code,0)
+        is_psum=tf.equal(param_code,2)
         
-        # ofmap fault injection
-        if FI_ofmap:
-            faultbit_ofmap=tf.constant(fault_dict['faultbit_ofmap'])            
-
-            if self.psumfault_handle=='single':
-                psum_alter_ofmap=tf.multiply(polarity_ofmap,faultbit_ofmap)
-            elif self.psumfault_handle=='rand_sum':
-                psum_alter_ofmap=self._rand_sum_polarity_mod(psum_alter_ofmap)
-                psum_alter_ofmap=tf.multiply(polarity_ofmap,faultbit_ofmap)
-                psum_alter_ofmap=tf.reduce_sum(psum_alter_ofmap, axis=1)
-            elif self.psumfault_handle=='direct_sum':
-                psum_alter_ofmap=tf.multiply(polarity_ofmap,faultbit_ofmap)
-                psum_alter_ofmap=tf.reduce_sum(psum_alter_ofmap, axis=1)
-            
-            psum_alter_ofmap=quantizer_output.right_shift_back(psum_alter_ofmap)
-            
-        # ifmap fault injection
-        if FI_ifmap:
-            faultbit_ifmap=tf.constant(fault_dict['faultbit_ifmap'])
-            psum_alter_ifmap=tf.multiply(ifmap_alloc_w, faultbit_ifmap)
-            
-            psum_alter_ifmap=self.mac_math_alter_make(psum_alter_ifmap, 
-                                                      polarity_ifmap, 
-                                                      quantizer_output, 
-                                                      sim_truncarry, 
-                                                      ifmap_alloc_i, 
-                                                      ifmap_alloc_w)
-            
-        # wght fault injection
-        if FI_wght:
-            faultbit_wght=tf.constant(fault_dict['faultbit_wght'])
-            psum_alter_wght=tf.multiply(wght_alloc_i, faultbit_wght)
-            
-            psum_alter_wght=self.mac_math_alter_make(psum_alter_wght, 
-                                                     polarity_wght, 
-                                                     quantizer_output, 
-                                                     sim_truncarry, 
-                                                     wght_alloc_i, 
-                                                     wght_alloc_w)
-            
-        psum_alter=tf.zeros(fault_dict['psum_idx_list_len'])
-
-        if FI_ofmap:
-            param_ofmap=tf.constant(param_ofmap)
-            psum_alter=tf.tensor_scatter_nd_update(psum_alter, param_ofmap, psum_alter_ofmap)
-        if FI_ifmap:
-            param_ifmap=tf.constant(param_ifmap)
-            psum_alter=tf.tensor_scatter_nd_update(psum_alter, param_ifmap, psum_alter_ifmap)
-        if FI_wght:
-            param_wght=tf.constant(param_wght)
-            psum_alter=tf.tensor_scatter_nd_update(psum_alter, param_wght, psum_alter_wght)
-
-        cnt_psidx=fault_dict['cnt_psidx']
-        if cnt_psidx is not None:
-            psum_alter=tf.split(psum_alter,cnt_psidx)
-            for alteritem in psum_alter:
-                alteritem=tf.reduce_sum(alteritem)
-            psum_alter=tf.stack(psum_alter)
+        # check polarity on the faulty param of each psum index
+        FI_param=tf.where(is_ifmap, ifmap_alloc, tf.where(tf.equal(param_code,1), wght_alloc, ofmap_alloc))
+        polarity=self._polarity_check_table(FI_param, modulator, tf.gather(table['signbit'],psidx_row), tf.gather(table['type_code'],psidx_row))
+        if self.psumfault_handle=='rand_sum':
+            polarity=tf.where(is_psum, self._rand_sum_polarity_mod(polarity), polarity)
+        polarity_ofmap=tf.where(is_psum, polarity, tf.zeros_like(polarity))
+        polarity_mac=tf.where(is_psum, tf.zeros_like(polarity), polarity)
+        
+        # the psum indexes are summed on the ofmap pixel of its fault row
+        psidx_coor=tf.gather(table['coor_id'],psidx_row)
+        n_coor=tf.shape(fd_coor)[0]
+        
+        # psum fault injection
+        psum_alter_ofmap=tf.multiply(polarity_ofmap,modulator)
+        psum_alter_ofmap=tf.math.unsorted_segment_sum(psum_alter_ofmap, psidx_coor, n_coor)
+        psum_alter_ofmap=quantizer_output.right_shift_back(psum_alter_ofmap)
+        
+        # ifmap and wght fault injection, the product of the other operand and fault bit
+        psum_alter_mac=tf.multiply(tf.where(is_ifmap, wght_alloc, ifmap_alloc), modulator)
+        psum_alter_mac=self.mac_math_alter_make(psum_alter_mac, 
+                                                polarity_mac, 
+                                                quantizer_output, 
+                                                sim_truncarry, 
+                                                ifmap_alloc, 
+                                                wght_alloc,
+                                                segment_ids=psidx_coor,
+                                                num_segments=n_coor)
+        
+        psum_alter=tf.add(psum_alter_ofmap, psum_alter_mac)
+        if fault_dict['multi_fault']:
             psum_alter=quantizer_output.quantize(psum_alter)
         
         # add psum_alter back to ofmap
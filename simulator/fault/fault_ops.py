@@ -8,8 +8,10 @@ inject stuck at fault during model build phase
 
 """
 
+import numpy as np
 import tensorflow as tf
-from .fault_core import generate_single_stuck_at_fault, generate_multiple_stuck_at_fault, generate_tensor_modulator
+from .fault_core import generate_single_stuck_at_fault, generate_multiple_stuck_at_fault, generate_tensor_modulator, generate_sparse_modulator, sparse_modulator
+from .fault_table import fault_table
 
 def _check_fault_dict(data, fault_dict):
     """Check the fault dictionary is valid for the data or not.
@@ -45,6 +47,15 @@ def _check_fault_modulator(data, fault_modulator):
                 
     return fault_modulator
 
+def _check_sparse_modulator(data, fault_modulator):
+    """Check the sparse fault modulator is valid for the data or not.
+        If not, raise error.
+    """
+    if len(fault_modulator.shape)!=len(data.shape) or tuple(data.shape[1:])!=fault_modulator.shape[1:]:
+        raise ValueError('sparse fault modulator must have the same shape as data. Expect %s but get %s'%(str(data.shape),str(fault_modulator.shape)))
+        
+    return fault_modulator
+
 def inject_layer_sa_fault_nparray(data_in, fault_dict, quantizer):
     """ Inject fault dictionary to numpy array.
 
@@ -52,7 +63,7 @@ def inject_layer_sa_fault_nparray(data_in, fault_dict, quantizer):
     ---------
     data_in: Ndarray. 
         The variable to be injected fault.
-    fault_dict: Dictionary. 
+    fault_dict: Dictionary or fault_table. 
         The dictionary contain fault list information.
     quantizer: Class. 
         | The quantizer class contain following quantize operation infromation.
@@ -65,6 +76,8 @@ def inject_layer_sa_fault_nparray(data_in, fault_dict, quantizer):
     The faulty numpy array.
     """
     data=data_in
+    if isinstance(fault_dict,fault_table):
+        fault_dict=fault_dict.to_dict()
     _check_fault_dict(data,fault_dict)
     for key in fault_dict.keys():
         if not isinstance(fault_dict[key]['SA_bit'],list):
@@ -74,46 +87,302 @@ def inject_layer_sa_fault_nparray(data_in, fault_dict, quantizer):
             
     return data
 
-def inject_layer_sa_fault_tensor(data, fault_list, quantizer):
+def _inject_modulator(data, tensor_modulator0, tensor_modulator1, tensor_modulatorF, quantizer, n_scenario=None, is_fmap=True, quantize=False):
+    """ Apply the SA0, SA1, bit-flip modulators to Tensor. 
+        For modulators with leading scenario axis, the fmap data batch is splitted into scenarios
+        and the weight data is broadcasted to scenarios.
+        If quantize, the data is not quantized yet. Quantize and inject with the fused kernel of quantizer.
+    """
+    if n_scenario is not None and is_fmap:
+        data_shape=tf.shape(data)
+        data=tf.reshape(data,tf.concat([[n_scenario,-1],data_shape[1:]],0))
+    
+    if quantize:
+        data=quantizer.quantize_and_inject(data, tensor_modulator0, tensor_modulator1, tensor_modulatorF)
+    else:
+        data=quantizer.left_shift_2int(data)
+        if tensor_modulator0 is not None:
+            data=tf.bitwise.bitwise_and(data,tensor_modulator0)
+        if tensor_modulator1 is not None:
+            data=tf.bitwise.bitwise_or(data,tensor_modulator1)
+        if tensor_modulatorF is not None:
+            data=tf.bitwise.bitwise_xor(data,tensor_modulatorF)
+        data=quantizer.right_shift_back(data)
+        
+    if n_scenario is not None and is_fmap:
+        data=tf.reshape(data,data_shape)
+    
+    return data
+
+def _inject_sparse_modulator(data, fault_modulator, quantizer):
+    """ Apply the sparse SA0, SA1, bit-flip modulator to Tensor. 
+        Only gather the faulty parameters, inject fault and scatter them back.
+        The faults out of data batch are dropped.
+    """
+    coor=tf.constant(fault_modulator.coor)
+    modulator0=tf.constant(fault_modulator.modulator0)
+    modulator1=tf.constant(fault_modulator.modulator1)
+    modulatorF=tf.constant(fault_modulator.modulatorF)
+    
+    in_batch=tf.less(coor[:,0],tf.cast(tf.shape(data)[0],tf.int64))
+    coor=tf.boolean_mask(coor,in_batch)
+    
+    fault_value=tf.gather_nd(data,coor)
+    fault_value=quantizer.left_shift_2int(fault_value)
+    fault_value=tf.bitwise.bitwise_and(fault_value,tf.boolean_mask(modulator0,in_batch))
+    fault_value=tf.bitwise.bitwise_or(fault_value,tf.boolean_mask(modulator1,in_batch))
+    fault_value=tf.bitwise.bitwise_xor(fault_value,tf.boolean_mask(modulatorF,in_batch))
+    fault_value=quantizer.right_shift_back(fault_value)
+    
+    return tf.tensor_scatter_nd_update(data,coor,fault_value)
+
+def inject_layer_sa_fault_tensor(data, fault_list, quantizer, n_scenario=None, is_fmap=True):
     """ Inject fault dictionary to Tensor.
 
     Arguments
     ---------
     data: Tensor. 
         The Tensor to be injected fault.
-    fault_list: Dictionary or List. 
-        The dictionary contain fault list information. Or the list of fault modulator [modulator0, modulator1, modulatorF].
+    fault_list: Dictionary or fault_table or List or sparse_modulator or fault_modulator_slot. 
+        | The dictionary contain fault list information. Or the columnar fault_table. Or the list of fault modulator [modulator0, modulator1, modulatorF].
+        | Or the sparse_modulator only holds fault coordinates and bit masks. Or the fault_modulator_slot which holds swappable modulators.
+        | The fault dictionary, fault_table and sparse_modulator are injected sparsely, only the faulty parameters are gathered and scattered back.
     quantizer: Class. 
         | The quantizer class contain following quantize operation infromation.
         | word_width: Variable. The fix-point representation of the parameter word length.
         | fractional_bits: Variable. Number of fractional bits in a fix-point parameter
         | rounding: String. Rounding method of quantization, argument must be one of 'nearest' , 'down', 'zero', 'stochastic'.
+    n_scenario: Integer. Default is None.
+        | The number of fault scenarios stacked on the leading axis of fault modulators. Only for the list of fault modulator.
+        | For feature map, the data batch is n_scenario times of the modulator batch. The scenarios are concatenated on batch axis.
+        | For weight, the faulty data will have a leading scenario axis.
+    is_fmap: Bool. Default is True.
+        The data is feature map (have batch axis) or weight. Only used when n_scenario is not None.
 
     Returns
     -------
     The faulty Tensor.
     """
-    if isinstance(fault_list,dict):
-        fault_list=_check_fault_dict(data,fault_list)
-        tensor_modulator0,tensor_modulator1,tensor_modulatorF=generate_tensor_modulator(data.shape,quantizer.nb,quantizer.fb,fault_list)
+    if isinstance(fault_list,fault_modulator_slot):
+        return fault_list.inject(data, quantizer)
+    
+    if n_scenario is not None:
+        if not isinstance(fault_list,list) or len(fault_list)!=3:
+            raise ValueError('Fault scenarios must be the list of stacked fault modulator [modulator0, modulator1, modulatorF].')
+        tensor_modulator0,tensor_modulator1,tensor_modulatorF=[None if modulator is None else tf.constant(modulator) for modulator in fault_list]
+        return _inject_modulator(data, tensor_modulator0, tensor_modulator1, tensor_modulatorF, quantizer, n_scenario=n_scenario, is_fmap=is_fmap)
+    
+    if isinstance(fault_list,(dict,fault_table)):
+        if isinstance(fault_list,fault_table):
+            fault_list=fault_list.check_shape(data.shape)
+        else:
+            fault_list=_check_fault_dict(data,fault_list)
+        fault_list=generate_sparse_modulator(data.shape,quantizer.nb,quantizer.fb,fault_list)
+        if fault_list is None:
+            return data
+        return _inject_sparse_modulator(data, fault_list, quantizer)
+    elif isinstance(fault_list,sparse_modulator):
+        fault_list=_check_sparse_modulator(data, fault_list)
+        return _inject_sparse_modulator(data, fault_list, quantizer)
     elif isinstance(fault_list,list):
         fault_list=_check_fault_modulator(data, fault_list)
         tensor_modulator0=fault_list[0]
         tensor_modulator1=fault_list[1]
         tensor_modulatorF=fault_list[2]
         
-    data=quantizer.left_shift_2int(data)
-    
     if tensor_modulator0 is not None:
         tensor_modulator0=tf.constant(tensor_modulator0)
-        data=tf.bitwise.bitwise_and(data,tensor_modulator0)
     if tensor_modulator1 is not None:
         tensor_modulator1=tf.constant(tensor_modulator1)
-        data=tf.bitwise.bitwise_or(data,tensor_modulator1)
     if tensor_modulatorF is not None:
         tensor_modulatorF=tf.constant(tensor_modulatorF)
-        data=tf.bitwise.bitwise_xor(data,tensor_modulatorF)        
 
-    data=quantizer.right_shift_back(data)
+    return _inject_modulator(data, tensor_modulator0, tensor_modulator1, tensor_modulatorF, quantizer)
+
+def quantize_inject_layer_sa_fault_tensor(data, fault_list, quantizer, n_scenario=None, is_fmap=True):
+    """ Quantize Tensor and inject fault.
+        If the quantizer has fused_inject and the fault is modulator list or fault_modulator_slot, 
+        the quantization and injection are done in integer domain in one fused kernel.
+        Otherwise, quantize the Tensor then inject_layer_sa_fault_tensor. 
+        The arguments are the same as inject_layer_sa_fault_tensor, but data is not quantized yet.
+
+    Returns
+    -------
+    The quantized faulty Tensor.
+    """
+    if fault_list is None:
+        return quantizer.quantize(data)
     
-    return data
+    if getattr(quantizer,'fused_inject',False):
+        if isinstance(fault_list,fault_modulator_slot):
+            return fault_list.inject(data, quantizer, quantize=True)
+        elif isinstance(fault_list,list) and len(fault_list)==3 and n_scenario is not None:
+            tensor_modulators=[None if modulator is None else tf.constant(modulator) for modulator in fault_list]
+            return _inject_modulator(data, *tensor_modulators, quantizer, n_scenario=n_scenario, is_fmap=is_fmap, quantize=True)
+        elif isinstance(fault_list,list):
+            fault_list=_check_fault_modulator(data, fault_list)
+            tensor_modulators=[None if modulator is None else tf.constant(modulator) for modulator in fault_list]
+            return _inject_modulator(data, *tensor_modulators, quantizer, quantize=True)
+    
+    return inject_layer_sa_fault_tensor(quantizer.quantize(data), fault_list, quantizer, n_scenario=n_scenario, is_fmap=is_fmap)
+
+
+class fault_modulator_slot:
+    """ Swappable fault modulator storage of a layer input, weight or output.
+        Hold the SA0, SA1, bit-flip modulators in non-trainable tf.Variable.
+        Pass the slot to Quantized layer as fault injection argument instead of fault dictionary or modulator.
+        The model graph only build once, the fault of each round is swapped by assigning new modulators to the slot.
+        
+        The variables are created lazily at the first time the layer is called, 
+        the data shape of slot is the shape of data being injected. Therefore, the batch size of model must be specified.
+        Before the slot is built (the layer never inject this parameter), the assigned fault will be ignored.
+        
+        For batched multi-round fault injection, the slot holds n_scenario stacked modulators on leading axis.
+        The model batch size is n_scenario times of the original batch size, and the input batch is repeated for every scenario.
+        The feature map modulators apply to the scenario batches respectively. 
+        The weight modulators make the faulty weights have a leading scenario axis, 
+        which Quantized layers compute each scenario with its own faulty weights.
+
+    Arguments
+    ---------
+    n_scenario: Integer. Default is None.
+        The number of fault scenarios evaluate in one forward pass. If None, single scenario without leading axis.
+    is_fmap: Bool. Default is True.
+        The slot is for feature map (have batch axis) or weight. Only used when n_scenario is not None.
+
+    Examples
+    --------
+    ```python
+    
+        slot=fault_modulator_slot()
+        model=quantized_lenet5(ifmap_fault_dict_list=[None,slot,None,None,None,None,None,None], ...)
+        slot.assign(fault_dict) # or [modulator0, modulator1, modulatorF]
+        model.predict(x_test)
+        slot.reset()
+        
+    ```
+    """
+    def __init__(self, n_scenario=None, is_fmap=True):
+        """ Fault modulator slot initializer """
+        self.n_scenario=n_scenario
+        self.is_fmap=is_fmap
+        self.data_shape=None
+        self.shape=None
+        self.quantizer=None
+        self.modulator0=None
+        self.modulator1=None
+        self.modulatorF=None
+        self.clean=True
+        
+    @property
+    def built(self):
+        return self.modulator0 is not None
+        
+    def build(self, shape, quantizer):
+        """ Create the modulator variables with fault free value. """
+        if not shape.is_fully_defined():
+            raise ValueError('The fault modulator slot needs fully defined data shape, but got %s. Please specify the batch size of model.'%str(shape))
+        
+        shape=tuple(shape.as_list())
+        if self.n_scenario is None:
+            self.data_shape=shape
+            self.shape=shape
+        elif self.is_fmap:
+            if shape[0]%self.n_scenario!=0:
+                raise ValueError('The batch size %d of data must be multiple of number of scenarios %d.'%(shape[0],self.n_scenario))
+            self.data_shape=(shape[0]//self.n_scenario,)+shape[1:]
+            self.shape=(self.n_scenario,)+self.data_shape
+        else:
+            self.data_shape=shape
+            self.shape=(self.n_scenario,)+self.data_shape
+            
+        self.quantizer=quantizer
+        with tf.init_scope():
+            self.modulator0=tf.Variable(-np.ones(self.shape,dtype=np.int32),trainable=False,name='modulator0')
+            self.modulator1=tf.Variable(np.zeros(self.shape,dtype=np.int32),trainable=False,name='modulator1')
+            self.modulatorF=tf.Variable(np.zeros(self.shape,dtype=np.int32),trainable=False,name='modulatorF')
+        self.clean=True
+            
+    def reset(self):
+        """ Set the modulators back to fault free state. """
+        if not self.built or self.clean:
+            return
+        
+        self.modulator0.assign(-np.ones(self.shape,dtype=np.int32))
+        self.modulator1.assign(np.zeros(self.shape,dtype=np.int32))
+        self.modulatorF.assign(np.zeros(self.shape,dtype=np.int32))
+        self.clean=True
+        
+    def _make_modulator(self, fault_list):
+        """ Convert the fault dictionary, sparse modulator or modulator list of a scenario to modulator list. """
+        if fault_list is None:
+            return [None,None,None]
+        elif isinstance(fault_list,dict):
+            fault_list=_check_fault_dict(tf.TensorSpec(self.data_shape),fault_list)
+            return generate_tensor_modulator(self.data_shape,self.quantizer.nb,self.quantizer.fb,fault_list)
+        elif isinstance(fault_list,fault_table):
+            fault_list=fault_list.check_shape(self.data_shape)
+            return generate_tensor_modulator(self.data_shape,self.quantizer.nb,self.quantizer.fb,fault_list)
+        elif isinstance(fault_list,list):
+            return _check_fault_modulator(tf.TensorSpec(self.data_shape),list(fault_list))
+        elif isinstance(fault_list,sparse_modulator):
+            fault_list=_check_sparse_modulator(tf.TensorSpec(self.data_shape),fault_list)
+            in_batch=fault_list.coor[:,0]<self.data_shape[0]
+            fault_list=sparse_modulator(self.data_shape,
+                                        fault_list.coor[in_batch],
+                                        fault_list.modulator0[in_batch],
+                                        fault_list.modulator1[in_batch],
+                                        fault_list.modulatorF[in_batch])
+            return fault_list.to_dense()
+        else:
+            raise TypeError('fault_list must be fault dictionary, fault_table, sparse_modulator or list of fault modulator [modulator0, modulator1, modulatorF].')
+        
+    def assign(self, fault_list):
+        """ Swap in the fault of new round.
+
+        Arguments
+        ---------
+        fault_list: Dictionary or fault_table or List or sparse_modulator or None. 
+            | The dictionary contain fault list information. Or the list of fault modulator [modulator0, modulator1, modulatorF].
+            | Or the fault_table or sparse_modulator. If None, reset the slot to fault free.
+            | If n_scenario is not None, the List of (Dictionary or List or None) for each scenario.
+        """
+        if not self.built:
+            return
+        if fault_list is None:
+            self.reset()
+            return
+        
+        if self.n_scenario is None:
+            modulators=self._make_modulator(fault_list)
+        else:
+            if not isinstance(fault_list,list) or len(fault_list)>self.n_scenario:
+                raise ValueError('The fault of scenarios must be a list with length less than or equal to %d.'%self.n_scenario)
+            modulators=[None,None,None]
+            fill_value=[-1,0,0]
+            for scenario,fault_scenario in enumerate(fault_list):
+                modulator_scenario=self._make_modulator(fault_scenario)
+                for i in range(3):
+                    if modulator_scenario[i] is None:
+                        continue
+                    if modulators[i] is None:
+                        modulators[i]=np.full(self.shape,fill_value[i],dtype=np.int32)
+                    modulators[i][scenario]=modulator_scenario[i]
+        
+        self.reset()
+        for modulator,variable in zip(modulators,[self.modulator0,self.modulator1,self.modulatorF]):
+            if modulator is not None:
+                variable.assign(modulator)
+                self.clean=False
+                
+    def inject(self, data, quantizer, quantize=False):
+        """ Inject the fault modulators in slot to Tensor. If quantize, quantize and inject with the fused kernel. """
+        if not self.built:
+            self.build(data.shape, quantizer)
+        
+        modulators=[self.modulator0, self.modulator1, self.modulatorF]
+        if self.n_scenario is None and self.is_fmap:
+            # the last batch of dataset may be smaller than model batch size
+            modulators=[modulator[:tf.shape(data)[0]] for modulator in modulators]
+            
+        return _inject_modulator(data, *modulators, quantizer, n_scenario=self.n_scenario, is_fmap=self.is_fmap, quantize=quantize)
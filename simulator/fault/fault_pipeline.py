@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:05:27 2026
+
+@author: Yung-Yu Tsai
+
+Producer/consumer fault generation pipeline. Generate the fault of upcoming rounds in worker processes while the current round is under inference.
+"""
+
+import collections
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tensorflow.keras.models import Model
+from .fault_list import generate_model_stuck_fault
+from .fault_rng import round_rng
+from ..models.model_mods import pseudo_model, model_shape_index, make_ref_model
+
+def _generate_round(gen_func, fault_gen_param, rng):
+    """ The job of worker process. Generate the fault of one round with its own random stream. """
+    if rng is not None:
+        fault_gen_param=dict(fault_gen_param, rng=rng)
+    return gen_func( **fault_gen_param)
+
+class fault_generation_pipeline:
+    """ The fault generation pipeline which overlap fault generation with inference.
+
+        A ProcessPoolExecutor pool generate the fault dict lists (or modulators) of upcoming rounds into a bounded queue.
+        The consumer iterate through the rounds in order, at most prefetch rounds are generated ahead of the consumer.
+        Every round draws from an independent random stream round_rng(seed, fault_rate, round_num),
+        thus the generated faults do not depend on which worker generate the round.
+
+        The Keras model in fault_gen_param is replaced by a picklable model_shape_index before sending to workers.
+
+    Arguments
+    ---------
+    fault_gen_param: Dictionary.
+        The argument for fault generation function. Should be picklable except the Keras model.
+    n_round: Integer.
+        Number of rounds to generate.
+    n_worker: Integer. Default is None.
+        | Number of worker processes. If None, use the number of CPUs.
+        | If 0, generate in the current process serially. No prefetch, no overlapping with inference.
+    prefetch: Integer. Default is 2.
+        The number of rounds to be generated ahead of the consumer, the depth of the bounded queue.
+    seed: Integer or numpy.random.SeedSequence. Default is None.
+        | The campaign seed. If None, use fresh entropy from OS for each pipeline.
+        | For n_worker=0 and seed=None, the global numpy random state is used as is.
+    gen_func: Callable. Default is generate_model_stuck_fault.
+        The fault generation function. Must be picklable (module level function) and take the rng argument.
+    mp_context: multiprocessing context. Default is None.
+        | The multiprocessing context of the ProcessPoolExecutor. If None, use multiprocessing.get_context('spawn').
+        | Fork is not the default, forking a process which already initialized the TF runtime may deadlock the workers.
+        | With spawn or forkserver, the calling script must be guarded by if __name__=='__main__'.
+
+    Example
+    -------
+    >>> pipeline=fault_generation_pipeline(param, n_round=200, n_worker=4, prefetch=4, seed=0)
+    >>> for round_num,(ifmap_fdl,ofmap_fdl,weight_fdl) in pipeline:
+    >>>     campaign.run_round(ifmap_fdl,ofmap_fdl,weight_fdl)
+
+    """
+    def __init__(self,
+                 fault_gen_param,
+                 n_round,
+                 n_worker=None,
+                 prefetch=2,
+                 seed=None,
+                 gen_func=generate_model_stuck_fault,
+                 mp_context=None):
+        if prefetch<1:
+            raise ValueError('prefetch must be at least 1, but got %d.'%prefetch)
+        self.fault_gen_param=self._picklable_param(fault_gen_param)
+        self.n_round=n_round
+        self.n_worker=n_worker
+        self.prefetch=prefetch
+        self.gen_func=gen_func
+        if mp_context is None:
+            mp_context=multiprocessing.get_context('spawn')
+        self.mp_context=mp_context
+
+        if n_worker!=0 and seed is None:
+            seed=np.random.SeedSequence().entropy
+        self.seed=seed
+
+    def _picklable_param(self, fault_gen_param):
+        """ Replace the model in fault generation parameter with its picklable shape index. """
+        fault_gen_param=dict(fault_gen_param)
+        model=fault_gen_param.get('model')
+        if isinstance(model,(Model,pseudo_model)) and not isinstance(model,model_shape_index):
+            if 'batch_size' in fault_gen_param and 'model_word_length' in fault_gen_param:
+                fault_gen_param['model']=model_shape_index(model,fault_gen_param['batch_size'],fault_gen_param['model_word_length'])
+            elif isinstance(model,Model):
+                fault_gen_param['model']=make_ref_model(model)
+        return fault_gen_param
+
+    def _round_rng(self, round_num):
+        if self.seed is None:
+            return None
+        return round_rng(self.seed, self.fault_gen_param.get('fault_rate',0.0), round_num)
+
+    def __len__(self):
+        return self.n_round
+
+    def __iter__(self):
+        """ Yield (round_num, generated fault) in round order. """
+        if self.n_worker==0:
+            for round_num in range(self.n_round):
+                yield round_num, _generate_round(self.gen_func, self.fault_gen_param, self._round_rng(round_num))
+            return
+
+        executor=ProcessPoolExecutor(max_workers=self.n_worker, mp_context=self.mp_context)
+        pending=collections.deque()
+        next_round=0
+        try:
+            while pending or next_round<self.n_round:
+                # keep the queue filled to prefetch depth before waiting on the head
+                while next_round<self.n_round and len(pending)<self.prefetch:
+                    pending.append(executor.submit(_generate_round, self.gen_func, self.fault_gen_param, self._round_rng(next_round)))
+                    next_round+=1
+
+                round_num=next_round-len(pending)
+                fault=pending.popleft().result()
+                # refill before handing the round to consumer, the workers run while the consumer does inference
+                if next_round<self.n_round:
+                    pending.append(executor.submit(_generate_round, self.gen_func, self.fault_gen_param, self._round_rng(next_round)))
+                    next_round+=1
+                yield round_num, fault
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def generate_round(self, round_num):
+        """ Regenerate the fault of a single round in the current process.
+            With a given seed, the result is identical to the round generated by pipeline.
+        """
+        return _generate_round(self.gen_func, self.fault_gen_param, self._round_rng(round_num))
+
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:16:40 2026
+
+@author: Yung-Yu Tsai
+
+Seedable random streams for fault generation.
+The fault of round i with fault rate r is a pure function of (campaign seed, r, i).
+"""
+
+import numpy as np
+
+def get_random_state(rng=None):
+    """ Get the random state used by the fault generators.
+
+    Arguments
+    ---------
+    rng: None, Integer, numpy.random.SeedSequence, numpy.random.Generator or numpy.random.RandomState. Default is None.
+        | If None, use the global numpy random state (np.random).
+        | If Integer or SeedSequence, make a new random state seeded by it.
+        | If Generator, wrap its bit generator. The Generator and the returned random state share the same stream.
+
+    Returns
+    -------
+    The random state with numpy.random.RandomState methods (randint, poisson, normal, uniform, multinomial).
+    """
+    if rng is None or rng is np.random:
+        return np.random
+    if isinstance(rng,np.random.RandomState):
+        return rng
+    if isinstance(rng,np.random.Generator):
+        return np.random.RandomState(rng.bit_generator)
+    return np.random.RandomState(np.random.PCG64(rng))
+
+def round_seed_sequence(seed, fault_rate, round_num):
+    """ The SeedSequence of a fault generation round.
+        The spawn key is derived from the bit pattern of fault_rate and the round number,
+        thus every (fault_rate, round_num) pair has an independent stream, and can be regenerated alone.
+
+    Arguments
+    ---------
+    seed: Integer or numpy.random.SeedSequence.
+        The campaign seed.
+    fault_rate: Float.
+        The bit error rate of the round.
+    round_num: Integer.
+        The index of round.
+
+    Returns
+    -------
+    numpy.random.SeedSequence
+    """
+    if isinstance(seed,np.random.SeedSequence):
+        entropy=seed.entropy
+        spawn_key=tuple(seed.spawn_key)
+    else:
+        entropy=seed
+        spawn_key=tuple()
+    rate_key=int(np.array(fault_rate,dtype=np.float64).view(np.uint64))
+    return np.random.SeedSequence(entropy=entropy, spawn_key=spawn_key+(rate_key & 0xffffffff, rate_key >> 32, int(round_num)))
+
+def round_rng(seed, fault_rate, round_num):
+    """ The random Generator of a fault generation round. Same arguments as round_seed_sequence.
+
+    Returns
+    -------
+    numpy.random.Generator
+    """
+    return np.random.Generator(np.random.PCG64(round_seed_sequence(seed, fault_rate, round_num)))
+
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:11:23 2026
+
+@author: Yung-Yu Tsai
+
+Columnar fault table. One row per faulty bit, the fault information are stored in Ndarray columns instead of per-fault dictionaries.
+
+The fault_table is accepted by the modulator consumers in fault_ops and fault_core (fault_modulator_slot, generate_tensor_modulator,
+generate_sparse_modulator, inject_layer_sa_fault_tensor, inject_layer_sa_fault_nparray), produced by the fault generators with
+return_modulator='table' and by the compiled memory mapping (tile.gen_layer_fault_table, model_memory_mapping).
+The PE array mapping path (tile_PE, PEarray.fd2coorbase, io_data_solver.tile2layer, the mac fault preprocess) and the legacy
+tile.fault_dict_tile2layer still take fault dictionaries, convert at their boundary by from_info_base/to_info_base or from_dict/to_dict.
+"""
+
+import numpy as np
+
+# the enum of stuck-at types, stored as uint8 code in fault table
+SA_TYPES=np.array(['0','1','flip'])
+SA_TYPE_CODE={sa_type:code for code,sa_type in enumerate(SA_TYPES)}
+
+# the enum of PE array fault parameters
+PARAM_TYPES=np.array(['ifmap_in','ifmap_out','wght_in','wght_out','psum_in','psum_out'])
+PARAM_TYPE_CODE={param:code for code,param in enumerate(PARAM_TYPES)}
+
+def _encode(values, code_map, name):
+    """ Encode String or Array of String to uint8 enum code. """
+    values=np.asarray(values)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.uint8)
+    uniq,inverse=np.unique(values,return_inverse=True)
+    try:
+        codes=np.array([code_map[str(value)] for value in uniq],dtype=np.uint8)
+    except KeyError as key:
+        raise ValueError('Invalid %s %s. Must be one of %s.'%(name,str(key),str(list(code_map.keys()))))
+    return np.reshape(codes[inverse],values.shape)
+
+class fault_table:
+    """ The columnar fault table. Each row is a faulty bit.
+        Replace the fault dictionary {coordinate : {'SA_type':..., 'SA_bit':...}} with Ndarray columns,
+        no dictionary is allocated per fault. Multiple faulty bits on the same parameter are multiple rows with the same coordinate.
+
+    Arguments
+    ---------
+    coor: Ndarray or List of Tuple. Shape (number of faults, number of dimensions).
+        The coordinates of faults. Stored as int32.
+    SA_bit: Ndarray or List of Integer. Shape (number of faults,)
+        The faulty bit of each fault. Stored as uint8.
+    SA_type: String or Ndarray.
+        | The stuck-at type '0', '1' or 'flip' of each fault, a String for all faults.
+        | Stored as uint8 code, the index in SA_TYPES.
+    param: String or Ndarray. Default is None.
+        | The PE array fault parameter of each fault, one of PARAM_TYPES. A String for all faults.
+        | Stored as uint8 code, the index in PARAM_TYPES. None if not a PE array fault.
+    id: Ndarray. Default is None.
+        The fault id of each fault, Stored as int64. None if no id.
+    ndim: Integer. Default is None.
+        The number of coordinate dimensions. Only needed when there is no fault.
+
+    Example
+    -------
+    >>> table=fault_table([(0,2,2,6),(3,5,4,2)], [3,7], 'flip')
+    >>> table=fault_table.from_dict(fault_dict)
+    >>> fault_dict=table.to_dict()
+
+    """
+    __slots__=('coor','SA_bit','SA_type','param','id')
+
+    def __init__(self, coor, SA_bit, SA_type, param=None, id=None, ndim=None):
+        """ Fault table initializer """
+        coor=np.asarray(coor,dtype=np.int32)
+        if coor.ndim!=2:
+            if coor.size>0:
+                raise ValueError('coor must have shape (number of faults, number of dimensions), but got %s.'%str(coor.shape))
+            coor=np.zeros((0,0 if ndim is None else ndim),dtype=np.int32)
+        n_fault=len(coor)
+        self.coor=coor
+        self.SA_bit=np.broadcast_to(np.asarray(SA_bit,dtype=np.uint8),(n_fault,)).copy()
+        self.SA_type=np.broadcast_to(_encode(SA_type,SA_TYPE_CODE,'SA_type'),(n_fault,)).copy()
+        self.param=None if param is None else np.broadcast_to(_encode(param,PARAM_TYPE_CODE,'param'),(n_fault,)).copy()
+        self.id=None if id is None else np.broadcast_to(np.asarray(id,dtype=np.int64),(n_fault,)).copy()
+
+    def __len__(self):
+        return len(self.coor)
+
+    def __repr__(self):
+        return 'fault_table(%d faults, %d dimensions)'%(len(self),self.ndim)
+
+    @property
+    def ndim(self):
+        return self.coor.shape[1]
+
+    @property
+    def SA_type_name(self):
+        """ The stuck-at types in String. """
+        return SA_TYPES[self.SA_type]
+
+    @property
+    def param_name(self):
+        """ The PE array fault parameters in String. """
+        if self.param is None:
+            return None
+        return PARAM_TYPES[self.param]
+
+    def select(self, index):
+        """ The sub-table of selected rows. index is a boolean mask or integer indexes. """
+        return fault_table(self.coor[index],
+                           self.SA_bit[index],
+                           self.SA_type[index],
+                           param=None if self.param is None else self.param[index],
+                           id=None if self.id is None else self.id[index],
+                           ndim=self.ndim)
+
+    def unique_coor(self):
+        """ Keep only the last fault of each coordinate, the same as building fault dictionary from the fault list.
+            For the fast generation which doesn't have multiple fault in single parameter.
+        """
+        if len(self)==0:
+            return self
+        numtag=np.ravel_multi_index(self.coor.T.astype(np.int64),tuple(np.max(self.coor,axis=0).astype(np.int64)+1))
+        _,last_idx=np.unique(numtag[::-1],return_index=True)
+        if len(last_idx)==len(self):
+            return self
+        return self.select(np.sort(len(self)-1-last_idx))
+
+    @staticmethod
+    def concatenate(tables):
+        """ Concatenate the rows of fault tables. The param and id columns are kept if all tables have them. """
+        tables=[table for table in tables if table is not None]
+        if len(tables)==0:
+            return None
+        return fault_table(np.concatenate([table.coor for table in tables]),
+                           np.concatenate([table.SA_bit for table in tables]),
+                           np.concatenate([table.SA_type for table in tables]),
+                           param=None if any(table.param is None for table in tables) else np.concatenate([table.param for table in tables]),
+                           id=None if any(table.id is None for table in tables) else np.concatenate([table.id for table in tables]),
+                           ndim=tables[0].ndim)
+
+    def check_shape(self, shape):
+        """ Check the fault coordinates are valid for the data shape, and drop the faults out of data batch.
+            Same as the check of fault dictionary.
+
+        Returns
+        -------
+        The fault_table of faults within data batch.
+        """
+        shape=tuple(shape)
+        if len(self)==0:
+            return self
+        if self.ndim!=len(shape):
+            raise ValueError('fault location has length %d different with data shape %s'%(self.ndim,str(shape)))
+        if self.ndim>1 and np.any(self.coor[:,1:]>=np.array(shape[1:])):
+            raise ValueError('fault location %s is out of data index with shape %s'%(str(tuple(self.coor[np.argmax(np.any(self.coor[:,1:]>=np.array(shape[1:]),axis=1))])),str(shape)))
+        if shape[0] is None:
+            return self
+        in_batch=self.coor[:,0]<shape[0]
+        if np.all(in_batch):
+            return self
+        return self.select(in_batch)
+
+    def modulators(self):
+        """ The per-fault bit masks.
+
+        Returns
+        -------
+        (modulator0, modulator1, modulatorF) Ndarray of int32. The SA0, SA1 and invert bit masks,
+        -1 and 0 is fault free for SA0 and the others respectively.
+        """
+        modulator=np.left_shift(np.ones(len(self),dtype=np.int32),self.SA_bit.astype(np.int32))
+        modulator0=np.where(self.SA_type==SA_TYPE_CODE['0'],np.invert(modulator),np.int32(-1))
+        modulator1=np.where(self.SA_type==SA_TYPE_CODE['1'],modulator,np.int32(0))
+        modulatorF=np.where(self.SA_type==SA_TYPE_CODE['flip'],modulator,np.int32(0))
+        return modulator0,modulator1,modulatorF
+
+    @classmethod
+    def from_dict(cls, fault_dict, ndim=None):
+        """ Convert the legacy fault dictionary to fault_table.
+            Both the coor-based {coordinate : fault info} and info-based {'coor' : coordinates, info : values} layouts are accepted.
+            The list of SA_type and SA_bit on one coordinate are expanded to rows.
+        """
+        if fault_dict is None:
+            return None
+        if 'coor' in fault_dict:
+            return cls.from_info_base(fault_dict)
+        if len(fault_dict)==0:
+            return cls(np.zeros((0,0 if ndim is None else ndim),dtype=np.int32),[],[],ndim=ndim)
+
+        coor=list()
+        SA_bit=list()
+        SA_type=list()
+        param=list()
+        fault_id=list()
+        first_info=next(iter(fault_dict.values()))
+        has_param='param' in first_info
+        has_id='id' in first_info
+        for key,info in fault_dict.items():
+            if isinstance(info['SA_bit'],list):
+                n_bit=len(info['SA_bit'])
+                SA_bit+=info['SA_bit']
+                SA_type+=info['SA_type'] if isinstance(info['SA_type'],list) else [info['SA_type']]*n_bit
+                if has_param:
+                    param+=info['param'] if isinstance(info['param'],list) else [info['param']]*n_bit
+                if has_id:
+                    fault_id+=info['id'] if isinstance(info['id'],list) else [info['id']]*n_bit
+            else:
+                n_bit=1
+                SA_bit.append(info['SA_bit'])
+                SA_type.append(info['SA_type'])
+                if has_param:
+                    param.append(info['param'])
+                if has_id:
+                    fault_id.append(info['id'])
+            coor+=[key]*n_bit
+
+        return cls(coor,SA_bit,SA_type,
+                   param=param if has_param else None,
+                   id=fault_id if has_id else None)
+
+    def to_dict(self):
+        """ Convert to the legacy coor-based fault dictionary {coordinate : {'SA_type':..., 'SA_bit':...}}.
+            The faults on the same coordinate are merged into lists, same as the fault dictionary made by slow generation.
+        """
+        fault_dict=dict()
+        coors=[tuple(coor) for coor in self.coor.tolist()]
+        SA_type=self.SA_type_name.tolist()
+        SA_bit=self.SA_bit.tolist()
+        param=None if self.param is None else self.param_name.tolist()
+        fault_id=None if self.id is None else self.id.tolist()
+        for i,coor in enumerate(coors):
+            if coor in fault_dict:
+                info=fault_dict[coor]
+                if not isinstance(info['SA_bit'],list):
+                    for item in info.keys():
+                        info[item]=[info[item]]
+                info['SA_type'].append(SA_type[i])
+                info['SA_bit'].append(SA_bit[i])
+                if param is not None:
+                    info['param'].append(param[i])
+                if fault_id is not None:
+                    info['id'].append(fault_id[i])
+            else:
+                info={'SA_type':SA_type[i],'SA_bit':SA_bit[i]}
+                if param is not None:
+                    info['param']=param[i]
+                if fault_id is not None:
+                    info['id']=fault_id[i]
+                fault_dict[coor]=info
+        return fault_dict
+
+    @classmethod
+    def from_info_base(cls, fault_dict):
+        """ Convert the info-based fault dictionary {'coor' : Ndarray, 'SA_type' : ..., 'SA_bit' : ..., 'param' : ..., 'id' : ...}
+            of PEarray and tile_PE to fault_table. The id must be one id per fault.
+        """
+        fault_id=fault_dict.get('id')
+        if fault_id is not None:
+            fault_id=np.asarray(fault_id)
+            if fault_id.dtype==object or fault_id.ndim>1:
+                raise ValueError('The info-based fault dictionary with repetitive fault id can not be converted to fault_table.')
+        return cls(fault_dict['coor'],
+                   fault_dict['SA_bit'],
+                   fault_dict['SA_type'],
+                   param=fault_dict.get('param'),
+                   id=fault_id)
+
+    def to_info_base(self):
+        """ Convert to the info-based fault dictionary {'coor' : Ndarray, 'SA_type' : Ndarray, 'SA_bit' : Ndarray, ...} of PEarray and tile_PE. """
+        fault_dict={'coor':self.coor.astype(int),
+                    'SA_type':self.SA_type_name,
+                    'SA_bit':self.SA_bit.astype(int)}
+        if self.param is not None:
+            fault_dict['param']=self.param_name
+        if self.id is not None:
+            fault_dict['id']=self.id
+        return fault_dict
+
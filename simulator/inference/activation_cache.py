@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:05:12 2026
+
+@author: Yung-Yu Tsai
+
+Golden (fault-free) activation cache of test set for resuming inference from faulty layer
+"""
+
+import os
+import hashlib
+import numpy as np
+from .verification import _build_intermediate_model
+from ..metrics.golden_reference import golden_reference_store
+
+class golden_activation_cache:
+    """ The fault-free (golden) layer input activations of the whole test set.
+        The activations are a reference of golden_reference_store, the same on-disk format read by the metrics (FT_metric_setup).
+        Each layer input is the array 'layer_<layer_num>_input_<input_num>' of the reference, the golden model prediction is 'prediction'.
+        The arrays are checksummed in the store index and opened memory-mapped.
+        The reference is reused across runs. The fingerprint of model, quantization, weights and test set is recorded with the reference,
+        the reference is removed and rebuilt when the fingerprint changes. Build with rebuild=True for changes out of the fingerprint.
+
+        The prediction and the layer inputs come from the same inference run, and the golden score is recorded when the labels are given.
+        Thus the reference also serves as the golden reference of metrics by its name.
+
+    Arguments
+    ---------
+    store: String or golden_reference_store.
+        The golden reference store (or its directory).
+    name: String.
+        The name of reference in store.
+
+    Examples
+    --------
+    ```python
+
+        cache=golden_activation_cache('../golden_reference', 'quantized_lenet5')
+        cache.build(model, [(3,0),(6,0)], x=x_test, y=y_test, batch_size=20, weight_name='../mnist_lenet5_weight.h5')
+        fmap=cache.get(3) # the input of model.layers[3]
+
+    ```
+    """
+    def __init__(self, store, name):
+        """ Golden activation cache initializer """
+        if isinstance(store,str):
+            store=golden_reference_store(store)
+        self.store=store
+        self.name=name
+
+    def fingerprint(self, model, x=None, datagen=None, weight_name=None):
+        """ The identity of model, weights and test set that the cached activations are made from.
+            The test set is identified by the digest of evenly spaced samples of x, or the file names of datagen.
+
+        Returns
+        -------
+        Dictionary. {'model' : model name, 'weights' : weights file path, 'weights_mtime' : weights file modified time,
+        'quantization' : [quant_mode, [[nb, fb, rounding_method, overflow_mode] of quantizers]] of quantized layers in order,
+        'n_sample' : number of test samples, 'input_shape' : input shape of a sample, 'data_digest' : sha256 of test set}
+        """
+        digest=hashlib.sha256()
+        if x is not None:
+            n_sample=len(x)
+            input_shape=np.shape(x)[1:]
+            sample_idx=np.unique(np.linspace(0,n_sample-1,num=min(n_sample,64)).astype(int))
+            sample=np.ascontiguousarray(x[sample_idx])
+            digest.update(sample.dtype.str.encode())
+            digest.update(sample.tobytes())
+        else:
+            n_sample=datagen.n
+            input_shape=getattr(datagen,'image_shape',None)
+            digest.update(str(getattr(datagen,'directory','')).encode())
+            digest.update('\n'.join(getattr(datagen,'filenames',[])).encode())
+
+        quantization=list()
+        for layer in model.layers:
+            if not hasattr(layer,'quantizer'):
+                continue
+            quantizers=layer.quantizer if isinstance(layer.quantizer,list) else [layer.quantizer]
+            quantization.append([getattr(layer,'quant_mode',None),
+                                 [[int(q.nb),int(q.fb),q.rounding_method,bool(q.overflow_mode)] for q in quantizers]])
+
+        return {'model':model.name,
+                'weights':None if weight_name is None else os.path.abspath(weight_name),
+                'weights_mtime':None if weight_name is None else os.path.getmtime(weight_name),
+                'quantization':quantization,
+                'n_sample':int(n_sample),
+                'input_shape':None if input_shape is None else [int(dim) for dim in input_shape],
+                'data_digest':digest.hexdigest()}
+
+    def load_fingerprint(self):
+        """ The fingerprint of cached activations. None if there is no fingerprint. """
+        if not self.store.has(self.name):
+            return None
+        return self.store.get_fingerprint(self.name)
+
+    def clear(self):
+        """ Remove the reference and its files from store. """
+        if self.store.has(self.name):
+            self.store.remove(self.name)
+
+    def _array_name(self, layer_num, input_num=0):
+        if layer_num is None:
+            return 'prediction'
+        return 'layer_%d_input_%d'%(layer_num,input_num)
+
+    def has(self, layer_num, input_num=0):
+        """ Whether the input_num-th input of layer layer_num is cached. Layer None for model prediction. """
+        return self.store.has_array(self.name, self._array_name(layer_num, input_num))
+
+    def get(self, layer_num, input_num=0):
+        """ Get the memory-mapped golden input of layer. Layer None for model prediction.
+
+        Returns
+        -------
+        Ndarray (numpy.memmap)
+            The golden activation with shape (number of test samples, ...).
+        """
+        if not self.has(layer_num, input_num):
+            raise ValueError('Layer %s input %d is not in golden activation cache %s of store %s.'%(str(layer_num),input_num,self.name,self.store.store_dir))
+        if layer_num is None:
+            return self.store.get_prediction(self.name)
+        return self.store.get_layer_input(self.name, layer_num, input_num)
+
+    def get_prediction(self):
+        """ Get the memory-mapped golden model prediction. """
+        return self.get(None)
+
+    def build(self, model, cut_list, x=None, y=None, datagen=None, batch_size=None, weight_name=None, rebuild=False, verbose=0):
+        """ Run the fault-free inference once and write the golden layer inputs and prediction to the store.
+            The existing reference is removed if its fingerprint doesn't match the model, weights and test set.
+
+        Arguments
+        ---------
+        model: Keras Model.
+            The fault-free model.
+        cut_list: List of Tuple.
+            The (layer_num, input_num) of layer inputs to be cached.
+        x: Ndarray. Default is None.
+            The test set input data.
+        y: Ndarray. Default is None.
+            The one-hot test set label for the golden score recorded with prediction.
+        datagen: Keras DataIterator. Default is None.
+            The test set data generator, used when x is None.
+        batch_size: Integer. Default is None.
+            The batch size of inference on x.
+        weight_name: String. Default is None.
+            The weights file loaded into model, its path and modified time are in the cache fingerprint.
+        rebuild: Bool. Default is False.
+            Rebuild the existing cache arrays or not.
+        verbose: Integer. Default is 0.
+            Print progress or not.
+        """
+        fingerprint=self.fingerprint(model, x=x, datagen=datagen, weight_name=weight_name)
+        if self.load_fingerprint()!=fingerprint:
+            if verbose>0 and self.load_fingerprint() is not None:
+                print('golden activation cache %s is made from different model, quantization, weights or test set, rebuild.'%self.name)
+            self.clear()
+
+        cut_list=sorted(set(cut_list))
+        if not rebuild:
+            cut_list=[cut for cut in cut_list if not self.has(*cut)]
+        build_prediction=rebuild or not self.has(None)
+        if len(cut_list)==0 and not build_prediction:
+            return
+
+        observe_layer_idxs=sorted(set([layer_num for layer_num,_ in cut_list]))
+        intermediate_model=_build_intermediate_model(model, observe_layer_idxs, include_output=True)
+
+        if x is not None:
+            n_sample=len(x)
+            n_batch=int(np.ceil(n_sample/batch_size))
+        else:
+            n_sample=datagen.n
+            n_batch=len(datagen)
+
+        def batches():
+            for i in range(n_batch):
+                if verbose>0:
+                    print('\rbuilding golden activation cache batch %d/%d'%(i+1,n_batch),end='')
+                if x is not None:
+                    x_batch=x[i*batch_size:(i+1)*batch_size]
+                else:
+                    x_batch=datagen[i][0]
+
+                outputs=intermediate_model.predict_on_batch(x_batch)
+                if len(observe_layer_idxs)==0:
+                    outputs=[outputs]
+                batch=dict()
+                for layer_num,layer_inputs in zip(observe_layer_idxs,outputs[:-1]):
+                    if not isinstance(layer_inputs,list):
+                        layer_inputs=[layer_inputs]
+                    for input_num,data in enumerate(layer_inputs):
+                        if (layer_num,input_num) in cut_list:
+                            batch[self._array_name(layer_num,input_num)]=np.asarray(data)
+                if build_prediction:
+                    batch[self._array_name(None)]=np.asarray(outputs[-1])
+                yield batch
+            if verbose>0:
+                print('')
+
+        # the arrays are committed to store after finish writing, an interrupted build won't leave incomplete cache arrays
+        self.store.update(self.name, batches(), n_sample, y=y if build_prediction else None, fingerprint=fingerprint)
@@ -0,0 +1,684 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 10:21:36 2026
+
+@author: Yung-Yu Tsai
+
+Persistent fault campaign. Build and load the quantized model once, swap the faults between rounds.
+"""
+
+import os, time
+import numpy as np
+import tensorflow as tf
+import tensorflow.keras.backend as K
+from tensorflow.keras.utils import to_categorical
+from ..utils_tool.dataset_setup import dataset_setup
+from ..fault.fault_ops import fault_modulator_slot
+from ..fault.fault_pipeline import fault_generation_pipeline
+from ..models.model_mods import make_ref_model, make_resume_model, set_frozen_weights
+from ..models.layer_shape import get_layer_weight_shape
+from .evaluate import FT_metric_accumulator
+from .activation_cache import golden_activation_cache
+from .scheme import _make_result_row, _write_result_row
+
+class fault_campaign:
+    """ The fault injection campaign engine which build the model only once.
+
+        Unlike inference_scheme rebuild the model, reload weights and recompile for every round,
+        the campaign build the quantized model with fault_modulator_slot on every layer input, weight and output.
+        The fault of each round is swapped into the slots (non-trainable tf.Variable modulators).
+        Thus there is no graph rebuild between rounds.
+
+        Support the SA fault dictionary and fault modulator list generated by generate_model_stuck_fault.
+        MAC unit fault (mac_unit argument of model) is not swappable and should use inference_scheme.
+        
+        With n_scenario given, K=n_scenario fault rounds are evaluated in one forward pass (batched multi-round).
+        The model is built with batch size K*batch_size, each input batch is repeated K times, 
+        and the slots hold K stacked fault scenarios. This trades memory for fewer small kernel launches.
+        
+        With golden_cache_dir given, the fault-free layer inputs of the test set are cached on disk (golden_activation_cache),
+        as the reference golden_name of the golden_reference_store in golden_cache_dir. The FT metrics read the same store.
+        Each round resumes inference from its first faulty layer with the cached golden activations, 
+        the fault-free prefix of the model is not recomputed. A round without fault takes the golden prediction directly.
+        
+        With early_exit, the inference of a round stops after its last faulty layer. The activations are compared 
+        with the golden activations per sample. The samples bit-identical to golden run take the golden prediction,
+        only the other samples continue the rest of model (fault free). The compute scales with the unmasked samples.
+        
+        With frozen_weights, the quantized faulty weights of each layer are computed once per round when the fault is swapped in, 
+        and cached in variables (set_frozen_weights). The batches of a round skip the weight quantization and injection.
+
+    Arguments
+    ---------
+    model_func: The callable function which returns a DNN model.
+        (Keras funtional model API recommmanded).
+    model_argument: Dictionary.
+        The arguments for DNN model function. The fault dict lists in it will be replaced by modulator slots.
+        The 'batch_size' must be specified for the modulator shape.
+    compile_argument: Dictionary.
+        The arguments for model compile argument.
+    dataset_argument: Dictionary.
+        The arguments for dataset setup.
+    weight_load_name: String. Default is None.
+        | The weight file to load. (if weight_load is not None)
+        | If None, don't need to load weight proccess outside model_func.
+    FT_evaluate_argument: Dictionary. Default is None.
+        | The arguments for fault tolerance analysis. (if FT_evaluate is True) Doing fault tolerance analysis.
+        | If None, using model.evaluate for only have loss, accuracy and top-k accuracy.
+    ref_model: pseudo_model. Default is None.
+        | The reference model made by make_ref_model for model depth and layer weights information.
+        | If None, build a reference model from model_func.
+    n_scenario: Integer. Default is None.
+        | The number of fault rounds evaluate in one forward pass. If None, evaluate one round per pass.
+        | Batched multi-round requires FT_evaluate_argument, since the prediction is split by scenarios.
+    golden_cache_dir: String. Default is None.
+        | The directory of golden_reference_store for golden activation cache. If None, every round runs the whole model.
+        | Resume from faulty layer requires FT_evaluate_argument.
+        | If FT_evaluate_argument has no golden_store, the metrics use this store, thus a reference named its model_name is the metric baseline.
+    golden_name: String. Default is None.
+        | The reference name of golden activation cache in store. If None, use the model name.
+        | Name it the model_name of FT_evaluate_argument to take the cached golden prediction and score as the metric baseline.
+    early_exit: Bool. Default is False.
+        | Prune the samples whose activations after the last faulty layer are identical to golden run. 
+        | Requires golden_cache_dir.
+    frozen_weights: Bool. Default is False.
+        | Compute the quantized faulty weights once per round instead of every batch. 
+        | Only takes effect on the layers with 'hybrid' or 'intrinsic' quant_mode.
+    verbose: Integer. Default 4.
+        | The verbosity of campaign printing information max 8 (print all info), min 0 (print nothing).
+        | The verbosity level is the same as inference_scheme.
+
+    Examples
+    --------
+    ```python
+
+        campaign=fault_campaign(quantized_lenet5,
+                                {'nbits':8,'fbits':3,'batch_size':20,'quant_mode':'hybrid'},
+                                compile_argument,
+                                {'dataset':'mnist'},
+                                weight_load_name='../mnist_lenet5_weight.h5',
+                                FT_evaluate_argument=FT_argument,
+                                ref_model=ref_model)
+        campaign.run('result.csv', n_round=200, fault_gen_param=param)
+
+    ```
+    """
+    def __init__(self,
+                 model_func,
+                 model_argument,
+                 compile_argument,
+                 dataset_argument,
+                 weight_load_name=None,
+                 FT_evaluate_argument=None,
+                 ref_model=None,
+                 n_scenario=None,
+                 golden_cache_dir=None,
+                 golden_name=None,
+                 early_exit=False,
+                 frozen_weights=False,
+                 verbose=4):
+        """ Fault campaign initializer, setup dataset and build model. """
+        if not callable(model_func):
+            raise TypeError('The model_func argument must be a callable function which returns a Keras DNN model.')
+        if model_argument.get('batch_size') is None:
+            raise ValueError('The batch_size in model_argument must be specified for fault modulator slot shape.')
+        if n_scenario is not None and FT_evaluate_argument is None:
+            raise ValueError('Batched multi-round fault campaign (n_scenario) requires FT_evaluate_argument.')
+        if golden_cache_dir is not None and FT_evaluate_argument is None:
+            raise ValueError('Resume from faulty layer with golden activation cache requires FT_evaluate_argument.')
+        if early_exit and golden_cache_dir is None:
+            raise ValueError('Early exit requires golden_cache_dir for comparing with golden activations.')
+
+        self.model_func=model_func
+        self.model_argument=dict(model_argument)
+        self.compile_argument=compile_argument
+        self.FT_evaluate_argument=FT_evaluate_argument
+        self.batch_size=model_argument['batch_size']
+        self.n_scenario=n_scenario
+        self.early_exit=early_exit
+        self.frozen_weights=frozen_weights
+        self.verbose=verbose
+
+        for key in ['ifmap_fault_dict_list','ofmap_fault_dict_list','weight_fault_dict_list','mac_unit']:
+            self.model_argument.pop(key,None)
+
+        if verbose>5:
+            print('preparing dataset...')
+        self.x_test, self.y_test, self.datagen = self._setup_dataset(dataset_argument)
+        if verbose>5:
+            print('dataset ready')
+
+        if ref_model is None:
+            ref_model=make_ref_model(model_func(verbose=False, **self.model_argument))
+            K.clear_session()
+        self.ref_model=ref_model
+
+        self._make_slots()
+        self.model=self._build_model(weight_load_name)
+        
+        self.FT_accumulators=None
+        self.golden_cache=None
+        self.golden_model=None
+        self.resume_models=dict()
+        self.segment_models=dict()
+        self.golden_resume_models=dict()
+        self._freeze_weights()
+        if golden_cache_dir is not None:
+            self._setup_resume(golden_cache_dir, golden_name, weight_load_name)
+
+    def _setup_dataset(self, dataset_argument):
+        """ Prepare the test set once for all rounds. """
+        _, x_test, _, y_test, _, datagen, _ = dataset_setup(verbose=self.verbose-5, **dataset_argument)
+        if datagen is not None:
+            y_test=to_categorical(datagen.classes,datagen.num_classes)
+        return x_test, y_test, datagen
+
+    def _make_slots(self):
+        """ Create the fault modulator slots for layers which have weights. """
+        self.model_depth=len(self.ref_model.layers)
+        self.ifmap_slots=[None for _ in range(self.model_depth)]
+        self.ofmap_slots=[None for _ in range(self.model_depth)]
+        self.weight_slots=[[None,None] for _ in range(self.model_depth)]
+
+        for layer_num in range(1,self.model_depth):
+            n_weight=len(get_layer_weight_shape(self.ref_model.layers[layer_num]))
+            if n_weight==0:
+                continue
+            self.ifmap_slots[layer_num]=fault_modulator_slot(self.n_scenario)
+            self.ofmap_slots[layer_num]=fault_modulator_slot(self.n_scenario)
+            self.weight_slots[layer_num]=[fault_modulator_slot(self.n_scenario, is_fmap=False) for _ in range(n_weight)]
+
+    def _build_model(self, weight_load_name):
+        """ Build the model with fault modulator slots, load weights and compile. Only execute once. """
+        t = time.time()
+        if self.verbose>6:
+            print('Building model...')
+        model_argument=dict(self.model_argument)
+        if self.n_scenario is not None:
+            model_argument['batch_size']=self.batch_size*self.n_scenario
+        model=self.model_func(verbose=self.verbose>4,
+                              ifmap_fault_dict_list=self.ifmap_slots,
+                              ofmap_fault_dict_list=self.ofmap_slots,
+                              weight_fault_dict_list=self.weight_slots,
+                              **model_argument)
+
+        if weight_load_name is not None:
+            model.load_weights(weight_load_name)
+
+        model.compile( **self.compile_argument)
+
+        if self.verbose>7:
+            model.summary()
+        t = time.time()-t
+        if self.verbose>2:
+            print('model build time: %f s'%t)
+
+        return model
+
+    def _setup_resume(self, golden_cache_dir, golden_name, weight_load_name):
+        """ Make the resume models start from each layer with slots and build the golden activation cache. """
+        slot_layers=[layer_num for layer_num in range(1,self.model_depth) if self.ifmap_slots[layer_num] is not None]
+        cut_all=list()
+        # the first layer with slots resumes from model input, just use the whole model
+        for layer_num in slot_layers[1:]:
+            self.resume_models[layer_num]=make_resume_model(self.model, layer_num)
+            cut_all+=self.resume_models[layer_num][1]
+        # early exit compares the activations after faulty layer and starts segment from any layer with slots
+        if self.early_exit:
+            for layer_num in slot_layers:
+                cut_all+=make_resume_model(self.model, layer_num, layer_num+1)[1]
+                if layer_num+1<self.model_depth:
+                    cut_all+=make_resume_model(self.model, layer_num+1)[1]
+        
+        t = time.time()
+        if self.verbose>2:
+            print('Preparing golden activation cache...')
+        golden_model=self.model_func(verbose=False, **self.model_argument)
+        if weight_load_name is not None:
+            golden_model.load_weights(weight_load_name)
+        self.golden_cache=golden_activation_cache(golden_cache_dir, golden_model.name if golden_name is None else golden_name)
+        self.golden_cache.build(golden_model, cut_all, 
+                                x=self.x_test if self.datagen is None else None, 
+                                y=self.y_test,
+                                datagen=self.datagen, 
+                                batch_size=self.batch_size, 
+                                weight_name=weight_load_name,
+                                verbose=self.verbose>3)
+        if self.early_exit:
+            # the rest of model after the last faulty layer is fault free
+            self.golden_model=golden_model
+        else:
+            del golden_model
+        t = time.time()-t
+        if self.verbose>2:
+            print('golden activation cache ready: %f s'%t)
+            
+    def _fault_start_layer(self):
+        """ The first layer with fault in slots. None if fault free. """
+        for layer_num in range(1,self.model_depth):
+            if self.ifmap_slots[layer_num] is None:
+                continue
+            slots=[self.ifmap_slots[layer_num],self.ofmap_slots[layer_num]]+self.weight_slots[layer_num]
+            if not all([slot.clean for slot in slots]):
+                return layer_num
+        return None
+    
+    def _fault_stop_layer(self):
+        """ The last layer with fault in slots. None if fault free. """
+        for layer_num in reversed(range(1,self.model_depth)):
+            if self.ifmap_slots[layer_num] is None:
+                continue
+            slots=[self.ifmap_slots[layer_num],self.ofmap_slots[layer_num]]+self.weight_slots[layer_num]
+            if not all([slot.clean for slot in slots]):
+                return layer_num
+        return None
+
+    def _freeze_weights(self):
+        """ Refresh the cached quantized faulty weights of frozen weights mode after the weight faults changed. """
+        if not self.frozen_weights:
+            return
+        if set_frozen_weights(self.model):
+            # the resume models share layers with the model
+            for resume_model,_ in list(self.resume_models.values())+list(self.segment_models.values()):
+                resume_model.predict_function=None
+
+    def clear_fault(self):
+        """ Reset all fault modulator slots to fault free. """
+        for layer_num in range(1,self.model_depth):
+            if self.ifmap_slots[layer_num] is not None:
+                self.ifmap_slots[layer_num].reset()
+                self.ofmap_slots[layer_num].reset()
+                for slot in self.weight_slots[layer_num]:
+                    slot.reset()
+        self._freeze_weights()
+
+    def set_fault(self, ifmap_fault_dict_list=None, ofmap_fault_dict_list=None, weight_fault_dict_list=None):
+        """ Swap the fault of a round into the model.
+            For batched multi-round (n_scenario), each argument is a list of at most n_scenario fault dict lists, one for each scenario.
+
+        Arguments
+        ---------
+        ifmap_fault_dict_list: List of Dictionary or List of modulators.
+            The fault dictionary list for input feature maps. Same format as inference_scheme model_argument.
+        ofmap_fault_dict_list: List of Dictionary or List of modulators.
+            The fault dictionary list for output feature maps. Same format as inference_scheme model_argument.
+        weight_fault_dict_list: List of List of (Dictionary or List of modulators).
+            The fault dictionary list for weights. Same format as inference_scheme model_argument.
+        """
+        if self.n_scenario is not None:
+            self._set_scenario_fault(ifmap_fault_dict_list, ofmap_fault_dict_list, weight_fault_dict_list)
+            self._freeze_weights()
+            return
+        
+        for layer_num in range(1,self.model_depth):
+            if self.ifmap_slots[layer_num] is None:
+                continue
+
+            if ifmap_fault_dict_list is None:
+                self.ifmap_slots[layer_num].reset()
+            else:
+                self.ifmap_slots[layer_num].assign(ifmap_fault_dict_list[layer_num])
+
+            if ofmap_fault_dict_list is None:
+                self.ofmap_slots[layer_num].reset()
+            else:
+                self.ofmap_slots[layer_num].assign(ofmap_fault_dict_list[layer_num])
+
+            for i,slot in enumerate(self.weight_slots[layer_num]):
+                if weight_fault_dict_list is None or weight_fault_dict_list[layer_num] is None or i>=len(weight_fault_dict_list[layer_num]):
+                    slot.reset()
+                else:
+                    slot.assign(weight_fault_dict_list[layer_num][i])
+        self._freeze_weights()
+
+    def _set_scenario_fault(self, ifmap_scenario_list=None, ofmap_scenario_list=None, weight_scenario_list=None):
+        """ Swap the fault of scenarios into the model. Each argument is a list of fault dict lists of scenarios. """
+        def layer_fault(scenario_list, layer_num, weight_idx=None):
+            if scenario_list is None:
+                return None
+            if len(scenario_list)>self.n_scenario:
+                raise ValueError('Got %d fault scenarios but the campaign only has %d scenarios.'%(len(scenario_list),self.n_scenario))
+            layer_fault_list=list()
+            for fault_dict_list in scenario_list:
+                if fault_dict_list is None or fault_dict_list[layer_num] is None:
+                    layer_fault_list.append(None)
+                elif weight_idx is None:
+                    layer_fault_list.append(fault_dict_list[layer_num])
+                elif weight_idx>=len(fault_dict_list[layer_num]):
+                    layer_fault_list.append(None)
+                else:
+                    layer_fault_list.append(fault_dict_list[layer_num][weight_idx])
+            return layer_fault_list
+        
+        for layer_num in range(1,self.model_depth):
+            if self.ifmap_slots[layer_num] is None:
+                continue
+            
+            self.ifmap_slots[layer_num].assign(layer_fault(ifmap_scenario_list, layer_num))
+            self.ofmap_slots[layer_num].assign(layer_fault(ofmap_scenario_list, layer_num))
+            for i,slot in enumerate(self.weight_slots[layer_num]):
+                slot.assign(layer_fault(weight_scenario_list, layer_num, i))
+                
+    def _input_batches(self, inputs=None):
+        """ Generator of input batches for prediction. 
+            The last batch is padded to batch size and each batch is repeated for every scenario.
+
+        Arguments
+        ---------
+        inputs: List of Ndarray. Default is None.
+            The input data of model. If None, use the test set.
+        """
+        n_tile=1 if self.n_scenario is None else self.n_scenario
+        if inputs is None and self.datagen is not None:
+            n_batch=len(self.datagen)
+        else:
+            n_batch=int(np.ceil(len(self.y_test)/self.batch_size))
+        
+        if inputs is None:
+            dtypes=[self.model.input.dtype.as_numpy_dtype]
+        else:
+            dtypes=[data.dtype for data in inputs]
+            
+        for i in range(n_batch):
+            if inputs is None:
+                if self.datagen is None:
+                    x_batch=[self.x_test[i*self.batch_size:(i+1)*self.batch_size]]
+                else:
+                    x_batch=[self.datagen[i][0]]
+            else:
+                x_batch=[data[i*self.batch_size:(i+1)*self.batch_size] for data in inputs]
+            
+            for j in range(len(x_batch)):
+                x=np.asarray(x_batch[j],dtype=dtypes[j])
+                if len(x)<self.batch_size:
+                    x=np.concatenate([x,np.repeat(x[-1:],self.batch_size-len(x),axis=0)])
+                if n_tile>1:
+                    x=np.tile(x,[n_tile]+[1 for _ in range(x.ndim-1)])
+                x_batch[j]=x
+                
+            if len(x_batch)==1:
+                yield x_batch[0]
+            else:
+                yield tuple(x_batch)
+            
+    def _predict_stream(self, infverbose=0):
+        """ Predict the test set with current fault state batch by batch.
+            Resume from the first faulty layer with golden activations if golden cache is available.
+
+        Yields
+        -------
+        (sample_start, prediction)
+            The index of first sample, and the prediction of scenarios with shape (n_scenario, number of samples, ...). 
+            n_scenario is 1 if it is None. The fault-free and early exit rounds are yield batch by batch as well.
+        """
+        n_tile=1 if self.n_scenario is None else self.n_scenario
+        n_sample=len(self.y_test)
+        
+        model=self.model
+        inputs=None
+        if self.golden_cache is not None:
+            start_layer=self._fault_start_layer()
+            if start_layer is None:
+                # fault-free round, the golden prediction slices of memory map are broadcasted to scenarios without copy
+                golden_prediction=self.golden_cache.get_prediction()
+                for sample_start in range(0,n_sample,self.batch_size):
+                    prediction=np.asarray(golden_prediction[sample_start:sample_start+self.batch_size])
+                    yield sample_start, np.broadcast_to(np.expand_dims(prediction,0),(n_tile,)+prediction.shape)
+                return
+            stop_layer=self._fault_stop_layer()+1
+            if self.early_exit and stop_layer<self.model_depth:
+                yield from self._predict_early_exit(start_layer, stop_layer, infverbose)
+                return
+            if start_layer in self.resume_models:
+                model,cut_list=self.resume_models[start_layer]
+                inputs=[self.golden_cache.get(layer_num,input_num) for layer_num,input_num in cut_list]
+                if self.verbose>4:
+                    print('resume inference from layer %d'%start_layer)
+        
+        if inputs is None and self.datagen is not None:
+            n_batch=len(self.datagen)
+        else:
+            n_batch=int(np.ceil(n_sample/self.batch_size))
+        if infverbose>0:
+            progbar=tf.keras.utils.Progbar(n_batch)
+            
+        for i,x_batch in enumerate(self._input_batches(inputs)):
+            prediction=model.predict_on_batch(list(x_batch) if isinstance(x_batch,tuple) else x_batch)
+            n_valid=min(self.batch_size,n_sample-i*self.batch_size)
+            prediction=np.reshape(prediction,(n_tile,self.batch_size)+prediction.shape[1:])
+            if infverbose>0:
+                progbar.update(i+1)
+            yield i*self.batch_size, prediction[:,:n_valid]
+    
+    def _predict_early_exit(self, start_layer, stop_layer, infverbose=0):
+        """ Predict the test set by the segment from first faulty layer to last faulty layer.
+            The samples with activations identical to golden run after the segment take golden prediction.
+            The rest samples continue inference on the fault-free rest of model.
+
+        Yields
+        -------
+        (sample_start, prediction)
+            The index of first sample, and the prediction of scenarios with shape (n_scenario, number of samples, ...). n_scenario is 1 if it is None.
+        """
+        n_tile=1 if self.n_scenario is None else self.n_scenario
+        n_sample=len(self.y_test)
+        
+        if (start_layer,stop_layer) not in self.segment_models:
+            self.segment_models[(start_layer,stop_layer)]=make_resume_model(self.model, start_layer, stop_layer)
+        if stop_layer not in self.golden_resume_models:
+            self.golden_resume_models[stop_layer]=make_resume_model(self.golden_model, stop_layer)
+        segment_model,cut_list=self.segment_models[(start_layer,stop_layer)]
+        rest_model,stop_cut_list=self.golden_resume_models[stop_layer]
+        
+        inputs=[self.golden_cache.get(layer_num,input_num) for layer_num,input_num in cut_list]
+        goldens=[self.golden_cache.get(layer_num,input_num) for layer_num,input_num in stop_cut_list]
+        golden_prediction=self.golden_cache.get_prediction()
+        
+        n_unmasked=0
+        if infverbose>0:
+            progbar=tf.keras.utils.Progbar(int(np.ceil(n_sample/self.batch_size)))
+        
+        # segment inference and compare with golden per sample, the unmasked samples continue on fault-free rest of model batch by batch
+        for i,x_batch in enumerate(self._input_batches(inputs)):
+            fmaps=segment_model.predict_on_batch(list(x_batch) if isinstance(x_batch,tuple) else x_batch)
+            if not isinstance(fmaps,list):
+                fmaps=[fmaps]
+            n_valid=min(self.batch_size,n_sample-i*self.batch_size)
+            
+            fmaps=[np.reshape(fmap,(n_tile,self.batch_size)+fmap.shape[1:])[:,:n_valid] for fmap in fmaps]
+            unmasked=np.zeros((n_tile,n_valid),dtype=bool)
+            for fmap,golden in zip(fmaps,goldens):
+                golden=np.asarray(golden[i*self.batch_size:i*self.batch_size+n_valid])
+                diff=np.not_equal(fmap,np.expand_dims(golden,0))
+                unmasked|=np.any(np.reshape(diff,(n_tile,n_valid,-1)),axis=-1)
+                
+            # the masked samples take the golden prediction of batch
+            prediction=np.asarray(golden_prediction[i*self.batch_size:i*self.batch_size+n_valid])
+            prediction=np.broadcast_to(np.expand_dims(prediction,0),(n_tile,)+prediction.shape)
+            scenario_idx,sample_idx=np.nonzero(unmasked)
+            if len(scenario_idx)>0:
+                prediction=prediction.copy()
+            unmasked_fmaps=[fmap[scenario_idx,sample_idx] for fmap in fmaps]
+            n_unmasked+=len(scenario_idx)
+            # the rest model has fixed batch size, the unmasked samples of scenarios are run in chunks padded to batch size
+            for chunk_start in range(0,len(scenario_idx),self.batch_size):
+                chunk=slice(chunk_start,chunk_start+self.batch_size)
+                n_chunk=len(scenario_idx[chunk])
+                chunk_fmaps=[np.concatenate([fmap[chunk],np.repeat(fmap[chunk][-1:],self.batch_size-n_chunk,axis=0)]) for fmap in unmasked_fmaps]
+                rest_prediction=rest_model.predict_on_batch(chunk_fmaps[0] if len(chunk_fmaps)==1 else chunk_fmaps)
+                prediction[scenario_idx[chunk],sample_idx[chunk]]=np.asarray(rest_prediction)[:n_chunk]
+            if infverbose>0:
+                progbar.update(i+1)
+            yield i*self.batch_size, prediction
+        
+        if self.verbose>4:
+            print('early exit: %d/%d samples unmasked'%(n_unmasked,n_tile*n_sample))
+    
+    def evaluate(self):
+        """ Run inference on the current fault state of model.
+
+        Returns
+        -------
+        test_result: Dictionary or List
+            | The evaluate_FT result dictionary if FT_evaluate_argument is given. Else, the model.evaluate result list.
+            | For batched multi-round (n_scenario), the list of evaluate_FT result dictionarys of scenarios.
+        """
+        if self.verbose>3:
+            infverbose=1
+        else:
+            infverbose=0
+            
+        if self.FT_evaluate_argument is None:
+            if self.datagen is None:
+                return self.model.evaluate(self.x_test, self.y_test, verbose=infverbose, batch_size=self.batch_size)
+            else:
+                return self.model.evaluate(self.datagen, verbose=infverbose, steps=len(self.datagen))
+            
+        # the metrics are accumulated batch by batch during inference
+        n_tile=1 if self.n_scenario is None else self.n_scenario
+        if self.FT_accumulators is None:
+            FT_argument={key:value for key,value in self.FT_evaluate_argument.items() if key not in ['prediction','test_label']}
+            if FT_argument.get('golden_store') is None and self.golden_cache is not None:
+                FT_argument['golden_store']=self.golden_cache.store
+            self.FT_accumulators=[FT_metric_accumulator( **FT_argument) for _ in range(n_tile)]
+        for accumulator in self.FT_accumulators:
+            accumulator.reset()
+        
+        for sample_start,prediction in self._predict_stream(infverbose):
+            y_batch=self.y_test[sample_start:sample_start+prediction.shape[1]]
+            for scenario,accumulator in enumerate(self.FT_accumulators):
+                accumulator.update(prediction[scenario], y_batch)
+        test_result=[accumulator.result() for accumulator in self.FT_accumulators]
+            
+        if self.n_scenario is None:
+            return test_result[0]
+        return test_result
+
+    def run_round(self, ifmap_fault_dict_list=None, ofmap_fault_dict_list=None, weight_fault_dict_list=None):
+        """ Swap in the fault and evaluate a round.
+            The arguments are the same as set_fault. Returns the same as evaluate.
+        """
+        self.set_fault(ifmap_fault_dict_list, ofmap_fault_dict_list, weight_fault_dict_list)
+        return self.evaluate()
+
+    def run(self,
+            result_save_file,
+            n_round=None,
+            fault_argument=None,
+            fault_gen_param=None,
+            n_gen_worker=0,
+            prefetch=2,
+            seed=None,
+            append_save_file=False,
+            save_runtime=False,
+            save_file_add_on=None,
+            name_tag=None):
+        """ Run the fault campaign for rounds and write the results into a csv file.
+
+        Arguments
+        ---------
+        result_save_file: String.
+            The file and directory to the result csv file.
+        n_round: Integer. Default is None.
+            Number of test rounds. If None, use the length of fault_argument.
+        fault_argument: List of Dictionarys. Default is None.
+            | The fault of each round. The dictionary keys are 'ifmap_fault_dict_list', 'ofmap_fault_dict_list' and 'weight_fault_dict_list'.
+            | The same format as the model_argument of inference_scheme. Other keys are ignored.
+        fault_gen_param: Dictionay. Default is None.
+            | If is dtype dictionary (fault generation parameter), generate fault dict list by generate_model_stuck_fault for each round.
+            | The 'model' in fault_gen_param is default to the reference model.
+        n_gen_worker: Integer. Default is 0.
+            | Number of worker processes generating the fault of upcoming rounds while the current round is under inference.
+            | If 0, generate fault serially before each round. If None, use the number of CPUs. Only used with fault_gen_param.
+            | The workers are spawned, the calling script must be guarded by if __name__=='__main__'.
+        prefetch: Integer. Default is 2.
+            The number of rounds generated ahead of inference by fault generation workers.
+        seed: Integer. Default is None.
+            The campaign seed for fault generation. Round i draws from the independent random stream round_rng(seed, fault_rate, i).
+        append_save_file: Bool.
+            Append the save file no matter what.
+        save_runtime: Bool.
+            Save runtime in result file or not.
+        save_file_add_on: Dictionary.
+            The add on information wanted to be saved to output result csv file. The item data list
+            should be the same as campaign rounds.
+        name_tag: String.
+            The messege to show in terminal represent current simulation
+
+        Returns
+        -------
+        None
+            Running the fault campaign.
+        """
+        if fault_argument is None and fault_gen_param is None:
+            raise ValueError('Either fault_argument or fault_gen_param must be given for fault campaign.')
+        if n_round is None:
+            if fault_argument is None:
+                raise ValueError('n_round must be given when using fault_gen_param for fault campaign.')
+            n_round=len(fault_argument)
+        if fault_gen_param is not None and 'model' not in fault_gen_param:
+            fault_gen_param=dict(fault_gen_param)
+            fault_gen_param['model']=self.ref_model
+        if name_tag is None:
+            name_tag=' '
+        if fault_gen_param is not None:
+            fault_iter=iter(fault_generation_pipeline(fault_gen_param, n_round, n_worker=n_gen_worker, prefetch=prefetch, seed=seed))
+
+        if self.n_scenario is None:
+            group_size=1
+        else:
+            group_size=self.n_scenario
+
+        for group_start in range(0,n_round,group_size):
+            round_nums=list(range(group_start,min(group_start+group_size,n_round)))
+            if n_round>1 and self.verbose>0:
+                if len(round_nums)==1:
+                    print('Running fault campaign %s %d/%d'%(name_tag,round_nums[0]+1,n_round))
+                else:
+                    print('Running fault campaign %s %d-%d/%d'%(name_tag,round_nums[0]+1,round_nums[-1]+1,n_round))
+
+            model_ifmap_fdl,model_ofmap_fdl,model_weight_fdl=list(),list(),list()
+            for round_num in round_nums:
+                if fault_gen_param is not None:
+                    _,(ifmap_fdl,ofmap_fdl,weight_fdl)=next(fault_iter)
+                else:
+                    ifmap_fdl=fault_argument[round_num].get('ifmap_fault_dict_list')
+                    ofmap_fdl=fault_argument[round_num].get('ofmap_fault_dict_list')
+                    weight_fdl=fault_argument[round_num].get('weight_fault_dict_list')
+                model_ifmap_fdl.append(ifmap_fdl)
+                model_ofmap_fdl.append(ofmap_fdl)
+                model_weight_fdl.append(weight_fdl)
+
+            t = time.time()
+            if self.verbose>5:
+                print('evaluating...')
+            if self.n_scenario is None:
+                test_results=[self.run_round(model_ifmap_fdl[0],model_ofmap_fdl[0],model_weight_fdl[0])]
+            else:
+                test_results=self.run_round(model_ifmap_fdl,model_ofmap_fdl,model_weight_fdl)
+            # runtime of each round is amortized over the rounds evaluated in the same forward pass
+            t = (time.time()-t)/len(round_nums)
+            if self.verbose>2:
+                print('\nruntime: %f s'%t)
+
+            for round_num,test_result in zip(round_nums,test_results):
+                if self.verbose>1:
+                    if self.FT_evaluate_argument is not None:
+                        for key in test_result.keys():
+                            print('Test %s\t:'%key, test_result[key])
+                    else:
+                        for i in range(len(test_result)):
+                            print('Test %s\t:'%self.model.metrics_names[i], test_result[i])
+    
+                test_result_dict=_make_result_row(test_result,
+                                                  self.model.metrics_names if self.FT_evaluate_argument is None else None,
+                                                  runtime=t if save_runtime else None,
+                                                  save_file_add_on=save_file_add_on,
+                                                  row_idx=round_num)
+                new_file=(round_num == 0 and not append_save_file) or (append_save_file and not os.path.exists(result_save_file))
+                _write_result_row(result_save_file, test_result_dict, new_file)
+
+            if self.verbose>1:
+                print('\n===============================================\n')
+
+        self.clear_fault()
@@ -8,19 +8,159 @@ Fault tolerance evaluation functions
 """
 
 import inspect
-from ..metrics.FT_metrics import FT_metric_setup
-import tensorflow.keras.backend as K
+import numpy as np
+from ..metrics.FT_metrics import FT_metric_setup, acc_loss, relative_acc
 from tensorflow.keras.metrics import categorical_accuracy
 import tensorflow as tf
 
-def evaluate_FT(model_name,prediction,test_label,loss_function,metrics,fuseBN=None,setsize=50,score=None,fault_free_pred=None):
+# metrics of the whole test set accuracy, finished from the accumulated accuracy
+_accuracy_based_metrics={acc_loss: lambda acc,ff_score: np.clip(ff_score[1]-acc,0.0,1.0),
+                         relative_acc: lambda acc,ff_score: np.clip(acc/ff_score[1],0.0,1.0)}
+
+class FT_metric_accumulator:
+    """
+    The streaming accumulator of fault tolerance metrics. 
+    Update the metrics batch by batch during inference, the full prediction array is not needed.
+    
+    The golden stats and predictions are set up once. Only the golden prediction rows of the batch are read.
+    Loss, accuracy and the per-sample metrics are accumulated as sum over samples. 
+    The metric returns a scalar batch mean is weighted by batch size. 
+    acc_loss and relative_acc are finished from the accumulated accuracy.
+
+    Parameters
+    ----------
+    model_name : String
+        Name of model. Support LeNet-5, Custom 4C2F, MobileNetV1, ResNet50 and the golden references in golden_store.
+    loss_function : Callable TensorFlow function
+        The loss function for DNN under test.
+    metrics : List of String or Callable TensorFlow function
+        The metrics for DNN under test.
+    fuseBN : Bool, optional
+        Flag for identify the DNN under test is a Fused BatchNormalization case or not. The default is None.
+    setsize : Integer, optional. One of 2, 10, 50.
+        The number of images in each ImageNet classes. The default is 50.
+    score : List of Float, optional
+        The base [Loss, Top-1 Accuracy, Top-K Accuracy] for comparing-to-fault-free based metrics. The default is None.
+    fault_free_pred : Ndarray, optional
+        The base golden prediction probabilities for comparing-to-fault-free based metrics. The default is None.
+    golden_store : String or golden_reference_store, optional
+        The golden reference store for models without preset. The default is None.
+
+    Example
+    -------
+    >>> accumulator=FT_metric_accumulator('lenet',categorical_crossentropy,['accuracy',pred_miss,conf_score_vary_10])
+    >>> for i in range(n_batch):
+    >>>     accumulator.update(model.predict_on_batch(x_test[i*batch_size:(i+1)*batch_size]), y_test[i*batch_size:(i+1)*batch_size])
+    >>> test_result=accumulator.result()
+
+    """
+    def __init__(self,model_name,loss_function,metrics,fuseBN=None,setsize=50,score=None,fault_free_pred=None,golden_store=None):
+        ff_score,ff_pred=FT_metric_setup(model_name,fuseBN=fuseBN,setsize=setsize,score=score,fault_free_pred=fault_free_pred,golden_store=golden_store)
+        self.ff_score=ff_score
+        self.ff_score_tf=tf.constant(ff_score)
+        self.ff_pred=ff_pred
+        self.loss_function=loss_function
+        
+        # metric arguments are inspected once
+        self.metric_list=list()
+        for metric in metrics:
+            if metric in ('accuracy', 'acc'):
+                self.metric_list.append((metric,None,'accuracy'))
+            elif metric in _accuracy_based_metrics:
+                self.metric_list.append((metric.__name__,metric,'accuracy_based'))
+            else:
+                parameters=inspect.signature(metric).parameters
+                self.metric_list.append((metric.__name__,metric,('ff_score' in parameters, 'ff_pred' in parameters)))
+        
+        self.reset()
+        
+    def reset(self):
+        """ Clear the accumulated metrics for next evaluation. """
+        self.n_sample=0
+        self.sums={'loss':0.0, 'accuracy':0.0}
+        self.counts={'loss':0, 'accuracy':0}
+        for name,_,_ in self.metric_list:
+            self.sums[name]=0.0
+            self.counts[name]=0
+    
+    def _accumulate(self, name, value, n_batch):
+        value=np.asarray(value,dtype=np.float64)
+        if value.ndim==0:
+            self.sums[name]+=float(value)*n_batch
+            self.counts[name]+=n_batch
+        else:
+            self.sums[name]+=float(np.sum(value))
+            self.counts[name]+=value.size
+        
+    def update(self, prediction, test_label):
+        """ Accumulate the metrics of a batch. The batches must be given in test set order, for matching golden prediction.
+
+        Parameters
+        ----------
+        prediction : Ndarray
+            The output probability of DNN model of the batch.
+        test_label : Ndarray
+            The label of the batch.
+        """
+        n_batch=len(prediction)
+        y_true=tf.constant(test_label)
+        y_pred=tf.constant(prediction)
+        ff_pred=None
+        
+        self._accumulate('loss', self.loss_function(y_true,y_pred), n_batch)
+        self._accumulate('accuracy', categorical_accuracy(y_true,y_pred), n_batch)
+        
+        for name,metric,kind in self.metric_list:
+            if kind in ('accuracy','accuracy_based'):
+                continue
+            use_score,use_pred=kind
+            if use_pred and ff_pred is None:
+                ff_pred=tf.constant(np.asarray(self.ff_pred[self.n_sample:self.n_sample+n_batch]))
+            
+            if use_score and use_pred:
+                value=metric(y_true,y_pred,self.ff_score_tf,ff_pred)
+            elif use_score:
+                value=metric(y_true,y_pred,self.ff_score_tf)
+            elif use_pred:
+                value=metric(y_true,y_pred,ff_pred)
+            else:
+                value=metric(y_true,y_pred)
+            self._accumulate(name, value, n_batch)
+        
+        self.n_sample+=n_batch
+        
+    def result(self):
+        """ The result of given metrics over the accumulated samples.
+
+        Returns
+        -------
+        test_result : Dictionary
+            The result of given metrics. Same as evaluate_FT.
+        """
+        if self.n_sample==0:
+            raise ValueError('No prediction has been accumulated.')
+        
+        accuracy=self.sums['accuracy']/self.counts['accuracy']
+        test_result={'loss':np.float32(self.sums['loss']/self.counts['loss'])}
+        for name,metric,kind in self.metric_list:
+            if kind=='accuracy':
+                test_result[name]=np.float32(accuracy)
+            elif kind=='accuracy_based':
+                test_result[name]=np.float32(_accuracy_based_metrics[metric](accuracy,self.ff_score))
+            else:
+                test_result[name]=np.float32(self.sums[name]/self.counts[name])
+        
+        return test_result
+
+def evaluate_FT(model_name,prediction,test_label,loss_function,metrics,fuseBN=None,setsize=50,score=None,fault_free_pred=None,golden_store=None):
     """
     Run the evaluation of given fault tolerance metrics
+    For evaluating batch by batch during inference, use FT_metric_accumulator.
 
     Parameters
     ----------
     model_name : String
-        Name of model. Support LeNet-5, Custom 4C2F, MobileNetV1, ResNet50.
+        Name of model. Support LeNet-5, Custom 4C2F, MobileNetV1, ResNet50 and the golden references in golden_store.
     prediction : Ndarray
         The output probability of DNN model.
     test_label : Ndarray
@@ -40,42 +180,16 @@ def evaluate_FT(model_name,prediction,test_label,loss_function,metrics,fuseBN=No
     fault_free_pred : Ndarray, optional
         The base golden prediction probabilities for all classes for comparing-to-fault-free based metrics. 
         If default as None, function will automaticly get stored golden output probabilities. The default is None.
+    golden_store : String or golden_reference_store, optional
+        The golden reference store (or its directory). The golden score and prediction of model_name are loaded from it if registered. 
+        The default is None.
 
     Returns
     -------
-    test_result : List of Float
+    test_result : Dictionary
         The result of given metrics.
 
     """
-    ff_score,ff_pred=FT_metric_setup(model_name,fuseBN=fuseBN,setsize=setsize,score=score,fault_free_pred=fault_free_pred)
-    
-    test_label_tf=tf.constant(test_label)
-    prediction_tf=tf.constant(prediction)
-    ff_score=tf.constant(ff_score)
-    ff_pred=tf.constant(ff_pred)
-    
-    test_output=list()
-    test_result=['loss']
-    
-    test_output.append(K.mean(loss_function(test_label_tf,prediction_tf)))
-    
-    for metric in metrics:
-        if metric in ('accuracy', 'acc'):
-            test_output.append(K.mean(categorical_accuracy(test_label_tf,prediction_tf)))
-            test_result.append(metric)
-        else:
-            test_result.append(metric.__name__)
-            if 'ff_score' in inspect.signature(metric).parameters and 'ff_pred' in inspect.signature(metric).parameters:
-                test_output.append(K.mean(metric(test_label_tf,prediction_tf,ff_score,ff_pred)))
-            elif 'ff_score' in inspect.signature(metric).parameters:
-                test_output.append(K.mean(metric(test_label_tf,prediction_tf,ff_score)))
-            elif 'ff_pred' in inspect.signature(metric).parameters:
-                test_output.append(K.mean(metric(test_label_tf,prediction_tf,ff_pred)))
-            else:
-                test_output.append(K.mean(metric(test_label_tf,prediction_tf)))
-     
-    test_output=K.eval(K.stack(test_output,axis=0))
-    
-    test_result=dict(zip(test_result,test_output))
-    
-    return test_result
+    accumulator=FT_metric_accumulator(model_name,loss_function,metrics,fuseBN=fuseBN,setsize=setsize,score=score,fault_free_pred=fault_free_pred,golden_store=golden_store)
+    accumulator.update(prediction,test_label)
+    return accumulator.result()
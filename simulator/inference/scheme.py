@@ -14,7 +14,7 @@ from tensorflow.keras.utils import to_categorical #TODO new multi gpu task
 from ..utils_tool.weight_conversion import convert_original_weight_layer_name
 from ..utils_tool.dataset_setup import dataset_setup
 from .evaluate import evaluate_FT
-from ..fault.fault_list import generate_model_stuck_fault
+from ..fault.fault_pipeline import fault_generation_pipeline
 import time
 import numpy as np
 
@@ -27,6 +27,9 @@ def inference_scheme(model_func,
                      weight_load_name=None, 
                      save_runtime=False,
                      fault_gen_param=None,
+                     n_gen_worker=0,
+                     prefetch=2,
+                     seed=None,
                      FT_evaluate_argument=None, 
                      multi_gpu_num=None, 
                      name_tag=None,
@@ -56,6 +59,14 @@ def inference_scheme(model_func,
     fault_gen_param: Dictionay. Default is None.
         | If is dtype dictionary (fault generation parameter), generate fault dict list inside inference_scheme (slower, consume less memory). 
         | If None, using the fault dict list from model_argument (faster, consume huge memory).
+    n_gen_worker: Integer. Default is 0.
+        | Number of worker processes generating the fault of upcoming schemes while the current scheme is under inference.
+        | If 0, generate fault serially before each scheme. If None, use the number of CPUs. Only used with fault_gen_param.
+        | The workers are spawned, the calling script must be guarded by if __name__=='__main__'.
+    prefetch: Integer. Default is 2.
+        The number of schemes generated ahead of inference by fault generation workers.
+    seed: Integer. Default is None.
+        The seed for fault generation. Scheme i draws from the independent random stream round_rng(seed, fault_rate, i).
     fault_param: Dictionay. 
         The argument for fault generation function.
     FT_evaluate_argument: Dictionary. Default is None.
@@ -124,6 +135,8 @@ def inference_scheme(model_func,
         print('dataset ready')
         
     n_scheme=len(model_argument)
+    if fault_gen_param is not None:
+        fault_iter=iter(fault_generation_pipeline(fault_gen_param, n_scheme, n_worker=n_gen_worker, prefetch=prefetch, seed=seed))
     for scheme_num in range(n_scheme):
         if name_tag is None:
             name_tag=' '
@@ -133,7 +146,7 @@ def inference_scheme(model_func,
         modelaug_tmp=model_argument[scheme_num]
         
         if fault_gen_param is not None:
-            model_ifmap_fdl,model_ofmap_fdl,model_weight_fdl=generate_model_stuck_fault( **fault_gen_param)
+            _,(model_ifmap_fdl,model_ofmap_fdl,model_weight_fdl)=next(fault_iter)
             modelaug_tmp['ifmap_fault_dict_list']=model_ifmap_fdl
             modelaug_tmp['ofmap_fault_dict_list']=model_ofmap_fdl
             modelaug_tmp['weight_fault_dict_list']=model_weight_fdl
@@ -218,56 +231,13 @@ def inference_scheme(model_func,
                 for i in range(len(test_result)):
                     print('Test %s\t:'%model.metrics_names[i], test_result[i])
             
-        if (scheme_num == 0 and not append_save_file) or (append_save_file and not os.path.exists(result_save_file)):
-            with open(result_save_file, 'w', newline='') as csvfile:
-                fieldnames=list()
-                test_result_dict=dict()
-                if FT_evaluate_argument is not None:
-                    for key in test_result.keys():
-                        fieldnames.append(key)
-                        test_result_dict[key]=test_result[key]
-                    if save_runtime:
-                        fieldnames.append('runtime')
-                        test_result_dict['runtime']=t
-                else:
-                    for i in range(len(test_result)):
-                        fieldnames.append(model.metrics_names[i])
-                        test_result_dict[model.metrics_names[i]]=test_result[i]
-                    if save_runtime:
-                        fieldnames.append('runtime')
-                        test_result_dict['runtime']=t
-                if save_file_add_on is not None:
-                    for key in save_file_add_on.keys():
-                        fieldnames.append(key)
-                        test_result_dict[key]=save_file_add_on[key][scheme_num]
-                writer=csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerow(test_result_dict)
-        else:
-            with open(result_save_file, 'a', newline='') as csvfile:
-                fieldnames=list()
-                test_result_dict=dict()
-                if FT_evaluate_argument is not None:
-                    for key in test_result.keys():
-                        fieldnames.append(key)
-                        test_result_dict[key]=test_result[key]
-                    if save_runtime:
-                        fieldnames.append('runtime')
-                        test_result_dict['runtime']=t
-                else:
-                    for i in range(len(test_result)):
-                        fieldnames.append(model.metrics_names[i])
-                        test_result_dict[model.metrics_names[i]]=test_result[i]
-                    if save_runtime:
-                        fieldnames.append('runtime')
-                        test_result_dict['runtime']=t
-                if save_file_add_on is not None:
-                    for key in save_file_add_on.keys():
-                        fieldnames.append(key)
-                        test_result_dict[key]=save_file_add_on[key][scheme_num]
-                writer=csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writerow(test_result_dict)
-                    
+        test_result_dict=_make_result_row(test_result, 
+                                          model.metrics_names if FT_evaluate_argument is None else None, 
+                                          runtime=t if save_runtime else None, 
+                                          save_file_add_on=save_file_add_on, 
+                                          row_idx=scheme_num)
+        new_file=(scheme_num == 0 and not append_save_file) or (append_save_file and not os.path.exists(result_save_file))
+        _write_result_row(result_save_file, test_result_dict, new_file)
             
         K.clear_session()
         del model
@@ -276,6 +246,38 @@ def inference_scheme(model_func,
             print('\n===============================================\n')
 
 
+def _make_result_row(test_result, metrics_names=None, runtime=None, save_file_add_on=None, row_idx=0):
+    """ Arrange the inference result into a csv row dictionary.
+        If metrics_names is None, the test_result is the dictionary return by evaluate_FT.
+        Otherwise, the test_result is the list return by model.evaluate.
+    """
+    test_result_dict=dict()
+    if metrics_names is None:
+        for key in test_result.keys():
+            test_result_dict[key]=test_result[key]
+    else:
+        for i in range(len(test_result)):
+            test_result_dict[metrics_names[i]]=test_result[i]
+    if runtime is not None:
+        test_result_dict['runtime']=runtime
+    if save_file_add_on is not None:
+        for key in save_file_add_on.keys():
+            test_result_dict[key]=save_file_add_on[key][row_idx]
+            
+    return test_result_dict
+
+def _write_result_row(result_save_file, test_result_dict, new_file):
+    """ Write a result row into csv file. Create new file with header or append to the existing file. """
+    if new_file:
+        with open(result_save_file, 'w', newline='') as csvfile:
+            writer=csv.DictWriter(csvfile, fieldnames=list(test_result_dict.keys()))
+            writer.writeheader()
+            writer.writerow(test_result_dict)
+    else:
+        with open(result_save_file, 'a', newline='') as csvfile:
+            writer=csv.DictWriter(csvfile, fieldnames=list(test_result_dict.keys()))
+            writer.writerow(test_result_dict)
+
 def gen_test_round_list(num_of_bit,upper_bound,lower_bound,left_bound=-3,right_bound=0):
     """Genrate test round list with number decade exponentially
 
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:32:05 2026
+
+@author: Yung-Yu Tsai
+
+Sharded fault campaign. Split the (fault rate, round) pairs over worker processes or hosts, merge the shard results into csv files.
+"""
+
+import os, io, csv, time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from ..fault.fault_rng import round_rng
+from ..utils_tool.atomic_file import atomic_write
+# TensorFlow, campaign and fault generation are imported in the shard process by run_shard,
+# the coordinator only spawns, reads and merges shard files
+
+def _run_shard_job(sharded, shard_id):
+    """ The job of worker process. Run a shard in a fresh process with its own TF runtime. """
+    return sharded.run_shard(shard_id)
+
+class sharded_campaign:
+    """ The fault campaign executor which shards (fault rate, round) pairs over processes or hosts.
+
+        The pairs are dealt round-robin to n_shard shards. Each shard builds its own fault_campaign (own TF runtime),
+        pins the TF thread counts, and appends one row per finished pair to its shard csv file in shard_dir.
+        The fault of round i with fault rate r is generated by round_rng(seed, r, i), thus any shard can regenerate it.
+
+        | Local multi-process: run(n_worker) spawns processes for the shards then merges the results.
+        | Multi-node: every host with access to a shared shard_dir calls run_shard(shard_id) for its shards,
+          and the coordinator calls merge when all shards are done.
+
+        On restart, the pairs already recorded in the shard csv file are skipped (crash-resume).
+
+    Arguments
+    ---------
+    campaign_argument: Dictionary.
+        The arguments for fault_campaign. (model_func, model_argument, compile_argument, dataset_argument, weight_load_name, FT_evaluate_argument...)
+        Must be picklable for local multi-process run, i.e. module level model_func and metric functions.
+    fault_gen_param: Dictionary.
+        The fault generation parameter for generate_model_stuck_fault. The 'fault_rate' is given by fault_rate_list.
+        The 'model' is default to the reference model of campaign.
+    fault_rate_list: List of Float.
+        The fault rates of campaign.
+    n_round_list: Integer or List of Integer.
+        Number of rounds of each fault rate.
+    shard_dir: String.
+        The directory of shard result csv files. Should be on shared filesystem for multi-node campaign.
+    n_shard: Integer.
+        Number of shards.
+    seed: Integer. Default is 0.
+        The campaign seed for fault generation.
+    intra_op_threads: Integer. Default is None.
+        The TF intra-op thread count of each shard. If None, TF default.
+    inter_op_threads: Integer. Default is None.
+        The TF inter-op thread count of each shard. If None, TF default.
+    verbose: Integer. Default is 1.
+        | The verbosity of shard progress printing.
+        | The verbosity of fault_campaign is set by campaign_argument.
+
+    Example
+    -------
+    >>> sharded=sharded_campaign(campaign_argument, param, fault_rate_list, 200, '../shard', n_shard=8, intra_op_threads=2)
+    >>> sharded.run(n_worker=8)
+    >>> sharded.merge('../test_result/mnist_lenet5_model_fault_rate')
+
+    """
+    def __init__(self,
+                 campaign_argument,
+                 fault_gen_param,
+                 fault_rate_list,
+                 n_round_list,
+                 shard_dir,
+                 n_shard,
+                 seed=0,
+                 intra_op_threads=None,
+                 inter_op_threads=None,
+                 verbose=1):
+        if isinstance(n_round_list,int):
+            n_round_list=[n_round_list for _ in range(len(fault_rate_list))]
+        if len(n_round_list)!=len(fault_rate_list):
+            raise ValueError('n_round_list must have the same length as fault_rate_list. Got %d and %d.'%(len(n_round_list),len(fault_rate_list)))
+        if seed is None:
+            raise ValueError('Sharded campaign requires a seed, every shard must regenerate the same faults.')
+
+        self.campaign_argument=campaign_argument
+        self.fault_gen_param=dict(fault_gen_param)
+        self.fault_rate_list=[float(fr) for fr in fault_rate_list]
+        self.n_round_list=n_round_list
+        self.shard_dir=shard_dir
+        self.n_shard=n_shard
+        self.seed=seed
+        self.intra_op_threads=intra_op_threads
+        self.inter_op_threads=inter_op_threads
+        self.verbose=verbose
+
+        self.fault_gen_param.pop('fault_rate',None)
+
+    def shard_tasks(self, shard_id):
+        """ The (fault rate, round) pairs of a shard. Dealt round-robin over all the pairs of campaign. """
+        tasks=[(fr,i) for fr,n_round in zip(self.fault_rate_list,self.n_round_list) for i in range(n_round)]
+        return tasks[shard_id::self.n_shard]
+
+    def shard_file(self, shard_id):
+        return os.path.join(self.shard_dir,'shard_%d_of_%d.csv'%(shard_id,self.n_shard))
+
+    def _read_shard(self, shard_id):
+        """ Read the finished rows of a shard. The incomplete row of a crashed write is dropped.
+            A row is finished only when its line ends with newline, a cut-off row may still have every column.
+        """
+        rows=list()
+        shard_file=self.shard_file(shard_id)
+        if not os.path.exists(shard_file):
+            return rows
+        with open(shard_file, 'r', newline='') as csvfile:
+            content=csvfile.read()
+        if not content.endswith('\n'):
+            content=content[:content.rfind('\n')+1]
+        reader=csv.DictReader(io.StringIO(content, newline=''))
+        for row in reader:
+            if None in row.values() or None in row.keys():
+                continue
+            rows.append(row)
+        return rows
+
+    def _truncate_partial_row(self, shard_id):
+        """ Cut off the partial row left by a crash during writing, before appending new rows. """
+        shard_file=self.shard_file(shard_id)
+        if not os.path.exists(shard_file):
+            return
+        with open(shard_file, 'rb+') as f:
+            content=f.read()
+            if len(content)>0 and not content.endswith(b'\n'):
+                f.truncate(content.rfind(b'\n')+1)
+
+    def completed_tasks(self, shard_id):
+        """ The set of (fault rate, round) pairs already recorded in the shard file. """
+        return set((float(row['fault_rate']),int(row['round'])) for row in self._read_shard(shard_id))
+
+    def _pin_threads(self):
+        """ Set the TF thread counts. Must be called before the TF runtime initialized. """
+        import tensorflow as tf
+        try:
+            if self.intra_op_threads is not None:
+                tf.config.threading.set_intra_op_parallelism_threads(self.intra_op_threads)
+            if self.inter_op_threads is not None:
+                tf.config.threading.set_inter_op_parallelism_threads(self.inter_op_threads)
+        except RuntimeError:
+            print('TF runtime already initialized, the thread counts of shard are not pinned.')
+
+    def run_shard(self, shard_id):
+        """ Run the unfinished pairs of a shard and append the results to the shard file.
+
+        Arguments
+        ---------
+        shard_id: Integer.
+            The index of shard, 0 to n_shard-1.
+
+        Returns
+        -------
+        Integer. Number of pairs run.
+        """
+        if shard_id<0 or shard_id>=self.n_shard:
+            raise ValueError('shard_id must be in range [0,%d), but got %d.'%(self.n_shard,shard_id))
+        completed=self.completed_tasks(shard_id)
+        tasks=[task for task in self.shard_tasks(shard_id) if task not in completed]
+        if len(tasks)==0:
+            if self.verbose>0:
+                print('shard %d/%d already done.'%(shard_id+1,self.n_shard))
+            return 0
+
+        self._pin_threads()
+        from ..fault.fault_list import generate_model_stuck_fault
+        from .scheme import _make_result_row, _write_result_row
+        from .campaign import fault_campaign
+        campaign=fault_campaign( **self.campaign_argument)
+        fault_gen_param=self.fault_gen_param
+        if 'model' not in fault_gen_param:
+            fault_gen_param=dict(fault_gen_param, model=campaign.ref_model)
+
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self._truncate_partial_row(shard_id)
+        shard_file=self.shard_file(shard_id)
+        new_file=not os.path.exists(shard_file) or os.path.getsize(shard_file)==0
+        group_size=1 if campaign.n_scenario is None else campaign.n_scenario
+
+        for group_start in range(0,len(tasks),group_size):
+            group=tasks[group_start:group_start+group_size]
+            if self.verbose>0:
+                print('shard %d/%d running pairs %d-%d/%d'%(shard_id+1,self.n_shard,group_start+1,group_start+len(group),len(tasks)))
+
+            faults=[generate_model_stuck_fault(fault_rate=fr, rng=round_rng(self.seed,fr,i), **fault_gen_param) for fr,i in group]
+            t=time.time()
+            if campaign.n_scenario is None:
+                test_results=[campaign.run_round(*faults[0])]
+            else:
+                test_results=campaign.run_round(*[list(fault_list) for fault_list in zip(*faults)])
+            t=(time.time()-t)/len(group)
+
+            for (fr,i),test_result in zip(group,test_results):
+                result_row={'fault_rate':repr(fr),'round':i}
+                result_row.update(_make_result_row(test_result,
+                                                   campaign.model.metrics_names if campaign.FT_evaluate_argument is None else None,
+                                                   runtime=t))
+                _write_result_row(shard_file, result_row, new_file)
+                new_file=False
+
+        campaign.clear_fault()
+        return len(tasks)
+
+    def run(self, n_worker=None, merge_folder=None):
+        """ Run all the shards on local worker processes.
+
+        Arguments
+        ---------
+        n_worker: Integer. Default is None.
+            Number of worker processes. If None, one process per shard.
+            Each worker process is spawned fresh, so that each shard has its own TF runtime and thread setting.
+            The calling script must be guarded by if __name__=='__main__'.
+        merge_folder: String. Default is None.
+            If not None, merge the shard results into this folder after all shards are done.
+        """
+        if n_worker is None:
+            n_worker=self.n_shard
+        with ProcessPoolExecutor(max_workers=n_worker, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures=[executor.submit(_run_shard_job, self, shard_id) for shard_id in range(self.n_shard)]
+            for future in futures:
+                future.result()
+        if merge_folder is not None:
+            self.merge(merge_folder)
+
+    def merge(self, result_save_folder, save_runtime=False):
+        """ Merge the shard results into one csv file per fault rate, named str(fault_rate)+'.csv'.
+            The same layout as the scheme scripts, rows in round order.
+
+        Arguments
+        ---------
+        result_save_folder: String.
+            The folder of merged result csv files.
+        save_runtime: Bool.
+            Keep the runtime column or not.
+
+        Returns
+        -------
+        Dictionary. {fault_rate : number of missing rounds}, the rounds not finished by any shard.
+        """
+        results={fr:dict() for fr in self.fault_rate_list}
+        for shard_id in range(self.n_shard):
+            for row in self._read_shard(shard_id):
+                fr=float(row.pop('fault_rate'))
+                i=int(row.pop('round'))
+                if not save_runtime:
+                    row.pop('runtime',None)
+                if fr in results:
+                    results[fr][i]=row
+
+        os.makedirs(result_save_folder, exist_ok=True)
+        missing=dict()
+        for fr,n_round in zip(self.fault_rate_list,self.n_round_list):
+            missing[fr]=n_round-len(results[fr])
+            if missing[fr]>0 and self.verbose>0:
+                print('fault rate %s missing %d/%d rounds.'%(str(fr),missing[fr],n_round))
+            if len(results[fr])==0:
+                continue
+            rows=[results[fr][i] for i in sorted(results[fr].keys())]
+            # write the whole merged file then rename, a merge interrupted or run along with reading won't leave a partial csv
+            with atomic_write(os.path.join(result_save_folder,str(fr)+'.csv'), 'w', newline='') as csvfile:
+                writer=csv.DictWriter(csvfile, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+        return missing
+
@@ -63,14 +63,19 @@ def view_intermediate(model,input_x,eager_mode=False):
     else:
         return [output[0] for output in intermediate_output]
                  
-def _build_intermediate_model(model,observe_layer_idxs):
-    """ Build model with observed layer input feature maps as output list """
+def _build_intermediate_model(model,observe_layer_idxs,include_output=False):
+    """ Build model with observed layer input feature maps as output list.
+        If include_output is True, the model output is appended at the end of output list.
+    """
     output_list=list()
     
     for n_layer in observe_layer_idxs:
         fmap=model.layers[n_layer].input
         output_list.append(fmap)
         
+    if include_output:
+        output_list.append(model.output)
+        
     intermediate_model=Model(inputs=model.input,outputs=output_list)   
     
     return intermediate_model
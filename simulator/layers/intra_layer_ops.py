@@ -22,6 +22,10 @@ import numpy as np
 PARALLEL_ITERATIONS=4 # number of convolution ops which can run in parallel.
 tf_while_loop=False
 INTRA_BATCH_SPLIT_FACTOR=None # number of split to cut output channel for big model non-while loop intrinsic.
+INTRINSIC_MEMORY_BUDGET=2**28 # approximate bytes of broadcast product per block for low-memory intrinsic conv and dense. None for the tf.tile implementation.
+NO_MEMORY_BUDGET='off' # the memory_budget argument of intrinsic conv and dense core for the tf.tile implementation of a single call, regardless of INTRINSIC_MEMORY_BUDGET.
+INTEGER_GEMM=False # use the exact integer GEMM engine for intrinsic conv and dense when the operand quantizers are given.
+INTEGER_GEMM_JIT=True # compile the product block kernel of integer GEMM engine with XLA, the broadcast product is fused into the reduction.
 
 def _preprocess_conv2d_input(x, data_format):
     """Transpose and cast the input before the conv2d.
@@ -62,15 +66,210 @@ def _preprocess_padding(padding):
         raise ValueError('Invalid padding: ' + str(padding))
     return padding
 
+def _intrinsic_block_shape(n_rows, n_psum, n_cols, memory_budget, element_bytes=4):
+    """Choose the block shape of low-memory intrinsic matrix multiplication.
+        The broadcast product of a block [row block, psum, column block] and its quantized copy are bounded by memory budget.
+        Prefer whole columns (output channels), then as many rows as possible.
+
+    # Arguments
+        n_rows: Integer or None. Number of rows (batch * ofmap pixels). None if unknown.
+        n_psum: Integer. Length of the reduction axis (kernel height * kernel width * input channel).
+        n_cols: Integer. Number of columns (output channels).
+        memory_budget: Integer. The bytes budget for a block.
+        element_bytes: Integer. The bytes of an element of product.
+
+    # Returns
+        Tuple of Integer. (row block, column block)
+    """
+    n_element=max(1, memory_budget//(2*element_bytes*n_psum))
+    if n_element>=n_cols:
+        col_block=n_cols
+        row_block=n_element//n_cols
+    else:
+        col_block=n_element
+        row_block=1
+    if n_rows is not None:
+        row_block=min(row_block,n_rows)
+    return row_block, col_block
+
+def _intrinsic_matmul_blocks(patches, kernel, quantize_product, memory_budget, jit_compile=False):
+    """Low-memory intrinsic quantization of matrix multiplication. 
+        Stream over blocks of rows and columns, each block does multiply, quantize products and reduce sum.
+        The broadcast product [rows, psum, columns] is never materialized as a whole, only one block at a time.
+        The result is identical to the tf.tile implementation, every output only reduces its own products.
+
+    # Arguments
+        patches: Tensor. [rows, psum] The input patches, the rows may be unknown.
+        kernel: Tensor. [psum, columns]
+        quantize_product: Callable. The quantization after multiplication, i.e. Q_info.quantize.
+        memory_budget: Integer. The bytes budget of broadcast product for a block.
+        jit_compile: Bool. Compile the block kernel (multiply, quantize, reduce sum) with XLA or not.
+
+    # Returns
+        Tensor. [rows, columns] The accumulated partial sum before accumulation quantization.
+    """
+    n_psum=kernel.shape.dims[0].value
+    n_cols=kernel.shape.dims[1].value
+    row_block, col_block = _intrinsic_block_shape(patches.shape.dims[0].value, n_psum, n_cols, memory_budget, patches.dtype.size)
+    
+    n_rows=patches.shape.dims[0].value
+    if n_rows is None:
+        # unknown batch, clamp the row block to the runtime rows, small batches are not padded to the budget
+        n_rows=tf.shape(patches)[0]
+        row_block=tf.maximum(tf.minimum(row_block,n_rows),1)
+    n_row_blocks=(n_rows+row_block-1)//row_block
+    n_col_blocks=-(-n_cols//col_block)
+    # pad to whole blocks
+    patches=tf.pad(patches,[[0,n_row_blocks*row_block-n_rows],[0,0]])
+    kernel=tf.pad(kernel,[[0,0],[0,n_col_blocks*col_block-n_cols]])
+    
+    def block_product(patch_tmp, kernel_tmp):
+        output_tmp = tf.multiply(tf.expand_dims(patch_tmp,axis=2), tf.expand_dims(kernel_tmp,axis=0))
+        #[row block, psum, column block]
+        # quantize after multiplication
+        output_tmp = quantize_product(output_tmp)
+        
+        return tf.reduce_sum(output_tmp,axis=1,keepdims=False)
+    
+    if jit_compile:
+        block_product = tf.function(block_product, jit_compile=True)
+    
+    def block_cond(index, outputs):
+        return index < n_row_blocks*n_col_blocks
+    
+    def block_body(index, outputs):
+        row=index//n_col_blocks
+        col=index%n_col_blocks
+        patch_tmp = tf.slice(patches,[row*row_block,0],[row_block,n_psum])
+        kernel_tmp = tf.slice(kernel,[0,col*col_block],[n_psum,col_block])
+        
+        output_tmp = block_product(patch_tmp, kernel_tmp)
+        outputs = outputs.write(index, output_tmp)
+        return [tf.add(index,1), outputs]
+    
+    index = tf.constant(0)
+    outputs = tf.TensorArray(patches.dtype, size=n_row_blocks*n_col_blocks, element_shape=[row_block if isinstance(row_block,int) else None,col_block])
+    # one block at a time, the memory of blocks in flight is bounded by budget
+    outputs = tf.while_loop( block_cond, block_body, [index, outputs], parallel_iterations=1 )[1]
+    
+    output = outputs.stack()
+    output = tf.reshape(output,[n_row_blocks,n_col_blocks,row_block,col_block])
+    output = tf.transpose(output,[0,2,1,3])
+    output = tf.reshape(output,[n_row_blocks*row_block,n_col_blocks*col_block])
+    
+    return output[:n_rows,:n_cols]
+
+
+def _integer_gemm_dtype(Q_input, Q_weight, Q_info, n_psum):
+    """Check whether the integer GEMM engine is exact for the quantizers and choose its integer type.
+        The float engine computes the products in float32, they are exact only if the operand integers have at most 24 bits in total.
+        The faulty operands may use the whole word (SA1 on sign bit), so the operand magnitude is bounded by 2^nb.
+
+    # Arguments
+        Q_input: quantizer. The quantizer of input feature map.
+        Q_weight: quantizer. The quantizer of weight.
+        Q_info: quantizer. The quantizer for multiplication and accumulation.
+        n_psum: Integer. Length of the reduction axis.
+
+    # Returns
+        tf.DType or None. tf.int32 or tf.int64 for the integer engine, None if the integer engine is not applicable.
+    """
+    if Q_info.rounding_method not in ['nearest','down','zero']:
+        return None
+    if Q_input.nb+Q_weight.nb>24:
+        return None
+    shift=Q_input.fb+Q_weight.fb-Q_info.fb
+    product_bits=Q_input.nb+Q_weight.nb+max(0,-shift)
+    accumulate_bits=Q_info.nb+int(np.ceil(np.log2(max(n_psum,1))))
+    if max(product_bits,accumulate_bits)>=31:
+        return tf.int64
+    return tf.int32
+
+def _integer_rounding_shift(X, shift, rounding_method):
+    """Integer equivalent of multiply by 2^-shift followed by quantizer.round_through.
+        Arithmetic right shift with a rounding offset for positive shift, exact left shift otherwise.
+    """
+    if shift<=0:
+        return tf.multiply(X, tf.constant(2**(-shift), X.dtype))
+    
+    shift_tensor = tf.constant(shift, X.dtype)
+    if rounding_method == 'down':
+        return tf.bitwise.right_shift(X, shift_tensor)
+    elif rounding_method == 'nearest':
+        # round half to even, same as tf.math.rint. Add half-1 and the parity of floor result.
+        parity = tf.bitwise.bitwise_and(tf.bitwise.right_shift(X, shift_tensor), tf.constant(1, X.dtype))
+        offset = tf.add(parity, tf.constant(2**(shift-1)-1, X.dtype))
+    elif rounding_method == 'zero':
+        # add 2^shift-1 to negative values, floor becomes truncate
+        sign = tf.bitwise.right_shift(X, tf.constant(X.dtype.size*8-1, X.dtype))
+        offset = tf.bitwise.bitwise_and(sign, tf.constant(2**shift-1, X.dtype))
+    else:
+        raise ValueError('Integer GEMM engine only supports \'nearest\', \'down\' and \'zero\' rounding, but got %s.'%str(rounding_method))
+        
+    return tf.bitwise.right_shift(tf.add(X, offset), shift_tensor)
+
+def _integer_capping(X, Q_info):
+    """Integer equivalent of quantizer capping, saturate or wrap-around on the integer interval of Q_info."""
+    if Q_info.overflow_mode:
+        ovf_val = tf.constant(2**(Q_info.nb-1), X.dtype)
+        ovf_capper = tf.constant(2**Q_info.nb, X.dtype)
+        return tf.subtract(tf.math.floormod(tf.add(X, ovf_val), ovf_capper), ovf_val)
+    else:
+        return tf.clip_by_value(X, tf.constant(-2**(Q_info.nb-1), X.dtype), tf.constant(2**(Q_info.nb-1)-1, X.dtype))
+
+def _integer_matmul(patches, kernel, Q_input, Q_weight, Q_info, dtype, memory_budget):
+    """Exact integer GEMM engine of intrinsic quantization. 
+        The operands are shifted to integer, the per-product quantization is done by integer rounding shift and capping,
+        the accumulation is integer sum with saturate or wrap-around of Q_info.
+        If no product can be rounded or capped (shift <= 0 and no overflow), the products are exact and it is a plain integer matmul.
+        Otherwise, stream the blocks of broadcast integer product like the low-memory float engine, 
+        the block kernel is compiled with XLA if INTEGER_GEMM_JIT.
+
+        The result is bit-exact with the float engine whenever the float32 partial sums are exact, 
+        i.e. the accumulated integer stays below 2^24. Beyond that, the integer engine is the exact fixed-point result.
+
+    # Arguments
+        patches: Tensor. [rows, psum] The quantized input patches.
+        kernel: Tensor. [psum, columns] The quantized kernel.
+        Q_input: quantizer. The quantizer of input feature map.
+        Q_weight: quantizer. The quantizer of weight.
+        Q_info: quantizer. The quantizer for multiplication and accumulation.
+        dtype: tf.DType. The integer type from _integer_gemm_dtype.
+        memory_budget: Integer or None. The bytes budget of broadcast product for a block.
+
+    # Returns
+        Tensor. [rows, columns] The output after accumulation quantization in fixed-point value.
+    """
+    patches = tf.cast(Q_input.left_shift_2int(patches), dtype)
+    kernel = tf.cast(Q_weight.left_shift_2int(kernel), dtype)
+    shift = Q_input.fb+Q_weight.fb-Q_info.fb
+    
+    if shift<=0 and Q_input.nb+Q_weight.nb-shift<Q_info.nb:
+        output = tf.matmul(patches, kernel)
+        output = tf.multiply(output, tf.constant(2**(-shift), dtype))
+    else:
+        def quantize_product(product):
+            product = _integer_rounding_shift(product, shift, Q_info.rounding_method)
+            return _integer_capping(product, Q_info)
+        if memory_budget is None:
+            memory_budget = 2**28
+        output = _intrinsic_matmul_blocks(patches, kernel, quantize_product, memory_budget, jit_compile=INTEGER_GEMM_JIT)
+    
+    # quantize after accumulation
+    output = _integer_capping(output, Q_info)
+    return Q_info.right_shift_back(output)
 
 
-def QuantizedDenseCore(inputs, kernel, Q_info):
+def QuantizedDenseCore(inputs, kernel, Q_info, memory_budget=None, Q_input=None, Q_weight=None):
     """ Intrinsic quantization of the Dense layer.
     
     Arguments
     ---------
     | inputs:  [batch_size, input_neurons] 
     | kernel: [input_neurons, output_neurons]
+    | memory_budget: The bytes budget of broadcast product for low-memory intrinsic. If None, use INTRINSIC_MEMORY_BUDGET. 
+      If NO_MEMORY_BUDGET, use the tf.tile implementation.
+    | Q_input, Q_weight: The quantizers of inputs and kernel. Required by the integer GEMM engine (INTEGER_GEMM).
     
     Returns
     -------
@@ -80,10 +279,30 @@ def QuantizedDenseCore(inputs, kernel, Q_info):
     batch_size = inputs.shape.dims[0].value  
     input_size = inputs.shape.dims[1].value
     output_size = kernel.get_shape().dims[1].value
+    
+    if memory_budget is None:
+        memory_budget = INTRINSIC_MEMORY_BUDGET
+    elif memory_budget == NO_MEMORY_BUDGET:
+        memory_budget = None
+    if Q_info.rounding_method == 'stochastic':
+        # stochastic rounding decides on the mean of whole product tensor, it can't be computed by blocks
+        memory_budget = None
+        
+    int_dtype = None
+    if INTEGER_GEMM and Q_input is not None and Q_weight is not None:
+        int_dtype = _integer_gemm_dtype(Q_input, Q_weight, Q_info, input_size)
+    
+    if int_dtype is not None:
+        output = _integer_matmul(inputs, kernel, Q_input, Q_weight, Q_info, int_dtype, memory_budget)
 
-    if not tf_while_loop:
+    elif not tf_while_loop:
         
-        if INTRA_BATCH_SPLIT_FACTOR is None:
+        if INTRA_BATCH_SPLIT_FACTOR is None and memory_budget is not None:
+            output = _intrinsic_matmul_blocks(inputs, kernel, Q_info.quantize, memory_budget)
+            # quantize after accumulation
+            output = Q_info.quantize(output) 
+            
+        elif INTRA_BATCH_SPLIT_FACTOR is None:
             # work around of tf.slice bug in multi gpu condition
             if batch_size is None:
                 batch_size = tf.shape(inputs)[:1]
@@ -194,12 +413,19 @@ def QuantizedDenseCore(inputs, kernel, Q_info):
 ### Reimplemented Conv ###
 ##########################
 # parallel_iterations and swap_memory in tf.while_loops can be adjusted
-def QuantizedConv2DCore(inputs, kernel, strides, rate, padding, data_format, Q_info):
+def QuantizedConv2DCore(inputs, kernel, strides, rate, padding, data_format, Q_info, memory_budget=None, Q_input=None, Q_weight=None):
     """ Intrinsic quantization of of the 2D convolution layer.
+        With memory budget, the products are computed by blocks of ofmap pixels and output channels (low-memory intrinsic),
+        else the patches and kernel are tiled to [batch, ofmap height, ofmap width, psum, output channel] at once.
+        With INTEGER_GEMM and the operand quantizers given, use the exact integer GEMM engine on im2col patches if applicable.
+        
     Arguments
     ---------
     | inputs:  [batch_size, image_height, image_width, input_channels] 
     | kernel: [kernel_height, kernel_width, input_channels, output_channels]
+    | memory_budget: The bytes budget of broadcast product for low-memory intrinsic. If None, use INTRINSIC_MEMORY_BUDGET. 
+      If NO_MEMORY_BUDGET, use the tf.tile implementation.
+    | Q_input, Q_weight: The quantizers of inputs and kernel. Required by the integer GEMM engine (INTEGER_GEMM).
     
     Returns
     -------
@@ -215,10 +441,58 @@ def QuantizedConv2DCore(inputs, kernel, strides, rate, padding, data_format, Q_i
     
     # split input batchwise
     batch_size = inputs.shape.dims[0].value
+    
+    if memory_budget is None:
+        memory_budget = INTRINSIC_MEMORY_BUDGET
+    elif memory_budget == NO_MEMORY_BUDGET:
+        memory_budget = None
+    if Q_info.rounding_method == 'stochastic':
+        # stochastic rounding decides on the mean of whole product tensor, it can't be computed by blocks
+        memory_budget = None
+        
+    int_dtype = None
+    if INTEGER_GEMM and Q_input is not None and Q_weight is not None:
+        kernel_shape = kernel.get_shape()
+        int_dtype = _integer_gemm_dtype(Q_input, Q_weight, Q_info, kernel_shape.dims[0].value*kernel_shape.dims[1].value*kernel_shape.dims[2].value)
 
-    if not tf_while_loop:
+    if int_dtype is not None:
+        # im2col
+        output = tf.image.extract_patches(inputs, 
+                                          sizes=(1,kernel_shape.dims[0], kernel_shape.dims[1],1), 
+                                          strides=strides,
+                                          rates=rate,
+                                          padding=padding )
+        patch_shape = output.get_shape()
+        
+        output = tf.reshape(output, [-1,patch_shape.dims[3].value])
+        kernel_tmp = tf.reshape(kernel, [patch_shape.dims[3].value,kernel_shape.dims[3].value])
+        
+        output = _integer_matmul(output, kernel_tmp, Q_input, Q_weight, Q_info, int_dtype, memory_budget)
+        output = tf.reshape(output, [-1,patch_shape.dims[1].value,patch_shape.dims[2].value,kernel_shape.dims[3].value])
+
+    elif not tf_while_loop:
         
-        if INTRA_BATCH_SPLIT_FACTOR is None:
+        if INTRA_BATCH_SPLIT_FACTOR is None and memory_budget is not None:
+            kernel_shape = kernel.get_shape()
+        
+            # get output for conv multiply
+            output = tf.image.extract_patches(inputs, 
+                                              sizes=(1,kernel_shape.dims[0], kernel_shape.dims[1],1), 
+                                              strides=strides,
+                                              rates=rate,
+                                              padding=padding )
+            patch_shape = output.get_shape()
+            #[batch, ofmap height, ofmap width, num of kernel psum * input channel]
+            
+            output = tf.reshape(output, [-1,patch_shape.dims[3].value])
+            kernel_tmp = tf.reshape(kernel, [patch_shape.dims[3].value,kernel_shape.dims[3].value])
+            
+            output = _intrinsic_matmul_blocks(output, kernel_tmp, Q_info.quantize, memory_budget)
+            output = tf.reshape(output, [-1,patch_shape.dims[1].value,patch_shape.dims[2].value,kernel_shape.dims[3].value])
+            # quantize after accumulation
+            output = Q_info.quantize(output)     
+            
+        elif INTRA_BATCH_SPLIT_FACTOR is None:
             # work around of tf.slice bug in multi gpu condition
             if batch_size is None:
                 batch_size=tf.shape(inputs)[:1]
@@ -18,11 +18,91 @@ from tensorflow.keras import initializers
 from tensorflow.python.keras.utils import conv_utils
 
 from .quantized_ops import quantizer
-from ..fault.fault_ops import inject_layer_sa_fault_tensor
+from ..fault.fault_ops import inject_layer_sa_fault_tensor, quantize_inject_layer_sa_fault_tensor
 from ..fault.fault_mac import mac_fault_injector
 from .intra_layer_ops import QuantizedDenseCore, QuantizedConv2DCore, QuantizedBatchNormalizationCore, QuantizedDepthwiseConv2DCore, DistributedConv2D, QuantizedDistributedConv2DCore
 
 
+def _get_n_scenario(quantized_param, param):
+    """ Get the number of fault scenarios from the leading axis of faulty parameter.
+        The faulty parameter has an extra leading scenario axis in batched multi-round fault injection.
+        Return None for single scenario.
+    """
+    if quantized_param is None or param is None:
+        return None
+    if len(quantized_param.shape)==len(param.shape)+1:
+        return quantized_param.shape[0]
+    return None
+
+def _scenario_kernel_call(op, inputs, kernel, n_scenario):
+    """ Call the layer operation for each fault scenario with its own faulty kernel. 
+        The inputs batch is concatenated by scenarios. The kernel has leading scenario axis.
+    """
+    inputs=tf.split(inputs, n_scenario, axis=0)
+    kernel=tf.unstack(kernel, n_scenario, axis=0)
+    outputs=[op(inputs[i],kernel[i]) for i in range(n_scenario)]
+    return tf.concat(outputs, axis=0)
+
+def _scenario_bias_add(outputs, bias, n_scenario, data_format=None):
+    """ Add the faulty bias with leading scenario axis to the scenario concatenated outputs. """
+    output_shape=tf.shape(outputs)
+    ndim=len(outputs.shape)
+    outputs=tf.reshape(outputs, tf.concat([[n_scenario,-1],output_shape[1:]],0))
+    if data_format=='channels_first':
+        bias=tf.reshape(bias, [n_scenario,1,bias.shape[-1]]+[1 for _ in range(ndim-2)])
+    else:
+        bias=tf.reshape(bias, [n_scenario]+[1 for _ in range(ndim-1)]+[bias.shape[-1]])
+    outputs=tf.add(outputs, bias)
+    return tf.reshape(outputs, output_shape)
+
+
+class _frozen_weight_cache:
+    """ The cache of quantized faulty weights of a layer for frozen weights mode.
+        The weights are constant within a fault round, thus computed once per round instead of every batch.
+        Plain class holding tf.Variable, so the cached variables are not tracked as layer weights.
+    """
+    def __init__(self):
+        self.variables=dict()
+        
+    def assign(self, name, value):
+        """ Assign the computed weight to cached variable. Create the variable if not exist or shape changed. 
+            Return True if the variable is created, the layer call must be traced again.
+        """
+        if value is None:
+            created=name in self.variables
+            self.variables.pop(name,None)
+            return created
+        variable=self.variables.get(name)
+        if variable is None or variable.shape!=value.shape:
+            with tf.init_scope():
+                self.variables[name]=tf.Variable(value,trainable=False,name='frozen_'+name)
+            return True
+        variable.assign(value)
+        return False
+    
+    def get(self, name):
+        """ Get the cached weight. Raise error if it is not computed yet. """
+        if name not in self.variables:
+            raise ValueError('The frozen %s is not computed. freeze_weights() must be called before the layer call with frozen_weights=True.'%name)
+        return self.variables[name]
+    
+def _freeze_layer_weights(layer, kernel):
+    """ Compute the quantized kernel and bias with SA fault injection once and cache them for the frozen weights mode.
+        Return True if the cached variables are created, the layer call must be traced again.
+    """
+    if layer.quant_mode not in ['hybrid','intrinsic']:
+        return False
+    if isinstance(layer.quantizer,list) and len(layer.quantizer)==3:
+        quantizer_weight =layer.quantizer[1]
+    else:
+        quantizer_weight =layer.quantizer
+    
+    created=layer.frozen_cache.assign('kernel', quantize_inject_layer_sa_fault_tensor(kernel, layer.weight_sa_fault_injection[0], quantizer_weight))
+    if layer.use_bias:
+        created=layer.frozen_cache.assign('bias', quantize_inject_layer_sa_fault_tensor(layer.bias, layer.weight_sa_fault_injection[1], quantizer_weight)) or created
+    return created
+
+
 class Clip(constraints.Constraint):
     def __init__(self, min_value, max_value=None):
         self.min_value = min_value
@@ -55,6 +135,8 @@ class QuantizedDense(Dense):
         self.ofmap_sa_fault_injection=ofmap_sa_fault_injection
         self.mac_unit=mac_unit
         self.last_layer=last_layer
+        self.frozen_weights=False
+        self.frozen_cache=_frozen_weight_cache()
         super(QuantizedDense, self).__init__(units, **kwargs)
     
     def build(self, input_shape):
@@ -80,6 +162,13 @@ class QuantizedDense(Dense):
         self.built = True
 
 
+    def freeze_weights(self):
+        """ Compute the quantized faulty kernel and bias once and cache them, call uses the cached weights when frozen_weights is True.
+            Must be called again after the weights or weight faults changed. 
+            Return True if the cached variables are created, the model must be traced again.
+        """
+        return _freeze_layer_weights(self, self.kernel)
+
     def call(self, inputs):
         if self.quant_mode not in [None,'extrinsic','hybrid','intrinsic']:
             raise ValueError('Invalid quantization mode. The \'quant_mode\' argument must be one of \'extrinsic\' , \'intrinsic\' , \'hybrid\' or None.')
@@ -94,24 +183,35 @@ class QuantizedDense(Dense):
             quantizer_weight =self.quantizer
             quantizer_output =self.quantizer
             
-        # quantize kernel
+        # quantize kernel and kernel SA fault injection
+        if self.quant_mode in ['hybrid','intrinsic']:
+            if self.frozen_weights:
+                quantized_kernel = self.frozen_cache.get('kernel')
+            else:
+                quantized_kernel = quantize_inject_layer_sa_fault_tensor(self.kernel, self.weight_sa_fault_injection[0], quantizer_weight)
+        # quantize input and input SA fault injection
         if self.quant_mode in ['hybrid','intrinsic']:
-            quantized_kernel = quantizer_weight.quantize(self.kernel)
-        # kernel SA fault injection
-        if self.weight_sa_fault_injection[0] is not None and self.quant_mode in ['hybrid','intrinsic']:
-            quantized_kernel = inject_layer_sa_fault_tensor(quantized_kernel, self.weight_sa_fault_injection[0], quantizer_weight)
-        # quantize input
+            inputs = quantize_inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
+        
+        # fault scenarios of batched multi-round fault injection
+        n_scenario = None
         if self.quant_mode in ['hybrid','intrinsic']:
-            inputs = quantizer_input.quantize(inputs)
-        # input SA fault injection
-        if self.ifmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic']:
-            inputs = inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
+            n_scenario = _get_n_scenario(quantized_kernel, self.kernel)
+        if n_scenario is not None and self.mac_unit is not None:
+            raise ValueError('Batched multi-round fault injection with weight fault scenarios does not support MAC unit fault.')
         
         # fully-connected layer call
         if self.quant_mode == 'intrinsic':
-            output = QuantizedDenseCore(inputs, quantized_kernel, quantizer_output)
+            if n_scenario is None:
+                output = QuantizedDenseCore(inputs, quantized_kernel, quantizer_output, Q_input=quantizer_input, Q_weight=quantizer_weight)
+            else:
+                output = _scenario_kernel_call(lambda x,k: QuantizedDenseCore(x, k, quantizer_output, Q_input=quantizer_input, Q_weight=quantizer_weight), inputs, quantized_kernel, n_scenario)
         elif self.quant_mode == 'hybrid':
-            output = K.dot(inputs, quantized_kernel)
+            if n_scenario is None:
+                output = K.dot(inputs, quantized_kernel)
+            else:
+                output = tf.matmul(tf.reshape(inputs, [n_scenario,-1,inputs.shape[-1]]), quantized_kernel)
+                output = tf.reshape(output, [-1,self.units])
             output = quantizer_output.quantize(output)                        
         elif self.quant_mode in ['extrinsic',None]:
             output = K.dot(inputs, self.kernel)
@@ -119,13 +219,17 @@ class QuantizedDense(Dense):
         # add bias
         if self.use_bias:
             if self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = quantizer_weight.quantize(self.bias)
-            
-            if self.weight_sa_fault_injection[1] is not None and self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = inject_layer_sa_fault_tensor(quantized_bias, self.weight_sa_fault_injection[1], quantizer_weight)
+                if self.frozen_weights:
+                    quantized_bias = self.frozen_cache.get('bias')
+                else:
+                    quantized_bias = quantize_inject_layer_sa_fault_tensor(self.bias, self.weight_sa_fault_injection[1], quantizer_weight)
                 
             if self.quant_mode in ['hybrid','intrinsic']:
-                output = K.bias_add(output, quantized_bias)
+                n_scenario_bias = _get_n_scenario(quantized_bias, self.bias)
+                if n_scenario_bias is None:
+                    output = K.bias_add(output, quantized_bias)
+                else:
+                    output = _scenario_bias_add(output, quantized_bias, n_scenario_bias)
                 output = quantizer_output.quantize(output)
             elif self.quant_mode in ['extrinsic',None]:
                 output = K.bias_add(output, self.bias)
@@ -139,13 +243,11 @@ class QuantizedDense(Dense):
         # activation function
         if self.activation is not None:
             output = self.activation(output)
-        # quantize output
-        if self.quant_mode in ['extrinsic','hybrid','intrinsic'] and not self.last_layer:
+        # quantize output and output SA fault injection 
+        if self.ofmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic'] and not self.last_layer and self.mac_unit is None:
+            output = quantize_inject_layer_sa_fault_tensor(output, self.ofmap_sa_fault_injection, quantizer_output)
+        elif self.quant_mode in ['extrinsic','hybrid','intrinsic'] and not self.last_layer:
             output = quantizer_output.quantize(output)
-        # output SA fault injection 
-        if self.ofmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic'] and not self.last_layer:
-            if self.mac_unit is None:
-                output = inject_layer_sa_fault_tensor(output, self.ofmap_sa_fault_injection, quantizer_output)
 
         return output
 
@@ -181,6 +283,8 @@ class QuantizedConv2D(Conv2D):
         self.ofmap_sa_fault_injection=ofmap_sa_fault_injection
         self.mac_unit=mac_unit
         self.last_layer=last_layer
+        self.frozen_weights=False
+        self.frozen_cache=_frozen_weight_cache()
         
     def build(self, input_shape):
         if self.data_format == 'channels_first':
@@ -214,6 +318,13 @@ class QuantizedConv2D(Conv2D):
         self.input_spec = InputSpec(ndim=4, axes={channel_axis: input_dim})
         self.built = True
 
+    def freeze_weights(self):
+        """ Compute the quantized faulty kernel and bias once and cache them, call uses the cached weights when frozen_weights is True.
+            Must be called again after the weights or weight faults changed. 
+            Return True if the cached variables are created, the model must be traced again.
+        """
+        return _freeze_layer_weights(self, self.kernel)
+
     def call(self, inputs):
         if self.quant_mode not in [None,'extrinsic','hybrid','intrinsic']:
             raise ValueError('Invalid quantization mode. The \'quant_mode\' argument must be one of \'extrinsic\' , \'intrinsic\' , \'hybrid\' or None.')
@@ -228,38 +339,52 @@ class QuantizedConv2D(Conv2D):
             quantizer_weight =self.quantizer
             quantizer_output =self.quantizer
 
-        # quantize kernel
+        # quantize kernel and kernel SA fault injection
         if self.quant_mode in ['hybrid','intrinsic']:
-            quantized_kernel = quantizer_weight.quantize(self.kernel)
-        # kernel SA fault injection
-        if self.weight_sa_fault_injection[0] is not None and self.quant_mode in ['hybrid','intrinsic']:
-            quantized_kernel = inject_layer_sa_fault_tensor(quantized_kernel, self.weight_sa_fault_injection[0], quantizer_weight)
-        # quantize input
+            if self.frozen_weights:
+                quantized_kernel = self.frozen_cache.get('kernel')
+            else:
+                quantized_kernel = quantize_inject_layer_sa_fault_tensor(self.kernel, self.weight_sa_fault_injection[0], quantizer_weight)
+        # quantize input and input SA fault injection
+        if self.quant_mode in ['hybrid','intrinsic']:
+            inputs = quantize_inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
+
+        # fault scenarios of batched multi-round fault injection
+        n_scenario = None
         if self.quant_mode in ['hybrid','intrinsic']:
-            inputs = quantizer_input.quantize(inputs)
-        # input SA fault injection
-        if self.ifmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic']:
-            inputs = inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
+            n_scenario = _get_n_scenario(quantized_kernel, self.kernel)
+        if n_scenario is not None and self.mac_unit is not None:
+            raise ValueError('Batched multi-round fault injection with weight fault scenarios does not support MAC unit fault.')
 
         # convolution 2D layer call
         if self.quant_mode == 'intrinsic':
             strides = (1,self.strides[0],self.strides[1],1)
             dilation_rate = (1,self.dilation_rate[0],self.dilation_rate[1],1)
-            outputs = QuantizedConv2DCore(
-                    inputs,
-                    quantized_kernel,
+            conv_op = lambda x,k: QuantizedConv2DCore(
+                    x,
+                    k,
                     strides, dilation_rate,
                     self.padding,
                     self.data_format,
-                    quantizer_output)
+                    quantizer_output,
+                    Q_input=quantizer_input,
+                    Q_weight=quantizer_weight)
+            if n_scenario is None:
+                outputs = conv_op(inputs, quantized_kernel)
+            else:
+                outputs = _scenario_kernel_call(conv_op, inputs, quantized_kernel, n_scenario)
         elif self.quant_mode == 'hybrid':
-            outputs = K.conv2d(
-                    inputs,
-                    quantized_kernel,
+            conv_op = lambda x,k: K.conv2d(
+                    x,
+                    k,
                     strides=self.strides,
                     padding=self.padding,
                     data_format=self.data_format,
                     dilation_rate=self.dilation_rate)
+            if n_scenario is None:
+                outputs = conv_op(inputs, quantized_kernel)
+            else:
+                outputs = _scenario_kernel_call(conv_op, inputs, quantized_kernel, n_scenario)
             outputs = quantizer_output.quantize(outputs)                        
         elif self.quant_mode in ['extrinsic',None]:
             outputs = K.conv2d(
@@ -273,16 +398,20 @@ class QuantizedConv2D(Conv2D):
         # add bias
         if self.use_bias:
             if self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = quantizer_weight.quantize(self.bias)
-            
-            if self.weight_sa_fault_injection[1] is not None and self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = inject_layer_sa_fault_tensor(quantized_bias, self.weight_sa_fault_injection[1], quantizer_weight)
+                if self.frozen_weights:
+                    quantized_bias = self.frozen_cache.get('bias')
+                else:
+                    quantized_bias = quantize_inject_layer_sa_fault_tensor(self.bias, self.weight_sa_fault_injection[1], quantizer_weight)
 
             if self.quant_mode in ['hybrid','intrinsic']:
-                outputs = K.bias_add(
-                        outputs,
-                        quantized_bias,
-                        data_format=self.data_format)          
+                n_scenario_bias = _get_n_scenario(quantized_bias, self.bias)
+                if n_scenario_bias is None:
+                    outputs = K.bias_add(
+                            outputs,
+                            quantized_bias,
+                            data_format=self.data_format)
+                else:
+                    outputs = _scenario_bias_add(outputs, quantized_bias, n_scenario_bias, data_format=self.data_format)
                 outputs = quantizer_output.quantize(outputs)
             elif self.quant_mode in ['extrinsic',None]:
                 outputs = K.bias_add(
@@ -302,13 +431,11 @@ class QuantizedConv2D(Conv2D):
         # activation function
         if self.activation is not None:
             outputs = self.activation(outputs)
-        # quantize output
-        if self.quant_mode in ['extrinsic','hybrid','intrinsic'] and not self.last_layer:
+        # quantize output and output SA fault injection 
+        if self.ofmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic'] and not self.last_layer and self.mac_unit is None:
+            outputs = quantize_inject_layer_sa_fault_tensor(outputs, self.ofmap_sa_fault_injection, quantizer_output)
+        elif self.quant_mode in ['extrinsic','hybrid','intrinsic'] and not self.last_layer:
             outputs = quantizer_output.quantize(outputs)
-        # output SA fault injection 
-        if self.ofmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic'] and not self.last_layer:
-            if self.mac_unit is None:
-                outputs = inject_layer_sa_fault_tensor(outputs, self.ofmap_sa_fault_injection, quantizer_output)
 
         return outputs
 
@@ -454,10 +581,7 @@ class QuantizedBatchNormalization(BatchNormalization):
                     
                     
                 if self.quant_mode in ['hybrid','intrinsic']:
-                    quantized_inputs = quantizer_input.quantize(inputs)
-                    
-                if self.ifmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic']:
-                    quantized_inputs = inject_layer_sa_fault_tensor(quantized_inputs, self.ifmap_sa_fault_injection, quantizer_input)
+                    quantized_inputs = quantize_inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
 
                 
                 if self.quant_mode == 'intrinsic':
@@ -526,11 +650,40 @@ class QuantizedBatchNormalization(BatchNormalization):
                     
                     
                 if self.quant_mode in ['hybrid','intrinsic']:
-                    quantized_inputs = quantizer_input.quantize(inputs)
-                    
-                if self.ifmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic']:
-                    quantized_inputs = inject_layer_sa_fault_tensor(quantized_inputs, self.ifmap_sa_fault_injection, quantizer_input)
+                    quantized_inputs = quantize_inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
 
+                # fault scenarios of batched multi-round fault injection
+                n_scenario = None
+                if self.quant_mode in ['hybrid','intrinsic']:
+                    for param, quantized_param in [(self.moving_mean,moving_mean),(self.moving_variance,moving_variance),(self.beta,beta),(self.gamma,gamma)]:
+                        n_scenario = _get_n_scenario(quantized_param, param) or n_scenario
+                        
+                if n_scenario is not None:
+                    # batch normalization is elementwise, compute each scenario with its own faulty parameters by broadcasting
+                    scenario_shape = [n_scenario] + [1 for _ in range(ndim)]
+                    scenario_shape[-1] = input_shape[-1]
+                    moving_mean, moving_variance, beta, gamma = \
+                        [None if p is None else (tf.reshape(p, scenario_shape) if len(p.shape)==2 else p) for p in [moving_mean, moving_variance, beta, gamma]]
+                    quantized_inputs = tf.reshape(quantized_inputs, [n_scenario,-1]+list(input_shape[1:]))
+                    if self.quant_mode == 'intrinsic':
+                        output = QuantizedBatchNormalizationCore(
+                                quantized_inputs,
+                                moving_mean,
+                                moving_variance,
+                                beta,
+                                gamma,
+                                self.epsilon,
+                                quantizer_output)
+                    else:
+                        output = tf.nn.batch_normalization(
+                                quantized_inputs,
+                                moving_mean,
+                                moving_variance,
+                                beta,
+                                gamma,
+                                self.epsilon)
+                        output = quantizer_output.quantize(output)
+                    return tf.reshape(output, [-1]+list(input_shape[1:]))
                 
                 if self.quant_mode == 'intrinsic':
                     return QuantizedBatchNormalizationCore(
@@ -646,6 +799,8 @@ class QuantizedDepthwiseConv2D(DepthwiseConv2D):
         self.ofmap_sa_fault_injection=ofmap_sa_fault_injection
         self.mac_unit=mac_unit
         self.last_layer=last_layer
+        self.frozen_weights=False
+        self.frozen_cache=_frozen_weight_cache()
 
     def build(self, input_shape):
         if len(input_shape) < 4:
@@ -684,6 +839,13 @@ class QuantizedDepthwiseConv2D(DepthwiseConv2D):
         self.input_spec = InputSpec(ndim=4, axes={channel_axis: input_dim})
         self.built = True
 
+    def freeze_weights(self):
+        """ Compute the quantized faulty depthwise kernel and bias once and cache them, call uses the cached weights when frozen_weights is True.
+            Must be called again after the weights or weight faults changed. 
+            Return True if the cached variables are created, the model must be traced again.
+        """
+        return _freeze_layer_weights(self, self.depthwise_kernel)
+
     def call(self, inputs, training=None):
         if self.quant_mode not in [None,'extrinsic','hybrid','intrinsic']:
             raise ValueError('Invalid quantization mode. The \'quant_mode\' argument must be one of \'extrinsic\' , \'intrinsic\' , \'hybrid\' or None.')
@@ -698,38 +860,50 @@ class QuantizedDepthwiseConv2D(DepthwiseConv2D):
             quantizer_weight =self.quantizer
             quantizer_output =self.quantizer
 
-        # quantize kernel
+        # quantize input and input SA fault injection
+        if self.quant_mode in ['hybrid','intrinsic']:
+            inputs = quantize_inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
+        # quantize kernel and kernel SA fault injection
         if self.quant_mode in ['hybrid','intrinsic']:
-            inputs = quantizer_input.quantize(inputs)
-        # kernel SA fault injection
-        if self.ifmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic']:
-            inputs = inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
-        # quantize input
+            if self.frozen_weights:
+                quantized_depthwise_kernel = self.frozen_cache.get('kernel')
+            else:
+                quantized_depthwise_kernel = quantize_inject_layer_sa_fault_tensor(self.depthwise_kernel, self.weight_sa_fault_injection[0], quantizer_weight)
+
+        # fault scenarios of batched multi-round fault injection
+        n_scenario = None
         if self.quant_mode in ['hybrid','intrinsic']:
-            quantized_depthwise_kernel=quantizer_weight.quantize(self.depthwise_kernel)
-        # input SA fault injection
-        if self.weight_sa_fault_injection[0] is not None and self.quant_mode in ['hybrid','intrinsic']:
-            quantized_depthwise_kernel= inject_layer_sa_fault_tensor(quantized_depthwise_kernel, self.weight_sa_fault_injection[0], quantizer_weight)
+            n_scenario = _get_n_scenario(quantized_depthwise_kernel, self.depthwise_kernel)
+        if n_scenario is not None and self.mac_unit is not None:
+            raise ValueError('Batched multi-round fault injection with weight fault scenarios does not support MAC unit fault.')
 
         # depthwise convolution 2D layer call
         if self.quant_mode == 'intrinsic':
             strides = (1,self.strides[0],self.strides[1],1)
             dilation_rate = (1,self.dilation_rate[0],self.dilation_rate[1],1)
-            outputs = QuantizedDepthwiseConv2DCore(
-                    inputs,
-                    quantized_depthwise_kernel,
+            conv_op = lambda x,k: QuantizedDepthwiseConv2DCore(
+                    x,
+                    k,
                     strides, dilation_rate,
                     self.padding,
                     self.data_format,
                     quantizer_output)
+            if n_scenario is None:
+                outputs = conv_op(inputs, quantized_depthwise_kernel)
+            else:
+                outputs = _scenario_kernel_call(conv_op, inputs, quantized_depthwise_kernel, n_scenario)
         elif self.quant_mode == 'hybrid':
-            outputs = K.depthwise_conv2d(
-                    inputs,
-                    quantized_depthwise_kernel,
+            conv_op = lambda x,k: K.depthwise_conv2d(
+                    x,
+                    k,
                     strides=self.strides,
                     padding=self.padding,
                     dilation_rate=self.dilation_rate,
                     data_format=self.data_format)
+            if n_scenario is None:
+                outputs = conv_op(inputs, quantized_depthwise_kernel)
+            else:
+                outputs = _scenario_kernel_call(conv_op, inputs, quantized_depthwise_kernel, n_scenario)
             outputs = quantizer_output.quantize(outputs)
         elif self.quant_mode in ['extrinsic',None]:
             outputs = K.depthwise_conv2d(
@@ -743,16 +917,20 @@ class QuantizedDepthwiseConv2D(DepthwiseConv2D):
         # add bias
         if self.use_bias:
             if self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = quantizer_weight.quantize(self.bias)
-            
-            if self.weight_sa_fault_injection[1] is not None and self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = inject_layer_sa_fault_tensor(quantized_bias, self.weight_sa_fault_injection[1], quantizer_weight)
+                if self.frozen_weights:
+                    quantized_bias = self.frozen_cache.get('bias')
+                else:
+                    quantized_bias = quantize_inject_layer_sa_fault_tensor(self.bias, self.weight_sa_fault_injection[1], quantizer_weight)
 
             if self.quant_mode in ['hybrid','intrinsic']:
-                outputs = K.bias_add(
-                    outputs,
-                    quantized_bias,
-                    data_format=self.data_format)
+                n_scenario_bias = _get_n_scenario(quantized_bias, self.bias)
+                if n_scenario_bias is None:
+                    outputs = K.bias_add(
+                        outputs,
+                        quantized_bias,
+                        data_format=self.data_format)
+                else:
+                    outputs = _scenario_bias_add(outputs, quantized_bias, n_scenario_bias, data_format=self.data_format)
                 outputs = quantizer_output.quantize(outputs)
             elif self.quant_mode in ['extrinsic',None]:
                 outputs = K.bias_add(
@@ -772,13 +950,11 @@ class QuantizedDepthwiseConv2D(DepthwiseConv2D):
         # activation function
         if self.activation is not None:
             outputs = self.activation(outputs)
-        # quantize output
-        if self.quant_mode in ['extrinsic','hybrid','intrinsic']:
+        # quantize output and output SA fault injection 
+        if self.ofmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic'] and not self.last_layer and self.mac_unit is None:
+            outputs = quantize_inject_layer_sa_fault_tensor(outputs, self.ofmap_sa_fault_injection, quantizer_output)
+        elif self.quant_mode in ['extrinsic','hybrid','intrinsic']:
             outputs = quantizer_output.quantize(outputs)
-        # output SA fault injection 
-        if self.ofmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic'] and not self.last_layer:
-            if self.mac_unit is None:
-                outputs = inject_layer_sa_fault_tensor(outputs, self.ofmap_sa_fault_injection, quantizer_output)
 
         return outputs
 
@@ -846,6 +1022,8 @@ class QuantizedDistributedConv2D(Conv2D):
         self.weight_sa_fault_injection=weight_sa_fault_injection
         self.ifmap_sa_fault_injection=ifmap_sa_fault_injection
         self.ofmap_sa_fault_injection=ofmap_sa_fault_injection
+        self.frozen_weights=False
+        self.frozen_cache=_frozen_weight_cache()
         
     def build(self, input_shape):
         if self.data_format == 'channels_first':
@@ -879,6 +1057,13 @@ class QuantizedDistributedConv2D(Conv2D):
         self.input_spec = InputSpec(ndim=4, axes={channel_axis: input_dim})
         self.built = True
 
+    def freeze_weights(self):
+        """ Compute the quantized faulty kernel and bias once and cache them, call uses the cached weights when frozen_weights is True.
+            Must be called again after the weights or weight faults changed. 
+            Return True if the cached variables are created, the model must be traced again.
+        """
+        return _freeze_layer_weights(self, self.kernel)
+
     def call(self, inputs):
         if self.quant_mode not in [None,'extrinsic','hybrid','intrinsic']:
             raise ValueError('Invalid quantization mode. The \'quant_mode\' argument must be one of \'extrinsic\' , \'intrinsic\' , \'hybrid\' or None.')
@@ -894,16 +1079,13 @@ class QuantizedDistributedConv2D(Conv2D):
 
         
         if self.quant_mode in ['hybrid','intrinsic']:
-            quantized_kernel = quantizer_weight.quantize(self.kernel)
-        
-        if self.weight_sa_fault_injection[0] is not None and self.quant_mode in ['hybrid','intrinsic']:
-            quantized_kernel = inject_layer_sa_fault_tensor(quantized_kernel, self.weight_sa_fault_injection[0], quantizer_weight)
+            if self.frozen_weights:
+                quantized_kernel = self.frozen_cache.get('kernel')
+            else:
+                quantized_kernel = quantize_inject_layer_sa_fault_tensor(self.kernel, self.weight_sa_fault_injection[0], quantizer_weight)
 
         if self.quant_mode in ['hybrid','intrinsic']:
-            inputs = quantizer_input.quantize(inputs)
-        
-        if self.ifmap_sa_fault_injection is not None and self.quant_mode in ['hybrid','intrinsic']:
-            inputs = inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
+            inputs = quantize_inject_layer_sa_fault_tensor(inputs, self.ifmap_sa_fault_injection, quantizer_input)
 
 
         if self.quant_mode == 'intrinsic':
@@ -944,10 +1126,10 @@ class QuantizedDistributedConv2D(Conv2D):
 
         if self.use_bias:
             if self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = quantizer_weight.quantize(self.bias)
-            
-            if self.weight_sa_fault_injection[1] is not None and self.quant_mode in ['hybrid','intrinsic']:
-                quantized_bias = inject_layer_sa_fault_tensor(quantized_bias, self.weight_sa_fault_injection[1], quantizer_weight)
+                if self.frozen_weights:
+                    quantized_bias = self.frozen_cache.get('bias')
+                else:
+                    quantized_bias = quantize_inject_layer_sa_fault_tensor(self.bias, self.weight_sa_fault_injection[1], quantizer_weight)
 
             if self.quant_mode in ['hybrid','intrinsic']:
                 outputs[0] = K.bias_add(
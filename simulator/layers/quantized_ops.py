@@ -28,9 +28,15 @@ class quantizer:
         | Else False, the overflow and underflow value will saturate at the max and min number this fixed-point number can represent.
     stop_gradient: Bool. 
         Whether to let the gradient pass through the quantization function or not.
+    fused_inject: Bool. 
+        | Whether to fuse quantization and SA fault modulator injection in integer domain or not.
+        | If True, the layer parameters with fault modulators are quantized to integer, masked and shifted back in one pass.
+        | The result is bit-exact with quantize followed by inject_layer_sa_fault_tensor. No gradient through the faulty parameters.
+    jit_compile: Bool. 
+        Compile the fused quantize and inject kernel with XLA or not. Only used when fused_inject is True.
 
     """
-    def __init__(self,nb,fb,rounding_method='nearest',overflow_mode=False,stop_gradient=False):
+    def __init__(self,nb,fb,rounding_method='nearest',overflow_mode=False,stop_gradient=False,fused_inject=False,jit_compile=False):
         """ Quantizer initilizer """
         if not isinstance(nb,int) or not isinstance(fb,int):
             raise ValueError('The word width and fractional bits argument must be integer type!')
@@ -47,6 +53,10 @@ class quantizer:
         self.max_value=np.power(2,nb-fb-1)-np.power(0.5,fb)
         self.ovf_val=np.power(2,nb-1)
         self.ovf_capper=np.power(2,nb)
+        
+        self.fused_inject=fused_inject
+        self.jit_compile=jit_compile
+        self._fused_fn=None
 
     def round_through(self, x, rounding_method=None):
         '''Element-wise rounding to the closest integer with full gradient propagation.
@@ -175,6 +185,42 @@ class quantizer:
         
         return Xq
     
+    def quantize_2int(self, X):
+        """ 
+        Quantize input X data to the integer interval.
+        Same as quantize followed by left_shift_2int, without the shift back and forth.
+        The capping is done on the shifted integer interval, which is exact since shift factor is power of 2.
+        """
+        Xq = tf.multiply(X,self.shift_factor)
+        Xq = self.round_through(Xq)
+        Xq = self.capping(Xq, clip_through=False)
+        Xq = tf.cast(Xq,tf.int32)
+        
+        return Xq
+    
+    def _quantize_and_inject(self, X, modulator0, modulator1, modulatorF):
+        Xq = self.quantize_2int(X)
+        if modulator0 is not None:
+            Xq = tf.bitwise.bitwise_and(Xq,modulator0)
+        if modulator1 is not None:
+            Xq = tf.bitwise.bitwise_or(Xq,modulator1)
+        if modulatorF is not None:
+            Xq = tf.bitwise.bitwise_xor(Xq,modulatorF)
+        Xq = self.right_shift_back(Xq)
+        
+        return Xq
+    
+    def quantize_and_inject(self, X, modulator0=None, modulator1=None, modulatorF=None):
+        """ 
+        Fused quantization and SA fault modulator injection.
+        Quantize X to integer interval, apply the SA0 (AND), SA1 (OR), bit-flip (XOR) modulators 
+        and shift back to fixed-point in one tf.function. Compiled with XLA if jit_compile.
+        The modulators must be broadcastable to X.
+        """
+        if self._fused_fn is None:
+            self._fused_fn = tf.function(self._quantize_and_inject, jit_compile=self.jit_compile)
+        return self._fused_fn(X, modulator0, modulator1, modulatorF)
+        
     def quantize_2half(self, X, rounding_method=None, clip_through=None, overflow_sim=None):
         """ The second half of qunatize operation
             That is rounding, capping, shift back.
@@ -8,6 +8,24 @@ Memory bitmap setting for memory fault mapping
 """
 
 import numpy as np
+from ..fault.fault_rng import get_random_state
+
+# the memory fault array, one record per faulty bit
+bitmap_fault_dtype=np.dtype([('row',np.int64),('col',np.int64),('type','U8')])
+
+def fault_dict2array(fault_dict):
+    """ Convert the bitmap fault dictionary {(row,col) : fault type} to memory fault array of dtype bitmap_fault_dtype. """
+    fault_array=np.empty(len(fault_dict),dtype=bitmap_fault_dtype)
+    if len(fault_dict)>0:
+        addr=np.array(list(fault_dict.keys()))
+        fault_array['row']=addr[:,0]
+        fault_array['col']=addr[:,1]
+        fault_array['type']=list(fault_dict.values())
+    return fault_array
+
+def fault_array2dict(fault_array):
+    """ Convert the memory fault array of dtype bitmap_fault_dtype to bitmap fault dictionary {(row,col) : fault type}. """
+    return dict(zip(zip(fault_array['row'].tolist(),fault_array['col'].tolist()),fault_array['type'].tolist()))
     
 class bitmap:
     """ The bitmap of a buffer for memory fault tolerance analysis.
@@ -22,8 +40,9 @@ class bitmap:
         The word length of memory
     fault_num: Integer. 
         Number of faults in memory.
-    fault_dict: Dictionary. 
-        The fault information {location : fault type}
+    fault_dict: Dictionary or Ndarray. 
+        | The fault information {location : fault type}
+        | or the memory fault array of dtype bitmap_fault_dtype with fields row, col, type.
     """
 
     def __init__(self, row, col, wl=None):
@@ -44,7 +63,7 @@ class bitmap:
         """
         self.fault_num=int(self.row * self.col * fault_rate)
     
-    def addr_gen_mem(self,distribution='uniform',poisson_lam=None):
+    def addr_gen_mem(self,distribution='uniform',poisson_lam=None,rng=None):
         """ Genenerate the fault location in a memory
 
         Arguments
@@ -53,29 +72,32 @@ class bitmap:
             The distribution type of locaton in memory. Must be one of 'uniform', 'poisson', 'normal'.
         poisson_lam: Integer. 
             The lambda of poisson distribution.
+        rng: numpy.random.Generator, RandomState or Integer. Default is None.
+            The random stream of fault generation. If None, use the global numpy random state.
     
         Returns
         -------
         The location index Tuple(Integer).
         """
+        rng=get_random_state(rng)
         if distribution=='uniform':
-            row_tmp=np.random.randint(self.row)
-            col_tmp=np.random.randint(self.col)
+            row_tmp=rng.randint(self.row)
+            col_tmp=rng.randint(self.col)
         elif distribution=='poisson':
             if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=2:
                 raise TypeError('Poisson distribution lambda setting must be a tuple has length of 2 (row, col).')
             
             if isinstance(poisson_lam[0],int) and poisson_lam[0]>=0 and poisson_lam[0]<self.row:
-                row_tmp=np.random.poisson(poisson_lam[0])
+                row_tmp=rng.poisson(poisson_lam[0])
                 while row_tmp>=self.row:
-                    row_tmp=np.random.poisson(poisson_lam[0])
+                    row_tmp=rng.poisson(poisson_lam[0])
             else:
                 raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str((self.row,self.col)),str(poisson_lam)))
             
             if isinstance(poisson_lam[1],int) and poisson_lam[1]>=0 and poisson_lam[1]<self.col:
-                col_tmp=np.random.poisson(poisson_lam[1])
+                col_tmp=rng.poisson(poisson_lam[1])
                 while col_tmp>=self.col:
-                    col_tmp=np.random.poisson(poisson_lam[1])
+                    col_tmp=rng.poisson(poisson_lam[1])
             else:
                 raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str((self.row,self.col)),str(poisson_lam)))
     
@@ -88,7 +110,7 @@ class bitmap:
         
         return (row_tmp,col_tmp)
     
-    def addr_gen_mem_fast(self,fault_num,distribution='uniform',poisson_lam=None):
+    def addr_gen_mem_fast(self,fault_num,distribution='uniform',poisson_lam=None,rng=None):
         """ Genenerate the fault location in a memory
             Faster generation may have repetitive fault addr.
 
@@ -98,26 +120,29 @@ class bitmap:
             The distribution type of locaton in memory. Must be one of 'uniform', 'poisson', 'normal'.
         poisson_lam: Integer. 
             The lambda of poisson distribution.
+        rng: numpy.random.Generator, RandomState or Integer. Default is None.
+            The random stream of fault generation. If None, use the global numpy random state.
     
         Returns
         -------
         The location index Tuple(Integer).
         """
+        rng=get_random_state(rng)
         if distribution=='uniform':
-            row_tmp=np.random.randint(self.row,size=fault_num)
-            col_tmp=np.random.randint(self.col,size=fault_num)
+            row_tmp=rng.randint(self.row,size=fault_num)
+            col_tmp=rng.randint(self.col,size=fault_num)
         elif distribution=='poisson':
             if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=2:
                 raise TypeError('Poisson distribution lambda setting must be a tuple has length of 2 (row, col).')
             
             if isinstance(poisson_lam[0],int) and poisson_lam[0]>=0 and poisson_lam[0]<self.row:
-                row_tmp=np.random.poisson(poisson_lam[0],size=fault_num)
+                row_tmp=rng.poisson(poisson_lam[0],size=fault_num)
                 row_tmp=np.clip(row_tmp,0,self.row-1)
             else:
                 raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str((self.row,self.col)),str(poisson_lam)))
             
             if isinstance(poisson_lam[1],int) and poisson_lam[1]>=0 and poisson_lam[1]<self.col:
-                col_tmp=np.random.poisson(poisson_lam[1],size=fault_num)
+                col_tmp=rng.poisson(poisson_lam[1],size=fault_num)
                 col_tmp=np.clip(col_tmp,0,self.col-1)
             else:
                 raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str((self.row,self.col)),str(poisson_lam)))
@@ -131,34 +156,133 @@ class bitmap:
         
         return zip(row_tmp,col_tmp)
 
-    def gen_bitmap_SA_fault_dict(self,fault_rate,fast_gen=False,addr_distribution='uniform',addr_pois_lam=None,fault_type='flip',**kwargs):
+    def addr_gen_mem_unique(self,fault_num,distribution='uniform',poisson_lam=None,rng=None):
+        """ Genenerate exactly fault_num distinct fault locations in a memory. Sampling without replacement on the flat bit address.
+            The addresses are drawn in batch and the repeated ones are redrawn, the first occurance of each address is kept.
+            For uniform distribution with fault_num over a quarter of memory, take a permutation of all addresses instead.
+
+        Arguments
+        ---------
+        fault_num: Integer. 
+            Number of fault locations.
+        distribution: String. 
+            The distribution type of locaton in memory. Must be one of 'uniform', 'poisson'.
+        poisson_lam: Tuple of Integer. 
+            The lambda (row, col) of poisson distribution.
+        rng: numpy.random.Generator, RandomState or Integer. Default is None.
+            The random stream of fault generation. If None, use the global numpy random state.
+    
+        Returns
+        -------
+        The flat bit address (numtag) Ndarray with shape (fault_num,).
+        """
+        rng=get_random_state(rng)
+        n_bit=self.row*self.col
+        if fault_num>n_bit:
+            raise ValueError('Number of faults %d exceeds the memory size %d.'%(fault_num,n_bit))
+            
+        if distribution=='uniform':
+            if fault_num*4>n_bit:
+                return rng.permutation(n_bit)[:fault_num]
+            draw=lambda n: rng.randint(n_bit,size=n)
+        elif distribution=='poisson':
+            if not isinstance(poisson_lam,tuple) or len(poisson_lam)!=2:
+                raise TypeError('Poisson distribution lambda setting must be a tuple has length of 2 (row, col).')
+            for lam,size in zip(poisson_lam,(self.row,self.col)):
+                if not isinstance(lam,int) or lam<0 or lam>=size:
+                    raise ValueError('Poisson distribution Lambda must within feature map shape. Feature map shape %s but got lambda input %s'%(str((self.row,self.col)),str(poisson_lam)))
+            
+            def draw(n):
+                # out of range rows and columns are redrawn, same as addr_gen_mem
+                row_tmp=rng.poisson(poisson_lam[0],size=n)
+                col_tmp=rng.poisson(poisson_lam[1],size=n)
+                valid=np.logical_and(row_tmp<self.row,col_tmp<self.col)
+                return row_tmp[valid]*self.col+col_tmp[valid]
+        else:
+            raise NameError('Invalid type of random generation distribution. Please choose between uniform, poisson.')
+        
+        numtag=np.zeros(0,dtype=np.int64)
+        n_stall=0
+        while len(numtag)<fault_num:
+            n_prev=len(numtag)
+            numtag=np.concatenate([numtag,draw(fault_num-len(numtag))])
+            _,first_idx=np.unique(numtag,return_index=True)
+            numtag=numtag[np.sort(first_idx)]
+            # the distribution concentrates on fewer addresses than fault_num
+            n_stall=n_stall+1 if len(numtag)==n_prev else 0
+            if n_stall>=100:
+                raise ValueError('Only %d distinct addresses found for %d faults with %s distribution %s.'%(len(numtag),fault_num,distribution,str(poisson_lam)))
+            
+        return numtag
+    
+    def gen_bitmap_SA_fault_array(self,fault_rate,addr_distribution='uniform',addr_pois_lam=None,fault_type='flip',rng=None):
+        """ Generate the memory fault array with exactly fault_num distinct fault locations. 
+            The result is kept in bitmap.fault_dict and accepted by tile.fault_dict_bitmap2tile with fast_mode=True.
+
+        Arguments
+        ---------
+        fault_rate: Float. 
+            The probability of fault occurance in memory.
+        addr_distribution: String. 
+            The distribution type of address in memory. Must be one of 'uniform', 'poisson'.
+        addr_pois_lam: Tuple of Integer. 
+            The lambda of poisson distribution of memory address.
+        fault_type: String. 
+            The type of fault.
+        rng: numpy.random.Generator, RandomState or Integer. Default is None.
+            The random stream of fault generation. If None, use the global numpy random state.
+    
+        Returns
+        -------
+        The memory fault array Ndarray of dtype bitmap_fault_dtype. The number of fault generated Integer.
+        """
+        self.fault_num_gen_mem(fault_rate)
+        numtag=self.addr_gen_mem_unique(self.fault_num,distribution=addr_distribution,poisson_lam=addr_pois_lam,rng=rng)
+        
+        fault_array=np.empty(self.fault_num,dtype=bitmap_fault_dtype)
+        fault_array['row'],fault_array['col']=np.divmod(numtag,self.col)
+        fault_array['type']=fault_type
+        
+        self.fault_dict=fault_array
+        
+        return fault_array,self.fault_num
+    
+    def gen_bitmap_SA_fault_dict(self,fault_rate,fast_gen=False,addr_distribution='uniform',addr_pois_lam=None,fault_type='flip',rng=None,**kwargs):
         """ Generate the fault dictionary of memory base on its shape and with specific distibution type.
 
         Arguments
         ---------
         fault_rate: Float. 
             The probability of fault occurance in memory.
+        fast_gen: Bool. 
+            Generate the distinct fault addresses vectorized (addr_gen_mem_unique) or one by one.
         addr_distribution: String. 
             The distribution type of address in memory. Must be one of 'uniform', 'poisson', 'normal'.
         addr_pois_lam: Integer. 
             The lambda of poisson distribution of memory address.
         fault_type: String. 
             The type of fault.
+        rng: numpy.random.Generator, RandomState or Integer. Default is None.
+            The random stream of fault generation. If None, use the global numpy random state.
+        **kwargs:
+            Passed to the address generation, gen_bitmap_SA_fault_array for fast_gen or addr_gen_mem otherwise.
+            Unexpected keys raise TypeError in both cases.
     
         Returns
         -------
         The fault information Dictionary. The number of fault generated Integer.
         """
+        rng=get_random_state(rng)
         fault_count=0        
         fault_dict=dict()
         self.fault_num_gen_mem(fault_rate)
                 
         if fast_gen:
-            addr=self.addr_gen_mem_fast(self.fault_num,distribution=addr_distribution,poisson_lam=addr_pois_lam,**kwargs)
-            fault_dict=dict(zip(addr,[fault_type for _ in range(self.fault_num)]))
+            fault_array,_=self.gen_bitmap_SA_fault_array(fault_rate,addr_distribution=addr_distribution,addr_pois_lam=addr_pois_lam,fault_type=fault_type,rng=rng,**kwargs)
+            fault_dict=fault_array2dict(fault_array)
         else:
             while fault_count<self.fault_num:
-                addr=self.addr_gen_mem(distribution=addr_distribution,poisson_lam=addr_pois_lam,**kwargs)
+                addr=self.addr_gen_mem(distribution=addr_distribution,poisson_lam=addr_pois_lam,rng=rng,**kwargs)
                 
                 if addr in fault_dict.keys():
                     continue
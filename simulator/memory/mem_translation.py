@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:02:41 2026
+
+@author: Yung-Yu Tsai
+
+Compiled bitmap to layer address translation for memory fault mapping.
+For a fixed memory geometry, tile setting and layer shape the memory mapping is static,
+so it is compiled once into lookup tables and each round of memory faults is mapped by gathering.
+"""
+
+import numpy as np
+from ..fault.fault_table import fault_table, SA_TYPE_CODE, _encode
+
+# the compiled translations, keyed by translation_key
+_translation_cache=dict()
+
+def _tile_layer_shape(tile_):
+    """ The tile shape in the dimension order of layer parameter. """
+    if tile_.shape_len==2:
+        if tile_.is_fmap:
+            return (tile_.Tn,tile_.Tm)
+        else:
+            return (tile_.Tm,tile_.Tn)
+    else:
+        if tile_.is_fmap:
+            return (tile_.Tn,tile_.Tr,tile_.Tc,tile_.Tm)
+        else:
+            return (tile_.Tr,tile_.Tc,tile_.Tm,tile_.Tn)
+
+def translation_key(tile_, bitmap, layer_shape, use_bias=False):
+    """ The key of a compiled translation. The tile setting, memory geometry and layer shape. """
+    return (type(tile_).__name__,
+            _tile_layer_shape(tile_),
+            tile_.is_fmap,
+            tile_.wl,
+            tuple(tile_.row_prior),
+            tuple(tile_.col_prior),
+            bitmap.row,
+            bitmap.col,
+            tuple(layer_shape),
+            bool(use_bias))
+
+def decode_bitmap_fault(bitmap_fault, col):
+    """ The numtag and stuck-at type code of bitmap faults.
+
+    Arguments
+    ---------
+    bitmap_fault: Ndarray or Dictionary.
+        The memory fault array of dtype bitmap_fault_dtype, or the bitmap fault dictionary {(row,col) : fault type}.
+    col: Integer.
+        Number of columns in memory.
+
+    Returns
+    -------
+    (numtag, fault_type) Ndarray. The bitmap numtag int64 and the uint8 code of SA_TYPES.
+    """
+    if isinstance(bitmap_fault,np.ndarray):
+        row,addr_col,fault_type=bitmap_fault['row'].astype(np.int64), bitmap_fault['col'].astype(np.int64), bitmap_fault['type']
+    elif len(bitmap_fault)==0:
+        return np.zeros(0,dtype=np.int64), np.zeros(0,dtype=np.uint8)
+    else:
+        addr=np.array(list(bitmap_fault.keys()),dtype=np.int64)
+        row,addr_col,fault_type=addr[:,0], addr[:,1], np.array(list(bitmap_fault.values()))
+    return row*col+addr_col, _encode(fault_type,SA_TYPE_CODE,'SA_type')
+
+def _expand_csr(indptr, indices, rows):
+    """ Gather the CSR entries of rows.
+
+    Returns
+    -------
+    (row_repeat, entries) Ndarray. The position in rows of each entry and the gathered entries.
+    """
+    start=indptr[rows]
+    count=indptr[rows+1]-start
+    row_repeat=np.repeat(np.arange(len(rows)),count)
+    offset=np.arange(len(row_repeat))-np.repeat(np.cumsum(count)-count,count)
+    return row_repeat, indices[np.repeat(start,count)+offset]
+
+class mem_translation:
+    """ The compiled translation from memory bitmap address to layer parameter coordinate and bit.
+
+        | The bitmap to tile part is a word table, the tile element index of each memory word in tile range.
+          It is the result of tile.bitmap2tile on the MSB of the word, the bits in a word are in the same tile element.
+        | The tile to layer part is a CSR structure, the layer flat indices of every tile element over all tile repetitions.
+          The CSR rows are tile elements and its entries are the layer elements congruent to it modulo the tile shape.
+        | The bias of weight tile follows the bias range of tile.fault_dict_bitmap2tile.
+
+        Mapping a round of memory faults is a word table lookup and a CSR gather, no per layer numtag or base coordinate recomputation.
+        The multiple faulty bits in a parameter are kept as rows of fault_table, the same as the slow mode mapping.
+
+    Arguments
+    ---------
+    tile_: Class (tile or tile_FC).
+        The tile of layer parameter, with the memory mapping priority set.
+    bitmap: Class (bitmap).
+        The bitmap of memory. Only the geometry is used, the faults are given on mapping.
+    layer_shape: Tuple.
+        The shape of a layer parameter were divided into tile.
+    use_bias: Bool. Default is False.
+        Use bias in weight tile or not.
+
+    Example
+    -------
+    >>> translation=get_translation(wght_tile_conv1, GLB_wght, (5,5,1,8), use_bias=True)
+    >>> weight_fault_table, bias_fault_table = translation.map(GLB_wght.fault_dict)
+
+    """
+    def __init__(self, tile_, bitmap, layer_shape, use_bias=False):
+        """ Compile the translation tables """
+        if tile_.is_fmap and use_bias:
+            raise ValueError('Feature map tile with use_bias option True. Only weight tile can mapping with bias.')
+        if tile_.wl!=bitmap.wl and bitmap.wl is not None:
+            raise ValueError('Word length of tile (%d) must be the same as bitmap (%d).'%(tile_.wl,bitmap.wl))
+        if bitmap.col % tile_.wl != 0:
+            raise ValueError('The memory column size %d does not fit word length %d.'%(bitmap.col,tile_.wl))
+        if len(layer_shape)!=tile_.shape_len or any(dim is None for dim in layer_shape):
+            raise ValueError('layer_shape must be the fully defined shape of length %d, but got %s.'%(tile_.shape_len,str(layer_shape)))
+        tile_.check_prior()
+
+        self.wl=tile_.wl
+        self.layer_shape=tuple(int(dim) for dim in layer_shape)
+        self.tile_shape=_tile_layer_shape(tile_)
+        self.use_bias=use_bias
+        self.Tn=tile_.Tn
+        self.bitmap_col=bitmap.col
+
+        self.tile_size=int(np.prod(self.tile_shape))*self.wl
+        if self.tile_size>bitmap.row*bitmap.col:
+            raise ValueError('The tile is bigger than the memory !')
+        if use_bias:
+            self.bias_range=self.tile_size+self.Tn*self.wl
+            if self.bias_range>bitmap.row*bitmap.col:
+                raise ValueError('The tile is bigger than the memory !')
+        else:
+            self.bias_range=self.tile_size
+
+        self.word2tile=self._compile_word_table(tile_, bitmap)
+        self.indptr,self.indices=self._compile_layer_csr()
+
+    def _compile_word_table(self, tile_, bitmap):
+        """ The tile element index of each memory word in tile range, the same as tile.bitmap2tile on the word MSB addresses. """
+        print_detail=tile_.print_detail
+        tile_.print_detail=False
+        tile_.tile_size=self.tile_size
+        tile_.build_slice_head(bitmap)
+
+        word_numtag=np.arange(0,self.tile_size,self.wl)
+        addr=np.stack([word_numtag//bitmap.col,word_numtag%bitmap.col],axis=-1)
+        coor_head=tile_.slice_head_list[tile_.slice_head_order[addr[:,0]]]
+        coor_numtag=np.add(tile_.get_numtag(coor_head,np.full(len(addr),self.wl-1)),addr[:,1])
+        
+        word2tile=np.empty(len(addr),dtype=np.int64)
+        in_order=coor_numtag<self.tile_size
+        word2tile[in_order]=np.ravel_multi_index(tile_.numtag2coor(coor_numtag[in_order])[0].T,self.tile_shape)
+        # the words at the end of tile which being repermutated, mapped one by one the same as slow mode
+        for word in np.flatnonzero(~in_order):
+            coor,_=tile_.bitmap2tile((int(addr[word,0]),int(addr[word,1])),bitmap)
+            word2tile[word]=np.ravel_multi_index(coor,self.tile_shape)
+        tile_.print_detail=print_detail
+
+        return word2tile
+
+    def _compile_layer_csr(self):
+        """ The CSR of tile element to layer flat indices. Each layer element belongs to the tile element of its coordinate modulo tile shape.
+            The layer indices are laid out on the (tile dims, repetition dims) grid, so that the tile-major flattening is already grouped by tile element.
+        """
+        ndim=len(self.layer_shape)
+        restore_multiple=[-(-dim//tile_dim) for dim,tile_dim in zip(self.layer_shape,self.tile_shape)]
+        layer_strides=np.cumprod((self.layer_shape[1:]+(1,))[::-1])[::-1]
+        
+        layer_idx=np.zeros(self.tile_shape+tuple(restore_multiple),dtype=np.int64)
+        valid=np.ones(layer_idx.shape,dtype=bool)
+        count=np.ones(1,dtype=np.int64)
+        for axis,(dim,tile_dim,n_restore,stride) in enumerate(zip(self.layer_shape,self.tile_shape,restore_multiple,layer_strides)):
+            axis_coor=np.add.outer(np.arange(tile_dim),np.arange(n_restore)*tile_dim)
+            axis_shape=[1]*(2*ndim)
+            axis_shape[axis]=tile_dim
+            axis_shape[ndim+axis]=n_restore
+            layer_idx+=np.reshape(axis_coor*stride,axis_shape)
+            valid&=np.reshape(axis_coor<dim,axis_shape)
+            count=np.multiply.outer(count,np.sum(axis_coor<dim,axis=1)).reshape(-1)
+
+        index_dtype=np.int32 if np.prod(self.layer_shape)<np.iinfo(np.int32).max else np.int64
+        indices=layer_idx[valid].astype(index_dtype)
+        indptr=np.zeros(len(count)+1,dtype=np.int64)
+        np.cumsum(count,out=indptr[1:])
+        return indptr,indices
+
+    def map(self, bitmap_fault):
+        """ Map the memory faults to layer parameter.
+
+        Arguments
+        ---------
+        bitmap_fault: Ndarray or Dictionary.
+            The memory fault array of dtype bitmap_fault_dtype, or the bitmap fault dictionary {(row,col) : fault type}.
+            The bitmap.fault_dict of the bitmap this translation compiled with.
+
+        Returns
+        -------
+        | The fault_table of layer parameter (feature maps or weights).
+        | [weight fault_table, bias fault_table] if use_bias.
+        """
+        return self.map_numtag(*decode_bitmap_fault(bitmap_fault,self.bitmap_col))
+
+    def map_numtag(self, numtag, fault_type):
+        """ Map the decoded memory faults to layer parameter. For the faults of a buffer shared by many layers, decode once and map to each.
+
+        Arguments
+        ---------
+        numtag: Ndarray.
+            The bitmap numtag of faults.
+        fault_type: Ndarray.
+            The stuck-at type code of faults, the index in SA_TYPES.
+
+        Returns
+        -------
+        | The fault_table of layer parameter (feature maps or weights).
+        | [weight fault_table, bias fault_table] if use_bias.
+        """
+        in_tile=np.flatnonzero(numtag<self.tile_size)
+        fault_idx,layer_idx=_expand_csr(self.indptr,self.indices,self.word2tile[numtag[in_tile]//self.wl])
+        fault_idx=in_tile[fault_idx]
+        layer_table=fault_table(np.stack(np.unravel_index(layer_idx,self.layer_shape),axis=-1),
+                                self.wl-1-numtag[fault_idx]%self.wl,
+                                fault_type[fault_idx],
+                                ndim=len(self.layer_shape))
+
+        if not self.use_bias:
+            return layer_table
+
+        in_bias=np.flatnonzero(np.logical_and(numtag>=self.tile_size,numtag<self.bias_range))
+        numtag_bias=numtag[in_bias]-(self.tile_size-1)
+        bias_coor=numtag_bias//self.wl
+        n_restore=np.maximum(0,-(-(self.layer_shape[-1]-bias_coor)//self.Tn))
+        fault_idx=np.repeat(np.arange(len(in_bias)),n_restore)
+        restore_idx=np.arange(len(fault_idx))-np.repeat(np.cumsum(n_restore)-n_restore,n_restore)
+        bias_table=fault_table(np.expand_dims(bias_coor[fault_idx]+restore_idx*self.Tn,-1),
+                               self.wl-1-numtag_bias[fault_idx]%self.wl,
+                               fault_type[in_bias][fault_idx],
+                               ndim=1)
+
+        return [layer_table,bias_table]
+
+def get_translation(tile_, bitmap, layer_shape, use_bias=False):
+    """ Get the compiled mem_translation of (tile, bitmap, layer shape), compiled on first use and cached in process.
+
+    Arguments
+    ---------
+    tile_: Class (tile or tile_FC).
+        The tile of layer parameter.
+    bitmap: Class (bitmap).
+        The bitmap of memory.
+    layer_shape: Tuple.
+        The shape of a layer parameter were divided into tile.
+    use_bias: Bool. Default is False.
+        Use bias in weight tile or not.
+
+    Returns
+    -------
+    Class mem_translation.
+    """
+    key=translation_key(tile_, bitmap, layer_shape, use_bias)
+    if key not in _translation_cache:
+        _translation_cache[key]=mem_translation(tile_, bitmap, layer_shape, use_bias=use_bias)
+    return _translation_cache[key]
+
+def clear_translation_cache():
+    """ Release the compiled translations. """
+    _translation_cache.clear()
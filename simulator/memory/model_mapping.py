@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:24:09 2026
+
+@author: Yung-Yu Tsai
+
+Whole model memory fault mapping. Assign the tiles of every layer, or derive them from the buffer setting and layer shapes,
+compile the memory mapping once and map each round of GLB faults onto all layers.
+"""
+
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .mem_bitmap import bitmap
+from .tile import tile, tile_FC
+from .mem_translation import get_translation, translation_key, decode_bitmap_fault
+from ..models.layer_shape import get_layer_weight_shape
+from ..fault.fault_rng import get_random_state
+
+def _halve(size):
+    return -(-size//2)
+
+def fit_fmap_tile(fmap_shape, capacity, channel_tile=None, batch_tile=1):
+    """ Fit the feature map tile into buffer capacity. Start from the whole feature map of batch_tile,
+        halve the larger of row and column first, then the channel, then the batch.
+
+    Arguments
+    ---------
+    fmap_shape: Tuple.
+        The feature map shape (batch, row, column, channel) or (batch, channel) of FC layer.
+    capacity: Integer.
+        The number of words in buffer.
+    channel_tile: Integer. Default is None.
+        The channel size of tile before fitting. If None, the whole channel.
+    batch_tile: Integer. Default is 1.
+        The batch size of tile before fitting.
+
+    Returns
+    -------
+    Tuple. The tile shape.
+    """
+    dims=list(fmap_shape)
+    dims[0]=min(batch_tile,dims[0])
+    if channel_tile is not None:
+        dims[-1]=min(channel_tile,dims[-1])
+
+    while np.prod(dims)>capacity:
+        if len(dims)==4 and max(dims[1],dims[2])>1:
+            axis=1 if dims[1]>=dims[2] else 2
+        elif dims[-1]>1:
+            axis=len(dims)-1
+        elif dims[0]>1:
+            axis=0
+        else:
+            raise ValueError('The buffer of %d words is too small for feature map %s.'%(capacity,str(fmap_shape)))
+        dims[axis]=_halve(dims[axis])
+
+    return tuple(int(dim) for dim in dims)
+
+def fit_wght_tile(kernel_shape, capacity, use_bias=False):
+    """ Fit the weight tile into buffer capacity. Start from the whole kernel, halve the larger of input and output channel (Tm, Tn).
+        The kernel rows and columns are not tiled. The bias of Tn words is stored after the tile.
+
+    Arguments
+    ---------
+    kernel_shape: Tuple.
+        The kernel shape (row, column, input channel, output channel) or (input neuron, output neuron) of FC layer.
+    capacity: Integer.
+        The number of words in buffer.
+    use_bias: Bool. Default is False.
+        The bias is stored with the weight tile or not.
+
+    Returns
+    -------
+    Tuple. The tile shape.
+    """
+    dims=list(kernel_shape)
+    kernel_size=int(np.prod(dims[:-2]))
+
+    while kernel_size*dims[-2]*dims[-1]+(dims[-1] if use_bias else 0)>capacity:
+        if dims[-2]>=dims[-1] and dims[-2]>1:
+            axis=len(dims)-2
+        elif dims[-1]>1:
+            axis=len(dims)-1
+        else:
+            raise ValueError('The buffer of %d words is too small for weight %s.'%(capacity,str(kernel_shape)))
+        dims[axis]=_halve(dims[axis])
+
+    return tuple(int(dim) for dim in dims)
+
+class model_memory_mapping:
+    """ The whole model memory fault mapping engine.
+
+        | The ifmap, weight and ofmap tiles of every convolution and dense layer are assigned by layer_tiles.
+          The tiles not assigned are derived from the buffer capacity and layer shapes by fit_fmap_tile and fit_wght_tile,
+          the channel tile of feature maps follows the Tm and Tn of the weight tile.
+        | The memory mapping of each (tile, buffer, layer shape) is compiled once by mem_translation, the layers having the same setting share one.
+        | Each round, the faults of a buffer are decoded once and mapped onto all layers by the compiled translations.
+          The returned fault lists are in model layer order, the layers without mapping are None.
+        | The compiled mapping places each tile fault on every repetition of the tile over the layer, the same as tile.fault_dict_tile2layer now.
+          The former tile.fault_dict_tile2layer skipped repetitions, the results of earlier runs are not directly comparable even with the same tiles.
+
+        Only the layer shapes are kept, the engine is picklable and could be the fault generation argument of worker processes.
+
+    Arguments
+    ---------
+    model: Keras Model or pseudo_model.
+        The model for its layer shapes.
+    ifmap_buffer: Class (bitmap).
+        The bitmap of input feature map buffer.
+    wght_buffer: Class (bitmap).
+        The bitmap of weight buffer.
+    ofmap_buffer: Class (bitmap).
+        The bitmap of output feature map buffer.
+    row_prior: List of Strings.
+        The priority of memory mapping in the memory row dimension. Consist of 'Tm', 'Tn', 'Tr', 'Tc'.
+    col_prior: List of Strings.
+        The priority of memory mapping in the memory column dimension. Consist of 'Tm', 'Tn', 'Tr', 'Tc'.
+        The FC layer tiles use the default priority of tile_FC.
+    batch_size: Integer. Default is None.
+        The batch size of feature maps, needed if the model has undefined batch dimension.
+    batch_tile: Integer. Default is 1.
+        The batch size of feature map tiles.
+    layer_tiles: Dictionary. Default is None.
+        The assigned tile shapes {layer name : {'ifmap' : tile shape, 'wght' : tile shape, 'ofmap' : tile shape}}.
+        The layers and parameters not given are derived.
+    n_thread: Integer. Default is None.
+        The number of threads for compile and mapping. The work is NumPy which releases the GIL. If None, run serially.
+    print_detail: Bool. Default is False.
+        Print the derived tiles or not.
+
+    Example
+    -------
+    >>> mem_mapping=model_memory_mapping.from_spec(ref_model, 'config_memory_ResNet50.json', batch_size=20, n_thread=4)
+    >>> mem_mapping.gen_fault(1e-6, rng=0)
+    >>> ifmap_fdl, ofmap_fdl, weight_fdl = mem_mapping.map_fault()
+
+    """
+    def __init__(self,
+                 model,
+                 ifmap_buffer,
+                 wght_buffer,
+                 ofmap_buffer,
+                 row_prior,
+                 col_prior,
+                 batch_size=None,
+                 batch_tile=1,
+                 layer_tiles=None,
+                 n_thread=None,
+                 print_detail=False):
+        self.buffers={'ifmap':ifmap_buffer,'wght':wght_buffer,'ofmap':ofmap_buffer}
+        for buffer in self.buffers.values():
+            if buffer.wl is None:
+                raise ValueError('The word length of buffer bitmap must be given for memory mapping.')
+        self.row_prior=row_prior
+        self.col_prior=col_prior
+        self.batch_size=batch_size
+        self.batch_tile=batch_tile
+        self.layer_tiles=dict() if layer_tiles is None else layer_tiles
+        self.n_thread=n_thread
+        self.print_detail=print_detail
+
+        self.n_layer=len(model.layers)
+        unknown_layers=set(self.layer_tiles.keys())-set(layer.name for layer in model.layers)
+        if len(unknown_layers)>0:
+            raise ValueError('The layers %s of layer_tiles are not in the model.'%str(sorted(unknown_layers)))
+        self.layer_mapping=[self._layer_mapping(model.layers[layer_num]) for layer_num in range(self.n_layer)]
+        self.translations=None
+
+    @classmethod
+    def from_spec(cls, model, spec, **kwargs):
+        """ Build the engine from the memory spec.
+
+        Arguments
+        ---------
+        model: Keras Model or pseudo_model.
+            The model for its layer shapes.
+        spec: Dictionary or String.
+            | The memory spec or the file path to memory spec (.json) file.
+            | {'wl' : word length,
+            |  'ifmap_buffer' : {'row' : number of rows, 'col' : number of columns in bit},
+            |  'wght_buffer' : {...},
+            |  'ofmap_buffer' : {...},
+            |  'row_prior' : List of String,
+            |  'col_prior' : List of String,
+            |  'batch_tile' : Integer (optional),
+            |  'layer_tiles' : {layer name : {'ifmap' : tile shape, 'wght' : tile shape, 'ofmap' : tile shape}} (optional)}
+        **kwargs:
+            The other arguments of model_memory_mapping. Override the spec.
+
+        Returns
+        -------
+        Class model_memory_mapping.
+        """
+        if isinstance(spec,str):
+            with open(spec, 'r') as spec_file:
+                spec=json.load(spec_file)
+
+        buffers=[bitmap(spec[name]['row'], spec[name]['col'], wl=spec['wl']) for name in ['ifmap_buffer','wght_buffer','ofmap_buffer']]
+        argument={'batch_tile':spec.get('batch_tile',1),
+                  'layer_tiles':spec.get('layer_tiles')}
+        argument.update(kwargs)
+
+        return cls(model, *buffers, spec['row_prior'], spec['col_prior'], **argument)
+
+    def _capacity(self, name):
+        buffer=self.buffers[name]
+        return buffer.row*buffer.col//buffer.wl
+
+    def _fmap_shape(self, shape):
+        shape=list(shape)
+        if shape[0] is None:
+            if self.batch_size is None:
+                raise ValueError('The model has undefined batch dimension, batch_size must be given.')
+            shape[0]=self.batch_size
+        return tuple(shape)
+
+    def _layer_mapping(self, layer):
+        """ Derive the tiles of a layer. None for the layer without memory mapping. """
+        layer_weight_shape=get_layer_weight_shape(layer)
+        if len(layer_weight_shape)==0 or len(layer_weight_shape[0]) not in [2,4] or isinstance(layer.input_shape,list):
+            return None
+
+        kernel_shape=layer_weight_shape[0]
+        use_bias=len(layer_weight_shape)>1
+        ifmap_shape=self._fmap_shape(layer.input_shape)
+        ofmap_shape=self._fmap_shape(layer.output_shape)
+        assigned=self.layer_tiles.get(layer.name,dict())
+
+        if 'wght' in assigned:
+            wght_tile_shape=tuple(assigned['wght'])
+        else:
+            wght_tile_shape=fit_wght_tile(kernel_shape,self._capacity('wght'),use_bias=use_bias)
+        Tm,Tn=wght_tile_shape[-2],wght_tile_shape[-1]
+
+        if 'ifmap' in assigned:
+            ifmap_tile_shape=tuple(assigned['ifmap'])
+        else:
+            ifmap_tile_shape=fit_fmap_tile(ifmap_shape,self._capacity('ifmap'),
+                                           channel_tile=Tm if ifmap_shape[-1]==kernel_shape[-2] else None,
+                                           batch_tile=self.batch_tile)
+        if 'ofmap' in assigned:
+            ofmap_tile_shape=tuple(assigned['ofmap'])
+        else:
+            ofmap_tile_shape=fit_fmap_tile(ofmap_shape,self._capacity('ofmap'),
+                                           channel_tile=Tn if ofmap_shape[-1]==kernel_shape[-1] else None,
+                                           batch_tile=self.batch_tile)
+
+        if len(kernel_shape)==4:
+            make_tile=lambda tile_shape,name: tile(tile_shape,is_fmap=name!='wght',wl=self.buffers[name].wl,row_prior=self.row_prior,col_prior=self.col_prior)
+        else:
+            make_tile=lambda tile_shape,name: tile_FC(tile_shape,is_fmap=name!='wght',wl=self.buffers[name].wl)
+
+        if self.print_detail:
+            print('layer %s tiles ifmap %s wght %s ofmap %s'%(layer.name,str(ifmap_tile_shape),str(wght_tile_shape),str(ofmap_tile_shape)))
+
+        return {'name':layer.name,
+                'ifmap':(make_tile(ifmap_tile_shape,'ifmap'),ifmap_shape,False),
+                'wght':(make_tile(wght_tile_shape,'wght'),kernel_shape,use_bias),
+                'ofmap':(make_tile(ofmap_tile_shape,'ofmap'),ofmap_shape,False)}
+
+    def _run(self, func, jobs):
+        """ Run the jobs serially or on threads. """
+        if self.n_thread is None or self.n_thread<=1 or len(jobs)<=1:
+            return [func(*job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=self.n_thread) as executor:
+            return list(executor.map(lambda job: func(*job), jobs))
+
+    def compile(self):
+        """ Compile the memory mapping of all layers. Called by map_fault on first use.
+
+        Returns
+        -------
+        List of Dictionary. The {'ifmap', 'wght', 'ofmap'} mem_translation of each layer, None for the layer without memory mapping.
+        """
+        jobs=dict()
+        for mapping in self.layer_mapping:
+            if mapping is None:
+                continue
+            for name in ['ifmap','wght','ofmap']:
+                tile_,shape,use_bias=mapping[name]
+                key=translation_key(tile_,self.buffers[name],shape,use_bias)
+                if key not in jobs:
+                    jobs[key]=(tile_,self.buffers[name],shape,use_bias)
+
+        compiled=dict(zip(jobs.keys(),self._run(get_translation,list(jobs.values()))))
+
+        self.translations=list()
+        for mapping in self.layer_mapping:
+            if mapping is None:
+                self.translations.append(None)
+                continue
+            translation=dict()
+            for name in ['ifmap','wght','ofmap']:
+                tile_,shape,use_bias=mapping[name]
+                translation[name]=compiled[translation_key(tile_,self.buffers[name],shape,use_bias)]
+            self.translations.append(translation)
+
+        return self.translations
+
+    def gen_fault(self, fault_rate, rng=None, addr_distribution='uniform', addr_pois_lam=None, fault_type='flip'):
+        """ Generate the faults of ifmap, weight and ofmap buffers in order, by bitmap.gen_bitmap_SA_fault_array.
+
+        Arguments
+        ---------
+        fault_rate: Float.
+            The probability of fault occurance in memory.
+        rng: numpy.random.Generator, RandomState or Integer. Default is None.
+            The random stream of fault generation. If None, use the global numpy random state.
+        addr_distribution: String.
+            The distribution type of address in memory. Must be one of 'uniform', 'poisson'.
+        addr_pois_lam: Tuple of Integer.
+            The lambda of poisson distribution of memory address.
+        fault_type: String.
+            The type of fault.
+        """
+        rng=get_random_state(rng)
+        for buffer in self.buffers.values():
+            buffer.gen_bitmap_SA_fault_array(fault_rate,addr_distribution=addr_distribution,addr_pois_lam=addr_pois_lam,fault_type=fault_type,rng=rng)
+
+    def map_fault(self):
+        """ Map the current faults of buffers onto all layers.
+            The layers sharing a compiled mapping share the same fault_table object, which should be treated as read-only.
+
+        Returns
+        -------
+        ifmap_fault_dict_list: List of fault_table.
+            The input feature map faults in model layer order.
+        ofmap_fault_dict_list: List of fault_table.
+            The output feature map faults in model layer order.
+        weight_fault_dict_list: List of List of fault_table.
+            The [kernel, bias] faults in model layer order.
+        """
+        if self.translations is None:
+            self.compile()
+
+        decoded={name:decode_bitmap_fault(buffer.fault_dict,buffer.col) for name,buffer in self.buffers.items()}
+        # buffers of the same geometry share the translation, thus the jobs are keyed by buffer as well
+        jobs=dict()
+        for translation in self.translations:
+            if translation is None:
+                continue
+            for name in ['ifmap','wght','ofmap']:
+                jobs.setdefault((id(translation[name]),name),(translation[name],name))
+
+        mapped=dict(zip(jobs.keys(),self._run(lambda translation,name: translation.map_numtag(*decoded[name]),list(jobs.values()))))
+
+        ifmap_fault_dict_list=[None for _ in range(self.n_layer)]
+        ofmap_fault_dict_list=[None for _ in range(self.n_layer)]
+        weight_fault_dict_list=[[None,None] for _ in range(self.n_layer)]
+        for layer_num,translation in enumerate(self.translations):
+            if translation is None:
+                continue
+            ifmap_fault_dict_list[layer_num]=mapped[(id(translation['ifmap']),'ifmap')]
+            ofmap_fault_dict_list[layer_num]=mapped[(id(translation['ofmap']),'ofmap')]
+            weight_fault=mapped[(id(translation['wght']),'wght')]
+            weight_fault_dict_list[layer_num]=list(weight_fault) if translation['wght'].use_bias else [weight_fault,None]
+
+        return ifmap_fault_dict_list,ofmap_fault_dict_list,weight_fault_dict_list
+
+def generate_model_memory_fault(mapping, fault_rate, rng=None, **kwargs):
+    """ Generate a round of memory faults and map them onto the model. The generation function for fault_generation_pipeline.
+
+    Arguments
+    ---------
+    mapping: Class model_memory_mapping.
+        The memory mapping engine.
+    fault_rate: Float.
+        The probability of fault occurance in memory.
+    rng: numpy.random.Generator, RandomState or Integer. Default is None.
+        The random stream of fault generation.
+    **kwargs:
+        The other arguments of model_memory_mapping.gen_fault.
+
+    Returns
+    -------
+    The fault lists (ifmap_fault_dict_list, ofmap_fault_dict_list, weight_fault_dict_list).
+    """
+    mapping.gen_fault(fault_rate, rng=rng, **kwargs)
+    return mapping.map_fault()
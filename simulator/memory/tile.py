@@ -8,6 +8,9 @@ DNN tiling for memory fault mapping
 """
 
 import numpy as np
+from ..models.layer_shape import get_layer_weight_shape
+from .mem_bitmap import fault_array2dict
+from .mem_translation import get_translation
 
 class tile:
     """The tile of a DNN feature map or weights
@@ -529,6 +532,8 @@ class tile:
             The priority of memory mapping in the memory row dimension. Consist of 'Tm', 'Tn', 'Tr', 'Tc'.
         col_prior: List of Strings. 
             The priority of memory mapping in the memory column dimension. Consist of 'Tm', 'Tn', 'Tr', 'Tc'.
+        fast_mode: Bool.
+            Map all the faults vectorized or one by one. The bitmap fault dictionary or memory fault array are both accepted.
         
         Returns
         -------
@@ -559,8 +564,12 @@ class tile:
                 raise ValueError('The tile is bigger than the memory !')
 
         if fast_mode:
-            addr=np.array(list(bitmap.fault_dict.keys()))
-            fault_type=np.array(list(bitmap.fault_dict.values()))
+            if isinstance(bitmap.fault_dict,np.ndarray):
+                addr=np.stack([bitmap.fault_dict['row'],bitmap.fault_dict['col']],axis=-1)
+                fault_type=bitmap.fault_dict['type']
+            else:
+                addr=np.array(list(bitmap.fault_dict.keys()))
+                fault_type=np.array(list(bitmap.fault_dict.values()))
             
             addr_numtag=bitmap.get_numtag(addr)
             if self.use_bias:
@@ -595,9 +604,13 @@ class tile:
                     self.bias_fault_dict=dict(zip(bias_coor,bias_info))
             
         else:
-            for addr in bitmap.fault_dict.keys():
+            if isinstance(bitmap.fault_dict,np.ndarray):
+                bitmap_fault_dict=fault_array2dict(bitmap.fault_dict)
+            else:
+                bitmap_fault_dict=bitmap.fault_dict
+            for addr in bitmap_fault_dict.keys():
                 if self.check_tile_overflow(bitmap,addr):
-                    fault_type=bitmap.fault_dict[addr]
+                    fault_type=bitmap_fault_dict[addr]
                     fault_coor,fault_bit=self.bitmap2tile(addr,bitmap)
                     
                     if fault_coor in self.fault_dict.keys():
@@ -613,7 +626,7 @@ class tile:
                 elif self.check_within_bias_range(bitmap,addr) and not self.is_fmap:
                     if self.print_detail:
                         print('bias fault %s'%str(addr))
-                    fault_type=bitmap.fault_dict[addr]
+                    fault_type=bitmap_fault_dict[addr]
                     bias_numtag=bitmap.get_numtag(addr)-self.tile_size+1
                     self.bias_fault_dict[(bias_numtag//self.wl,)]={'SA_type':fault_type,
                                                                    'SA_bit' :self.wl - bias_numtag % self.wl -1}
@@ -760,7 +773,8 @@ class tile:
         
         if len(self.fault_dict)!=0:
             tile_fault_coor=list(self.fault_dict.keys())
-            layer_fault_coor=np.add(np.tile(self.base_coor,[len(tile_fault_coor),1]),np.tile(tile_fault_coor,[len(self.base_coor),1]))
+            # every tile fault on every tile repetition, base coordinate major
+            layer_fault_coor=np.reshape(np.add(np.expand_dims(self.base_coor,1),np.expand_dims(tile_fault_coor,0)),[-1,4])
             
             tile_fault_info=list(self.fault_dict.values())
             layer_fault_info=np.tile(tile_fault_info,[len(self.base_coor)])
@@ -845,6 +859,33 @@ class tile:
     
         return self.fault_dict_tile2layer(layer_shape)
     
+    def gen_layer_fault_table(self,layer_shape,bitmap,use_bias=None):
+        """Generate the fault_table of a layer from bitmap faults by the compiled translation of (tile, bitmap, layer shape).
+           The translation is compiled on first use and reused by the later rounds.
+
+        Arguments
+        ---------
+        layer_shape: Tuple. 
+            The shape of a layer parameter were divided into tile.
+        bitmap: Class. 
+            The bitmap class for memory fault tolerance analysis.
+        use_bias: Bool.
+            Use bias in weight tile or not.
+        
+        Returns
+        -------
+        | The fault_table of a layer parameter (feature maps or weights).
+        | [weight fault_table, bias fault_table] if use_bias.
+        """
+        if self.is_fmap and use_bias:
+            raise ValueError('Feature map tile with use_bias option True. Only weight tile can mapping with bias.')
+        if use_bias is not None:
+            self.use_bias=use_bias
+            
+        translation=get_translation(self,bitmap,layer_shape,use_bias=self.use_bias)
+        
+        return translation.map(bitmap.fault_dict)
+    
     def clear(self):
         """Clear the fault information of tile"""
         self.fault_dict=dict()
@@ -1074,7 +1115,8 @@ class tile_FC(tile):
         
         if len(self.fault_dict)!=0:
             tile_fault_coor=list(self.fault_dict.keys())
-            layer_fault_coor=np.add(np.tile(self.base_coor,[len(tile_fault_coor),1]),np.tile(tile_fault_coor,[len(self.base_coor),1]))
+            # every tile fault on every tile repetition, base coordinate major
+            layer_fault_coor=np.reshape(np.add(np.expand_dims(self.base_coor,1),np.expand_dims(tile_fault_coor,0)),[-1,2])
             
             tile_fault_info=list(self.fault_dict.values())
             layer_fault_info=np.tile(tile_fault_info,[len(self.base_coor)])
@@ -1128,7 +1170,7 @@ class tile_FC(tile):
         
         
         
-def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,ifmap_tile,wght_tile,ofmap_tile,print_detail=True,fast_mode=False,**kwargs):
+def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,ifmap_tile,wght_tile,ofmap_tile,print_detail=True,fast_mode=False,compiled=False,**kwargs):
     """Generate the fault dictionary list of a layer base on its memory mapping and buffer fault information.
 
     Arguments
@@ -1149,6 +1191,11 @@ def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,if
         The tile or tile_FC class for memory fault tolerance analysis of weight feature maps.
     print_detail: Bool. 
         Print generation detail or not.
+    fast_mode: Bool.
+        Map all the faults vectorized or one by one.
+    compiled: Bool.
+        | Map the faults by the compiled translation tables of tile.gen_layer_fault_table, the fault_table are returned instead of Dictionary.
+        | The translation is compiled once per (tile, bitmap, layer shape), thus the later rounds only gather. fast_mode is ignored.
 
     Returns
     -------
@@ -1164,7 +1211,7 @@ def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,if
     
     layer_input_shape=layer.input_shape
     layer_output_shape=layer.output_shape
-    layer_weight_shape=[weight_shape.shape for weight_shape in layer.get_weights()]
+    layer_weight_shape=get_layer_weight_shape(layer)
     
     if len(layer_weight_shape)==0:
         if print_detail:
@@ -1177,7 +1224,10 @@ def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,if
             print('The input feature map buffer has no fault information. Try bitmap.gen_bitmap_SA_fault_dict or assign fault information.\nProceed without inject fault.')
         ifmap_fault_dict=None
     else:
-        ifmap_fault_dict=ifmap_tile.gen_layer_fault_dict(layer_input_shape,ifmap_buffer,fast_mode=fast_mode)
+        if compiled:
+            ifmap_fault_dict=ifmap_tile.gen_layer_fault_table(layer_input_shape,ifmap_buffer)
+        else:
+            ifmap_fault_dict=ifmap_tile.gen_layer_fault_dict(layer_input_shape,ifmap_buffer,fast_mode=fast_mode)
     
         if print_detail:
             print('    mapped layer ifmap %d faults'%(len(ifmap_fault_dict)))
@@ -1189,7 +1239,10 @@ def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,if
             print('The output feature map buffer has no fault information. Try bitmap.gen_bitmap_SA_fault_dict or assign fault information.\nProceed without inject fault.')
         ofmap_fault_dict=None
     else:
-        ofmap_fault_dict=ofmap_tile.gen_layer_fault_dict(layer_output_shape,ofmap_buffer,fast_mode=fast_mode)
+        if compiled:
+            ofmap_fault_dict=ofmap_tile.gen_layer_fault_table(layer_output_shape,ofmap_buffer)
+        else:
+            ofmap_fault_dict=ofmap_tile.gen_layer_fault_dict(layer_output_shape,ofmap_buffer,fast_mode=fast_mode)
     
         if print_detail:
             print('    mapped layer ofmap %d faults'%(len(ofmap_fault_dict)))
@@ -1205,7 +1258,10 @@ def generate_layer_memory_mapping(layer,ifmap_buffer,wght_buffer,ofmap_buffer,if
         else:
             use_bias=False
         
-        weight_fault_dict=wght_tile.gen_layer_fault_dict(layer_weight_shape[0],wght_buffer,use_bias=use_bias,fast_mode=fast_mode)
+        if compiled:
+            weight_fault_dict=wght_tile.gen_layer_fault_table(layer_weight_shape[0],wght_buffer,use_bias=use_bias)
+        else:
+            weight_fault_dict=wght_tile.gen_layer_fault_dict(layer_weight_shape[0],wght_buffer,use_bias=use_bias,fast_mode=fast_mode)
         
         if print_detail:
             print('    mapped layer weight %s faults'%(str([len(weight_fault_dict[0]),len(weight_fault_dict[1])])))
@@ -7,20 +7,33 @@ Created on Thu May 16 13:16:15 2019
 metirc for fault tolerance analysis
 """
 
+import os
 import tensorflow as tf
 from tensorflow.keras import metrics
 from tensorflow.keras import backend as K
 import numpy as np
+from .golden_reference import golden_reference_store
 
+# golden predictions loaded in process, memory-mapped from the npy file
+_fault_free_pred_cache=dict()
 
-def FT_metric_setup(model,fuseBN=None,setsize=50,score=None,fault_free_pred=None):
+def load_fault_free_pred(file_path):
+    """ Load the golden prediction npy file once per process. The array is memory-mapped read-only, 
+        thus only the rows being sliced are read from disk.
+    """
+    file_path=os.path.abspath(file_path)
+    if file_path not in _fault_free_pred_cache:
+        _fault_free_pred_cache[file_path]=np.load(file_path, mmap_mode='r')
+    return _fault_free_pred_cache[file_path]
+
+def FT_metric_setup(model,fuseBN=None,setsize=50,score=None,fault_free_pred=None,golden_store=None):
     """
     Setup prerequisites for fault tolerance metrics
 
     Parameters
     ----------
-    model : String. one of LeNet-5, Custom 4C2F, MobileNet-V1, ResNet50
-        The name of model.
+    model : String. 
+        The name of model. The name of golden reference in golden_store, or one of the presets LeNet-5, Custom 4C2F, MobileNet-V1, ResNet50.
     fuseBN : Bool, optional
         Get the fused batch normalization version of model attributes or not. The default is None.
     setsize : Integer, optional. One of 2, 10, 50.
@@ -29,15 +42,18 @@ def FT_metric_setup(model,fuseBN=None,setsize=50,score=None,fault_free_pred=None
         Get the respective setsize fault free prediction. The default is 50.
     score : List of Float, optional. [loss, top-1 accuracy, top-k accuracy]
         Manually given the loss, accuracy and top-k accuracy baseline. If None, load the save preset result. The default is None.
-    fault_free_pred : TYPE, optional
-        DESCRIPTION. The default is None.
+    fault_free_pred : Ndarray, optional
+        Manually given the golden output probabilities. If None, load the golden reference or saved preset result. The default is None.
+    golden_store : String or golden_reference_store, optional
+        The golden reference store (or its directory). If it has the reference named model, the stored score and prediction are used,
+        the fuseBN and setsize arguments are ignored. Otherwise fall back to the presets. The default is None.
 
     Returns
     -------
     ff_score : List of Float
         [loss, top-1 accuracy, top-k accuracy].
     ff_pred : Ndarray
-        Golden output probabilities of fault free model.
+        Golden output probabilities of fault free model. Memory-mapped read-only if loaded from golden store or the saved preset.
 
     """
     # score of original floating-point fault free NN
@@ -54,12 +70,20 @@ def FT_metric_setup(model,fuseBN=None,setsize=50,score=None,fault_free_pred=None
     if not isinstance(model,str):
         raise ValueError('Argument model is the name of model please use string to assign model name.')
         
-    if model.lower() in ['lenet','lenet5','lenet-5','le']:
+    if isinstance(golden_store,str):
+        golden_store=golden_reference_store(golden_store)
+        
+    if golden_store is not None and golden_store.has(model):
+        ff_score=golden_store.get_score(model)
+        ff_pred=golden_store.get_prediction(model) if fault_free_pred is None else None
+        if ff_score is None and score is None:
+            raise ValueError('Golden reference %s has no score, please give the score argument.'%model)
+    elif model.lower() in ['lenet','lenet5','lenet-5','le']:
         ff_score=lenet5_mnist_stat
-        ff_pred=np.load('../fault_free_pred/lenet5_mnist_fault_free_pred.npy')
+        ff_pred=load_fault_free_pred('../fault_free_pred/lenet5_mnist_fault_free_pred.npy')
     elif model.lower() in ['4c2f','c4f2','cifar10']:
         ff_score=C4F2fusedBN_cifar10_stat
-        ff_pred=np.load('../fault_free_pred/C4F2_cifar10_fault_free_pred.npy')
+        ff_pred=load_fault_free_pred('../fault_free_pred/C4F2_cifar10_fault_free_pred.npy')
     elif model.lower() in ['mobile','mobilenet','mobilenetv1','mobilenet-v1']:
         if fuseBN:
             ff_score=mobilenet_fusedBN_imagenet_stat
@@ -67,11 +91,11 @@ def FT_metric_setup(model,fuseBN=None,setsize=50,score=None,fault_free_pred=None
             ff_score=mobilenet_imagenet_stat
             
         if setsize==50:
-            ff_pred=np.load('../fault_free_pred/mobilenet_imagenet_fault_free_pred.npy')
+            ff_pred=load_fault_free_pred('../fault_free_pred/mobilenet_imagenet_fault_free_pred.npy')
         elif setsize==10:
-            ff_pred=np.load('../fault_free_pred/mobilenet_imagenet_fault_free_pred_setsize_10.npy')
+            ff_pred=load_fault_free_pred('../fault_free_pred/mobilenet_imagenet_fault_free_pred_setsize_10.npy')
         elif setsize==2:
-            ff_pred=np.load('../fault_free_pred/mobilenet_imagenet_fault_free_pred_setsize_2.npy')
+            ff_pred=load_fault_free_pred('../fault_free_pred/mobilenet_imagenet_fault_free_pred_setsize_2.npy')
         else:
             raise ValueError('setsize %d doesn\'t exist!'%setsize)
             
@@ -82,16 +106,19 @@ def FT_metric_setup(model,fuseBN=None,setsize=50,score=None,fault_free_pred=None
             ff_score=resnet50_imagenet_stat
             
         if setsize==50:
-            ff_pred=np.load('../fault_free_pred/resnet50_imagenet_fault_free_pred.npy')
+            ff_pred=load_fault_free_pred('../fault_free_pred/resnet50_imagenet_fault_free_pred.npy')
         elif setsize==10:
-            ff_pred=np.load('../fault_free_pred/resnet50_imagenet_fault_free_pred_setsize_10.npy')
+            ff_pred=load_fault_free_pred('../fault_free_pred/resnet50_imagenet_fault_free_pred_setsize_10.npy')
         elif setsize==2:
-            ff_pred=np.load('../fault_free_pred/resnet50_imagenet_fault_free_pred_setsize_2.npy')
+            ff_pred=load_fault_free_pred('../fault_free_pred/resnet50_imagenet_fault_free_pred_setsize_2.npy')
         else:
             raise ValueError('setsize %d doesn\'t exist!'%setsize)        
             
+    elif score is not None and fault_free_pred is not None:
+        ff_score=score
+        ff_pred=fault_free_pred
     else:
-        raise ValueError('model %s doesn\'t exist!'%model)
+        raise ValueError('model %s doesn\'t exist! Give both score and fault_free_pred, or register its golden reference in a golden_reference_store for models without preset.'%model)
     
     if score is not None:
         ff_score=score
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:02:44 2026
+
+@author: Yung-Yu Tsai
+
+Golden reference store. The fault-free predictions, scores and layer activations of any model and dataset configuration,
+stored as checksummed npy files under one index and opened memory-mapped.
+"""
+
+import os, json
+import numpy as np
+from ..utils_tool.atomic_file import file_checksum, verify_checksum, atomic_write, npy_batch_writer
+
+# golden arrays opened in process, shared by all the stores. {absolute file path : memory-mapped Ndarray}
+_golden_array_cache=dict()
+
+def golden_score(prediction, label, topk=5, epsilon=1e-7):
+    """ The [loss, top-1 accuracy, top-k accuracy] of golden prediction. Loss is the categorical crossentropy.
+
+    Arguments
+    ---------
+    prediction: Ndarray.
+        The output probabilities with shape (number of samples, number of classes).
+    label: Ndarray.
+        The one-hot label with the same shape as prediction.
+    topk: Integer. Default is 5.
+        The k of top-k accuracy.
+
+    Returns
+    -------
+    List of Float.
+    """
+    prediction=np.asarray(prediction,dtype=np.float64)
+    label=np.asarray(label,dtype=np.float64)
+    prob=np.clip(prediction/np.sum(prediction,axis=-1,keepdims=True),epsilon,1.0-epsilon)
+    loss=np.mean(-np.sum(label*np.log(prob),axis=-1))
+
+    label_idx=np.argmax(label,axis=-1)
+    top1=np.mean(np.argmax(prediction,axis=-1)==label_idx)
+    # rank by the number of classes with higher probability than the labeled class
+    label_prob=np.take_along_axis(prediction,label_idx[:,np.newaxis],axis=-1)
+    topk_acc=np.mean(np.sum(prediction>label_prob,axis=-1)<topk)
+
+    return [float(loss),float(top1),float(topk_acc)]
+
+class golden_reference_store:
+    """ The on-disk registry of golden (fault-free) references.
+
+        Each reference is registered by name, one name per model and dataset configuration, e.g. 'resnet50_imagenet_setsize_10'.
+        A reference holds the golden score [loss, top-1 accuracy, top-k accuracy],
+        the golden prediction and optionally the output or input activations of layers.
+        The arrays are npy files in store_dir/<name>/, recorded with shape, dtype and sha256 checksum in store_dir/index.json.
+        A reference may record the fingerprint of model, weights and test set it is made from, see inference.activation_cache.
+
+        Arrays are opened with mmap_mode='r' and cached in process, thus repeated evaluations only read the sliced rows.
+        The checksum is verified once per process when the array is first opened.
+        Files and index are written to temporary files then renamed, an interrupted write never leaves a partial reference.
+        The index is not locked, register references from one process at a time.
+
+        The store is the only on-disk format of golden data. The metrics read the score and prediction of a reference (FT_metric_setup),
+        the golden_activation_cache of fault_campaign keeps the layer inputs for resuming inference in a reference of the same store.
+
+    Arguments
+    ---------
+    store_dir: String.
+        The directory of golden reference store.
+    verify: Bool. Default is True.
+        Verify the checksum of array when first opened or not.
+
+    Example
+    -------
+    >>> store=golden_reference_store('../golden_reference')
+    >>> store.generate('lenet5_mnist', model, x=x_test, y=y_test, batch_size=20, topk=2)
+    >>> ff_score,ff_pred=FT_metric_setup('lenet5_mnist', golden_store=store)
+
+    """
+    def __init__(self, store_dir, verify=True):
+        self.store_dir=store_dir
+        self.verify=verify
+        self.index_file=os.path.join(store_dir,'index.json')
+        self._index=None
+        self._index_mtime=None
+
+    def _load_index(self):
+        """ Read the index file, reread when it is changed on disk. """
+        if not os.path.exists(self.index_file):
+            self._index=dict()
+            self._index_mtime=None
+        else:
+            mtime=os.path.getmtime(self.index_file)
+            if self._index is None or mtime!=self._index_mtime:
+                with open(self.index_file, 'r') as f:
+                    self._index=json.load(f)
+                self._index_mtime=mtime
+        return self._index
+
+    def _save_index(self, index):
+        with atomic_write(self.index_file, 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        self._index=index
+        self._index_mtime=os.path.getmtime(self.index_file)
+
+    def _entry(self, name):
+        index=self._load_index()
+        if name not in index:
+            raise ValueError('Golden reference %s is not in store %s.'%(name,self.store_dir))
+        return index[name]
+
+    def names(self):
+        """ The names of registered references. """
+        return sorted(self._load_index().keys())
+
+    def has(self, name):
+        return name in self._load_index()
+
+    def _array_file(self, name, array_name):
+        return os.path.join(self.store_dir,name,array_name+'.npy')
+
+    def _open_array(self, name, array_name):
+        entry=self._entry(name)
+        if array_name not in entry['arrays']:
+            raise ValueError('Golden reference %s has no array %s.'%(name,array_name))
+        record=entry['arrays'][array_name]
+        file_path=os.path.abspath(self._array_file(name, array_name))
+
+        cached=_golden_array_cache.get(file_path)
+        if cached is not None and cached[0]==record['sha256']:
+            return cached[1]
+
+        if self.verify:
+            verify_checksum(file_path, record['sha256'], 'Golden reference %s array %s'%(name,array_name))
+        array=np.load(file_path, mmap_mode='r')
+        if list(array.shape)!=record['shape'] or array.dtype.str!=record['dtype']:
+            raise ValueError('Golden reference %s array %s has shape %s %s, but index records %s %s.'%(name,array_name,str(array.shape),array.dtype.str,str(record['shape']),record['dtype']))
+        _golden_array_cache[file_path]=(record['sha256'],array)
+        return array
+
+    def get_score(self, name):
+        """ The golden [loss, top-1 accuracy, top-k accuracy]. None if the reference is registered without score. """
+        return self._entry(name)['score']
+
+    def get_prediction(self, name):
+        """ The memory-mapped golden prediction with shape (number of test samples, number of classes). """
+        return self._open_array(name, 'prediction')
+
+    def get_fingerprint(self, name):
+        """ The fingerprint recorded with the reference. None if the reference is registered without fingerprint. """
+        return self._entry(name).get('fingerprint')
+
+    def has_array(self, name, array_name):
+        """ Whether the reference is registered and has the array. """
+        index=self._load_index()
+        return name in index and array_name in index[name]['arrays']
+
+    def get_activation(self, name, layer_num):
+        """ The memory-mapped golden output activation of model.layers[layer_num]. """
+        return self._open_array(name, 'layer_%d_output'%layer_num)
+
+    def get_layer_input(self, name, layer_num, input_num=0):
+        """ The memory-mapped golden input_num-th input activation of model.layers[layer_num]. """
+        return self._open_array(name, 'layer_%d_input_%d'%(layer_num,input_num))
+
+    def activation_layers(self, name):
+        """ The layer indexes with stored golden output activations. """
+        return sorted(int(array_name.split('_')[1]) for array_name in self._entry(name)['arrays'] if array_name.startswith('layer_') and array_name.endswith('_output'))
+
+    def _write_arrays(self, name, batches, n_sample):
+        """ Write the arrays from an iterator of {array_name : batch data} into temporary npy files.
+
+        Returns
+        -------
+        Class npy_batch_writer. Closed, the temporary files are not committed yet.
+        """
+        os.makedirs(os.path.join(self.store_dir,name), exist_ok=True)
+        start=0
+        with npy_batch_writer(n_sample) as writer:
+            for batch in batches:
+                n_batch=None
+                for array_name,data in batch.items():
+                    writer.write(self._array_file(name, array_name), data, start)
+                    n_batch=len(data)
+                start+=n_batch
+            writer.close()
+        return writer
+
+    def _remove_array(self, name, array_name):
+        file_path=self._array_file(name, array_name)
+        _golden_array_cache.pop(os.path.abspath(file_path),None)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    def _golden_score(self, name, writer, y, topk):
+        """ The golden score of the written prediction. None if there is no label or no prediction written. """
+        prediction_file=self._array_file(name, 'prediction')
+        if y is None or prediction_file not in writer.tmp_files:
+            return None
+        return golden_score(np.load(writer.tmp_files[prediction_file], mmap_mode='r'), y, topk=topk)
+
+    def _commit(self, name, writer, score, info, fingerprint=None, update=False):
+        """ Checksum the written arrays, rename them into place and record the reference in index.
+            The array files of the replaced reference which are not rewritten are removed.
+            If update, the reference keeps its other arrays, and its score and info unless given.
+        """
+        old_entry=self._load_index().get(name)
+        entry={'score':None if score is None else [float(s) for s in score],
+               'info':dict() if info is None else info,
+               'arrays':dict()}
+        if fingerprint is not None:
+            entry['fingerprint']=fingerprint
+        if update and old_entry is not None:
+            entry['arrays'].update(old_entry['arrays'])
+            if score is None:
+                entry['score']=old_entry['score']
+            if info is None:
+                entry['info']=old_entry['info']
+            if fingerprint is None and 'fingerprint' in old_entry:
+                entry['fingerprint']=old_entry['fingerprint']
+        for file_path,tmp_file in writer.close().items():
+            array=np.load(tmp_file, mmap_mode='r')
+            array_name=os.path.splitext(os.path.basename(file_path))[0]
+            entry['arrays'][array_name]={'shape':list(array.shape),
+                                         'dtype':array.dtype.str,
+                                         'sha256':file_checksum(tmp_file)}
+            del array
+        writer.commit()
+
+        index=dict(self._load_index())
+        index[name]=entry
+        self._save_index(index)
+        if old_entry is not None:
+            for array_name in old_entry['arrays']:
+                if array_name not in entry['arrays']:
+                    self._remove_array(name, array_name)
+
+    def register(self, name, prediction, score=None, activations=None, info=None, overwrite=False):
+        """ Register a golden reference from given arrays.
+
+        Arguments
+        ---------
+        name: String.
+            The name of reference.
+        prediction: Ndarray.
+            The golden prediction with shape (number of test samples, number of classes).
+        score: List of Float. Default is None.
+            The golden [loss, top-1 accuracy, top-k accuracy].
+        activations: Dictionary. Default is None.
+            The golden layer output activations {layer_num : Ndarray}.
+        info: Dictionary. Default is None.
+            The json serializable description of model and dataset configuration kept in index.
+        overwrite: Bool. Default is False.
+            Replace the existing reference of name or not. The array files of the replaced reference are removed.
+        """
+        if self.has(name) and not overwrite:
+            raise ValueError('Golden reference %s already exists in store %s. Use overwrite=True to replace it.'%(name,self.store_dir))
+        batch={'prediction':np.asarray(prediction)}
+        if activations is not None:
+            for layer_num,activation in activations.items():
+                activation=np.asarray(activation)
+                if len(activation)!=len(batch['prediction']):
+                    raise ValueError('The activation of layer %d has %d samples, but prediction has %d.'%(layer_num,len(activation),len(batch['prediction'])))
+                batch['layer_%d_output'%layer_num]=activation
+        writer=self._write_arrays(name, [batch], len(batch['prediction']))
+        self._commit(name, writer, score, info)
+
+    def generate(self, name, model, x=None, y=None, datagen=None, batch_size=None, observe_layer_idxs=None, topk=5, info=None, overwrite=False, verbose=0):
+        """ Run the fault-free inference once and register the golden reference.
+            The prediction and activations are written batch by batch, the whole test set output is never held in memory.
+
+        Arguments
+        ---------
+        name: String.
+            The name of reference.
+        model: Keras Model.
+            The fault-free model.
+        x: Ndarray. Default is None.
+            The test set input data.
+        y: Ndarray. Default is None.
+            The one-hot test set label for golden score. If None and datagen given, use the labels of datagen.
+        datagen: Keras DataIterator. Default is None.
+            The test set data generator, used when x is None. Must not shuffle.
+        batch_size: Integer. Default is None.
+            The batch size of inference on x. If None, use the batch dimension of model.
+        observe_layer_idxs: List of Integer. Default is None.
+            The indexes of layers whose output activations are stored.
+        topk: Integer. Default is 5.
+            The k of top-k accuracy in golden score.
+        info: Dictionary. Default is None.
+            The json serializable description of model and dataset configuration kept in index.
+        overwrite: Bool. Default is False.
+            Replace the existing reference of name or not. The array files of the replaced reference are removed.
+        verbose: Integer. Default is 0.
+            Print progress or not.
+
+        Returns
+        -------
+        List of Float. The golden score. None if no label available.
+        """
+        if self.has(name) and not overwrite:
+            raise ValueError('Golden reference %s already exists in store %s. Use overwrite=True to replace it.'%(name,self.store_dir))
+        if x is None and datagen is None:
+            raise ValueError('Either x or datagen must be given for golden reference generation.')
+
+        observe_layer_idxs=list() if observe_layer_idxs is None else sorted(set(observe_layer_idxs))
+        if len(observe_layer_idxs)>0:
+            # TensorFlow is only needed for generation, the store is read without it
+            from tensorflow.keras.models import Model
+            observe_model=Model(inputs=model.input,outputs=[model.layers[layer_num].output for layer_num in observe_layer_idxs]+[model.output])
+        else:
+            observe_model=model
+
+        if x is not None:
+            if batch_size is None:
+                batch_size=model.input_shape[0]
+                if batch_size is None:
+                    raise ValueError('The model has undefined batch dimension, batch_size must be given for inference on x.')
+            n_sample=len(x)
+            n_batch=int(np.ceil(n_sample/batch_size))
+        else:
+            n_sample=datagen.n
+            n_batch=len(datagen)
+
+        labels=list()
+        def batches():
+            for i in range(n_batch):
+                if verbose>0:
+                    print('\rgenerating golden reference batch %d/%d'%(i+1,n_batch),end='')
+                if x is not None:
+                    x_batch=x[i*batch_size:(i+1)*batch_size]
+                else:
+                    x_batch,y_batch=datagen[i]
+                    if y is None:
+                        labels.append(y_batch)
+                outputs=observe_model.predict_on_batch(x_batch)
+                if len(observe_layer_idxs)==0:
+                    outputs=[outputs]
+                batch={'layer_%d_output'%layer_num:np.asarray(output) for layer_num,output in zip(observe_layer_idxs,outputs[:-1])}
+                batch['prediction']=np.asarray(outputs[-1])
+                yield batch
+            if verbose>0:
+                print('')
+
+        writer=self._write_arrays(name, batches(), n_sample)
+
+        if y is None and len(labels)>0:
+            y=np.concatenate(labels)
+        score=self._golden_score(name, writer, y, topk)
+
+        self._commit(name, writer, score, info)
+        return score
+
+    def update(self, name, batches, n_sample, y=None, topk=5, fingerprint=None):
+        """ Write arrays into a reference and keep its other arrays. The reference is registered if not exists.
+            For adding the arrays of a reference incrementally, e.g. the layer inputs of golden_activation_cache.
+
+        Arguments
+        ---------
+        name: String.
+            The name of reference.
+        batches: Iterable of Dictionary.
+            The {array_name : batch data} in test set order, e.g. 'prediction', 'layer_<n>_output', 'layer_<n>_input_<k>'.
+        n_sample: Integer.
+            The number of test samples.
+        y: Ndarray. Default is None.
+            The one-hot test set label. If given and prediction is written, the golden score is updated.
+        topk: Integer. Default is 5.
+            The k of top-k accuracy in golden score.
+        fingerprint: Dictionary. Default is None.
+            The json serializable identity of model, weights and test set recorded with the reference. If None, keep the recorded one.
+        """
+        writer=self._write_arrays(name, batches, n_sample)
+        self._commit(name, writer, self._golden_score(name, writer, y, topk), None, fingerprint=fingerprint, update=True)
+
+    def remove(self, name):
+        """ Remove a golden reference and its files. """
+        entry=self._entry(name)
+        index=dict(self._load_index())
+        del index[name]
+        self._save_index(index)
+        for array_name in entry['arrays']:
+            self._remove_array(name, array_name)
+        entry_dir=os.path.join(self.store_dir,name)
+        if os.path.isdir(entry_dir) and len(os.listdir(entry_dir))==0:
+            os.rmdir(entry_dir)
+
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:12:48 2026
+
+@author: Yung-Yu Tsai
+
+Read layer and model shape information without touching the weights
+"""
+
+import numpy as np
+
+def get_layer_weight_shape(layer):
+    '''Get the weight shapes of a Keras layer or pseudo_layer.
+        Read the shapes from weight variables instead of copying every weight out of TensorFlow by layer.get_weights().
+    
+    # Arguments
+        layer: Keras layer or pseudo_layer.
+
+    # Returns
+        List of Tuple. The weight shapes in the same order as layer.get_weights().
+    '''
+    if hasattr(layer,'weight_shape'):
+        return [tuple(shape) for shape in layer.weight_shape]
+    return [tuple(weight.shape.as_list()) for weight in layer.weights]
+
+def get_model_param_bits(model,batch_size,model_word_length):
+    """ Get the number of bits of every layer input/output/weight in the DNN model.
+        Only the layers have weights are counted, the others are 0 bits.
+
+    Parameters
+    ----------
+    model : tensorflow.keras.model or pseudo_model
+        The DNN model wanted to get number of bits.
+    batch_size : Integer
+        Batch size.
+    model_word_length : Integer or List of Integer
+        Word length of parameters. The list is [ifmap, weight, ofmap] word length.
+
+    Returns
+    -------
+    param_bits : List of Ndarray. [ifmap_bits, ofmap_bits, weight_bits]
+        The flattened number of bits of each parameter in layer order.
+    param_index : List of List of Tuple. [ifmap_index, ofmap_index, weight_index]
+        The (layer_num, data_num) of each flattened parameter. data_num is None for single input/output layers.
+    """
+    if not isinstance(model_word_length,list):
+        model_word_length=[model_word_length,model_word_length,model_word_length]
+    
+    param_bits=[list(),list(),list()]
+    param_index=[list(),list(),list()]
+    
+    for layer_num in range(1,len(model.layers)):
+        layer=model.layers[layer_num]
+        layer_weight_shape=get_layer_weight_shape(layer)
+        
+        if len(layer_weight_shape)==0:
+            for i,data_nums in [(0,[None]),(1,[None]),(2,[0,1])]:
+                for data_num in data_nums:
+                    param_bits[i].append(0)
+                    param_index[i].append((layer_num,data_num))
+            continue
+        
+        for i,layer_shape in [(0,layer.input_shape),(1,layer.output_shape)]:
+            word_length=model_word_length[0] if i==0 else model_word_length[2]
+            if isinstance(layer_shape,list):
+                for data_num in range(len(layer_shape)):
+                    param_bits[i].append(int(np.prod(layer_shape[data_num][1:]) * batch_size * word_length))
+                    param_index[i].append((layer_num,data_num))
+            else:
+                param_bits[i].append(int(np.prod(layer_shape[1:]) * batch_size * word_length))
+                param_index[i].append((layer_num,None))
+            
+        for data_num in range(len(layer_weight_shape)):
+            param_bits[2].append(int(np.prod(layer_weight_shape[data_num][1:]) * batch_size * model_word_length[1]))
+            param_index[2].append((layer_num,data_num))
+            
+    param_bits=[np.array(bits,dtype=np.int64) for bits in param_bits]
+    return param_bits,param_index
@@ -8,9 +8,11 @@ Modify existing models
 """
 
 from tensorflow.keras.models import Model
+from tensorflow.keras.layers import Input
 import numpy as np
 
 from ..layers.quantized_layers import QuantizedDistributedConv2D
+from .layer_shape import get_layer_weight_shape, get_model_param_bits
 from tensorflow.keras.layers import Activation, Add
 
 def exchange_distributed_conv(model,target_layer_num,fault_dict_conversion,split_type,splits,ifmap_fault_dict_list=None,ofmap_fault_dict_list=None,wght_fault_dict_list=None):
@@ -92,6 +94,135 @@ def exchange_distributed_conv(model,target_layer_num,fault_dict_conversion,split
     return new_model
     
     
+def _cut_tensors(model,layer_num):
+    """List the tensors produced before the given layer and consumed by the layers after it.
+        Return the List of (tensor, (consumer layer_num, input_num)) in the order of first consumption.
+    """
+    layers = [l for l in model.layers]
+    produced = set()
+    for i in range(layer_num, len(layers)):
+        outputs = layers[i].output if isinstance(layers[i].output,list) else [layers[i].output]
+        produced.update([tensor.ref() for tensor in outputs])
+        
+    cut = list()
+    found = set()
+    for i in range(layer_num, len(layers)):
+        layer_inputs = layers[i].input if isinstance(layers[i].input,list) else [layers[i].input]
+        for n,tensor in enumerate(layer_inputs):
+            if tensor.ref() not in produced and tensor.ref() not in found:
+                found.add(tensor.ref())
+                cut.append((tensor,(i,n)))
+    return cut
+
+def make_resume_model(model,start_layer_num,stop_layer_num=None):
+    """Cut the model before the given layer. Make the sub-model which resume inference from the start layer.
+        The sub-model shares the layers (weights and fault injection arguments) with the original model.
+        The inputs of sub-model are the tensors produced before the start layer and consumed by the layers after it.
+        Therefore, models with skip connection are supported. The layers must only be called once in the model.
+
+    # Arguments
+        model: Keras model. The model wanted to be cut.
+        start_layer_num: Integer. The index of layer in model.layers where the sub-model starts.
+        stop_layer_num: Integer. Default is None. 
+            The index of layer in model.layers where the sub-model stops (exclusive). 
+            The outputs are the tensors consumed by the layers from stop layer, 
+            in the same order as the inputs of resume model starts from stop layer.
+            If None, the outputs are the model outputs.
+
+    # Returns
+        A Model, the sub-model starts from start layer.
+        List of Tuple. The (layer_num, input_num) of each sub-model input. 
+        Which is the input_num-th input of the layer_num-th layer in original model.
+    """
+    layers = [l for l in model.layers]
+    if stop_layer_num is None:
+        stop_layer_num = len(layers)
+    tensor_map = dict()
+    resume_inputs = list()
+    cut_list = list()
+    
+    for tensor,(i,n) in _cut_tensors(model,start_layer_num):
+        tensor_map[tensor.ref()] = Input(batch_shape=tensor.shape, dtype=tensor.dtype, name='resume_%s_%d'%(layers[i].name,n))
+        resume_inputs.append(tensor_map[tensor.ref()])
+        cut_list.append((i,n))
+    
+    for i in range(start_layer_num, stop_layer_num):
+        layer_inputs = layers[i].input
+        if isinstance(layer_inputs,list):
+            x = layers[i]([tensor_map[tensor.ref()] for tensor in layer_inputs])
+        else:
+            x = layers[i](tensor_map[layer_inputs.ref()])
+            
+        if isinstance(layers[i].output,list):
+            for tensor,new_tensor in zip(layers[i].output,x):
+                tensor_map[tensor.ref()] = new_tensor
+        else:
+            tensor_map[layers[i].output.ref()] = x
+
+    if stop_layer_num == len(layers):
+        outputs = [tensor_map[tensor.ref()] for tensor in model.outputs]
+    else:
+        outputs = [tensor_map[tensor.ref()] for tensor,_ in _cut_tensors(model,stop_layer_num)]
+    if len(outputs)==1:
+        outputs = outputs[0]
+    resume_model = Model(inputs=resume_inputs, outputs=outputs)
+    return resume_model, cut_list
+
+def set_fused_inject(model,fused_inject=True,jit_compile=False):
+    """Switch the fused quantize and SA fault injection kernel of every quantized layer in model.
+        The quantizers of layers are set in place. The predict function of model is reset, 
+        the next predict call traces the layers again with the new setting.
+
+    # Arguments
+        model: Keras model. The quantized model.
+        fused_inject: Bool. Quantize and inject fault modulators in integer domain in one pass or not.
+        jit_compile: Bool. Compile the fused kernel with XLA or not.
+
+    # Returns
+        The same model.
+    """
+    for layer in model.layers:
+        quantizers = getattr(layer,'quantizer',None)
+        if quantizers is None:
+            continue
+        if not isinstance(quantizers,list):
+            quantizers = [quantizers]
+        for quantizer in quantizers:
+            if quantizer.fused_inject != fused_inject or quantizer.jit_compile != jit_compile:
+                quantizer.fused_inject = fused_inject
+                quantizer.jit_compile = jit_compile
+                quantizer._fused_fn = None
+    model.predict_function = None
+    return model
+
+def set_frozen_weights(model,frozen_weights=True):
+    """Switch the frozen weights mode of every quantized layer in model.
+        In frozen weights mode, the quantized faulty kernel and bias are computed once per fault round and cached, 
+        instead of quantizing and injecting the weights in every batch. 
+        Must be called again after the weights or weight faults of the model changed, to refresh the cache.
+        The predict function of model is reset if the layers need to be traced again.
+
+    # Arguments
+        model: Keras model. The quantized model.
+        frozen_weights: Bool. Use the cached quantized faulty weights or not.
+
+    # Returns
+        Bool. The layers need to be traced again or not. 
+        The models sharing these layers (i.e. resume models) should reset their predict function as well.
+    """
+    retrace = False
+    for layer in model.layers:
+        if not hasattr(layer,'freeze_weights'):
+            continue
+        if frozen_weights:
+            retrace = layer.freeze_weights() or retrace
+        if layer.frozen_weights != frozen_weights:
+            layer.frozen_weights = frozen_weights
+            retrace = True
+    if retrace:
+        model.predict_function = None
+    return retrace
+
 class pseudo_model:
     '''The class like Keras Model for fault generation.
         Only store layer Shape information.
@@ -141,7 +272,7 @@ def make_ref_model(model):
         if 'conv' in layer.__class__.__name__.lower():
             ref_layer=pseudo_layer(layer.input_shape,
                                    layer.output_shape,
-                                   [weight_shape.shape for weight_shape in layer.get_weights()],
+                                   get_layer_weight_shape(layer),
                                    layer.name,
                                    config,
                                    layer.kernel_size, 
@@ -150,10 +281,45 @@ def make_ref_model(model):
         else:
             ref_layer=pseudo_layer(layer.input_shape,
                                    layer.output_shape,
-                                   [weight_shape.shape for weight_shape in layer.get_weights()],
+                                   get_layer_weight_shape(layer),
                                    layer.name,
                                    config,)
         layer_list.append(ref_layer)
         
     ref_model=pseudo_model(layer_list)
     return ref_model
+
+class model_shape_index(pseudo_model):
+    '''The picklable shape index of model for fault generation and memory mapping.
+        Built once from a Keras model or the pseudo_model of make_ref_model.
+        Record the input, output and weight shapes of each layer, the word lengths, 
+        and the number of bits and cumulative bit offsets of every layer input/output/weight.
+        It can be used as the model argument of fault generators and modulator builders, 
+        which never touch the real weights.
+
+    # Arguments
+        model: Keras model or pseudo_model. The model to be indexed.
+        batch_size: Integer. The batch size for feature map bits.
+        word_length: Integer or List of Integer. The word length of [ifmap, weight, ofmap].
+
+    # Attributes
+        layers: List of pseudo_layer. The layer shape information.
+        param_bits: List of Ndarray. [ifmap_bits, ofmap_bits, weight_bits] number of bits of each parameter in layer order.
+        param_index: List of List of Tuple. [ifmap_index, ofmap_index, weight_index] the (layer_num, data_num) of each parameter.
+        bit_offsets: List of Ndarray. [ifmap_offsets, ofmap_offsets, weight_offsets] the cumulative bit offsets, start from 0.
+        total_bits: List of Integer. [ifmap, ofmap, weight] total number of bits.
+    '''
+    def __init__(self,model,batch_size,word_length):
+        if isinstance(model,pseudo_model):
+            layers=list(model.layers)
+        else:
+            layers=make_ref_model(model).layers
+        super(model_shape_index, self).__init__(layers)
+        
+        if not isinstance(word_length,list):
+            word_length=[word_length,word_length,word_length]
+        self.batch_size=batch_size
+        self.word_length=word_length
+        self.param_bits,self.param_index=get_model_param_bits(self,batch_size,word_length)
+        self.bit_offsets=[np.concatenate([[0],np.cumsum(bits)]) for bits in self.param_bits]
+        self.total_bits=[int(offsets[-1]) for offsets in self.bit_offsets]
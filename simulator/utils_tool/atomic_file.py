@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:37:15 2026
+
+@author: Yung-Yu Tsai
+
+Atomic file writing and checksum verification for the on-disk caches and result files.
+The files are written to temporary files in the same directory then renamed into place,
+an interrupted write never leaves a partial file.
+"""
+
+import os, hashlib, tempfile
+from contextlib import contextmanager
+import numpy as np
+
+def file_checksum(file_path, chunk_size=1<<24):
+    """ The sha256 hex digest of a file, read in chunks. """
+    hasher=hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def verify_checksum(file_path, checksum, description='file'):
+    """ Raise ValueError if the sha256 of file doesn't match the recorded checksum. """
+    if file_checksum(file_path)!=checksum:
+        raise ValueError('%s checksum mismatch, the file %s is corrupted or changed.'%(description,file_path))
+
+@contextmanager
+def atomic_write(file_path, mode='wb', **kwargs):
+    """ Open a temporary file for writing, rename it to file_path when the block exits without error.
+        The temporary file is removed on error.
+
+    Arguments
+    ---------
+    file_path: String.
+        The destination file.
+    mode: String. Default is 'wb'.
+        The mode of open, 'w' or 'wb'.
+    **kwargs:
+        The other arguments of open, e.g. newline.
+
+    Example
+    -------
+    >>> with atomic_write('index.json', 'w') as f:
+    ...     json.dump(index, f)
+
+    """
+    file_dir=os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(file_dir, exist_ok=True)
+    fd,tmp_file=tempfile.mkstemp(suffix=os.path.splitext(file_path)[1], dir=file_dir)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_file, file_path)
+    except:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+class npy_batch_writer:
+    """ Write arrays of the whole data set into npy files batch by batch, without holding the whole arrays in memory.
+        Each array is a memory-mapped temporary file, renamed into place by commit. abort or an error in the with block removes them.
+
+    Arguments
+    ---------
+    n_sample: Integer.
+        The number of samples, the first dimension of all arrays.
+
+    Example
+    -------
+    >>> with npy_batch_writer(n_sample) as writer:
+    ...     for i,batch in enumerate(batches):
+    ...         writer.write('prediction.npy', batch, i*batch_size)
+    ...     writer.commit()
+
+    """
+    def __init__(self, n_sample):
+        self.n_sample=n_sample
+        self.memmaps=dict()
+        self.tmp_files=dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+    def write(self, file_path, data, start):
+        """ Write the batch data to rows [start, start+len(data)) of the array of file_path. """
+        if file_path not in self.memmaps:
+            self.tmp_files[file_path]=file_path+'.tmp'
+            self.memmaps[file_path]=np.lib.format.open_memmap(self.tmp_files[file_path], mode='w+', dtype=data.dtype, shape=(self.n_sample,)+data.shape[1:])
+        self.memmaps[file_path][start:start+len(data)]=data
+
+    def close(self):
+        """ Flush and release the memory maps. The temporary files are complete after close.
+
+        Returns
+        -------
+        Dictionary. {file path : temporary file path}
+        """
+        for memmap in self.memmaps.values():
+            memmap.flush()
+        self.memmaps.clear()
+        return dict(self.tmp_files)
+
+    def commit(self):
+        """ Close and rename the temporary files into place.
+
+        Returns
+        -------
+        List of String. The committed file paths.
+        """
+        self.close()
+        for file_path,tmp_file in self.tmp_files.items():
+            os.replace(tmp_file, file_path)
+        file_paths=list(self.tmp_files.keys())
+        self.tmp_files.clear()
+        return file_paths
+
+    def abort(self):
+        """ Release the memory maps and remove the temporary files. """
+        self.memmaps.clear()
+        for tmp_file in self.tmp_files.values():
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        self.tmp_files.clear()
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+The simulator package is used from the repository root, put the root on the import path for the tests.
+"""
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
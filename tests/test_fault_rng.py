@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Seedable random streams of fault generation rounds.
+"""
+
+import numpy as np
+
+from simulator.fault.fault_rng import get_random_state, round_seed_sequence, round_rng
+
+def test_get_random_state():
+    assert get_random_state() is np.random
+    assert get_random_state(np.random) is np.random
+    state=np.random.RandomState(0)
+    assert get_random_state(state) is state
+    assert np.array_equal(get_random_state(3).randint(100,size=10),get_random_state(3).randint(100,size=10))
+    assert np.array_equal(get_random_state(np.random.SeedSequence(3)).randint(100,size=10),get_random_state(3).randint(100,size=10))
+
+def test_generator_shares_stream():
+    generator=np.random.default_rng(4)
+    reference=np.random.default_rng(4)
+    state=get_random_state(generator)
+    state.randint(100,size=5)
+    reference_state=get_random_state(reference)
+    reference_state.randint(100,size=5)
+    # the wrapped state advanced the Generator stream
+    assert generator.integers(1<<30)==reference.integers(1<<30)
+
+def test_round_rng_is_a_function_of_seed_rate_round():
+    draw=lambda seed,fault_rate,round_num: round_rng(seed,fault_rate,round_num).integers(1<<62,size=4)
+    assert np.array_equal(draw(0,1e-4,3),draw(0,1e-4,3))
+    # regenerate a single round out of order
+    rounds=[draw(0,1e-4,i) for i in range(5)]
+    assert np.array_equal(rounds[3],draw(0,1e-4,3))
+
+    streams=[draw(0,1e-4,0),draw(0,1e-4,1),draw(1,1e-4,0),draw(0,2e-4,0),draw(0,np.nextafter(1e-4,1),0)]
+    assert len({tuple(stream.tolist()) for stream in streams})==len(streams)
+
+def test_round_seed_sequence_keeps_parent_spawn_key():
+    parent=np.random.SeedSequence(9).spawn(2)[1]
+    child=round_seed_sequence(parent,0.5,2)
+    assert child.entropy==parent.entropy
+    assert child.spawn_key[:len(parent.spawn_key)]==parent.spawn_key
+    assert child.spawn_key[len(parent.spawn_key):][-1]==2
+    assert round_seed_sequence(9,0.5,2).spawn_key!=child.spawn_key
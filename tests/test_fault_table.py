@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar fault table conversions and columns.
+"""
+
+import numpy as np
+import pytest
+
+from simulator.fault.fault_table import fault_table, SA_TYPES, PARAM_TYPES, SA_TYPE_CODE
+
+def test_columns_and_enums():
+    table=fault_table([(0,2,2,6),(3,5,4,2)], [3,7], ['flip','0'])
+    assert len(table)==2 and table.ndim==4
+    assert table.coor.dtype==np.int32 and table.SA_bit.dtype==np.uint8 and table.SA_type.dtype==np.uint8
+    assert table.SA_type_name.tolist()==['flip','0']
+    assert table.param is None and table.param_name is None and table.id is None
+    assert list(SA_TYPES[table.SA_type])==['flip','0']
+
+    # one String for all faults, uint8 codes are taken as is
+    assert fault_table([(1,),(2,)], 0, '1').SA_type_name.tolist()==['1','1']
+    assert fault_table([(1,)], 0, np.array([SA_TYPE_CODE['flip']],dtype=np.uint8)).SA_type_name.tolist()==['flip']
+    table=fault_table([(1,1)], 4, 'flip', param='psum_out', id=[7])
+    assert table.param_name.tolist()==['psum_out'] and PARAM_TYPES[table.param[0]]=='psum_out'
+    assert table.id.dtype==np.int64
+
+    with pytest.raises(ValueError):
+        fault_table([(1,)], 0, 'stuck')
+    with pytest.raises(ValueError):
+        fault_table([(1,)], 0, 'flip', param='psum')
+
+def test_empty_table():
+    table=fault_table([], [], [], ndim=3)
+    assert len(table)==0 and table.ndim==3
+    table=fault_table.from_dict(dict(), ndim=2)
+    assert len(table)==0 and table.ndim==2
+    assert table.to_dict()==dict()
+    assert fault_table.from_dict(None) is None
+
+def test_dict_round_trip_with_multi_bit_rows():
+    fault_dict={(0,1,2,3):{'SA_type':'flip','SA_bit':3},
+                (0,4,4,1):{'SA_type':['0','flip'],'SA_bit':[1,6]},
+                (1,0,0,0):{'SA_type':'1','SA_bit':[2,5,7]}}
+    table=fault_table.from_dict(fault_dict)
+    assert len(table)==6
+    assert table.coor.tolist()==[[0,1,2,3],[0,4,4,1],[0,4,4,1],[1,0,0,0],[1,0,0,0],[1,0,0,0]]
+    assert table.SA_bit.tolist()==[3,1,6,2,5,7]
+    assert table.SA_type_name.tolist()==['flip','0','flip','1','1','1']
+
+    restored=table.to_dict()
+    assert restored[(0,1,2,3)]=={'SA_type':'flip','SA_bit':3}
+    assert restored[(0,4,4,1)]=={'SA_type':['0','flip'],'SA_bit':[1,6]}
+    assert restored[(1,0,0,0)]=={'SA_type':['1','1','1'],'SA_bit':[2,5,7]}
+
+def test_dict_round_trip_with_param_and_id():
+    fault_dict={(2,3):{'SA_type':'flip','SA_bit':4,'param':'ifmap_in','id':0},
+                (5,1):{'SA_type':['0','1'],'SA_bit':[0,7],'param':['wght_out','psum_in'],'id':[1,2]}}
+    table=fault_table.from_dict(fault_dict)
+    assert table.param_name.tolist()==['ifmap_in','wght_out','psum_in']
+    assert table.id.tolist()==[0,1,2]
+    assert table.to_dict()==fault_dict
+
+def test_info_base_round_trip():
+    info_fd={'coor':np.array([[0,1],[2,3],[4,5]]),'SA_type':'flip','SA_bit':np.array([1,2,3]),'param':'psum_out','id':np.array([0,1,2])}
+    table=fault_table.from_dict(info_fd)
+    assert table.coor.tolist()==info_fd['coor'].tolist()
+    assert table.param_name.tolist()==['psum_out']*3
+
+    restored=table.to_info_base()
+    assert np.array_equal(restored['coor'],info_fd['coor'])
+    assert restored['SA_type'].tolist()==['flip']*3
+    assert restored['SA_bit'].tolist()==[1,2,3]
+    assert restored['param'].tolist()==['psum_out']*3
+    assert restored['id'].tolist()==[0,1,2]
+
+    repetitive_id=np.empty(2,dtype=object)
+    repetitive_id[:]=[[0,1],[2]]
+    with pytest.raises(ValueError):
+        fault_table.from_info_base(dict(info_fd,coor=info_fd['coor'][:2],SA_bit=[1,2],id=repetitive_id))
+
+def test_select_unique_and_concatenate():
+    table=fault_table([(0,1),(2,2),(0,1),(3,0)], [1,2,3,4], 'flip', id=[0,1,2,3])
+    # the last fault of each coordinate is kept, in the original order
+    unique=table.unique_coor()
+    assert unique.coor.tolist()==[[2,2],[0,1],[3,0]]
+    assert unique.SA_bit.tolist()==[2,3,4]
+    assert unique.id.tolist()==[1,2,3]
+
+    selected=table.select(np.array([True,False,False,True]))
+    assert selected.coor.tolist()==[[0,1],[3,0]] and selected.id.tolist()==[0,3]
+
+    merged=fault_table.concatenate([selected,None,fault_table([(1,1)],5,'0')])
+    assert len(merged)==3 and merged.id is None
+    assert merged.SA_type_name.tolist()==['flip','flip','0']
+    assert fault_table.concatenate([None]) is None
+
+def test_check_shape():
+    table=fault_table([(0,1,1),(3,0,2)], [1,2], 'flip')
+    assert len(table.check_shape((2,4,4)))==1
+    assert table.check_shape((None,4,4)) is table
+    with pytest.raises(ValueError):
+        table.check_shape((4,4,2))
+    with pytest.raises(ValueError):
+        table.check_shape((4,4))
+
+def test_modulators():
+    table=fault_table([(0,),(1,),(2,)], [0,3,7], ['0','1','flip'])
+    modulator0,modulator1,modulatorF=table.modulators()
+    assert modulator0.dtype==np.int32
+    assert modulator0.tolist()==[~1,-1,-1]
+    assert modulator1.tolist()==[0,8,0]
+    assert modulatorF.tolist()==[0,0,128]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+The golden reference store shared by the FT metrics and the golden activation cache.
+"""
+
+import os, json
+import numpy as np
+import pytest
+
+from simulator.metrics import golden_reference as golden_module
+from simulator.metrics.golden_reference import golden_reference_store, golden_score
+
+N_SAMPLE=10
+
+def _data(seed=0):
+    rng=np.random.default_rng(seed)
+    prediction=rng.random((N_SAMPLE,4)).astype(np.float32)
+    label=np.eye(4,dtype=np.float32)[rng.integers(0,4,N_SAMPLE)]
+    return prediction,label
+
+def _batches(arrays, batch_size=4):
+    for start in range(0,N_SAMPLE,batch_size):
+        yield {array_name:array[start:start+batch_size] for array_name,array in arrays.items()}
+
+@pytest.fixture(autouse=True)
+def _clear_array_cache():
+    golden_module._golden_array_cache.clear()
+    yield
+    golden_module._golden_array_cache.clear()
+
+def test_register_and_read(tmp_path):
+    prediction,label=_data()
+    store=golden_reference_store(str(tmp_path))
+    activation=np.arange(N_SAMPLE*3,dtype=np.int16).reshape(N_SAMPLE,3)
+    store.register('lenet', prediction, score=golden_score(prediction,label), activations={2:activation}, info={'dataset':'mnist'})
+
+    assert store.names()==['lenet'] and store.has('lenet')
+    loaded=store.get_prediction('lenet')
+    assert isinstance(loaded,np.memmap)
+    assert np.array_equal(loaded,prediction)
+    assert np.array_equal(store.get_activation('lenet',2),activation)
+    assert store.activation_layers('lenet')==[2]
+    assert store.get_score('lenet')==pytest.approx(golden_score(prediction,label))
+    assert store.get_fingerprint('lenet') is None
+
+    # a new store object reads the same index
+    assert np.array_equal(golden_reference_store(str(tmp_path)).get_prediction('lenet'),prediction)
+    with pytest.raises(ValueError):
+        store.register('lenet', prediction)
+    with pytest.raises(ValueError):
+        store.get_prediction('missing')
+
+def test_checksum_mismatch(tmp_path):
+    prediction,_=_data()
+    store=golden_reference_store(str(tmp_path))
+    store.register('lenet', prediction)
+    with open(os.path.join(str(tmp_path),'lenet','prediction.npy'), 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\x00' if f.read(1)!=b'\x00' else b'\x01')
+    with pytest.raises(ValueError):
+        store.get_prediction('lenet')
+    assert np.array_equal(golden_reference_store(str(tmp_path), verify=False).get_prediction('lenet')[:-1],prediction[:-1])
+
+def test_update_keeps_other_arrays_and_fingerprint(tmp_path):
+    prediction,label=_data()
+    layer_input=np.random.default_rng(1).random((N_SAMPLE,2,2)).astype(np.float32)
+    store=golden_reference_store(str(tmp_path))
+    fingerprint={'model':'quantized_lenet5','n_sample':N_SAMPLE}
+
+    # the layer inputs and prediction of the golden activation cache, in one index entry
+    store.update('quantized_lenet5', _batches({'prediction':prediction,'layer_3_input_0':layer_input}), N_SAMPLE, y=label, fingerprint=fingerprint)
+    assert store.get_score('quantized_lenet5')==pytest.approx(golden_score(prediction,label))
+    assert store.get_fingerprint('quantized_lenet5')==fingerprint
+    assert np.array_equal(store.get_layer_input('quantized_lenet5',3),layer_input)
+    # input arrays are not output activations
+    assert store.activation_layers('quantized_lenet5')==[]
+
+    # adding a layer input keeps the prediction, score and fingerprint
+    other_input=layer_input[:,0]
+    store.update('quantized_lenet5', _batches({'layer_5_input_1':other_input}), N_SAMPLE)
+    assert store.has_array('quantized_lenet5','layer_3_input_0') and store.has_array('quantized_lenet5','prediction')
+    assert np.array_equal(store.get_layer_input('quantized_lenet5',5,1),other_input)
+    assert store.get_fingerprint('quantized_lenet5')==fingerprint
+    assert store.get_score('quantized_lenet5')==pytest.approx(golden_score(prediction,label))
+    assert not store.has_array('missing','prediction')
+
+    with open(os.path.join(str(tmp_path),'index.json'), 'r') as f:
+        index=json.load(f)
+    assert sorted(index['quantized_lenet5']['arrays'])==['layer_3_input_0','layer_5_input_1','prediction']
+    assert not any(file_name.endswith('.tmp') for file_name in os.listdir(os.path.join(str(tmp_path),'quantized_lenet5')))
+
+    store.remove('quantized_lenet5')
+    assert not store.has('quantized_lenet5')
+    assert not os.path.exists(os.path.join(str(tmp_path),'quantized_lenet5'))
+
+def test_overwrite_drops_stale_arrays(tmp_path):
+    prediction,_=_data()
+    store=golden_reference_store(str(tmp_path))
+    store.register('lenet', prediction, activations={1:prediction})
+    store.register('lenet', prediction*0.5, overwrite=True)
+    assert store.activation_layers('lenet')==[]
+    assert not os.path.exists(os.path.join(str(tmp_path),'lenet','layer_1_output.npy'))
+    assert np.array_equal(store.get_prediction('lenet'),prediction*0.5)
+
+def test_golden_score():
+    prediction=np.array([[0.7,0.2,0.1],[0.2,0.5,0.3],[0.1,0.3,0.6]])
+    label=np.eye(3)[[0,2,1]]
+    loss,top1,top2=golden_score(prediction,label,topk=2)
+    assert loss==pytest.approx(-np.mean(np.log([0.7,0.3,0.3])))
+    assert top1==pytest.approx(1/3)
+    assert top2==pytest.approx(1.0)
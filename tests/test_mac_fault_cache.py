@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Round-trip and keys of the mac fault preprocess cache.
+"""
+
+import os
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+from simulator.comp_unit import mac_fault_cache as cache_module
+from simulator.comp_unit.mac_fault_cache import mac_fault_cache, content_key
+
+def _mapping_key(cache):
+    layer=SimpleNamespace(name='conv1', input_shape=(None,28,28,1), output_shape=(None,28,28,8), kernel_size=(3,3), strides=(1,1), padding='same')
+    qtz=SimpleNamespace(nb=8, fb=3, rounding_method='nearest', overflow_mode=True)
+    mac=SimpleNamespace(quantizer=qtz, quant_mode='hybrid', ifmap_io=None, wght_io=None, psum_io=None, noise_inject=False,
+                        sim_truncarry=False, psumfault_handle='single', fast_gen=True, amp_factor_fmap=1.0, amp_factor_wght=1.0)
+    PEarray=SimpleNamespace(n_x=8, n_y=8, n_clk=16)
+    tiles=[SimpleNamespace(tile_shape=(1,28,28,1), is_fmap=True, wl=8, row_prior=['Tr'], col_prior=['Tc'])]
+    return cache.mapping_key(layer, mac, PEarray, tiles, [{'PE_y':8}])
+
+def test_round_trip(tmp_path):
+    cache=mac_fault_cache(str(tmp_path))
+    preprocess_data={'idx_ofmap':np.arange(12,dtype=np.int32).reshape(3,4),
+                     'psidx_offsets':np.array([0,2,5],dtype=np.int64),
+                     'fault_param':'psum_out',
+                     'fault_bit':3,
+                     'amp':1.5,
+                     'n_psum':np.int64(7)}
+    detail={'num_layer_fault_coor':3}
+    cache.save('key0', preprocess_data, detail)
+
+    loaded,loaded_detail=cache.load('key0')
+    assert set(loaded.keys())==set(preprocess_data.keys())
+    assert np.array_equal(loaded['idx_ofmap'],preprocess_data['idx_ofmap'])
+    assert loaded['idx_ofmap'].dtype==np.int32
+    assert loaded['fault_param']=='psum_out' and isinstance(loaded['fault_param'],str)
+    assert loaded['fault_bit']==3 and isinstance(loaded['fault_bit'],int)
+    assert loaded['amp']==1.5 and isinstance(loaded['amp'],float)
+    assert loaded['n_psum']==7 and loaded['n_psum'].dtype==np.int64
+    assert loaded_detail=={'num_layer_fault_coor':3}
+
+def test_none_entry_and_miss(tmp_path):
+    cache=mac_fault_cache(str(tmp_path))
+    assert cache.load('missing') is None
+    cache.save('empty', None)
+    assert cache.load('empty')==(None,None)
+
+def test_cached_hit_and_miss(tmp_path):
+    cache=mac_fault_cache(str(tmp_path))
+    calls=[]
+    def compute():
+        calls.append(1)
+        return {'a':np.ones(3)}, None
+
+    first=cache.cached('k', compute)
+    second=cache.cached('k', compute)
+    assert len(calls)==1
+    assert (cache.hit,cache.miss)==(1,1)
+    assert np.array_equal(first[0]['a'],second[0]['a'])
+
+@pytest.mark.parametrize('value',[[np.zeros(2),np.zeros(3)], {'a':1}])
+def test_object_items_are_refused(tmp_path, value):
+    cache=mac_fault_cache(str(tmp_path))
+    with pytest.raises(TypeError):
+        cache.save('obj', {'bad':value})
+    with pytest.raises(TypeError):
+        cache.save('obj', {'ok':np.ones(2)}, detail={'bad':value})
+    assert not os.path.exists(cache.entry_file('obj'))
+
+    # cached returns the data uncached
+    preprocess_data,_=cache.cached('obj', lambda: ({'bad':value}, None))
+    assert preprocess_data['bad'] is value
+    assert cache.load('obj') is None
+
+def test_keys_follow_content_and_format_version(tmp_path, monkeypatch):
+    cache=mac_fault_cache(str(tmp_path))
+    mapping_key=_mapping_key(cache)
+    assert mapping_key==_mapping_key(cache)
+    fault_key=cache.PE_fault_key(mapping_key, (2,3), {'SA_type':'flip','SA_bit':3,'param':'psum_out'})
+    assert fault_key!=cache.PE_fault_key(mapping_key, (2,4), {'SA_type':'flip','SA_bit':3,'param':'psum_out'})
+    assert content_key({'a':1,'b':2})==content_key({'b':2,'a':1})
+
+    monkeypatch.setattr(cache_module, 'CACHE_FORMAT_VERSION', cache_module.CACHE_FORMAT_VERSION+1)
+    assert _mapping_key(cache)!=mapping_key
+    assert cache.PE_fault_key(mapping_key, (2,3), {'SA_type':'flip','SA_bit':3,'param':'psum_out'})!=fault_key
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled PE array mapping plan against the PE_mapping_backward pipeline, and batched mapping against per-fault mapping.
+"""
+
+import os, json, copy
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+pytest.importorskip('tqdm')
+
+from simulator.comp_unit.PEarray import PEarray
+from simulator.comp_unit.tile import tile_PE
+from simulator.comp_unit.mapping_flow import mapping_plan, PE_mapping_forward, PE_mapping_backward
+
+# a 4x4 PE array version of the example_PEarray_mapping_fromTile dataflow
+OFMAP_CONFIG={'orig_prior':[3,0,1,2], 'expect_shape':(36,8), 'reshape_prior':[0,1], 'slicing_dims':(36,4), 'slices_permute':[0,1],
+              'tilting':True, 'tilt_axis':1, 'tilt_direction':0}
+WGHT_CONFIG={'orig_prior':[0,1,2,3], 'expect_shape':(36,8), 'reshape_prior':[0,1], 'slicing_dims':(4,4), 'slices_permute':[0,1],
+             'bias_slice_width':4}
+IFMAP_CONFIG={'ksizes':(1,3,3,1), 'strides':(1,1,1,1), 'dilation_rates':(1,1,1,1), 'padding':'same', 'edge_fill':False,
+              'patches_unravel':[0,1,2], 'reshape_patches':True, 'patches_prior':[3,1,2,0], 'expect_shape':(36,36),
+              'reshape_prior':[1,0], 'slicing_dims':(36,4), 'slices_permute':[1,0], 'tilting':True, 'tilt_axis':1, 'tilt_direction':0}
+
+# the tiles repeat twice over layer rows and channels
+LAYER=SimpleNamespace(name='conv', weight_shape=[(3,3,8,8),(8,)], input_shape=(1,12,6,8), output_shape=(1,12,6,8))
+
+FAULTS=[((1,2),{'SA_type':'flip','SA_bit':3,'param':'psum_out'}),
+        ((0,3),{'SA_type':'1','SA_bit':5,'param':'wght_in'}),
+        ((3,0),{'SA_type':'0','SA_bit':1,'param':'ifmap_out'}),
+        ((2,2),{'SA_type':'flip','SA_bit':7,'param':'psum_in'})]
+
+def _PEarray_config():
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'config_PEarray.json'), 'r') as config_file:
+        config=json.load(config_file)
+    config.update(o_stall_latency=8, w_repeat=42, w_pack_size=42, w_stall_latency=5, i_stall_latency=5, p_stall_latency=5,
+                  b_repeat=42, b_pack_size=42, b_stall_latency=5)
+    return config
+
+def _setup():
+    wght_tile=tile_PE((3,3,4,8),is_fmap=False,wl=8)
+    ifmap_tile=tile_PE((1,6,6,4),is_fmap=True,wl=8)
+    ofmap_tile=tile_PE((1,6,6,8),is_fmap=True,wl=8)
+    wght_tile.use_bias=True
+    MXU=PEarray(4,4,ofmap_tile=ofmap_tile,wght_tile=wght_tile,ifmap_tile=ifmap_tile)
+    return ifmap_tile,wght_tile,ofmap_tile,MXU
+
+def _configs():
+    return [copy.deepcopy(config) for config in [IFMAP_CONFIG,WGHT_CONFIG,OFMAP_CONFIG,_PEarray_config()]]
+
+@pytest.fixture(scope='module')
+def plan():
+    return mapping_plan(LAYER,*_setup(),*_configs())
+
+def _psum_rows(fault_dict):
+    """ The set of (layer coordinate, psum index) rows, independent of psum index order. """
+    psum_idx=fault_dict['psum_idx']
+    coor=fault_dict['coor']
+    if 'psum_idx_offsets' in fault_dict:
+        owner=np.repeat(np.arange(len(coor)),np.diff(fault_dict['psum_idx_offsets']))
+    else:
+        owner=np.repeat(np.arange(len(coor)),psum_idx.shape[1])
+        psum_idx=np.reshape(psum_idx,[-1,psum_idx.shape[-1]])
+    return set(map(tuple,np.concatenate([coor[owner],psum_idx],axis=1).tolist()))
+
+@pytest.mark.parametrize('fault_loc,fault_info',FAULTS)
+def test_plan_matches_backward_pipeline(plan, fault_loc, fault_info):
+    plan.gen_PEarray_permanent_fault_dict(fault_loc, fault_info, mac_config=False)
+    layer_fd=plan.map_backward()
+
+    ifmap_tile,wght_tile,ofmap_tile,MXU=_setup()
+    PE_mapping_forward(ifmap_tile,wght_tile,ofmap_tile,MXU,*_configs(),pre_plan=True,verbose=0)
+    MXU.gen_PEarray_permanent_fault_dict(fault_loc, fault_info, mac_config=False)
+    ref_fd=PE_mapping_backward(LAYER,MXU,verbose=0)
+
+    assert np.array_equal(layer_fd['coor'],ref_fd['coor'])
+    assert _psum_rows(layer_fd)==_psum_rows(ref_fd)
+    for info in ['SA_type','SA_bit','param']:
+        assert layer_fd[info]==fault_info[info]
+
+def test_batch_matches_per_fault(plan):
+    fault_locs=[fault_loc for fault_loc,_ in FAULTS]
+    fault_infos=[fault_info for _,fault_info in FAULTS]
+    layer_fds,detail=plan.map_backward_batch(fault_locs, fault_infos, mac_config=False, return_detail=True)
+    assert len(layer_fds)==len(FAULTS)
+
+    n_layer_fault_coor=0
+    for (fault_loc,fault_info),layer_fd in zip(FAULTS,layer_fds):
+        plan.gen_PEarray_permanent_fault_dict(fault_loc, fault_info, mac_config=False)
+        single_fd=plan.map_backward()
+        assert set(layer_fd.keys())==set(single_fd.keys())
+        for info,value in single_fd.items():
+            assert np.array_equal(np.asarray(layer_fd[info]),np.asarray(value)),info
+        n_layer_fault_coor+=len(single_fd['coor'])
+    assert detail['num_layer_fault_coor']==n_layer_fault_coor
+
+def test_batch_no_fault_is_None(plan):
+    assert plan.map_backward_batch([], [], mac_config=False)==[]
+
+    no_weight=SimpleNamespace(name='pool', weight_shape=[], input_shape=(1,12,6,8), output_shape=(1,6,3,8))
+    no_weight_plan=mapping_plan(no_weight,*_setup(),*_configs())
+    assert no_weight_plan.map_backward_batch([FAULTS[0][0]], [FAULTS[0][1]], mac_config=False)==[None]
+
+    # group 1 has no layer coordinate
+    batch_layer_fd={'coor':np.array([[0,0,0,0],[0,1,0,0],[0,0,0,1]]),
+                    'psum_idx':np.zeros((3,2,9),dtype=np.int32),
+                    'group':np.array([0,0,2])}
+    layer_fds=plan._split_layer_fault_dict(batch_layer_fd, [FAULTS[0][1]]*3)
+    assert layer_fds[1] is None
+    assert len(layer_fds[0]['coor'])==2 and len(layer_fds[2]['coor'])==1
+    assert plan._split_layer_fault_dict(dict(), [FAULTS[0][1]]*2)==[None,None]
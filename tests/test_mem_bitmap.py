@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Unique-address memory fault generation of bitmap.
+"""
+
+import numpy as np
+import pytest
+
+from simulator.memory.mem_bitmap import bitmap, bitmap_fault_dtype, fault_array2dict, fault_dict2array
+
+@pytest.mark.parametrize('fault_num',[1,37,500,2048])
+def test_unique_exact_count(fault_num):
+    # over a quarter of the memory takes the permutation path
+    buffer=bitmap(16,128,wl=8)
+    numtag=buffer.addr_gen_mem_unique(fault_num,rng=0)
+    assert len(numtag)==fault_num
+    assert len(np.unique(numtag))==fault_num
+    assert np.all((numtag>=0) & (numtag<16*128))
+
+def test_unique_poisson_in_range():
+    buffer=bitmap(64,64)
+    numtag=buffer.addr_gen_mem_unique(200,distribution='poisson',poisson_lam=(20,30),rng=1)
+    assert len(np.unique(numtag))==200
+    row,col=np.divmod(numtag,buffer.col)
+    assert np.all(row<buffer.row) and np.all(col<buffer.col)
+
+def test_unique_is_reproducible():
+    buffer=bitmap(32,256,wl=8)
+    assert np.array_equal(buffer.addr_gen_mem_unique(100,rng=5),buffer.addr_gen_mem_unique(100,rng=5))
+    assert not np.array_equal(buffer.addr_gen_mem_unique(100,rng=5),buffer.addr_gen_mem_unique(100,rng=6))
+    assert np.array_equal(buffer.addr_gen_mem_unique(100,rng=np.random.default_rng(7)),
+                          buffer.addr_gen_mem_unique(100,rng=np.random.default_rng(7)))
+
+def test_unique_errors():
+    buffer=bitmap(4,4)
+    with pytest.raises(ValueError):
+        buffer.addr_gen_mem_unique(17)
+    with pytest.raises(TypeError):
+        buffer.addr_gen_mem_unique(2,distribution='poisson',poisson_lam=3)
+    with pytest.raises(ValueError):
+        buffer.addr_gen_mem_unique(2,distribution='poisson',poisson_lam=(5,1))
+    with pytest.raises(NameError):
+        buffer.addr_gen_mem_unique(2,distribution='normal')
+    # a poisson with lambda 0 concentrates on one address
+    with pytest.raises(ValueError):
+        bitmap(64,64).addr_gen_mem_unique(3,distribution='poisson',poisson_lam=(0,0),rng=0)
+
+def test_fault_array_and_dict():
+    buffer=bitmap(32,256,wl=8)
+    fault_array,fault_num=buffer.gen_bitmap_SA_fault_array(0.01,fault_type='1',rng=2)
+    assert fault_array.dtype==bitmap_fault_dtype
+    assert fault_num==len(fault_array)==int(32*256*0.01)
+    assert buffer.fault_dict is fault_array
+    assert np.all(fault_array['type']=='1')
+
+    fault_dict,_=buffer.gen_bitmap_SA_fault_dict(0.01,fast_gen=True,fault_type='1',rng=2)
+    assert fault_dict==fault_array2dict(fault_array)
+    assert np.array_equal(fault_dict2array(fault_dict),fault_array)
+    with pytest.raises(TypeError):
+        buffer.gen_bitmap_SA_fault_dict(0.01,fast_gen=True,rng=2,unknown=1)
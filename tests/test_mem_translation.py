@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled memory translation tables against the tile.bitmap2tile and fault_dict_tile2layer mapping.
+"""
+
+import numpy as np
+import pytest
+
+from simulator.memory.mem_bitmap import bitmap
+from simulator.memory.tile import tile, tile_FC
+from simulator.memory.mem_translation import get_translation, clear_translation_cache, decode_bitmap_fault
+from simulator.fault.fault_table import fault_table
+
+ROW_PRIOR=['Tr','Tm','Tc','Tn']
+COL_PRIOR=['Tm','Tc','Tr','Tn']
+
+# (tile maker, layer shape, use_bias), the layer shapes are not multiples of the tile shapes
+CASES=[(lambda: tile((3,3,4,4),is_fmap=False,wl=8,row_prior=ROW_PRIOR,col_prior=COL_PRIOR), (3,3,10,12), True),
+       (lambda: tile((1,4,4,4),is_fmap=True,wl=8,row_prior=ROW_PRIOR,col_prior=COL_PRIOR), (2,10,9,6), False),
+       (lambda: tile_FC((20,3),is_fmap=False,wl=8), (50,8), True)]
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    clear_translation_cache()
+    yield
+    clear_translation_cache()
+
+def _rows(table):
+    """ The set of (layer coordinate, bit, stuck-at type) rows. """
+    if not isinstance(table,fault_table):
+        table=fault_table.from_dict(table,ndim=len(next(iter(table))) if len(table)>0 else 0)
+    return set(zip(map(tuple,table.coor.tolist()),table.SA_bit.tolist(),table.SA_type_name.tolist()))
+
+def _outer_product(tile_fault_dict, tile_shape, layer_shape):
+    """ Every tile fault on every tile repetition within the layer. """
+    rows=set()
+    for coor,bit,SA_type in _rows(tile_fault_dict):
+        for base in np.ndindex(*[-(-dim//tile_dim) for dim,tile_dim in zip(layer_shape,tile_shape)]):
+            layer_coor=tuple(int(c) for c in np.add(coor,np.multiply(base,tile_shape)))
+            if all(c<dim for c,dim in zip(layer_coor,layer_shape)):
+                rows.add((layer_coor,bit,SA_type))
+    return rows
+
+@pytest.mark.parametrize('make_tile,layer_shape,use_bias',CASES)
+@pytest.mark.parametrize('seed',[0,1,2])
+@pytest.mark.parametrize('fast_mode',[False,True])
+def test_legacy_and_compiled_mapping_match(make_tile, layer_shape, use_bias, seed, fast_mode):
+    buffer=bitmap(16,128,wl=8)
+    buffer.gen_bitmap_SA_fault_dict(0.01,fast_gen=True,rng=seed)
+
+    legacy_tile=make_tile()
+    legacy_tile.print_detail=False
+    legacy=legacy_tile.gen_layer_fault_dict(layer_shape,buffer,use_bias=use_bias,fast_mode=fast_mode)
+    compiled=make_tile().gen_layer_fault_table(layer_shape,buffer,use_bias=use_bias)
+
+    # the compiled translation follows slow mode, fast mode keeps one faulty bit per word
+    if use_bias:
+        if not fast_mode:
+            assert _rows(legacy[0])==_rows(compiled[0])
+            assert _rows(legacy[1])==_rows(compiled[1])
+        legacy=legacy[0]
+    elif not fast_mode:
+        assert _rows(legacy)==_rows(compiled)
+
+    # the legacy path places every tile fault on every tile repetition
+    tile_shape=[legacy_tile.Tn,legacy_tile.Tm] if isinstance(legacy_tile,tile_FC) and legacy_tile.is_fmap else \
+               [legacy_tile.Tm,legacy_tile.Tn] if isinstance(legacy_tile,tile_FC) else \
+               [legacy_tile.Tn,legacy_tile.Tr,legacy_tile.Tc,legacy_tile.Tm] if legacy_tile.is_fmap else \
+               [legacy_tile.Tr,legacy_tile.Tc,legacy_tile.Tm,legacy_tile.Tn]
+    assert _rows(legacy)==_outer_product(legacy_tile.fault_dict,tile_shape,layer_shape)
+
+def test_tile2layer_covers_every_repetition():
+    wght_tile=tile((3,3,4,4),is_fmap=False,wl=8,row_prior=ROW_PRIOR,col_prior=COL_PRIOR)
+    # 2 faults over 2x2 repetitions, the element-wise pairing lost half of them
+    wght_tile.fault_dict={(0,0,1,2):{'SA_type':'flip','SA_bit':3},(2,1,3,0):{'SA_type':'1','SA_bit':0}}
+    layer_fault_dict=wght_tile.fault_dict_tile2layer((3,3,8,8))
+    assert set(layer_fault_dict.keys())=={(0,0,1,2),(0,0,1,6),(0,0,5,2),(0,0,5,6),
+                                          (2,1,3,0),(2,1,3,4),(2,1,7,0),(2,1,7,4)}
+    assert layer_fault_dict[(2,1,7,4)]=={'SA_type':'1','SA_bit':0}
+
+@pytest.mark.parametrize('make_tile,layer_shape,use_bias',CASES)
+def test_word_table_follows_bitmap2tile(make_tile, layer_shape, use_bias):
+    buffer=bitmap(16,128,wl=8)
+    tile_=make_tile()
+    tile_.print_detail=False
+    translation=get_translation(tile_,buffer,layer_shape,use_bias=use_bias)
+    assert len(translation.word2tile)==translation.tile_size//translation.wl
+    for word,tile_idx in enumerate(translation.word2tile):
+        numtag=word*translation.wl
+        coor,_=tile_.bitmap2tile((numtag//buffer.col,numtag%buffer.col),buffer)
+        assert np.ravel_multi_index(coor,translation.tile_shape)==tile_idx
+
+@pytest.mark.parametrize('make_tile,layer_shape,use_bias',CASES)
+def test_layer_csr_partitions_the_layer(make_tile, layer_shape, use_bias):
+    translation=get_translation(make_tile(),bitmap(16,128,wl=8),layer_shape,use_bias=use_bias)
+    assert translation.indptr[-1]==len(translation.indices)==np.prod(layer_shape)
+    assert np.array_equal(np.sort(translation.indices),np.arange(np.prod(layer_shape)))
+
+    # each CSR row holds the layer elements congruent to its tile element
+    owner=np.repeat(np.arange(len(translation.indptr)-1),np.diff(translation.indptr))
+    layer_coor=np.stack(np.unravel_index(translation.indices,layer_shape),axis=-1)
+    assert np.array_equal(np.ravel_multi_index((layer_coor%np.array(translation.tile_shape)).T,translation.tile_shape),owner)
+
+def test_translation_is_shared_and_decodes_both_layouts():
+    buffer=bitmap(16,128,wl=8)
+    fault_array,_=buffer.gen_bitmap_SA_fault_array(0.01,rng=3)
+    translation=get_translation(CASES[1][0](),buffer,CASES[1][1])
+    assert get_translation(CASES[1][0](),buffer,CASES[1][1]) is translation
+
+    numtag,fault_type=decode_bitmap_fault(fault_array,buffer.col)
+    numtag_dict,fault_type_dict=decode_bitmap_fault(dict(zip(zip(fault_array['row'].tolist(),fault_array['col'].tolist()),fault_array['type'].tolist())),buffer.col)
+    assert np.array_equal(numtag,numtag_dict) and np.array_equal(fault_type,fault_type_dict)
+    assert _rows(translation.map(fault_array))==_rows(translation.map_numtag(numtag,fault_type))
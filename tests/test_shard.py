@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Crash-resume of sharded fault campaign shard files.
+"""
+
+import os, csv
+
+from simulator.inference.shard import sharded_campaign
+
+FIELDS=['fault_rate','round','loss','accuracy','runtime']
+
+def _append_rows(shard_file, rows):
+    new_file=not os.path.exists(shard_file)
+    with open(shard_file, 'a', newline='') as csvfile:
+        writer=csv.DictWriter(csvfile, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+        for fr,i in rows:
+            writer.writerow({'fault_rate':repr(fr),'round':i,'loss':0.1*i,'accuracy':0.8,'runtime':1.2})
+
+def _make_sharded(tmp_path, n_round):
+    return sharded_campaign(dict(), dict(), [0.1], n_round, str(tmp_path), n_shard=1, verbose=0)
+
+def test_shard_tasks_round_robin(tmp_path):
+    sharded=sharded_campaign(dict(), dict(), [0.1,0.2], [3,2], str(tmp_path), n_shard=2, verbose=0)
+    assert sharded.shard_tasks(0)==[(0.1,0),(0.1,2),(0.2,1)]
+    assert sharded.shard_tasks(1)==[(0.1,1),(0.2,0)]
+
+def test_resume_with_cut_off_last_row(tmp_path):
+    sharded=_make_sharded(tmp_path, 3)
+    shard_file=sharded.shard_file(0)
+    _append_rows(shard_file, [(0.1,0),(0.1,1)])
+    # crash right before the newline of the last row, the row has every column
+    with open(shard_file, 'rb+') as f:
+        content=f.read()
+        f.truncate(len(content.rstrip(b'\r\n')))
+
+    assert sharded.completed_tasks(0)=={(0.1,0)}
+
+    # resume: drop the cut-off row and append the rerun pairs
+    sharded._truncate_partial_row(0)
+    with open(shard_file, 'rb') as f:
+        assert f.read().endswith(b'\n')
+    _append_rows(shard_file, [(0.1,1),(0.1,2)])
+
+    assert sharded.completed_tasks(0)=={(0.1,0),(0.1,1),(0.1,2)}
+    missing=sharded.merge(str(tmp_path/'merged'))
+    assert missing=={0.1:0}
+    with open(os.path.join(str(tmp_path/'merged'),'0.1.csv'), newline='') as csvfile:
+        rows=list(csv.DictReader(csvfile))
+    assert [float(row['loss']) for row in rows]==[0.0,0.1,0.2]
+    assert 'runtime' not in rows[0]
+
+def test_read_shard_drops_row_without_all_columns(tmp_path):
+    sharded=_make_sharded(tmp_path, 2)
+    shard_file=sharded.shard_file(0)
+    _append_rows(shard_file, [(0.1,0)])
+    with open(shard_file, 'a', newline='') as f:
+        f.write('0.1,1,0.')
+
+    assert sharded.completed_tasks(0)=={(0.1,0)}
+    assert sharded.merge(str(tmp_path/'merged'))=={0.1:1}
+
+def test_truncate_keeps_complete_file(tmp_path):
+    sharded=_make_sharded(tmp_path, 2)
+    shard_file=sharded.shard_file(0)
+    _append_rows(shard_file, [(0.1,0),(0.1,1)])
+    with open(shard_file, 'rb') as f:
+        content=f.read()
+
+    sharded._truncate_partial_row(0)
+    with open(shard_file, 'rb') as f:
+        assert f.read()==content
+    assert sharded.completed_tasks(0)=={(0.1,0),(0.1,1)}
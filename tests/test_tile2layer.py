@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Partial sum index handling of io_data_solver.tile2layer.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tqdm')
+
+from simulator.comp_unit.tile import tile_PE, io_data_solver
+
+# psum index (out batch, out channel, out row, out col, in channel, kernel row, kernel col, in row, in col) upper bounds of a tile
+PSUM_BOUND=[1,2,4,4,2,3,3,6,6]
+TILE_SHAPES={'layer_input_shape':(1,6,6,2),'layer_weight_shape':[(3,3,2,2)],'layer_output_shape':(1,4,4,2)}
+# tiles repeat twice over rows, columns and channels
+LAYER_SHAPES={'layer_input_shape':(1,10,10,4),'layer_weight_shape':[(3,3,4,4)],'layer_output_shape':(1,8,8,4)}
+
+def _solver(state='fastgen'):
+    ofmap_tile=tile_PE((1,4,4,2),is_fmap=True,wl=8)
+    wght_tile=tile_PE((3,3,2,2),is_fmap=False,wl=8)
+    ifmap_tile=tile_PE((1,6,6,2),is_fmap=True,wl=8)
+    ifmap_tile.padding='valid'
+    ifmap_tile.ksizes=(1,3,3,1)
+    ifmap_tile.dilation_rates=(1,1,1,1)
+    ifmap_tile.expand_method='reshape'
+    solver=io_data_solver(ofmap_tile,wght_tile,ifmap_tile)
+    solver.pstate=solver.wstate=solver.istate=state
+    return solver
+
+def _fault_dict(rng, n_coor, psidx_cnt):
+    coor=np.unique(rng.integers(0,[1,4,4,2],size=(n_coor,4)),axis=0)
+    # unsorted coordinates
+    coor=coor[rng.permutation(len(coor))]
+    psidx_cnt=np.resize(psidx_cnt,len(coor))
+    psum_idx=rng.integers(0,PSUM_BOUND,size=(int(np.sum(psidx_cnt)),9))
+    return {'coor':coor,'id':np.arange(len(coor)),'SA_type':'flip','SA_bit':3,'param':'psum_out'},psum_idx,psidx_cnt
+
+def _ragged(psum_idx, psidx_cnt):
+    psidx_list=np.split(psum_idx,np.cumsum(psidx_cnt)[:-1])
+    psum_idx_obj=np.empty(len(psidx_list),dtype=object)
+    psum_idx_obj[:]=psidx_list
+    return psum_idx_obj
+
+def _psum_rows(fault_dict):
+    psum_idx=fault_dict['psum_idx']
+    coor=fault_dict['coor']
+    if 'psum_idx_offsets' in fault_dict:
+        owner=np.repeat(np.arange(len(coor)),np.diff(fault_dict['psum_idx_offsets']))
+    else:
+        owner=np.repeat(np.arange(len(coor)),psum_idx.shape[1])
+        psum_idx=np.reshape(psum_idx,[-1,psum_idx.shape[-1]])
+    return sorted(map(tuple,np.concatenate([coor[owner],psum_idx],axis=1).tolist()))
+
+def test_unique_coors_keep_their_psum_idx():
+    rng=np.random.default_rng(0)
+    fault_dict,psum_idx,_=_fault_dict(rng,8,3)
+    coor=fault_dict['coor']
+    fault_dict['psum_idx']=np.reshape(psum_idx,[len(coor),3,9])
+    layer_fd=_solver().tile2layer(dict(fault_dict),**TILE_SHAPES)
+
+    # tile is the whole layer, the coordinates are sorted and each keeps its own psum indexes
+    order=np.lexsort(coor.T[::-1])
+    assert np.array_equal(layer_fd['coor'],coor[order])
+    assert np.array_equal(layer_fd['psum_idx'],np.reshape(psum_idx,[len(coor),3,9])[order])
+
+def test_object_psum_idx_is_fastgen():
+    rng=np.random.default_rng(1)
+    fault_dict,psum_idx,psidx_cnt=_fault_dict(rng,8,[1,2,3])
+    layer_fd_obj=_solver().tile2layer(dict(fault_dict,psum_idx=_ragged(psum_idx,psidx_cnt)),**LAYER_SHAPES)
+    layer_fd_csr=_solver().tile2layer(dict(fault_dict,psum_idx=psum_idx,psum_idx_offsets=np.append(0,np.cumsum(psidx_cnt))),**LAYER_SHAPES)
+
+    assert 'psum_idx_offsets' in layer_fd_obj
+    assert layer_fd_obj['psum_idx'].dtype==np.int32
+    assert np.array_equal(layer_fd_obj['coor'],layer_fd_csr['coor'])
+    assert np.array_equal(layer_fd_obj['psum_idx'],layer_fd_csr['psum_idx'])
+    assert np.array_equal(layer_fd_obj['psum_idx_offsets'],layer_fd_csr['psum_idx_offsets'])
+
+def test_repetitive_coors_merge_uneven_psum_idx():
+    rng=np.random.default_rng(2)
+    fault_dict,psum_idx,psidx_cnt=_fault_dict(rng,6,[1,2])
+    n_coor=len(fault_dict['coor'])
+    solver=_solver()
+    layer_fd=solver.tile2layer(dict(fault_dict,psum_idx=_ragged(psum_idx,psidx_cnt)),**LAYER_SHAPES)
+
+    # the input channel tiles add up on the same layer coordinate, no psum index is lost
+    assert len(layer_fd['coor'])<solver.num_base_coor*n_coor
+    assert len(np.unique(layer_fd['coor'],axis=0))==len(layer_fd['coor'])
+    assert layer_fd['psum_idx_offsets'][-1]==len(layer_fd['psum_idx'])==solver.num_layer_psum_idx
+    assert layer_fd['psum_idx'].shape[1]==solver.len_psidx
+
+def test_group_batch_matches_single_faults():
+    rng=np.random.default_rng(3)
+    singles=list()
+    fault_dicts=list()
+    for n_coor,psidx_cnt in [(5,[1,3]),(4,2),(6,[2,1,1])]:
+        fault_dict,psum_idx,psidx_cnt=_fault_dict(rng,n_coor,psidx_cnt)
+        fault_dict['psum_idx']=psum_idx
+        fault_dict['psum_idx_offsets']=np.append(0,np.cumsum(psidx_cnt))
+        fault_dicts.append(fault_dict)
+        singles.append(_solver().tile2layer(dict(fault_dict),**LAYER_SHAPES))
+
+    psidx_cnt=np.concatenate([np.diff(fault_dict['psum_idx_offsets']) for fault_dict in fault_dicts])
+    batch_fd={'coor':np.concatenate([fault_dict['coor'] for fault_dict in fault_dicts]),
+              'psum_idx':np.concatenate([fault_dict['psum_idx'] for fault_dict in fault_dicts]),
+              'psum_idx_offsets':np.append(0,np.cumsum(psidx_cnt)),
+              'id':np.arange(len(psidx_cnt)),
+              'group':np.concatenate([np.full(len(fault_dict['coor']),group) for group,fault_dict in enumerate(fault_dicts)])}
+    batch_layer_fd=_solver().tile2layer(batch_fd,**LAYER_SHAPES)
+
+    assert np.all(np.diff(batch_layer_fd['group'])>=0)
+    bounds=np.searchsorted(batch_layer_fd['group'],np.arange(len(fault_dicts)+1))
+    offsets=batch_layer_fd['psum_idx_offsets']
+    for group,single_fd in enumerate(singles):
+        start,end=bounds[group],bounds[group+1]
+        assert np.array_equal(batch_layer_fd['coor'][start:end],single_fd['coor'])
+        group_fd={'coor':batch_layer_fd['coor'][start:end],
+                  'psum_idx':batch_layer_fd['psum_idx'][offsets[start]:offsets[end]],
+                  'psum_idx_offsets':offsets[start:end+1]-offsets[start]}
+        assert _psum_rows(group_fd)==_psum_rows(single_fd)